@@ -56,7 +56,7 @@ class LogicalDeviceCli(Cmd):
 
     def get_devices(self):
         stub = self.get_stub()
-        res = stub.ListDevices(Empty())
+        res = stub.ListDevices(voltha_pb2.ListRequest())
         return res.items
 
     do_exit = Cmd.do_quit
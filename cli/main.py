@@ -171,12 +171,12 @@ class VolthaCli(Cmd):
 
     def get_devices(self):
         stub = self.get_stub()
-        res = stub.ListDevices(Empty())
+        res = stub.ListDevices(voltha_pb2.ListRequest())
         return res.items
 
     def get_logical_devices(self):
         stub = self.get_stub()
-        res = stub.ListLogicalDevices(Empty())
+        res = stub.ListLogicalDevices(voltha_pb2.ListRequest())
         return res.items
 
     def do_devices(self, line):
@@ -196,7 +196,7 @@ class VolthaCli(Cmd):
     def do_logical_devices(self, line):
         """List logical devices in Voltha"""
         stub = self.get_stub()
-        res = stub.ListLogicalDevices(Empty())
+        res = stub.ListLogicalDevices(voltha_pb2.ListRequest())
         omit_fields = {
             'desc.mfr_desc',
             'desc.hw_desc',
@@ -452,7 +452,7 @@ class TestCli(VolthaCli):
         """
         stub = self.get_stub()
         ports = stub.ListLogicalDevicePorts(
-            voltha_pb2.ID(id=logical_device_id)).items
+            voltha_pb2.ListRequest(id=logical_device_id)).items
         nni = None
         unis = []
         for port in ports:
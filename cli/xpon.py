@@ -196,7 +196,7 @@ class XponCli(Cmd):
             print_pb_list_as_table("Channel Pairs:",
                                    interface.channelpair_config, {},
                                    self.poutput)
-            devices = stub.ListDevices(Empty())
+            devices = stub.ListDevices(voltha_pb2.ListRequest())
             for d in devices.items:
                 interface = stub.GetAllChannelterminationConfig(
                     voltha_pb2.ID(id=d.id))
@@ -832,7 +832,7 @@ channel_termination create -i <DEVICE_ID> -n "PON port"
                     "Channel Terminations for device ID = {}:".format(opts.id),
                                        ct, {}, self.poutput)
             else:
-                devices = stub.ListDevices(Empty())
+                devices = stub.ListDevices(voltha_pb2.ListRequest())
                 for d in devices.items:
                     interface = stub.GetAllChannelterminationConfig(
                         voltha_pb2.ID(id=d.id))
@@ -16,31 +16,151 @@
 
 """
 A simple internal pub/sub event bus with topics and filter-based registration.
+
+Callbacks are called by publish itself, unless subscribed with a queue_size:
+such asynchronous subscriptions get their messages through a bounded queue
+of their own, delivered on the reactor, so that a slow subscriber does not
+slow down the publishers.
 """
 import re
+from collections import deque
+from threading import Condition
 
 import structlog
+from twisted.internet import reactor
+from twisted.python.threadable import isInIOThread
 
 
 log = structlog.get_logger()
 
+# overflow policies of the asynchronous subscriptions
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
 
 class _Subscription(object):
 
-    __slots__ = ('bus', 'predicate', 'callback', 'topic')
-    def __init__(self, bus, predicate, callback, topic=None):
+    __slots__ = ('bus', 'predicate', 'callback', 'topic', 'queue')
+    def __init__(self, bus, predicate, callback, topic=None, queue=None):
         self.bus = bus
         self.predicate = predicate
         self.callback = callback
         self.topic = topic
+        self.queue = queue
+
+
+class _DeliveryQueue(object):
+    """
+    Bounded queue of the messages of an asynchronous subscription, delivered
+    to its callback on the reactor. On overflow, the newest or the oldest
+    message is dropped, or the publisher blocks until there is room. A
+    publisher on the reactor cannot wait for the reactor, so it delivers the
+    queued messages itself instead.
+    """
+
+    def __init__(self, callback, name, maxsize, overflow, scheduler):
+        assert maxsize > 0
+        assert overflow in (DROP_NEWEST, DROP_OLDEST, BLOCK)
+        self.callback = callback
+        self.name = name
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.scheduler = scheduler
+        self.items = deque()  # (topic, msg, time queued)
+        self.lock = Condition()
+        self.scheduled = False
+        self.closed = False
+
+        self.delivered = 0
+        self.dropped = 0
+
+    def put(self, topic, msg):
+        with self.lock:
+            while len(self.items) >= self.maxsize and not self.closed:
+                if self.overflow == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                elif self.overflow == DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                elif isInIOThread():
+                    self.lock.release()
+                    try:
+                        self.drain()
+                    finally:
+                        self.lock.acquire()
+                else:
+                    self.lock.wait()
+            if self.closed:
+                return
+            self.items.append((topic, msg, self.scheduler.seconds()))
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.scheduler.callFromThread(self._drain_scheduled)
+
+    def drain(self):
+        """
+        Deliver the messages queued so far
+        """
+        with self.lock:
+            count = len(self.items)
+        for _ in xrange(count):
+            with self.lock:
+                if not self.items:
+                    break
+                topic, msg, _ = self.items.popleft()
+                self.lock.notify()
+            try:
+                self.callback(topic, msg)
+            except Exception, e:
+                log.exception('callback-failed', e=repr(e), topic=topic)
+            self.delivered += 1
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.dropped += len(self.items)
+            self.items.clear()
+            self.lock.notify_all()
+
+    def get_metrics(self, prefix):
+        with self.lock:
+            lag = self.scheduler.seconds() - self.items[0][2] \
+                if self.items else 0
+            return {
+                prefix + '-queued': len(self.items),
+                prefix + '-lag': lag,
+                prefix + '-delivered': self.delivered,
+                prefix + '-dropped': self.dropped,
+            }
+
+    def _drain_scheduled(self):
+        # deliver a bounded number of messages per reactor turn
+        self.drain()
+        with self.lock:
+            if self.items and not self.closed:
+                self.scheduler.callLater(0, self._drain_scheduled)
+            else:
+                self.scheduled = False
 
 
 class EventBus(object):
 
-    def __init__(self):
+    route_cache_size = 1024
+
+    def __init__(self, scheduler=None):
+        """
+        :param scheduler: reactor delivering the messages of the
+        asynchronous subscriptions, the global reactor by default
+        """
+        self.scheduler = scheduler or reactor
         self.subscriptions = {}  # topic -> list of _Subscription objects
                                  # topic None holds regexp based topic subs.
         self.subs_topic_map = {} # to aid fast lookup when unsubscribing
+        self.routes = {}  # topic -> tuple of the subscriptions it reaches,
+                          # reset whenever subscriptions change
 
     def list_subscribers(self, topic=None):
         if topic is None:
@@ -60,18 +180,32 @@ class EventBus(object):
         else:
             raise AttributeError('topic not a string nor a compiled regex')
 
-    def subscribe(self, topic, callback, predicate=None):
+    def subscribe(self, topic, callback, predicate=None, queue_size=None,
+                  overflow=DROP_OLDEST, name=None):
         """
         Subscribe to given topic with predicate and register the callback
         :param topic: String topic (explicit) or regexp based topic filter.
         :param callback: Callback method with signature def func(topic, msg)
         :param predicate: Optional method/function signature def predicate(msg)
+        :param queue_size: Optional size of the queue the messages are
+        delivered asynchronously through
+        :param overflow: DROP_NEWEST, DROP_OLDEST or BLOCK, what to do with
+        a message published while the queue is full
+        :param name: Optional name of the subscription in the metrics of its
+        queue, the topic by default
         :return: Subscription object which can be used to unsubscribe
         """
-        subscription = _Subscription(self, predicate, callback, topic)
+        queue = None
+        if queue_size is not None:
+            if name is None:
+                name = getattr(topic, 'pattern', topic)
+            queue = _DeliveryQueue(callback, name, queue_size, overflow,
+                                   self.scheduler)
+        subscription = _Subscription(self, predicate, callback, topic, queue)
         topic_key = self._get_topic_key(topic)
         self.subscriptions.setdefault(topic_key, []).append(subscription)
         self.subs_topic_map[subscription] = topic_key
+        self._invalidate_routes(topic_key)
         return subscription
 
     def unsubscribe(self, subscription):
@@ -80,8 +214,14 @@ class EventBus(object):
         :param subscription: subscription object as was returned by subscribe
         :return: None
         """
-        topic_key = self.subs_topic_map[subscription]
-        self.subscriptions[topic_key].remove(subscription)
+        topic_key = self.subs_topic_map.pop(subscription)
+        subscribers = self.subscriptions[topic_key]
+        subscribers.remove(subscription)
+        if not subscribers:
+            del self.subscriptions[topic_key]
+        self._invalidate_routes(topic_key)
+        if subscription.queue is not None:
+            subscription.queue.close()
 
     def publish(self, topic, msg):
         """
@@ -98,21 +238,51 @@ class EventBus(object):
             except Exception, e:
                 return False  # failed predicate function treated as no match
 
-        # lookup subscribers with explicit topic subscriptions
-        subscribers = self.subscriptions.get(topic, [])
-
-        # add matching regexp topic subscribers
-        subscribers.extend(s for s in self.subscriptions.get(None, [])
-                           if s.topic.match(topic))
-
-        for candidate in subscribers:
+        for candidate in self._route(topic):
             predicate = candidate.predicate
             if predicate is None or passes(msg, predicate):
+                if candidate.queue is not None:
+                    candidate.queue.put(topic, msg)
+                    continue
                 try:
                     candidate.callback(topic, msg)
                 except Exception, e:
                     log.exception('callback-failed', e=repr(e), topic=topic)
 
+    def get_metrics(self, prefix='event-bus'):
+        """
+        :return: metrics of the queues of the asynchronous subscriptions
+        """
+        metrics = {}
+        for subscription in self.subs_topic_map.keys():
+            if subscription.queue is not None:
+                metrics.update(subscription.queue.get_metrics(
+                    '{}-{}'.format(prefix, subscription.queue.name)))
+        return metrics
+
+    def _route(self, topic):
+        """
+        :return: tuple of the subscriptions of the topic, explicit ones
+        first, then the matching regexp based ones. Matching the regexps
+        only happens the first time a topic is published after a change of
+        the subscriptions.
+        """
+        route = self.routes.get(topic)
+        if route is None:
+            route = tuple(self.subscriptions.get(topic, ())) + tuple(
+                s for s in self.subscriptions.get(None, ())
+                if s.topic.match(topic))
+            if len(self.routes) >= self.route_cache_size:
+                self.routes.clear()
+            self.routes[topic] = route
+        return route
+
+    def _invalidate_routes(self, topic_key):
+        if topic_key is None:
+            self.routes.clear()
+        else:
+            self.routes.pop(topic_key, None)
+
 
 
 default_bus = EventBus()
@@ -163,16 +333,23 @@ class EventBusClient(object):
         """
         self.bus.publish(topic, msg)
 
-    def subscribe(self, topic, callback, predicate=None):
+    def subscribe(self, topic, callback, predicate=None, queue_size=None,
+                  overflow=DROP_OLDEST, name=None):
         """
         Subscribe to given topic with predicate and register the callback
         :param topic: String topic (explicit) or regexp based topic filter.
         :param callback: Callback method with signature def func(topic, msg)
         :param predicate: Optional method/function with signature
         def predicate(msg)
+        :param queue_size: Optional size of the queue the messages are
+        delivered asynchronously through, on the reactor
+        :param overflow: DROP_NEWEST, DROP_OLDEST or BLOCK, what to do with
+        a message published while the queue is full
+        :param name: Optional name of the subscription in the metrics
         :return: Subscription object which can be used to unsubscribe
         """
-        return self.bus.subscribe(topic, callback, predicate)
+        return self.bus.subscribe(topic, callback, predicate, queue_size,
+                                  overflow, name)
 
     def unsubscribe(self, subscription):
         """
@@ -190,3 +367,11 @@ class EventBusClient(object):
         :return: List of subscriptions
         """
         return self.bus.list_subscribers(topic)
+
+    def get_metrics(self):
+        """
+        Return the queue length, lag in seconds, and delivered and dropped
+        message counts of each asynchronous subscription.
+        :return: Dict of metrics
+        """
+        return self.bus.get_metrics()
@@ -40,6 +40,7 @@ from scapy.data import ETH_P_ALL
 from twisted.internet import reactor
 from zope.interface import implementer
 
+from common.utils.metrics import counter
 from voltha.registry import IComponent
 
 if sys.platform.startswith('linux'):
@@ -49,6 +50,11 @@ elif sys.platform == 'darwin':
 
 log = structlog.get_logger()
 
+_rx_frames = counter('frameio-rx-frames')
+_rx_discarded = counter('frameio-rx-discarded')
+_tx_frames = counter('frameio-tx-frames')
+_tx_errors = counter('frameio-tx-errors')
+
 
 def hexify(buffer):
     """
@@ -166,6 +172,7 @@ class FrameIOPort(object):
         log.debug('frame-received', iface=self.iface_name, len=len(frame),
                   hex=hexify(frame))
         self.received +=1
+        _rx_frames.inc()
         dispatched = False
         for proxy in self.proxies:
             if proxy.filter is None or proxy.filter(frame):
@@ -175,12 +182,15 @@ class FrameIOPort(object):
 
         if not dispatched:
             self.discarded += 1
+            _rx_discarded.inc()
             log.debug('frame-discarded')
 
     def send(self, frame):
         log.debug('sending', len=len(frame), iface=self.iface_name)
         sent_bytes = self.send_frame(frame)
+        _tx_frames.inc()
         if sent_bytes != len(frame):
+            _tx_errors.inc()
             log.error('send-error', iface=self.iface_name,
                       wanted_to_send=len(frame), actually_sent=sent_bytes)
         return sent_bytes
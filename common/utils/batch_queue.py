@@ -0,0 +1,120 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from Queue import Empty
+from collections import deque
+from threading import Condition
+from time import time
+
+
+class BatchQueue(object):
+    """
+    A thread-safe FIFO queue handing out its items in batches, so that the
+    consumer pays its per-wakeup overhead once per burst rather than once
+    per item. The queue is bounded: when full, new items are dropped (or,
+    with drop_oldest, the oldest queued items are), and counted as such.
+    Once closed, the queue takes no more items, and its consumers get
+    the remaining ones, then empty batches without waiting.
+    """
+
+    def __init__(self, maxsize=0, drop_oldest=False):
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.items = deque()
+        self.cond = Condition()
+        self.closed = False
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+
+    def qsize(self):
+        return len(self.items)
+
+    def put(self, item):
+        """
+        Add item to the queue, unless the queue is full
+        :return: True if the item was queued
+        """
+        with self.cond:
+            if self.closed:
+                return False
+            if self.maxsize > 0 and len(self.items) >= self.maxsize:
+                self.dropped += 1
+                if not self.drop_oldest:
+                    return False
+                self.items.popleft()
+            self.items.append(item)
+            self.enqueued += 1
+            self.cond.notify()
+            return True
+
+    def close(self):
+        """
+        Stop taking items, and wake up all waiting consumers
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def get_batch(self, max_items=None, timeout=None):
+        """
+        Remove and return the queued items, waiting for at least one
+        :param max_items: if given, return no more than that many items
+        :param timeout: if given, seconds after which an empty list is
+        returned if no item was queued by then
+        :return: list of items, empty if timed out or closed
+        """
+        with self.cond:
+            if not self.items:
+                if timeout is None:
+                    while not self.items and not self.closed:
+                        self.cond.wait()
+                else:
+                    deadline = time() + timeout
+                    while not self.items and not self.closed:
+                        remaining = deadline - time()
+                        if remaining <= 0:
+                            return []
+                        self.cond.wait(remaining)
+                if not self.items:
+                    return []
+
+            items = self.items
+            if max_items is None or len(items) <= max_items:
+                batch = list(items)
+                items.clear()
+            else:
+                batch = [items.popleft() for _ in xrange(max_items)]
+            self.dequeued += len(batch)
+            return batch
+
+    def get(self, timeout=None):
+        """
+        Remove and return a single item, as Queue.Queue.get() does
+        :raises Queue.Empty: if no item was queued within timeout
+        """
+        batch = self.get_batch(1, timeout)
+        if not batch:
+            raise Empty()
+        return batch[0]
+
+    def get_metrics(self, prefix):
+        return {
+            prefix + '-queued': len(self.items),
+            prefix + '-enqueued': self.enqueued,
+            prefix + '-dequeued': self.dequeued,
+            prefix + '-dropped': self.dropped,
+        }
@@ -0,0 +1,185 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Wire formats of the events published to Kafka, shared by the publisher and
+the consumers.
+
+json: the JSON form of MessageToDict(msg, True, True). The conversion is
+done by functions made once per message type, much cheaper than the
+reflection of MessageToDict.
+
+protobuf: a NUL byte, the length of the full name of the message type, as
+one byte, that name, as schema id, and the serialized message. A JSON
+message never starts with a NUL byte, so consumers can tell both apart.
+"""
+import math
+from base64 import b64encode
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.symbol_database import Default as default_symbol_db
+from simplejson import dumps, loads
+
+JSON = 'json'
+PROTOBUF = 'protobuf'
+
+_PROTOBUF_MAGIC = '\x00'
+
+
+def encode_json(msg):
+    return dumps(message_to_dict(msg))
+
+
+def encode_protobuf(msg):
+    schema_id = msg.DESCRIPTOR.full_name
+    return ''.join((_PROTOBUF_MAGIC, chr(len(schema_id)), schema_id,
+                    msg.SerializeToString()))
+
+
+encoders = {
+    JSON: encode_json,
+    PROTOBUF: encode_protobuf,
+}
+
+
+def decode(value):
+    """
+    Decode an event published in any of the wire formats
+    :param value: the Kafka message value
+    :return: the event as a dict, as MessageToDict(msg, True, True) makes
+    it. Decoding the protobuf format needs the protobuf module of the
+    message type to be imported.
+    """
+    if not value.startswith(_PROTOBUF_MAGIC):
+        return loads(value)
+    return MessageToDict(decode_message(value), True, True)
+
+
+def decode_message(value):
+    """
+    :return: the protobuf message of an event in the protobuf format
+    """
+    assert value.startswith(_PROTOBUF_MAGIC)
+    end = 2 + ord(value[1])
+    msg = default_symbol_db().GetSymbol(value[2:end])()
+    msg.ParseFromString(value[end:])
+    return msg
+
+
+def message_to_dict(msg):
+    """
+    Same as MessageToDict(msg, True, True)
+    """
+    return _converter(msg.DESCRIPTOR)(msg)
+
+
+_converters = {}  # message full name -> message to dict function
+
+_INT64_TYPES = frozenset((
+    FieldDescriptor.CPPTYPE_INT64,
+    FieldDescriptor.CPPTYPE_UINT64,
+))
+
+
+def _converter(descriptor):
+    converter = _converters.get(descriptor.full_name)
+    if converter is None:
+        converter = _converters[descriptor.full_name] = \
+            _make_converter(descriptor)
+    return converter
+
+
+def _make_converter(descriptor):
+    if descriptor.full_name.startswith('google.protobuf.'):
+        # well-known types have JSON forms of their own
+        return lambda msg: MessageToDict(msg, True, True)
+
+    always = []  # (name, value converter)
+    if_set = []  # (name, value converter), for the fields with presence
+    for field in descriptor.fields:
+        convert = _value_converter(field)
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            if _is_map(field):
+                convert = _map_converter(field)
+            else:
+                convert = _repeated_converter(convert)
+            always.append((field.name, convert))
+        elif field.message_type is not None or field.containing_oneof:
+            if_set.append((field.name, convert))
+        else:
+            always.append((field.name, convert))
+
+    def to_dict(msg):
+        d = {}
+        for name, convert in always:
+            d[name] = convert(getattr(msg, name))
+        for name, convert in if_set:
+            if msg.HasField(name):
+                d[name] = convert(getattr(msg, name))
+        return d
+
+    return to_dict
+
+
+def _is_map(field):
+    return field.message_type is not None and \
+        field.message_type.GetOptions().map_entry
+
+
+def _repeated_converter(convert):
+    return lambda values: [convert(v) for v in values]
+
+
+def _map_converter(field):
+    key_field, value_field = field.message_type.fields
+    convert = _value_converter(value_field)
+    if key_field.cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        key_to_str = lambda key: 'true' if key else 'false'
+    else:
+        key_to_str = unicode
+    return lambda values: dict(
+        (key_to_str(key), convert(value)) for key, value in values.iteritems())
+
+
+def _value_converter(field):
+    cpp_type = field.cpp_type
+    if cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+        message_type = field.message_type
+        return lambda msg: _converter(message_type)(msg)
+    if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+        values = field.enum_type.values_by_number
+
+        def enum_name(number):
+            value = values.get(number)
+            return number if value is None else value.name
+        return enum_name
+    if cpp_type in _INT64_TYPES:
+        return str
+    if cpp_type in (FieldDescriptor.CPPTYPE_FLOAT,
+                    FieldDescriptor.CPPTYPE_DOUBLE):
+        return _float
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return lambda value: b64encode(value).decode('utf-8')
+    return lambda value: value
+
+
+def _float(value):
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if math.isnan(value):
+        return 'NaN'
+    return value
@@ -0,0 +1,87 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Lock
+
+from common.utils.batch_queue import BatchQueue
+
+
+class FanOut(object):
+    """
+    Delivers every item published to all of its subscribers, each through
+    a bounded BatchQueue of its own, so that a slow subscriber only ever
+    overflows its own queue. The items published while there is no
+    subscriber are kept, within the same bound, for the first one to come.
+    """
+
+    def __init__(self, maxsize=0, drop_oldest=False):
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.lock = Lock()
+        self.subscribers = []
+        self.backlog = self._make_queue()
+
+        self.published = 0
+        self.dropped = 0  # by the queues of former subscribers
+
+    def subscribe(self):
+        """
+        :return: BatchQueue receiving the items published from now on
+        """
+        with self.lock:
+            if self.subscribers:
+                queue = self._make_queue()
+            else:
+                queue, self.backlog = self.backlog, None
+            self.subscribers = self.subscribers + [queue]
+            return queue
+
+    def unsubscribe(self, queue):
+        queue.close()
+        with self.lock:
+            if queue not in self.subscribers:
+                return
+            self.subscribers = [q for q in self.subscribers if q is not queue]
+            self.dropped += queue.dropped
+            if not self.subscribers:
+                self.backlog = self._make_queue()
+
+    def close_subscriptions(self):
+        """
+        Close the queues of all current subscribers, ending their waits
+        """
+        for queue in self.subscribers:
+            queue.close()
+
+    def publish(self, item):
+        with self.lock:
+            queues = self.subscribers or (self.backlog,)
+            self.published += 1
+        for queue in queues:
+            queue.put(item)
+
+    def get_metrics(self, prefix):
+        with self.lock:
+            queues = self.subscribers or (self.backlog,)
+            return {
+                prefix + '-subscribers': len(self.subscribers),
+                prefix + '-published': self.published,
+                prefix + '-queued': sum(q.qsize() for q in queues),
+                prefix + '-dropped':
+                    self.dropped + sum(q.dropped for q in queues),
+            }
+
+    def _make_queue(self):
+        return BatchQueue(self.maxsize, self.drop_oldest)
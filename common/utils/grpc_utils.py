@@ -107,3 +107,34 @@ def twisted_async(func):
     return in_thread_wrapper
 
 
+
+
+def deferred_from_future(future):
+    """
+    Return a Deferred firing, on the Twisted main thread, with the outcome
+    of a gRPC client call started with the future() form of a stub method.
+    Unlike the blocking form, this does not hold the reactor while the call
+    is in progress. Cancelling the Deferred cancels the call.
+
+    Example usage:
+
+        future = stub.GetSpam.future(request, timeout=5)
+        spam = yield deferred_from_future(future)
+
+    """
+    d = Deferred(lambda _: future.cancel())
+
+    def _fire(fire, value):
+        if not d.called:
+            fire(value)
+
+    def _done(f):
+        try:
+            result = f.result()
+        except Exception, e:
+            reactor.callFromThread(_fire, d.errback, e)
+        else:
+            reactor.callFromThread(_fire, d.callback, result)
+
+    future.add_done_callback(_done)
+    return d
@@ -13,41 +13,116 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from twisted.internet.defer import Deferred
+from collections import OrderedDict, deque
+from itertools import count
+
+import structlog
+from twisted.internet.defer import Deferred, TimeoutError
 from twisted.internet.defer import succeed
 
+log = structlog.get_logger()
+
+
+class _Waiter(object):
+
+    __slots__ = ('seq', 'd', 'predicate', 'slot')
+
+    def __init__(self, seq, predicate, slot):
+        self.seq = seq
+        self.d = None
+        self.predicate = predicate
+        self.slot = slot  # (index name, key) for waiters of get_by()
+
+
+def _pop_key(by_key, key, item):
+    """
+    Remove item from the deque of key; it is nearly always the first one
+    """
+    items = by_key[key]
+    if items[0] is item:
+        items.popleft()
+    else:
+        items.remove(item)
+    if not items:
+        del by_key[key]
+
 
 class MessageQueue(object):
     """
     An event driven queue, similar to twisted.internet.defer.DeferredQueue
     but which allows selective dequeing based on a predicate function.
-    Unlike DeferredQueue, there is no limit on backlog, and there is no queue
-    limit.
+
+    For the common selections, such as by transaction id or by message
+    class, indices can be registered (see add_index) and used through
+    get_by(). Matching a message to the waiters of an index, or a waiter to
+    the queued messages, is then a dict lookup, irrespective of the number
+    of messages queued and of the requests outstanding. Predicates remain
+    supported, at the cost of a scan over the queued messages or over the
+    predicate waiters.
+
+    Waiters are served in the order of their requests, whichever way they
+    select. If maxsize is given, the oldest message is dropped when a
+    message is put into a full queue.
     """
 
-    def __init__(self):
-        self.waiting = []  # tuples of (d, predicate)
-        self.queue = []  # messages piling up here if no one is waiting
+    def __init__(self, maxsize=None, clock=None):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.dropped = 0  # messages dropped due to a full queue
+        self.indices = {}  # index name -> function returning keys of obj
+        self._seq = count()
+        self._init_state()
 
-    def reset(self):
+    def _init_state(self):
+        self.waiting = []  # predicate waiters, in order of request
+        # seq -> (obj, [(index name, key)]), piling up if no one is waiting
+        self.queue = OrderedDict()
+        # index name -> {key -> deque of seqs of queued objects}
+        self.queued_by_key = dict((name, {}) for name in self.indices)
+        # index name -> {key -> deque of waiters}
+        self.waiting_by_key = dict((name, {}) for name in self.indices)
+
+    def add_index(self, name, keys):
         """
-        Purge all content as well as waiters (by errback-ing their entries).
+        Register an index, to be used with get_by()
+        :param name: name of the index
+        :param keys: function returning the keys obj is to be found by in
+        this index, e.g., lambda msg: (msg.xid,)
         :return: None
         """
-        for d, _ in self.waiting:
-            d.errback(Exception('mesage queue reset() was called'))
-        self.waiting = []
-        self.queue = []
+        assert not self.queue and not self.waiting, 'queue in use'
+        self.indices[name] = keys
+        self.queued_by_key[name] = {}
+        self.waiting_by_key[name] = {}
 
-    def _cancelGet(self, d):
+    def reset(self):
         """
-        Remove a deferred from our waiting list.
-        :param d: The deferred that was been canceled.
+        Purge all content as well as waiters (by errback-ing their entries).
         :return: None
         """
-        for i in range(len(self.waiting)):
-            if self.waiting[i][0] is d:
-                self.waiting.pop(i)
+        waiters = list(self.waiting)
+        for by_key in self.waiting_by_key.itervalues():
+            for key_waiters in by_key.itervalues():
+                waiters.extend(key_waiters)
+        self._init_state()
+        for waiter in sorted(waiters, key=lambda w: w.seq):
+            waiter.d.errback(Exception('mesage queue reset() was called'))
+
+    def __len__(self):
+        return len(self.queue)
+
+    def _remove_waiter(self, waiter):
+        if waiter.slot is None:
+            self.waiting.remove(waiter)
+        else:
+            name, key = waiter.slot
+            _pop_key(self.waiting_by_key[name], key, waiter)
+
+    def _remove_queued(self, seq):
+        obj, slots = self.queue.pop(seq)
+        for name, key in slots:
+            _pop_key(self.queued_by_key[name], key, seq)
+        return obj
 
     def put(self, obj):
         """
@@ -55,35 +130,108 @@ class MessageQueue(object):
         :param obj: arbitrary object that will be added to the queue
         :return:
         """
+        slots = [(name, key)
+                 for name, keys in self.indices.iteritems()
+                 for key in keys(obj)]
+
+        # find the earliest waiter for this, if any
+        first = None
+        for name, key in slots:
+            key_waiters = self.waiting_by_key[name].get(key)
+            if key_waiters and (first is None or
+                                key_waiters[0].seq < first.seq):
+                first = key_waiters[0]
+        for waiter in self.waiting:
+            if first is not None and waiter.seq > first.seq:
+                break
+            if waiter.predicate is None or waiter.predicate(obj):
+                first = waiter
+                break
 
         # if someone is waiting for this, return right away
-        for i in range(len(self.waiting)):
-            d, predicate = self.waiting[i]
-            if predicate is None or predicate(obj):
-                self.waiting.pop(i)
-                d.callback(obj)
-                return
+        if first is not None:
+            self._remove_waiter(first)
+            first.d.callback(obj)
+            return
 
         # otherwise...
-        self.queue.append(obj)
+        if self.maxsize is not None and len(self.queue) >= self.maxsize:
+            self._remove_queued(next(iter(self.queue)))
+            self.dropped += 1
+            log.warn('message-queue-full', maxsize=self.maxsize,
+                     dropped=self.dropped)
+        seq = next(self._seq)
+        self.queue[seq] = (obj, slots)
+        for name, key in slots:
+            by_key = self.queued_by_key[name]
+            seqs = by_key.get(key)
+            if seqs is None:
+                seqs = by_key[key] = deque()
+            seqs.append(seq)
 
-    def get(self, predicate=None):
+    def get(self, predicate=None, timeout=None):
         """
         Attempt to retrieve and remove an object from the queue that
         matches the optional predicate.
+        :param timeout: if given, seconds after which the returned Deferred
+        errbacks with TimeoutError, unless an object was available by then
         :return: Deferred which fires with the next object available.
         If predicate was provided, only objects for which
         predicate(obj) is True will be considered.
         """
-        for i in range(len(self.queue)):
-            msg = self.queue[i]
+        for seq, (msg, _) in self.queue.iteritems():
             if predicate is None or predicate(msg):
-                self.queue.pop(i)
-                return succeed(msg)
+                return succeed(self._remove_queued(seq))
 
         # there were no matching entries if we got here, so we wait
-        d = Deferred(canceller=self._cancelGet)
-        self.waiting.append((d, predicate))
-        return d
+        waiter = self._wait(predicate, None, timeout)
+        self.waiting.append(waiter)
+        return waiter.d
+
+    def get_by(self, name, key, timeout=None):
+        """
+        Attempt to retrieve and remove the first object from the queue
+        that the given index has under key.
+        :param name: name of an index registered with add_index()
+        :param key: key to look up in the index
+        :param timeout: as with get()
+        :return: Deferred which fires with the next matching object
+        """
+        seqs = self.queued_by_key[name].get(key)
+        if seqs:
+            return succeed(self._remove_queued(seqs[0]))
+
+        # there were no matching entries if we got here, so we wait
+        waiter = self._wait(None, (name, key), timeout)
+        by_key = self.waiting_by_key[name]
+        key_waiters = by_key.get(key)
+        if key_waiters is None:
+            key_waiters = by_key[key] = deque()
+        key_waiters.append(waiter)
+        return waiter.d
+
+    def _wait(self, predicate, slot, timeout):
+        waiter = _Waiter(next(self._seq), predicate, slot)
+        waiter.d = d = Deferred(
+            canceller=lambda _: self._remove_waiter(waiter))
+
+        if timeout is not None:
+            if self.clock is None:
+                from twisted.internet import reactor
+                self.clock = reactor
+
+            def expire():
+                self._remove_waiter(waiter)
+                d.errback(TimeoutError(
+                    'no message within {}s'.format(timeout)))
+
+            timer = self.clock.callLater(timeout, expire)
+
+            def stop_timer(result):
+                if timer.active():
+                    timer.cancel()
+                return result
 
+            d.addBoth(stop_timer)
 
+        return waiter
@@ -0,0 +1,233 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Lightweight in-process metrics: counters, gauges and fixed-bucket
+histograms, registered by name and collected periodically as a flat dict
+of numbers, e.g. by Diagnostics into KPI events.
+
+Modules get their metrics once, at import time, from the process default
+registry:
+
+>>> commits = counter('config-commits')
+>>> commits.inc()
+>>> latency = histogram('rpc-latency')
+>>> with latency.time():
+>>>     handle_request()
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from time import time
+
+from twisted.internet.defer import Deferred
+
+# upper bounds, in seconds, of the buckets of latency histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self.lock = Lock()
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def collect(self):
+        return {self.name: self.value}
+
+
+class Gauge(object):
+    """
+    Either set, or read from fn when collected
+    """
+
+    def __init__(self, name, fn=None):
+        self.name = name
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def collect(self):
+        return {self.name: self.value if self.fn is None else self.fn()}
+
+
+class Histogram(object):
+    """
+    Distribution of the values observed, over fixed buckets. Collected as
+    the count and sum of all values observed so far, and the 50th, 90th and
+    99th percentiles and the maximum of the values observed since the
+    previous collection. A percentile is the upper bound of its bucket,
+    capped to that maximum.
+    """
+
+    percentiles = (50, 90, 99)
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0  # since the previous collection
+        self.collected_counts = list(self.counts)
+        self.lock = Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        """
+        :return: context manager observing the time spent in its block
+        """
+        return _Timer(self)
+
+    def timed(self, f):
+        """
+        Decorator observing the time spent in f, up to the firing of the
+        Deferred it returns, if it does
+        """
+        @wraps(f)
+        def wrapper(*args, **kw):
+            t0 = time()
+            try:
+                result = f(*args, **kw)
+            except Exception:
+                self.observe(time() - t0)
+                raise
+            if isinstance(result, Deferred):
+                def observe(r):
+                    self.observe(time() - t0)
+                    return r
+                result.addBoth(observe)
+            else:
+                self.observe(time() - t0)
+            return result
+        return wrapper
+
+    def collect(self):
+        with self.lock:
+            window = [c - p for c, p in
+                      zip(self.counts, self.collected_counts)]
+            self.collected_counts = list(self.counts)
+            window_max, self.max = self.max, 0.0
+            metrics = {
+                self.name + '-count': self.count,
+                self.name + '-sum': self.sum,
+                self.name + '-max': window_max,
+            }
+        total = sum(window)
+        for percentile in self.percentiles:
+            metrics['{}-p{}'.format(self.name, percentile)] = \
+                self._percentile(window, total, percentile, window_max)
+        return metrics
+
+    def _percentile(self, window, total, percentile, window_max):
+        if not total:
+            return 0
+        rank = -(-total * percentile // 100)  # ceiling
+        seen = 0
+        for i, count in enumerate(window):
+            seen += count
+            if seen >= rank:
+                break
+        if i < len(self.bounds):
+            return min(self.bounds[i], window_max)
+        return window_max
+
+
+class _Timer(object):
+
+    __slots__ = ('histogram', 't0')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t0 = time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time() - self.t0)
+
+
+class MetricsRegistry(object):
+
+    def __init__(self):
+        self.metrics = OrderedDict()  # name -> metric
+        self.lock = Lock()
+
+    def counter(self, name):
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name, fn=None):
+        """
+        :param fn: Optional function returning the value of the gauge,
+        replacing the one of an already registered gauge
+        """
+        gauge = self._get_or_create(name, Gauge)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS):
+        return self._get_or_create(name, Histogram, buckets)
+
+    def unregister(self, name):
+        with self.lock:
+            self.metrics.pop(name, None)
+
+    def collect(self):
+        """
+        :return: dict of the values of all metrics
+        """
+        with self.lock:
+            metrics = self.metrics.values()
+        values = {}
+        for metric in metrics:
+            values.update(metric.collect())
+        return values
+
+    def _get_or_create(self, name, cls, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError('metric {} is a {}'.format(
+                    name, type(metric).__name__))
+            return metric
+
+
+default_registry = MetricsRegistry()
+
+counter = default_registry.counter
+gauge = default_registry.gauge
+histogram = default_registry.histogram
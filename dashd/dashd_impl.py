@@ -75,6 +75,9 @@ from twisted.python.failure import Failure
 from twisted.internet.task import LoopingCall
 
 from common.utils.consulhelpers import get_endpoint_from_consul
+from common.utils.event_codec import decode
+from voltha.protos import third_party
+from voltha.protos import events_pb2
 import requests
 import json
 import re
@@ -82,6 +85,9 @@ import sys
 import time
 from dashd.dash_template import DashTemplate
 
+# register the event types decode() may meet
+_ = third_party, events_pb2
+
 log = get_logger()
 
 
@@ -310,7 +316,7 @@ class DashDaemon(object):
         # Extract the ids for all olt(s) in the message and do one of 2
         # things. If it exists, reset the meta_data timer for the dashboard and
         # if it doesn't exist add it to the array of needed dashboards.
-        metrics = json.loads(getattr(msg.message,'value'))['prefixes']
+        metrics = decode(getattr(msg.message,'value'))['prefixes']
         for key in metrics.keys():
             match = re.search(r'voltha\.(.*olt)\.([0-9a-zA-Z]+)\.(.*)',key)
             if match and match.lastindex > 1:
@@ -137,18 +137,13 @@ class Agent(protocol.ClientFactory):
             log.error('client-connection-lost',
                       reason=reason, connector=connector)
 
-    def forward_packet_in(self, ofp_packet_in):
+    def is_connected(self):
+        return self.proto_handler is not None and \
+            self.proto_handler.cxn.connected
+
+    def send_async(self, encoded_msgs):
         if self.proto_handler is not None:
-            self.proto_handler.forward_packet_in(ofp_packet_in)
-
-    def forward_change_event(self, event):
-        # assert isinstance(event, ChangeEvent)
-        log.info('got-change-event', change_event=event)
-        if event.HasField("port_status"):
-            if self.proto_handler is not None:
-                self.proto_handler.forward_port_status(event.port_status)
-        else:
-            log.error('unknown-change-event', change_event=event)
+            self.proto_handler.send_async(encoded_msgs)
 
 
 if __name__ == '__main__':
@@ -28,10 +28,12 @@ from grpc import StatusCode
 from grpc._channel import _Rendezvous
 from ofagent.protos import third_party
 from protos import voltha_pb2
-from protos.voltha_pb2 import OfAgentSubscriber
+from protos.voltha_pb2 import OfAgentSubscriber, LogicalDeviceEvent
 from grpc_client import GrpcClient
 
 from agent import Agent
+from converter import to_loxi
+from of_connection import EncodedMessage
 from google.protobuf.empty_pb2 import Empty
 from common.utils.dockerhelpers import get_my_containers_name
 
@@ -41,8 +43,8 @@ log = get_logger()
 
 class ConnectionManager(object):
     def __init__(self, consul_endpoint, vcore_endpoint, controller_endpoints,
-                 vcore_retry_interval=0.5, devices_refresh_interval=5,
-                 subscription_refresh_interval=5):
+                 vcore_retry_interval=0.5, devices_refresh_interval=60,
+                 subscription_refresh_interval=5, stats_max_age=5):
 
         log.info('init-connection-manager')
         log.info('list-of-controllers', controller_endpoints=controller_endpoints)
@@ -56,9 +58,14 @@ class ConnectionManager(object):
         self.agent_map = {}  # (datapath_id, controller_endpoint) -> Agent()
         self.device_id_to_datapath_id_map = {}
 
+        # position in the logical device event stream of vcore
+        self.logical_device_event_epoch = ''
+        self.logical_device_event_sequence = 0
+
         self.vcore_retry_interval = vcore_retry_interval
         self.devices_refresh_interval = devices_refresh_interval
         self.subscription_refresh_interval = subscription_refresh_interval
+        self.stats_max_age = stats_max_age
         self.subscription = None
 
         self.running = False
@@ -164,7 +171,8 @@ class ConnectionManager(object):
                         # Keep details on the current GRPC session and subscription
                         log.debug('subscription-with-vcore-successful', subscription=subscription)
                         self.subscription = subscription
-                        self.grpc_client = GrpcClient(self, self.channel).start()
+                        self.grpc_client = GrpcClient(
+                            self, self.channel, self.stats_max_age).start()
 
                     # Sleep a bit in between each subscribe
                     yield asleep(self.subscription_refresh_interval)
@@ -199,7 +207,7 @@ class ConnectionManager(object):
             log.info('retrieve-logical-device-list')
             try:
                 stub = voltha_pb2.VolthaLocalServiceStub(self.channel)
-                devices = stub.ListLogicalDevices(Empty()).items
+                devices = stub.ListLogicalDevices(voltha_pb2.ListRequest()).items
                 for device in devices:
                     log.info("logical-device-entry", id=device.id, datapath_id=device.datapath_id)
 
@@ -251,6 +259,36 @@ class ConnectionManager(object):
         log.debug('updated-device-id-to-datapath-id-map',
                   map=str(self.device_id_to_datapath_id_map))
 
+    def get_logical_device_event_position(self):
+        return (self.logical_device_event_epoch,
+                self.logical_device_event_sequence)
+
+    def handle_logical_device_event(self, event):
+        """
+        Update the agents as per a logical device event pushed by vcore.
+        Must be called on the twisted thread.
+        :param event: LogicalDeviceEvent
+        :return: None
+        """
+        if event.type == LogicalDeviceEvent.SNAPSHOT:
+            self.refresh_agent_connections(event.logical_devices)
+        else:
+            current_datapath_ids = set(
+                datapath_id for datapath_id, _ in self.agent_map.iterkeys())
+            for device in event.logical_devices:
+                if event.type == LogicalDeviceEvent.ADDED:
+                    if device.datapath_id not in current_datapath_ids:
+                        self.create_agent(device)
+                        current_datapath_ids.add(device.datapath_id)
+                elif event.type == LogicalDeviceEvent.REMOVED:
+                    if device.datapath_id in current_datapath_ids:
+                        self.delete_agent(device.datapath_id)
+                        current_datapath_ids.discard(device.datapath_id)
+            log.debug('updated-agent-list', count=len(self.agent_map))
+
+        self.logical_device_event_epoch = event.epoch
+        self.logical_device_event_sequence = event.sequence
+
     def create_agent(self, device):
         datapath_id = device.datapath_id
         device_id = device.id
@@ -268,6 +306,8 @@ class ConnectionManager(object):
             agent.stop()
             del self.agent_map[(datapath_id,controller_endpoint)]
             del self.device_id_to_datapath_id_map[device_id]
+        if self.grpc_client is not None:
+            self.grpc_client.stats_cache.remove(device_id)
 
     @inlineCallbacks
     def monitor_logical_devices(self):
@@ -276,7 +316,8 @@ class ConnectionManager(object):
         while self.running:
             log.info('monitoring-logical-devices')
 
-            # should change to a gRPC streaming call
+            # changes are pushed by vcore as logical device events (see
+            # handle_logical_device_event); polling remains as a safety net
             # see https://jira.opencord.org/browse/CORD-821
 
             try:
@@ -300,16 +341,34 @@ class ConnectionManager(object):
 
         log.debug('stop-monitor-logical-devices')
 
-    def forward_packet_in(self, device_id, ofp_packet_in):
+    def get_connected_agents(self, device_id):
         datapath_id = self.device_id_to_datapath_id_map.get(device_id, None)
-        if datapath_id:
-            for controller_endpoint in self.controller_endpoints:
-                agent = self.agent_map[(datapath_id, controller_endpoint)]
-                agent.forward_packet_in(ofp_packet_in)
+        if not datapath_id:
+            return []
+        agents = [self.agent_map[(datapath_id, controller_endpoint)]
+                  for controller_endpoint in self.controller_endpoints]
+        return [agent for agent in agents if agent.is_connected()]
+
+    def forward_packet_in(self, device_id, ofp_packet_in):
+        self.forward_packets_in(device_id, [ofp_packet_in])
+
+    def forward_packets_in(self, device_id, ofp_packet_ins):
+        # the messages are converted and packed once for all controllers
+        agents = self.get_connected_agents(device_id)
+        if agents:
+            encoded_msgs = [EncodedMessage(to_loxi(ofp_packet_in))
+                            for ofp_packet_in in ofp_packet_ins]
+            for agent in agents:
+                agent.send_async(encoded_msgs)
 
     def forward_change_event(self, device_id, event):
-        datapath_id = self.device_id_to_datapath_id_map.get(device_id, None)
-        if datapath_id:
-            for controller_endpoint in self.controller_endpoints:
-                agent = self.agent_map[(datapath_id, controller_endpoint)]
-                agent.forward_change_event(event)
+        log.debug('got-change-event', change_event=event)
+        agents = self.get_connected_agents(device_id)
+        if not agents:
+            return
+        if event.HasField('port_status'):
+            encoded_msgs = [EncodedMessage(to_loxi(event.port_status))]
+            for agent in agents:
+                agent.send_async(encoded_msgs)
+        else:
+            log.error('unknown-change-event', change_event=event)
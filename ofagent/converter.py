@@ -52,8 +52,18 @@ def to_grpc(loxi_object):
     return converter(loxi_object)
 
 def ofp_port_to_loxi_port_desc(pb):
-    kw = pb2dict(pb)
-    return of13.common.port_desc(**kw)
+    return of13.common.port_desc(
+        port_no=pb.port_no,
+        hw_addr=list(pb.hw_addr) or None,
+        name=str(pb.name),
+        config=pb.config,
+        state=pb.state,
+        curr=pb.curr,
+        advertised=pb.advertised,
+        supported=pb.supported,
+        peer=pb.peer,
+        curr_speed=pb.curr_speed,
+        max_speed=pb.max_speed)
 
 def ofp_port_status_to_loxi_port_status(pb):
     return of13.message.port_status(
@@ -61,113 +71,96 @@ def ofp_port_status_to_loxi_port_status(pb):
         desc=ofp_port_to_loxi_port_desc(pb.desc)
     )
 
-def make_loxi_field(oxm_field):
-    assert oxm_field['oxm_class'] == pb2.OFPXMC_OPENFLOW_BASIC
-    ofb_field = oxm_field['ofb_field']
-    field_type = ofb_field.get('type', 0)
-
-    if field_type == pb2.OFPXMT_OFB_ETH_TYPE:
-        return (
-            of13.oxm.eth_type(value=ofb_field['eth_type']))
-
-    elif field_type == pb2.OFPXMT_OFB_IN_PORT:
-        return (
-            of13.oxm.in_port(value=ofb_field['port']))
-
-    elif field_type == pb2.OFPXMT_OFB_IP_PROTO:
-        return (
-            of13.oxm.ip_proto(value=ofb_field['ip_proto']))
-
-    elif field_type == pb2.OFPXMT_OFB_VLAN_VID:
-        return (
-            of13.oxm.vlan_vid(value=ofb_field['vlan_vid']))
-
-    elif field_type == pb2.OFPXMT_OFB_VLAN_PCP:
-        return (
-            of13.oxm.vlan_pcp(value=ofb_field['vlan_pcp']))
-
-    elif field_type == pb2.OFPXMT_OFB_IPV4_SRC:
-        return (
-            of13.oxm.ipv4_src(value=ofb_field['ipv4_src']))
-
-    elif field_type == pb2.OFPXMT_OFB_IPV4_DST:
-        return (
-            of13.oxm.ipv4_dst(value=ofb_field['ipv4_dst']))
-
-    elif field_type == pb2.OFPXMT_OFB_UDP_SRC:
-        return (
-            of13.oxm.udp_src(value=ofb_field['udp_src']))
-
-    elif field_type == pb2.OFPXMT_OFB_UDP_DST:
-        return (
-            of13.oxm.udp_dst(value=ofb_field['udp_dst']))
-
-    elif field_type == pb2.OFPXMT_OFB_METADATA:
-        return (
-            of13.oxm.metadata(value=ofb_field['table_metadata']))
+# The hot conversions below read the protobuf fields directly, dispatching
+# on the type fields through these tables, rather than going through pb2dict.
+
+# OXM field type -> (loxi oxm class, name of the ofp_oxm_ofb_field value)
+loxi_oxm_fields = {
+    pb2.OFPXMT_OFB_ETH_TYPE: (of13.oxm.eth_type, 'eth_type'),
+    pb2.OFPXMT_OFB_IN_PORT: (of13.oxm.in_port, 'port'),
+    pb2.OFPXMT_OFB_IP_PROTO: (of13.oxm.ip_proto, 'ip_proto'),
+    pb2.OFPXMT_OFB_VLAN_VID: (of13.oxm.vlan_vid, 'vlan_vid'),
+    pb2.OFPXMT_OFB_VLAN_PCP: (of13.oxm.vlan_pcp, 'vlan_pcp'),
+    pb2.OFPXMT_OFB_IPV4_SRC: (of13.oxm.ipv4_src, 'ipv4_src'),
+    pb2.OFPXMT_OFB_IPV4_DST: (of13.oxm.ipv4_dst, 'ipv4_dst'),
+    pb2.OFPXMT_OFB_UDP_SRC: (of13.oxm.udp_src, 'udp_src'),
+    pb2.OFPXMT_OFB_UDP_DST: (of13.oxm.udp_dst, 'udp_dst'),
+    pb2.OFPXMT_OFB_METADATA: (of13.oxm.metadata, 'table_metadata'),
+}
 
-    else:
+def make_loxi_field(oxm_field):
+    assert oxm_field.oxm_class == pb2.OFPXMC_OPENFLOW_BASIC
+    ofb_field = oxm_field.ofb_field
+    try:
+        cls, value_field = loxi_oxm_fields[ofb_field.type]
+    except KeyError:
         raise NotImplementedError(
-            'OXM match field for type %s' % field_type)
+            'OXM match field for type %s' % ofb_field.type)
+    return cls(value=getattr(ofb_field, value_field))
 
 def make_loxi_match(match):
-    assert match.get('type', pb2.OFPMT_STANDARD) == pb2.OFPMT_OXM
-    loxi_match_fields = []
-    for oxm_field in match.get('oxm_fields', []):
-        loxi_match_fields.append(make_loxi_field(oxm_field))
-    return of13.match_v3(oxm_list=loxi_match_fields)
-
+    assert match.type == pb2.OFPMT_OXM
+    return of13.match_v3(
+        oxm_list=[make_loxi_field(f) for f in match.oxm_fields])
 
-def make_loxi_action(a):
-    if type(a) is not dict:
-        a = pb2dict(a)
 
-    typ = a.get('type', 0)
+def _make_loxi_output_action(a):
+    return of13.action.output(port=a.output.port, max_len=a.output.max_len)
 
-    if typ == pb2.OFPAT_OUTPUT:
-        output_kws = a['output']
-        return of13.action.output(**output_kws)
+def _make_loxi_pop_vlan_action(a):
+    return of13.action.pop_vlan()
 
-    elif typ == pb2.OFPAT_POP_VLAN:
-        return of13.action.pop_vlan()
+def _make_loxi_push_vlan_action(a):
+    return of13.action.push_vlan(ethertype=a.push.ethertype)
 
-    elif typ == pb2.OFPAT_PUSH_VLAN:
-        push_vlan_kws = a['push']
-        return of13.action.push_vlan(**push_vlan_kws)
+def _make_loxi_set_field_action(a):
+    return of13.action.set_field(make_loxi_field(a.set_field.field))
 
-    elif typ == pb2.OFPAT_SET_FIELD:
-        loxi_field = make_loxi_field(a['set_field']['field'])
-        return of13.action.set_field(loxi_field)
+def _make_loxi_group_action(a):
+    return of13.action.group(group_id=a.group.group_id)
 
-    elif typ == pb2.OFPAT_GROUP:
-        group_kws = a['group']
-        return of13.action.group(**group_kws)
+loxi_actions = {
+    pb2.OFPAT_OUTPUT: _make_loxi_output_action,
+    pb2.OFPAT_POP_VLAN: _make_loxi_pop_vlan_action,
+    pb2.OFPAT_PUSH_VLAN: _make_loxi_push_vlan_action,
+    pb2.OFPAT_SET_FIELD: _make_loxi_set_field_action,
+    pb2.OFPAT_GROUP: _make_loxi_group_action,
+}
 
-    else:
+def make_loxi_action(a):
+    try:
+        make = loxi_actions[a.type]
+    except KeyError:
         raise NotImplementedError(
-            'Action decoder for action OFPAT_* %d' % typ)
+            'Action decoder for action OFPAT_* %d' % a.type)
+    return make(a)
 
 
-def ofp_flow_stats_to_loxi_flow_stats(pb):
-    kw = pb2dict(pb)
-
-    def make_loxi_instruction(inst):
-        type = inst['type']
-        if type == pb2.OFPIT_APPLY_ACTIONS:
-            return of13.instruction.apply_actions(
-                actions=[make_loxi_action(a)
-                         for a in inst['actions']['actions']])
-        elif type == pb2.OFPIT_GOTO_TABLE:
-            return of13.instruction.goto_table(
-                table_id=inst['goto_table']['table_id'])
+def make_loxi_instruction(inst):
+    if inst.type == pb2.OFPIT_APPLY_ACTIONS:
+        return of13.instruction.apply_actions(
+            actions=[make_loxi_action(a) for a in inst.actions.actions])
+    elif inst.type == pb2.OFPIT_GOTO_TABLE:
+        return of13.instruction.goto_table(
+            table_id=inst.goto_table.table_id)
+    else:
+        raise NotImplementedError('Instruction type %d' % inst.type)
 
-        else:
-            raise NotImplementedError('Instruction type %d' % type)
 
-    kw['match'] = make_loxi_match(kw['match'])
-    kw['instructions'] = [make_loxi_instruction(i) for i in kw['instructions']]
-    del kw['id']
-    return of13.flow_stats_entry(**kw)
+def ofp_flow_stats_to_loxi_flow_stats(pb):
+    return of13.flow_stats_entry(
+        table_id=pb.table_id,
+        duration_sec=pb.duration_sec,
+        duration_nsec=pb.duration_nsec,
+        priority=pb.priority,
+        idle_timeout=pb.idle_timeout,
+        hard_timeout=pb.hard_timeout,
+        flags=pb.flags,
+        cookie=pb.cookie,
+        packet_count=pb.packet_count,
+        byte_count=pb.byte_count,
+        match=make_loxi_match(pb.match),
+        instructions=[make_loxi_instruction(i) for i in pb.instructions])
 
 
 def ofp_packet_in_to_loxi_packet_in(pb):
@@ -176,7 +169,7 @@ def ofp_packet_in_to_loxi_packet_in(pb):
         reason=pb.reason,
         table_id=pb.table_id,
         cookie=pb.cookie,
-        match=make_loxi_match(pb2dict(pb.match)),
+        match=make_loxi_match(pb.match),
         data=pb.data
     )
     return packet_in
@@ -214,6 +207,46 @@ def ofp_bucket_to_loxi_bucket(pb):
     )
 
 
+def ofp_port_stats_to_loxi_port_stats(pb):
+    return of13.port_stats_entry(
+        port_no=pb.port_no,
+        rx_packets=pb.rx_packets,
+        tx_packets=pb.tx_packets,
+        rx_bytes=pb.rx_bytes,
+        tx_bytes=pb.tx_bytes,
+        rx_dropped=pb.rx_dropped,
+        tx_dropped=pb.tx_dropped,
+        rx_errors=pb.rx_errors,
+        tx_errors=pb.tx_errors,
+        rx_frame_err=pb.rx_frame_err,
+        rx_over_err=pb.rx_over_err,
+        rx_crc_err=pb.rx_crc_err,
+        collisions=pb.collisions,
+        duration_sec=pb.duration_sec,
+        duration_nsec=pb.duration_nsec)
+
+
+def ofp_table_stats_to_loxi_table_stats(pb):
+    return of13.table_stats_entry(
+        table_id=pb.table_id,
+        active_count=pb.active_count,
+        lookup_count=pb.lookup_count,
+        matched_count=pb.matched_count)
+
+
+def ofp_meter_stats_to_loxi_meter_stats(pb):
+    return of13.meter_stats(
+        meter_id=pb.meter_id,
+        flow_count=pb.flow_count,
+        packet_in_count=pb.packet_in_count,
+        byte_in_count=pb.byte_in_count,
+        duration_sec=pb.duration_sec,
+        duration_nsec=pb.duration_nsec,
+        band_stats=[of13.meter_band_stats(
+            packet_band_count=b.packet_band_count,
+            byte_band_count=b.byte_band_count) for b in pb.band_stats])
+
+
 to_loxi_converters = {
     'ofp_port': ofp_port_to_loxi_port_desc,
     'ofp_port_status': ofp_port_status_to_loxi_port_status,
@@ -223,6 +256,9 @@ to_loxi_converters = {
     'ofp_group_desc': ofp_group_desc_to_loxi_group_desc,
     'ofp_bucket_counter': ofp_bucket_counter_to_loxy_bucket_counter,
     'ofp_bucket': ofp_bucket_to_loxi_bucket,
+    'ofp_port_stats': ofp_port_stats_to_loxi_port_stats,
+    'ofp_table_stats': ofp_table_stats_to_loxi_table_stats,
+    'ofp_meter_stats': ofp_meter_stats_to_loxi_meter_stats,
     'ofp_action': make_loxi_action
 }
 
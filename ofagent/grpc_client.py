@@ -18,6 +18,8 @@
 The gRPC client layer for the OpenFlow agent
 """
 from Queue import Queue, Empty
+from collections import OrderedDict
+from time import time
 import os
 
 from grpc import StatusCode
@@ -28,25 +30,36 @@ from twisted.internet import threads
 from twisted.internet.defer import inlineCallbacks, returnValue, DeferredQueue
 
 from protos.voltha_pb2 import ID, VolthaLocalServiceStub, FlowTableUpdate, \
-    FlowGroupTableUpdate, PacketOut
+    FlowGroupTableUpdate, FlowTableBatchUpdate, FlowTableBatchItem, \
+    PacketOut, LogicalDeviceEventsRequest, ListRequest
+from protos.openflow_13_pb2 import ofp_group_mod
 from google.protobuf import empty_pb2
 
+from stats_cache import StatsCache
+
 
 log = get_logger()
 
 
 class GrpcClient(object):
 
-    def __init__(self, connection_manager, channel):
+    # exponential backoff of the restarts of the streams
+    stream_retry_delay = 0.5
+    stream_retry_max_delay = 30
+
+    def __init__(self, connection_manager, channel, stats_max_age=5):
 
         self.connection_manager = connection_manager
         self.channel = channel
         self.local_stub = VolthaLocalServiceStub(channel)
 
+        # statistics of the logical devices, shared by all their agents
+        self.stats_cache = StatsCache(
+            self._fetch_logical_device_stats, stats_max_age)
+
         self.stopped = False
 
         self.packet_out_queue = Queue()  # queue to send out PacketOut msgs
-        self.packet_in_queue = DeferredQueue()  # queue to receive PacketIn
         self.change_event_queue = DeferredQueue()  # queue change events
 
     def start(self):
@@ -54,7 +67,7 @@ class GrpcClient(object):
         self.start_packet_out_stream()
         self.start_packet_in_stream()
         self.start_change_event_in_stream()
-        reactor.callLater(0, self.packet_in_forwarder_loop)
+        self.start_logical_device_event_stream()
         reactor.callLater(0, self.change_event_processing_loop)
         log.info('started')
         return self
@@ -78,48 +91,107 @@ class GrpcClient(object):
 
         def stream_packets_out():
             generator = packet_generator()
-            try:
-                self.local_stub.StreamPacketsOut(generator)
-            except _Rendezvous, e:
-                if e.code() == StatusCode.UNAVAILABLE:
-                    os.system("kill -15 {}".format(os.getpid()))
+            self.local_stub.StreamPacketsOut(generator)
 
-        reactor.callInThread(stream_packets_out)
+        self._run_stream('packets-out', stream_packets_out)
 
     def start_packet_in_stream(self):
 
         def receive_packet_in_stream():
-            streaming_rpc_method = self.local_stub.ReceivePacketsIn
+            streaming_rpc_method = self.local_stub.ReceivePacketInBatches
             iterator = streaming_rpc_method(empty_pb2.Empty())
-            try:
-                for packet_in in iterator:
-                    reactor.callFromThread(self.packet_in_queue.put,
-                                           packet_in)
-                    log.debug('enqued-packet-in',
-                              packet_in=packet_in,
-                              queue_len=len(self.packet_in_queue.pending))
-            except _Rendezvous, e:
-                if e.code() == StatusCode.UNAVAILABLE:
-                    os.system("kill -15 {}".format(os.getpid()))
+            for packet_ins in iterator:
+                # forward the batch on the reactor and wait for that, so
+                # that packet-ins arriving meanwhile queue up into the
+                # next batch in vcore, where excess ones are dropped
+                threads.blockingCallFromThread(
+                    reactor, self.forward_packets_in, packet_ins.items)
+                if self.stopped:
+                    break
 
-        reactor.callInThread(receive_packet_in_stream)
+        self._run_stream('packets-in', receive_packet_in_stream)
 
     def start_change_event_in_stream(self):
 
         def receive_change_events():
             streaming_rpc_method = self.local_stub.ReceiveChangeEvents
             iterator = streaming_rpc_method(empty_pb2.Empty())
+            for event in iterator:
+                reactor.callFromThread(self.change_event_queue.put, event)
+                log.debug('enqued-change-event',
+                          change_event=event,
+                          queue_len=len(self.change_event_queue.pending))
+
+        self._run_stream('change-events', receive_change_events)
+
+    def _run_stream(self, name, stream, restart_on_end=False):
+        """
+        Run stream() in a thread. If restart_on_end, run it again, after an
+        exponentially increasing delay, whenever it ends or fails; else
+        only when vcore refuses it for having too many streams open, and
+        a stream failing as vcore is unavailable terminates ofagent, which
+        starts over with whatever vcore it finds next.
+        """
+        delay = [self.stream_retry_delay]
+
+        def run():
+            started = time()
             try:
-                for event in iterator:
-                    reactor.callFromThread(self.change_event_queue.put, event)
-                    log.debug('enqued-change-event',
-                              change_event=event,
-                              queue_len=len(self.change_event_queue.pending))
+                stream()
+                if not restart_on_end:
+                    return
+                log.info('stream-ended', stream=name)
             except _Rendezvous, e:
-                if e.code() == StatusCode.UNAVAILABLE:
-                    os.system("kill -15 {}".format(os.getpid()))
+                if not restart_on_end and \
+                        e.code() != StatusCode.RESOURCE_EXHAUSTED:
+                    if e.code() == StatusCode.UNAVAILABLE:
+                        os.system("kill -15 {}".format(os.getpid()))
+                    return
+                log.warn('stream-failed', stream=name, code=e.code(),
+                         details=e.details())
+            except Exception, e:
+                if not restart_on_end:
+                    raise
+                log.exception('stream-failed', stream=name, e=e)
 
-        reactor.callInThread(receive_change_events)
+            if self.stopped:
+                return
+            if time() - started > self.stream_retry_max_delay:
+                # it did run for a while, start backing off over
+                delay[0] = self.stream_retry_delay
+            log.info('restarting-stream', stream=name, delay=delay[0])
+            reactor.callFromThread(
+                reactor.callLater, delay[0], reactor.callInThread, run)
+            delay[0] = min(delay[0] * 2, self.stream_retry_max_delay)
+
+        reactor.callInThread(run)
+
+    def start_logical_device_event_stream(self):
+
+        def receive_logical_device_events():
+            # resume after the last event seen, if any; vcore answers with
+            # a snapshot if it cannot replay the events since then
+            epoch, sequence = \
+                self.connection_manager.get_logical_device_event_position()
+            streaming_rpc_method = self.local_stub.ReceiveLogicalDeviceEvents
+            iterator = streaming_rpc_method(LogicalDeviceEventsRequest(
+                epoch=epoch, sequence=sequence))
+            for event in iterator:
+                # wait for the event to be handled, so that a restarted
+                # stream resumes after it
+                threads.blockingCallFromThread(
+                    reactor,
+                    self.connection_manager.handle_logical_device_event,
+                    event)
+                log.debug('received-logical-device-event',
+                          type=event.type, sequence=event.sequence)
+                if self.stopped:
+                    break
+
+        # the logical devices are polled much less often than the events
+        # come, so the stream is kept up rather than ofagent restarted
+        self._run_stream('logical-device-events',
+                         receive_logical_device_events, restart_on_end=True)
 
     @inlineCallbacks
     def change_event_processing_loop(self):
@@ -133,15 +205,17 @@ class GrpcClient(object):
             if self.stopped:
                 break
 
-    @inlineCallbacks
-    def packet_in_forwarder_loop(self):
-        while True:
-            packet_in = yield self.packet_in_queue.get()
-            device_id = packet_in.id
-            ofp_packet_in = packet_in.packet_in
-            self.connection_manager.forward_packet_in(device_id, ofp_packet_in)
-            if self.stopped:
-                break
+    def forward_packets_in(self, packet_ins):
+        log.debug('forwarding-packets-in', count=len(packet_ins))
+        by_device = OrderedDict()
+        for packet_in in packet_ins:
+            by_device.setdefault(packet_in.id, []).append(packet_in.packet_in)
+        for device_id, ofp_packet_ins in by_device.iteritems():
+            try:
+                self.connection_manager.forward_packets_in(
+                    device_id, ofp_packet_ins)
+            except Exception, e:
+                log.exception('failed-to-forward-packets-in', e=e)
 
     def send_packet_out(self, device_id, packet_out):
         packet_out = PacketOut(id=device_id, packet_out=packet_out)
@@ -149,7 +223,7 @@ class GrpcClient(object):
 
     @inlineCallbacks
     def get_port_list(self, device_id):
-        req = ID(id=device_id)
+        req = ListRequest(id=device_id)
         res = yield threads.deferToThread(
             self.local_stub.ListLogicalDevicePorts, req)
         returnValue(res.items)
@@ -181,16 +255,48 @@ class GrpcClient(object):
             self.local_stub.UpdateLogicalDeviceFlowGroupTable, req)
         returnValue(res)
 
+    @inlineCallbacks
+    def update_tables_batch(self, device_id, mods):
+        """
+        Apply an ordered batch of flow and group mods in one call
+        :param mods: list of ofp_flow_mod and ofp_group_mod
+        :return: list of FlowTableBatchItemStatus, one per mod
+        """
+        req = FlowTableBatchUpdate(
+            id=device_id,
+            items=[FlowTableBatchItem(group_mod=mod)
+                   if isinstance(mod, ofp_group_mod) else
+                   FlowTableBatchItem(flow_mod=mod) for mod in mods]
+        )
+        res = yield threads.deferToThread(
+            self.local_stub.UpdateLogicalDeviceFlowTableBatch, req)
+        returnValue(res.items)
+
     @inlineCallbacks
     def list_flows(self, device_id):
-        req = ID(id=device_id)
+        req = ListRequest(id=device_id)
         res = yield threads.deferToThread(
             self.local_stub.ListLogicalDeviceFlows, req)
         returnValue(res.items)
 
+    def get_logical_device_stats(self, device_id):
+        """
+        Get the port, table and meter statistics of a logical device, no
+        older than the configured maximum age
+        :return: Deferred firing with a LogicalDeviceStats
+        """
+        return self.stats_cache.get(device_id)
+
     @inlineCallbacks
-    def list_groups(self, device_id):
+    def _fetch_logical_device_stats(self, device_id):
         req = ID(id=device_id)
+        res = yield threads.deferToThread(
+            self.local_stub.GetLogicalDeviceStats, req)
+        returnValue(res)
+
+    @inlineCallbacks
+    def list_groups(self, device_id):
+        req = ListRequest(id=device_id)
         res = yield threads.deferToThread(
             self.local_stub.ListLogicalDeviceFlowGroups, req)
         returnValue(res.items)
@@ -24,6 +24,17 @@ def unpack_list(reader, deserializer):
         entries.append(deserializer(reader))
     return entries
 
+_structs = {}
+
+def get_struct(fmt):
+    """
+    Return the compiled struct.Struct of fmt, compiling it on first use
+    """
+    st = _structs.get(fmt)
+    if st is None:
+        st = _structs[fmt] = struct.Struct(fmt)
+    return st
+
 def pad_to(alignment, length):
     """
     Return a string of zero bytes that will pad a string of length 'length' to
@@ -56,7 +67,12 @@ class OFReader(object):
         self.offset = 0
 
     def read(self, fmt):
-        st = struct.Struct(fmt)
+        return self.read_struct(get_struct(fmt))
+
+    def read_struct(self, st):
+        """
+        Like read(), with a precompiled struct.Struct
+        """
         if self.offset + st.size > self.length:
             raise loxi.ProtocolError("Buffer too short")
         result = st.unpack_from(self.buf, self.start+self.offset)
@@ -70,7 +86,7 @@ class OFReader(object):
         return s
 
     def peek(self, fmt, offset=0):
-        st = struct.Struct(fmt)
+        st = get_struct(fmt)
         if self.offset + offset + st.size > self.length:
             raise loxi.ProtocolError("Buffer too short")
         result = st.unpack_from(self.buf, self.start + self.offset + offset)
@@ -12,6 +12,10 @@ import util
 import loxi.generic_util
 
 import sys
+
+# Precompiled layouts of the fixed-size fields
+_struct_HH = struct.Struct("!HH")
+_struct_LL = struct.Struct("!LL")
 ofp = sys.modules['loxi.of13']
 
 class bsn_tlv(loxi.OFObject):
@@ -41,8 +45,7 @@ class bsn_tlv(loxi.OFObject):
             return subclass.unpack(reader)
 
         obj = bsn_tlv()
-        obj.type = reader.read("!H")[0]
-        _length = reader.read("!H")[0]
+        obj.type, _length = reader.read_struct(_struct_HH)
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -83,9 +86,8 @@ class actor_key(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_key()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 44)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -130,9 +132,8 @@ class actor_port_num(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_port_num()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 43)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -177,9 +178,8 @@ class actor_port_priority(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_port_priority()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 42)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -224,9 +224,8 @@ class actor_state(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_state()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 53)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -271,9 +270,8 @@ class actor_system_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_system_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 41)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -318,9 +316,8 @@ class actor_system_priority(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = actor_system_priority()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 40)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -365,9 +362,8 @@ class anchor(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = anchor()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 81)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -412,9 +408,8 @@ class broadcast_query_timeout(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = broadcast_query_timeout()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 10)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -459,9 +454,8 @@ class broadcast_rate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = broadcast_rate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 90)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -506,9 +500,8 @@ class bucket(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = bucket()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 64)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = loxi.generic_util.unpack_list(reader, ofp.bsn_tlv.bsn_tlv.unpack)
@@ -553,9 +546,8 @@ class circuit_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = circuit_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 14)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = str(reader.read_all())
@@ -600,9 +592,8 @@ class convergence_status(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = convergence_status()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 45)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -647,9 +638,8 @@ class crc_enabled(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = crc_enabled()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 22)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -694,9 +684,8 @@ class data(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = data()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 55)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = str(reader.read_all())
@@ -741,9 +730,8 @@ class decap(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = decap()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 85)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -788,9 +776,8 @@ class eth_dst(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = eth_dst()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 33)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -835,9 +822,8 @@ class eth_src(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = eth_src()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 32)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -882,9 +868,8 @@ class external_gateway_ip(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = external_gateway_ip()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 26)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -929,9 +914,8 @@ class external_gateway_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = external_gateway_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 29)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -976,9 +960,8 @@ class external_ip(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = external_ip()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 23)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1023,9 +1006,8 @@ class external_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = external_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 24)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -1070,9 +1052,8 @@ class external_netmask(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = external_netmask()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 25)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1117,9 +1098,8 @@ class generation_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = generation_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 80)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -1164,9 +1144,8 @@ class hash_packet_field(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = hash_packet_field()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 103)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -1211,9 +1190,8 @@ class hash_packet_type(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = hash_packet_type()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 102)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -1254,8 +1232,7 @@ class hash_seed(bsn_tlv):
         packed = []
         packed.append(struct.pack("!H", self.type))
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 1
-        packed.append(struct.pack("!L", self.seed1))
-        packed.append(struct.pack("!L", self.seed2))
+        packed.append(_struct_LL.pack(self.seed1, self.seed2))
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
         return ''.join(packed)
@@ -1263,13 +1240,11 @@ class hash_seed(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = hash_seed()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 100)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
-        obj.seed1 = reader.read("!L")[0]
-        obj.seed2 = reader.read("!L")[0]
+        obj.seed1, obj.seed2 = reader.read_struct(_struct_LL)
         return obj
 
     def __eq__(self, other):
@@ -1315,9 +1290,8 @@ class hash_type(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = hash_type()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 101)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -1362,9 +1336,8 @@ class header_size(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = header_size()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 31)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1409,9 +1382,8 @@ class icmp_code(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = icmp_code()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 69)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -1456,9 +1428,8 @@ class icmp_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = icmp_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 70)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -1503,9 +1474,8 @@ class icmp_type(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = icmp_type()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 68)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -1545,9 +1515,8 @@ class idle_notification(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = idle_notification()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 7)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -1588,9 +1557,8 @@ class idle_time(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = idle_time()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 5)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -1635,9 +1603,8 @@ class idle_timeout(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = idle_timeout()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 8)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1677,9 +1644,8 @@ class igmp_snooping(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = igmp_snooping()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 78)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -1720,9 +1686,8 @@ class internal_gateway_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = internal_gateway_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 28)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -1767,9 +1732,8 @@ class internal_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = internal_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 27)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -1814,9 +1778,8 @@ class interval(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = interval()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 58)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1861,9 +1824,8 @@ class ip_proto(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ip_proto()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 67)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -1908,9 +1870,8 @@ class ipv4(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ipv4()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 4)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -1955,9 +1916,8 @@ class ipv4_dst(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ipv4_dst()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 35)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2002,9 +1962,8 @@ class ipv4_netmask(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ipv4_netmask()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 60)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2049,9 +2008,8 @@ class ipv4_src(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ipv4_src()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 34)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2096,9 +2054,8 @@ class ipv6(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = ipv6()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 84)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read('!16s')[0]
@@ -2143,9 +2100,8 @@ class known_multicast_rate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = known_multicast_rate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 91)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2185,9 +2141,8 @@ class l2_multicast_lookup(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = l2_multicast_lookup()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 79)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -2228,9 +2183,8 @@ class mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -2275,9 +2229,8 @@ class mac_mask(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mac_mask()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 56)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -2317,9 +2270,8 @@ class mcg_type_vxlan(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mcg_type_vxlan()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 87)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -2360,9 +2312,8 @@ class miss_packets(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = miss_packets()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 13)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -2407,9 +2358,8 @@ class mpls_control_word(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mpls_control_word()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 62)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -2454,9 +2404,8 @@ class mpls_label(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mpls_label()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 61)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2501,9 +2450,8 @@ class mpls_sequenced(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = mpls_sequenced()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 63)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -2548,9 +2496,8 @@ class multicast_interface_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = multicast_interface_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 95)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -2595,9 +2542,8 @@ class name(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = name()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 52)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = str(reader.read_all())
@@ -2637,9 +2583,8 @@ class negate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = negate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 83)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -2675,9 +2620,8 @@ class nexthop_type_vxlan(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = nexthop_type_vxlan()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 94)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -2718,9 +2662,8 @@ class offset(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = offset()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 82)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -2765,9 +2708,8 @@ class partner_key(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_key()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 51)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -2812,9 +2754,8 @@ class partner_port_num(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_port_num()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 50)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -2859,9 +2800,8 @@ class partner_port_priority(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_port_priority()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 49)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -2906,9 +2846,8 @@ class partner_state(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_state()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 54)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -2953,9 +2892,8 @@ class partner_system_mac(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_system_mac()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 48)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = list(reader.read('!6B'))
@@ -3000,9 +2938,8 @@ class partner_system_priority(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = partner_system_priority()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 47)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -3047,9 +2984,8 @@ class port(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = port()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 0)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = util.unpack_port_no(reader)
@@ -3094,9 +3030,8 @@ class port_vxlan_mode(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = port_vxlan_mode()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 88)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -3141,9 +3076,8 @@ class priority(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = priority()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 57)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -3188,9 +3122,8 @@ class queue_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = queue_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 20)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -3235,9 +3168,8 @@ class queue_weight(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = queue_weight()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 21)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -3282,9 +3214,8 @@ class rate_unit(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = rate_unit()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 89)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -3334,9 +3265,8 @@ class reference(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = reference()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 59)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.table_id = reader.read("!H")[0]
@@ -3386,9 +3316,8 @@ class reply_packets(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = reply_packets()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 12)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -3433,9 +3362,8 @@ class request_packets(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = request_packets()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 11)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -3480,9 +3408,8 @@ class rx_bytes(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = rx_bytes()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 71)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -3527,9 +3454,8 @@ class rx_packets(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = rx_packets()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 2)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -3574,9 +3500,8 @@ class sampling_rate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = sampling_rate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 30)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -3616,9 +3541,8 @@ class set_loopback_mode(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = set_loopback_mode()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 74)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -3659,9 +3583,8 @@ class status(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = status()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 97)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -3701,9 +3624,8 @@ class strip_mpls_l2_on_ingress(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = strip_mpls_l2_on_ingress()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 75)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -3739,9 +3661,8 @@ class strip_mpls_l3_on_ingress(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = strip_mpls_l3_on_ingress()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 76)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -3777,9 +3698,8 @@ class strip_vlan_on_egress(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = strip_vlan_on_egress()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 73)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -3820,9 +3740,8 @@ class sub_agent_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = sub_agent_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 38)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -3867,9 +3786,8 @@ class tcp_dst(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = tcp_dst()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 66)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -3914,9 +3832,8 @@ class tcp_src(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = tcp_src()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 65)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -3961,9 +3878,8 @@ class tx_bytes(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = tx_bytes()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 39)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -4008,9 +3924,8 @@ class tx_packets(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = tx_packets()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 3)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!Q")[0]
@@ -4055,9 +3970,8 @@ class udf_anchor(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udf_anchor()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 16)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4102,9 +4016,8 @@ class udf_id(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udf_id()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 15)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4149,9 +4062,8 @@ class udf_length(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udf_length()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 18)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4196,9 +4108,8 @@ class udf_offset(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udf_offset()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 17)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4243,9 +4154,8 @@ class udp_dst(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udp_dst()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 37)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4290,9 +4200,8 @@ class udp_src(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = udp_src()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 36)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4337,9 +4246,8 @@ class unicast_query_timeout(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = unicast_query_timeout()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 9)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -4384,9 +4292,8 @@ class unicast_rate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = unicast_rate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 93)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -4431,9 +4338,8 @@ class unknown_multicast_rate(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = unknown_multicast_rate()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 92)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -4478,9 +4384,8 @@ class use_packet_state(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = use_packet_state()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 96)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -4525,9 +4430,8 @@ class vfi(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vfi()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 99)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4572,9 +4476,8 @@ class vlan_pcp(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vlan_pcp()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 72)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!B")[0]
@@ -4619,9 +4522,8 @@ class vlan_vid(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vlan_vid()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 6)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4666,9 +4568,8 @@ class vlan_vid_mask(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vlan_vid_mask()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 77)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!H")[0]
@@ -4713,9 +4614,8 @@ class vni(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vni()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 86)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -4760,9 +4660,8 @@ class vrf(bsn_tlv):
     @staticmethod
     def unpack(reader):
         obj = vrf()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 19)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.value = reader.read("!L")[0]
@@ -12,6 +12,44 @@ import util
 import loxi.generic_util
 
 import sys
+
+# Precompiled layouts of the fixed-size fields
+_struct_2x16sLL = struct.Struct("!2x16sLL")
+_struct_2x16sLLLLLLLL = struct.Struct("!2x16sLLLLLLLL")
+_struct_2xLL4xQQLL = struct.Struct("!2xLL4xQQLL")
+_struct_6xLQQLL = struct.Struct("!6xLQQLL")
+_struct_B1xL = struct.Struct("!B1xL")
+_struct_B1xLLHHHH4xQQQ = struct.Struct("!B1xLLHHHH4xQQQ")
+_struct_B3xLQQ = struct.Struct("!B3xLQQ")
+_struct_B5x32sQQLL = struct.Struct("!B5x32sQQLL")
+_struct_BB2xL = struct.Struct("!BB2xL")
+_struct_BB2xL256s = struct.Struct("!BB2xL256s")
+_struct_BQ = struct.Struct("!BQ")
+_struct_H2xL = struct.Struct("!H2xL")
+_struct_H32sLL4x = struct.Struct("!H32sLL4x")
+_struct_HH = struct.Struct("!HH")
+_struct_HHH2x = struct.Struct("!HHH2x")
+_struct_HHHB1xH = struct.Struct("!HHHB1xH")
+_struct_HL = struct.Struct("!HL")
+_struct_HLL4x = struct.Struct("!HLL4x")
+_struct_L4xQQQQQQQQQQQQLL = struct.Struct("!L4xQQQQQQQQQQQQLL")
+_struct_LH = struct.Struct("!LH")
+_struct_LHHHH = struct.Struct("!LHHHH")
+_struct_LHHHH16s = struct.Struct("!LHHHH16s")
+_struct_LL = struct.Struct("!LL")
+_struct_LL4x = struct.Struct("!LL4x")
+_struct_LL4xQQLL = struct.Struct("!LL4xQQLL")
+_struct_LLBB2xLL = struct.Struct("!LLBB2xLL")
+_struct_LLBB2xLL16s = struct.Struct("!LLBB2xLL16s")
+_struct_LLH = struct.Struct("!LLH")
+_struct_LLL = struct.Struct("!LLL")
+_struct_LLLBB2x = struct.Struct("!LLLBB2x")
+_struct_LLLLLLLL = struct.Struct("!LLLLLLLL")
+_struct_LLQQQLL = struct.Struct("!LLQQQLL")
+_struct_LQQLL = struct.Struct("!LQQLL")
+_struct_Q64s256s = struct.Struct("!Q64s256s")
+_struct_QQ = struct.Struct("!QQ")
+_struct_QQLL = struct.Struct("!QQLL")
 ofp = sys.modules['loxi.of13']
 
 class bsn_controller_connection(loxi.OFObject):
@@ -37,20 +75,13 @@ class bsn_controller_connection(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!B", self.state))
-        packed.append(struct.pack("!B", self.auxiliary_id))
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!L", self.role))
-        packed.append(struct.pack("!256s", self.uri))
+        packed.append(_struct_BB2xL256s.pack(self.state, self.auxiliary_id, self.role, self.uri))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_controller_connection()
-        obj.state = reader.read("!B")[0]
-        obj.auxiliary_id = reader.read("!B")[0]
-        reader.skip(2)
-        obj.role = reader.read("!L")[0]
+        obj.state, obj.auxiliary_id, obj.role = reader.read_struct(_struct_BB2xL)
         obj.uri = reader.read("!256s")[0].rstrip("\x00")
         return obj
 
@@ -101,9 +132,7 @@ class bsn_debug_counter_desc_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!Q", self.counter_id))
-        packed.append(struct.pack("!64s", self.name))
-        packed.append(struct.pack("!256s", self.description))
+        packed.append(_struct_Q64s256s.pack(self.counter_id, self.name, self.description))
         return ''.join(packed)
 
     @staticmethod
@@ -153,15 +182,13 @@ class bsn_debug_counter_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!Q", self.counter_id))
-        packed.append(struct.pack("!Q", self.value))
+        packed.append(_struct_QQ.pack(self.counter_id, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_debug_counter_stats_entry()
-        obj.counter_id = reader.read("!Q")[0]
-        obj.value = reader.read("!Q")[0]
+        obj.counter_id, obj.value = reader.read_struct(_struct_QQ)
         return obj
 
     def __eq__(self, other):
@@ -322,11 +349,7 @@ class bsn_gentable_desc_stats_entry(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append(struct.pack("!H", self.table_id))
-        packed.append(struct.pack("!32s", self.name))
-        packed.append(struct.pack("!L", self.buckets_size))
-        packed.append(struct.pack("!L", self.max_entries))
-        packed.append('\x00' * 4)
+        packed.append(_struct_H32sLL4x.pack(self.table_id, self.name, self.buckets_size, self.max_entries))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
         return ''.join(packed)
@@ -339,9 +362,7 @@ class bsn_gentable_desc_stats_entry(loxi.OFObject):
         reader = orig_reader.slice(_length, 2)
         obj.table_id = reader.read("!H")[0]
         obj.name = reader.read("!32s")[0].rstrip("\x00")
-        obj.buckets_size = reader.read("!L")[0]
-        obj.max_entries = reader.read("!L")[0]
-        reader.skip(4)
+        obj.buckets_size, obj.max_entries = reader.read_struct(_struct_LL4x)
         return obj
 
     def __eq__(self, other):
@@ -511,18 +532,14 @@ class bsn_gentable_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!H", self.table_id))
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!L", self.entry_count))
+        packed.append(_struct_H2xL.pack(self.table_id, self.entry_count))
         packed.append(util.pack_checksum_128(self.checksum))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_gentable_stats_entry()
-        obj.table_id = reader.read("!H")[0]
-        reader.skip(2)
-        obj.entry_count = reader.read("!L")[0]
+        obj.table_id, obj.entry_count = reader.read_struct(_struct_H2xL)
         obj.checksum = util.unpack_checksum_128(reader)
         return obj
 
@@ -574,10 +591,7 @@ class bsn_interface(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!6B", *self.hw_addr))
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!16s", self.name))
-        packed.append(struct.pack("!L", self.ipv4_addr))
-        packed.append(struct.pack("!L", self.ipv4_netmask))
+        packed.append(_struct_2x16sLL.pack(self.name, self.ipv4_addr, self.ipv4_netmask))
         return ''.join(packed)
 
     @staticmethod
@@ -586,8 +600,7 @@ class bsn_interface(loxi.OFObject):
         obj.hw_addr = list(reader.read('!6B'))
         reader.skip(2)
         obj.name = reader.read("!16s")[0].rstrip("\x00")
-        obj.ipv4_addr = reader.read("!L")[0]
-        obj.ipv4_netmask = reader.read("!L")[0]
+        obj.ipv4_addr, obj.ipv4_netmask = reader.read_struct(_struct_LL)
         return obj
 
     def __eq__(self, other):
@@ -673,39 +686,21 @@ class bsn_lacp_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(util.pack_port_no(self.port_no))
-        packed.append(struct.pack("!H", self.actor_sys_priority))
+        packed.append(_struct_LH.pack(self.port_no, self.actor_sys_priority))
         packed.append(struct.pack("!6B", *self.actor_sys_mac))
-        packed.append(struct.pack("!H", self.actor_port_priority))
-        packed.append(struct.pack("!H", self.actor_port_num))
-        packed.append(struct.pack("!H", self.actor_key))
-        packed.append(struct.pack("!B", self.convergence_status))
-        packed.append('\x00' * 1)
-        packed.append(struct.pack("!H", self.partner_sys_priority))
+        packed.append(_struct_HHHB1xH.pack(self.actor_port_priority, self.actor_port_num, self.actor_key, self.convergence_status, self.partner_sys_priority))
         packed.append(struct.pack("!6B", *self.partner_sys_mac))
-        packed.append(struct.pack("!H", self.partner_port_priority))
-        packed.append(struct.pack("!H", self.partner_port_num))
-        packed.append(struct.pack("!H", self.partner_key))
-        packed.append('\x00' * 2)
+        packed.append(_struct_HHH2x.pack(self.partner_port_priority, self.partner_port_num, self.partner_key))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_lacp_stats_entry()
-        obj.port_no = util.unpack_port_no(reader)
-        obj.actor_sys_priority = reader.read("!H")[0]
+        obj.port_no, obj.actor_sys_priority = reader.read_struct(_struct_LH)
         obj.actor_sys_mac = list(reader.read('!6B'))
-        obj.actor_port_priority = reader.read("!H")[0]
-        obj.actor_port_num = reader.read("!H")[0]
-        obj.actor_key = reader.read("!H")[0]
-        obj.convergence_status = reader.read("!B")[0]
-        reader.skip(1)
-        obj.partner_sys_priority = reader.read("!H")[0]
+        obj.actor_port_priority, obj.actor_port_num, obj.actor_key, obj.convergence_status, obj.partner_sys_priority = reader.read_struct(_struct_HHHB1xH)
         obj.partner_sys_mac = list(reader.read('!6B'))
-        obj.partner_port_priority = reader.read("!H")[0]
-        obj.partner_port_num = reader.read("!H")[0]
-        obj.partner_key = reader.read("!H")[0]
-        reader.skip(2)
+        obj.partner_port_priority, obj.partner_port_num, obj.partner_key = reader.read_struct(_struct_HHH2x)
         return obj
 
     def __eq__(self, other):
@@ -873,15 +868,13 @@ class bsn_table_checksum_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!B", self.table_id))
-        packed.append(struct.pack("!Q", self.checksum))
+        packed.append(_struct_BQ.pack(self.table_id, self.checksum))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_table_checksum_stats_entry()
-        obj.table_id = reader.read("!B")[0]
-        obj.checksum = reader.read("!Q")[0]
+        obj.table_id, obj.checksum = reader.read_struct(_struct_BQ)
         return obj
 
     def __eq__(self, other):
@@ -926,9 +919,8 @@ class bsn_tlv_vlan_mac_list(loxi.OFObject):
     @staticmethod
     def unpack(reader):
         obj = bsn_tlv_vlan_mac_list()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 98)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.key = loxi.generic_util.unpack_list(reader, ofp.common.bsn_vlan_mac.unpack)
@@ -977,8 +969,7 @@ class bsn_vport(loxi.OFObject):
             return subclass.unpack(reader)
 
         obj = bsn_vport()
-        obj.type = reader.read("!H")[0]
-        _length = reader.read("!H")[0]
+        obj.type, _length = reader.read_struct(_struct_HH)
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -1155,19 +1146,10 @@ class bsn_vport_l2gre(bsn_vport):
         packed = []
         packed.append(struct.pack("!H", self.type))
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 1
-        packed.append(struct.pack("!L", self.flags))
-        packed.append(util.pack_port_no(self.port_no))
-        packed.append(util.pack_port_no(self.loopback_port_no))
+        packed.append(_struct_LLL.pack(self.flags, self.port_no, self.loopback_port_no))
         packed.append(struct.pack("!6B", *self.local_mac))
         packed.append(struct.pack("!6B", *self.nh_mac))
-        packed.append(struct.pack("!L", self.src_ip))
-        packed.append(struct.pack("!L", self.dst_ip))
-        packed.append(struct.pack("!B", self.dscp))
-        packed.append(struct.pack("!B", self.ttl))
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!L", self.vpn))
-        packed.append(struct.pack("!L", self.rate_limit))
-        packed.append(struct.pack("!16s", self.if_name))
+        packed.append(_struct_LLBB2xLL16s.pack(self.src_ip, self.dst_ip, self.dscp, self.ttl, self.vpn, self.rate_limit, self.if_name))
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
         return ''.join(packed)
@@ -1175,23 +1157,14 @@ class bsn_vport_l2gre(bsn_vport):
     @staticmethod
     def unpack(reader):
         obj = bsn_vport_l2gre()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
-        obj.flags = reader.read("!L")[0]
-        obj.port_no = util.unpack_port_no(reader)
-        obj.loopback_port_no = util.unpack_port_no(reader)
+        obj.flags, obj.port_no, obj.loopback_port_no = reader.read_struct(_struct_LLL)
         obj.local_mac = list(reader.read('!6B'))
         obj.nh_mac = list(reader.read('!6B'))
-        obj.src_ip = reader.read("!L")[0]
-        obj.dst_ip = reader.read("!L")[0]
-        obj.dscp = reader.read("!B")[0]
-        obj.ttl = reader.read("!B")[0]
-        reader.skip(2)
-        obj.vpn = reader.read("!L")[0]
-        obj.rate_limit = reader.read("!L")[0]
+        obj.src_ip, obj.dst_ip, obj.dscp, obj.ttl, obj.vpn, obj.rate_limit = reader.read_struct(_struct_LLBB2xLL)
         obj.if_name = reader.read("!16s")[0].rstrip("\x00")
         return obj
 
@@ -1290,12 +1263,7 @@ class bsn_vport_q_in_q(bsn_vport):
         packed = []
         packed.append(struct.pack("!H", self.type))
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 1
-        packed.append(struct.pack("!L", self.port_no))
-        packed.append(struct.pack("!H", self.ingress_tpid))
-        packed.append(struct.pack("!H", self.ingress_vlan_id))
-        packed.append(struct.pack("!H", self.egress_tpid))
-        packed.append(struct.pack("!H", self.egress_vlan_id))
-        packed.append(struct.pack("!16s", self.if_name))
+        packed.append(_struct_LHHHH16s.pack(self.port_no, self.ingress_tpid, self.ingress_vlan_id, self.egress_tpid, self.egress_vlan_id, self.if_name))
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
         return ''.join(packed)
@@ -1303,16 +1271,11 @@ class bsn_vport_q_in_q(bsn_vport):
     @staticmethod
     def unpack(reader):
         obj = bsn_vport_q_in_q()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 0)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
-        obj.port_no = reader.read("!L")[0]
-        obj.ingress_tpid = reader.read("!H")[0]
-        obj.ingress_vlan_id = reader.read("!H")[0]
-        obj.egress_tpid = reader.read("!H")[0]
-        obj.egress_vlan_id = reader.read("!H")[0]
+        obj.port_no, obj.ingress_tpid, obj.ingress_vlan_id, obj.egress_tpid, obj.egress_vlan_id = reader.read_struct(_struct_LHHHH)
         obj.if_name = reader.read("!16s")[0].rstrip("\x00")
         return obj
 
@@ -1431,10 +1394,7 @@ class bucket(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for len at index 0
-        packed.append(struct.pack("!H", self.weight))
-        packed.append(util.pack_port_no(self.watch_port))
-        packed.append(struct.pack("!L", self.watch_group))
-        packed.append('\x00' * 4)
+        packed.append(_struct_HLL4x.pack(self.weight, self.watch_port, self.watch_group))
         packed.append(loxi.generic_util.pack_list(self.actions))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
@@ -1446,10 +1406,7 @@ class bucket(loxi.OFObject):
         _len = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_len, 2)
-        obj.weight = reader.read("!H")[0]
-        obj.watch_port = util.unpack_port_no(reader)
-        obj.watch_group = reader.read("!L")[0]
-        reader.skip(4)
+        obj.weight, obj.watch_port, obj.watch_group = reader.read_struct(_struct_HLL4x)
         obj.actions = loxi.generic_util.unpack_list(reader, ofp.action.action.unpack)
         return obj
 
@@ -1496,15 +1453,13 @@ class bucket_counter(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!Q", self.packet_count))
-        packed.append(struct.pack("!Q", self.byte_count))
+        packed.append(_struct_QQ.pack(self.packet_count, self.byte_count))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bucket_counter()
-        obj.packet_count = reader.read("!Q")[0]
-        obj.byte_count = reader.read("!Q")[0]
+        obj.packet_count, obj.byte_count = reader.read_struct(_struct_QQ)
         return obj
 
     def __eq__(self, other):
@@ -1583,18 +1538,7 @@ class flow_stats_entry(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append(struct.pack("!B", self.table_id))
-        packed.append('\x00' * 1)
-        packed.append(struct.pack("!L", self.duration_sec))
-        packed.append(struct.pack("!L", self.duration_nsec))
-        packed.append(struct.pack("!H", self.priority))
-        packed.append(struct.pack("!H", self.idle_timeout))
-        packed.append(struct.pack("!H", self.hard_timeout))
-        packed.append(struct.pack("!H", self.flags))
-        packed.append('\x00' * 4)
-        packed.append(struct.pack("!Q", self.cookie))
-        packed.append(struct.pack("!Q", self.packet_count))
-        packed.append(struct.pack("!Q", self.byte_count))
+        packed.append(_struct_B1xLLHHHH4xQQQ.pack(self.table_id, self.duration_sec, self.duration_nsec, self.priority, self.idle_timeout, self.hard_timeout, self.flags, self.cookie, self.packet_count, self.byte_count))
         packed.append(self.match.pack())
         packed.append(loxi.generic_util.pack_list(self.instructions))
         length = sum([len(x) for x in packed])
@@ -1607,18 +1551,7 @@ class flow_stats_entry(loxi.OFObject):
         _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 2)
-        obj.table_id = reader.read("!B")[0]
-        reader.skip(1)
-        obj.duration_sec = reader.read("!L")[0]
-        obj.duration_nsec = reader.read("!L")[0]
-        obj.priority = reader.read("!H")[0]
-        obj.idle_timeout = reader.read("!H")[0]
-        obj.hard_timeout = reader.read("!H")[0]
-        obj.flags = reader.read("!H")[0]
-        reader.skip(4)
-        obj.cookie = reader.read("!Q")[0]
-        obj.packet_count = reader.read("!Q")[0]
-        obj.byte_count = reader.read("!Q")[0]
+        obj.table_id, obj.duration_sec, obj.duration_nsec, obj.priority, obj.idle_timeout, obj.hard_timeout, obj.flags, obj.cookie, obj.packet_count, obj.byte_count = reader.read_struct(_struct_B1xLLHHHH4xQQQ)
         obj.match = ofp.match.unpack(reader)
         obj.instructions = loxi.generic_util.unpack_list(reader, ofp.instruction.instruction.unpack)
         return obj
@@ -1703,9 +1636,7 @@ class group_desc_stats_entry(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append(struct.pack("!B", self.group_type))
-        packed.append('\x00' * 1)
-        packed.append(struct.pack("!L", self.group_id))
+        packed.append(_struct_B1xL.pack(self.group_type, self.group_id))
         packed.append(loxi.generic_util.pack_list(self.buckets))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
@@ -1717,9 +1648,7 @@ class group_desc_stats_entry(loxi.OFObject):
         _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 2)
-        obj.group_type = reader.read("!B")[0]
-        reader.skip(1)
-        obj.group_id = reader.read("!L")[0]
+        obj.group_type, obj.group_id = reader.read_struct(_struct_B1xL)
         obj.buckets = loxi.generic_util.unpack_list(reader, ofp.common.bucket.unpack)
         return obj
 
@@ -1783,14 +1712,7 @@ class group_stats_entry(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!L", self.group_id))
-        packed.append(struct.pack("!L", self.ref_count))
-        packed.append('\x00' * 4)
-        packed.append(struct.pack("!Q", self.packet_count))
-        packed.append(struct.pack("!Q", self.byte_count))
-        packed.append(struct.pack("!L", self.duration_sec))
-        packed.append(struct.pack("!L", self.duration_nsec))
+        packed.append(_struct_2xLL4xQQLL.pack(self.group_id, self.ref_count, self.packet_count, self.byte_count, self.duration_sec, self.duration_nsec))
         packed.append(loxi.generic_util.pack_list(self.bucket_stats))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
@@ -1803,13 +1725,7 @@ class group_stats_entry(loxi.OFObject):
         orig_reader = reader
         reader = orig_reader.slice(_length, 2)
         reader.skip(2)
-        obj.group_id = reader.read("!L")[0]
-        obj.ref_count = reader.read("!L")[0]
-        reader.skip(4)
-        obj.packet_count = reader.read("!Q")[0]
-        obj.byte_count = reader.read("!Q")[0]
-        obj.duration_sec = reader.read("!L")[0]
-        obj.duration_nsec = reader.read("!L")[0]
+        obj.group_id, obj.ref_count, obj.packet_count, obj.byte_count, obj.duration_sec, obj.duration_nsec = reader.read_struct(_struct_LL4xQQLL)
         obj.bucket_stats = loxi.generic_util.unpack_list(reader, ofp.common.bucket_counter.unpack)
         return obj
 
@@ -1880,8 +1796,7 @@ class hello_elem(loxi.OFObject):
             return subclass.unpack(reader)
 
         obj = hello_elem()
-        obj.type = reader.read("!H")[0]
-        _length = reader.read("!H")[0]
+        obj.type, _length = reader.read_struct(_struct_HH)
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -1922,9 +1837,8 @@ class hello_elem_versionbitmap(hello_elem):
     @staticmethod
     def unpack(reader):
         obj = hello_elem_versionbitmap()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.bitmaps = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -1985,9 +1899,8 @@ class match_v3(loxi.OFObject):
     @staticmethod
     def unpack(reader):
         obj = match_v3()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_list = loxi.generic_util.unpack_list(reader, ofp.oxm.oxm.unpack)
@@ -2025,15 +1938,13 @@ class meter_band_stats(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!Q", self.packet_band_count))
-        packed.append(struct.pack("!Q", self.byte_band_count))
+        packed.append(_struct_QQ.pack(self.packet_band_count, self.byte_band_count))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = meter_band_stats()
-        obj.packet_band_count = reader.read("!Q")[0]
-        obj.byte_band_count = reader.read("!Q")[0]
+        obj.packet_band_count, obj.byte_band_count = reader.read_struct(_struct_QQ)
         return obj
 
     def __eq__(self, other):
@@ -2076,8 +1987,7 @@ class meter_config(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append(struct.pack("!H", self.flags))
-        packed.append(struct.pack("!L", self.meter_id))
+        packed.append(_struct_HL.pack(self.flags, self.meter_id))
         packed.append(loxi.generic_util.pack_list(self.entries))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
@@ -2089,8 +1999,7 @@ class meter_config(loxi.OFObject):
         _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 2)
-        obj.flags = reader.read("!H")[0]
-        obj.meter_id = reader.read("!L")[0]
+        obj.flags, obj.meter_id = reader.read_struct(_struct_HL)
         obj.entries = loxi.generic_util.unpack_list(reader, ofp.meter_band.meter_band.unpack)
         return obj
 
@@ -2145,23 +2054,13 @@ class meter_features(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.max_meter))
-        packed.append(struct.pack("!L", self.band_types))
-        packed.append(struct.pack("!L", self.capabilities))
-        packed.append(struct.pack("!B", self.max_bands))
-        packed.append(struct.pack("!B", self.max_color))
-        packed.append('\x00' * 2)
+        packed.append(_struct_LLLBB2x.pack(self.max_meter, self.band_types, self.capabilities, self.max_bands, self.max_color))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = meter_features()
-        obj.max_meter = reader.read("!L")[0]
-        obj.band_types = reader.read("!L")[0]
-        obj.capabilities = reader.read("!L")[0]
-        obj.max_bands = reader.read("!B")[0]
-        obj.max_color = reader.read("!B")[0]
-        reader.skip(2)
+        obj.max_meter, obj.band_types, obj.capabilities, obj.max_bands, obj.max_color = reader.read_struct(_struct_LLLBB2x)
         return obj
 
     def __eq__(self, other):
@@ -2233,12 +2132,7 @@ class meter_stats(loxi.OFObject):
         packed = []
         packed.append(struct.pack("!L", self.meter_id))
         packed.append(struct.pack("!H", 0)) # placeholder for len at index 1
-        packed.append('\x00' * 6)
-        packed.append(struct.pack("!L", self.flow_count))
-        packed.append(struct.pack("!Q", self.packet_in_count))
-        packed.append(struct.pack("!Q", self.byte_in_count))
-        packed.append(struct.pack("!L", self.duration_sec))
-        packed.append(struct.pack("!L", self.duration_nsec))
+        packed.append(_struct_6xLQQLL.pack(self.flow_count, self.packet_in_count, self.byte_in_count, self.duration_sec, self.duration_nsec))
         packed.append(loxi.generic_util.pack_list(self.band_stats))
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
@@ -2247,16 +2141,11 @@ class meter_stats(loxi.OFObject):
     @staticmethod
     def unpack(reader):
         obj = meter_stats()
-        obj.meter_id = reader.read("!L")[0]
-        _len = reader.read("!H")[0]
+        obj.meter_id, _len = reader.read_struct(_struct_LH)
         orig_reader = reader
         reader = orig_reader.slice(_len, 6)
         reader.skip(6)
-        obj.flow_count = reader.read("!L")[0]
-        obj.packet_in_count = reader.read("!Q")[0]
-        obj.byte_in_count = reader.read("!Q")[0]
-        obj.duration_sec = reader.read("!L")[0]
-        obj.duration_nsec = reader.read("!L")[0]
+        obj.flow_count, obj.packet_in_count, obj.byte_in_count, obj.duration_sec, obj.duration_nsec = reader.read_struct(_struct_LQQLL)
         obj.band_stats = loxi.generic_util.unpack_list(reader, ofp.common.meter_band_stats.unpack)
         return obj
 
@@ -2319,21 +2208,18 @@ class packet_queue(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.queue_id))
-        packed.append(util.pack_port_no(self.port))
-        packed.append(struct.pack("!H", 0)) # placeholder for len at index 2
+        packed.append(_struct_LL.pack(self.queue_id, self.port))
+        packed.append(struct.pack("!H", 0)) # placeholder for len at index 1
         packed.append('\x00' * 6)
         packed.append(loxi.generic_util.pack_list(self.properties))
         length = sum([len(x) for x in packed])
-        packed[2] = struct.pack("!H", length)
+        packed[1] = struct.pack("!H", length)
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = packet_queue()
-        obj.queue_id = reader.read("!L")[0]
-        obj.port = util.unpack_port_no(reader)
-        _len = reader.read("!H")[0]
+        obj.queue_id, obj.port, _len = reader.read_struct(_struct_LLH)
         orig_reader = reader
         reader = orig_reader.slice(_len, 10)
         reader.skip(6)
@@ -2418,16 +2304,7 @@ class port_desc(loxi.OFObject):
         packed.append(util.pack_port_no(self.port_no))
         packed.append('\x00' * 4)
         packed.append(struct.pack("!6B", *self.hw_addr))
-        packed.append('\x00' * 2)
-        packed.append(struct.pack("!16s", self.name))
-        packed.append(struct.pack("!L", self.config))
-        packed.append(struct.pack("!L", self.state))
-        packed.append(struct.pack("!L", self.curr))
-        packed.append(struct.pack("!L", self.advertised))
-        packed.append(struct.pack("!L", self.supported))
-        packed.append(struct.pack("!L", self.peer))
-        packed.append(struct.pack("!L", self.curr_speed))
-        packed.append(struct.pack("!L", self.max_speed))
+        packed.append(_struct_2x16sLLLLLLLL.pack(self.name, self.config, self.state, self.curr, self.advertised, self.supported, self.peer, self.curr_speed, self.max_speed))
         return ''.join(packed)
 
     @staticmethod
@@ -2438,14 +2315,7 @@ class port_desc(loxi.OFObject):
         obj.hw_addr = list(reader.read('!6B'))
         reader.skip(2)
         obj.name = reader.read("!16s")[0].rstrip("\x00")
-        obj.config = reader.read("!L")[0]
-        obj.state = reader.read("!L")[0]
-        obj.curr = reader.read("!L")[0]
-        obj.advertised = reader.read("!L")[0]
-        obj.supported = reader.read("!L")[0]
-        obj.peer = reader.read("!L")[0]
-        obj.curr_speed = reader.read("!L")[0]
-        obj.max_speed = reader.read("!L")[0]
+        obj.config, obj.state, obj.curr, obj.advertised, obj.supported, obj.peer, obj.curr_speed, obj.max_speed = reader.read_struct(_struct_LLLLLLLL)
         return obj
 
     def __eq__(self, other):
@@ -2571,43 +2441,13 @@ class port_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(util.pack_port_no(self.port_no))
-        packed.append('\x00' * 4)
-        packed.append(struct.pack("!Q", self.rx_packets))
-        packed.append(struct.pack("!Q", self.tx_packets))
-        packed.append(struct.pack("!Q", self.rx_bytes))
-        packed.append(struct.pack("!Q", self.tx_bytes))
-        packed.append(struct.pack("!Q", self.rx_dropped))
-        packed.append(struct.pack("!Q", self.tx_dropped))
-        packed.append(struct.pack("!Q", self.rx_errors))
-        packed.append(struct.pack("!Q", self.tx_errors))
-        packed.append(struct.pack("!Q", self.rx_frame_err))
-        packed.append(struct.pack("!Q", self.rx_over_err))
-        packed.append(struct.pack("!Q", self.rx_crc_err))
-        packed.append(struct.pack("!Q", self.collisions))
-        packed.append(struct.pack("!L", self.duration_sec))
-        packed.append(struct.pack("!L", self.duration_nsec))
+        packed.append(_struct_L4xQQQQQQQQQQQQLL.pack(self.port_no, self.rx_packets, self.tx_packets, self.rx_bytes, self.tx_bytes, self.rx_dropped, self.tx_dropped, self.rx_errors, self.tx_errors, self.rx_frame_err, self.rx_over_err, self.rx_crc_err, self.collisions, self.duration_sec, self.duration_nsec))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = port_stats_entry()
-        obj.port_no = util.unpack_port_no(reader)
-        reader.skip(4)
-        obj.rx_packets = reader.read("!Q")[0]
-        obj.tx_packets = reader.read("!Q")[0]
-        obj.rx_bytes = reader.read("!Q")[0]
-        obj.tx_bytes = reader.read("!Q")[0]
-        obj.rx_dropped = reader.read("!Q")[0]
-        obj.tx_dropped = reader.read("!Q")[0]
-        obj.rx_errors = reader.read("!Q")[0]
-        obj.tx_errors = reader.read("!Q")[0]
-        obj.rx_frame_err = reader.read("!Q")[0]
-        obj.rx_over_err = reader.read("!Q")[0]
-        obj.rx_crc_err = reader.read("!Q")[0]
-        obj.collisions = reader.read("!Q")[0]
-        obj.duration_sec = reader.read("!L")[0]
-        obj.duration_nsec = reader.read("!L")[0]
+        obj.port_no, obj.rx_packets, obj.tx_packets, obj.rx_bytes, obj.tx_bytes, obj.rx_dropped, obj.tx_dropped, obj.rx_errors, obj.tx_errors, obj.rx_frame_err, obj.rx_over_err, obj.rx_crc_err, obj.collisions, obj.duration_sec, obj.duration_nsec = reader.read_struct(_struct_L4xQQQQQQQQQQQQLL)
         return obj
 
     def __eq__(self, other):
@@ -2710,8 +2550,7 @@ class queue_prop(loxi.OFObject):
             return subclass.unpack(reader)
 
         obj = queue_prop()
-        obj.type = reader.read("!H")[0]
-        _len = reader.read("!H")[0]
+        obj.type, _len = reader.read_struct(_struct_HH)
         orig_reader = reader
         reader = orig_reader.slice(_len, 4)
         reader.skip(4)
@@ -2767,9 +2606,8 @@ class queue_prop_experimenter(queue_prop):
             return subclass.unpack(reader)
 
         obj = queue_prop_experimenter()
-        _type = reader.read("!H")[0]
+        _type, _len = reader.read_struct(_struct_HH)
         assert(_type == 65535)
-        _len = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_len, 4)
         reader.skip(4)
@@ -2820,9 +2658,8 @@ class queue_prop_max_rate(queue_prop):
     @staticmethod
     def unpack(reader):
         obj = queue_prop_max_rate()
-        _type = reader.read("!H")[0]
+        _type, _len = reader.read_struct(_struct_HH)
         assert(_type == 2)
-        _len = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_len, 4)
         reader.skip(4)
@@ -2871,9 +2708,8 @@ class queue_prop_min_rate(queue_prop):
     @staticmethod
     def unpack(reader):
         obj = queue_prop_min_rate()
-        _type = reader.read("!H")[0]
+        _type, _len = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _len = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_len, 4)
         reader.skip(4)
@@ -2933,25 +2769,13 @@ class queue_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(util.pack_port_no(self.port_no))
-        packed.append(struct.pack("!L", self.queue_id))
-        packed.append(struct.pack("!Q", self.tx_bytes))
-        packed.append(struct.pack("!Q", self.tx_packets))
-        packed.append(struct.pack("!Q", self.tx_errors))
-        packed.append(struct.pack("!L", self.duration_sec))
-        packed.append(struct.pack("!L", self.duration_nsec))
+        packed.append(_struct_LLQQQLL.pack(self.port_no, self.queue_id, self.tx_bytes, self.tx_packets, self.tx_errors, self.duration_sec, self.duration_nsec))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = queue_stats_entry()
-        obj.port_no = util.unpack_port_no(reader)
-        obj.queue_id = reader.read("!L")[0]
-        obj.tx_bytes = reader.read("!Q")[0]
-        obj.tx_packets = reader.read("!Q")[0]
-        obj.tx_errors = reader.read("!Q")[0]
-        obj.duration_sec = reader.read("!L")[0]
-        obj.duration_nsec = reader.read("!L")[0]
+        obj.port_no, obj.queue_id, obj.tx_bytes, obj.tx_packets, obj.tx_errors, obj.duration_sec, obj.duration_nsec = reader.read_struct(_struct_LLQQQLL)
         return obj
 
     def __eq__(self, other):
@@ -3021,8 +2845,7 @@ class table_feature_prop(loxi.OFObject):
             return subclass.unpack(reader)
 
         obj = table_feature_prop()
-        obj.type = reader.read("!H")[0]
-        _length = reader.read("!H")[0]
+        obj.type, _length = reader.read_struct(_struct_HH)
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         return obj
@@ -3064,9 +2887,8 @@ class table_feature_prop_apply_actions(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_apply_actions()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 6)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.action_ids = loxi.generic_util.unpack_list(reader, ofp.action_id.action_id.unpack)
@@ -3113,9 +2935,8 @@ class table_feature_prop_apply_actions_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_apply_actions_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 7)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.action_ids = loxi.generic_util.unpack_list(reader, ofp.action_id.action_id.unpack)
@@ -3162,9 +2983,8 @@ class table_feature_prop_apply_setfield(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_apply_setfield()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 14)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3211,9 +3031,8 @@ class table_feature_prop_apply_setfield_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_apply_setfield_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 15)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3261,8 +3080,7 @@ class table_feature_prop_experimenter(table_feature_prop):
         packed = []
         packed.append(struct.pack("!H", self.type))
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 1
-        packed.append(struct.pack("!L", self.experimenter))
-        packed.append(struct.pack("!L", self.subtype))
+        packed.append(_struct_LL.pack(self.experimenter, self.subtype))
         packed.append(self.experimenter_data)
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
@@ -3277,13 +3095,11 @@ class table_feature_prop_experimenter(table_feature_prop):
             return subclass.unpack(reader)
 
         obj = table_feature_prop_experimenter()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 65534)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
-        obj.experimenter = reader.read("!L")[0]
-        obj.subtype = reader.read("!L")[0]
+        obj.experimenter, obj.subtype = reader.read_struct(_struct_LL)
         obj.experimenter_data = str(reader.read_all())
         orig_reader.skip_align()
         return obj
@@ -3334,8 +3150,7 @@ class table_feature_prop_experimenter_miss(table_feature_prop):
         packed = []
         packed.append(struct.pack("!H", self.type))
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 1
-        packed.append(struct.pack("!L", self.experimenter))
-        packed.append(struct.pack("!L", self.subtype))
+        packed.append(_struct_LL.pack(self.experimenter, self.subtype))
         packed.append(self.experimenter_data)
         length = sum([len(x) for x in packed])
         packed[1] = struct.pack("!H", length)
@@ -3350,13 +3165,11 @@ class table_feature_prop_experimenter_miss(table_feature_prop):
             return subclass.unpack(reader)
 
         obj = table_feature_prop_experimenter_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 65535)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
-        obj.experimenter = reader.read("!L")[0]
-        obj.subtype = reader.read("!L")[0]
+        obj.experimenter, obj.subtype = reader.read_struct(_struct_LL)
         obj.experimenter_data = str(reader.read_all())
         orig_reader.skip_align()
         return obj
@@ -3406,9 +3219,8 @@ class table_feature_prop_instructions(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_instructions()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 0)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.instruction_ids = loxi.generic_util.unpack_list(reader, ofp.instruction_id.instruction_id.unpack)
@@ -3455,9 +3267,8 @@ class table_feature_prop_instructions_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_instructions_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 1)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.instruction_ids = loxi.generic_util.unpack_list(reader, ofp.instruction_id.instruction_id.unpack)
@@ -3504,9 +3315,8 @@ class table_feature_prop_match(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_match()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 8)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3553,9 +3363,8 @@ class table_feature_prop_next_tables(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_next_tables()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 2)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.next_table_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint8.unpack)
@@ -3602,9 +3411,8 @@ class table_feature_prop_next_tables_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_next_tables_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 3)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.next_table_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint8.unpack)
@@ -3651,9 +3459,8 @@ class table_feature_prop_wildcards(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_wildcards()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 10)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3700,9 +3507,8 @@ class table_feature_prop_write_actions(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_write_actions()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 4)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.action_ids = loxi.generic_util.unpack_list(reader, ofp.action_id.action_id.unpack)
@@ -3749,9 +3555,8 @@ class table_feature_prop_write_actions_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_write_actions_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 5)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.action_ids = loxi.generic_util.unpack_list(reader, ofp.action_id.action_id.unpack)
@@ -3798,9 +3603,8 @@ class table_feature_prop_write_setfield(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_write_setfield()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 12)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3847,9 +3651,8 @@ class table_feature_prop_write_setfield_miss(table_feature_prop):
     @staticmethod
     def unpack(reader):
         obj = table_feature_prop_write_setfield_miss()
-        _type = reader.read("!H")[0]
+        _type, _length = reader.read_struct(_struct_HH)
         assert(_type == 13)
-        _length = reader.read("!H")[0]
         orig_reader = reader
         reader = orig_reader.slice(_length, 4)
         obj.oxm_ids = loxi.generic_util.unpack_list(reader, ofp.common.uint32.unpack)
@@ -3909,13 +3712,7 @@ class table_features(loxi.OFObject):
     def pack(self):
         packed = []
         packed.append(struct.pack("!H", 0)) # placeholder for length at index 0
-        packed.append(struct.pack("!B", self.table_id))
-        packed.append('\x00' * 5)
-        packed.append(struct.pack("!32s", self.name))
-        packed.append(struct.pack("!Q", self.metadata_match))
-        packed.append(struct.pack("!Q", self.metadata_write))
-        packed.append(struct.pack("!L", self.config))
-        packed.append(struct.pack("!L", self.max_entries))
+        packed.append(_struct_B5x32sQQLL.pack(self.table_id, self.name, self.metadata_match, self.metadata_write, self.config, self.max_entries))
         packed.append(loxi.generic_util.pack_list(self.properties))
         length = sum([len(x) for x in packed])
         packed[0] = struct.pack("!H", length)
@@ -3930,10 +3727,7 @@ class table_features(loxi.OFObject):
         obj.table_id = reader.read("!B")[0]
         reader.skip(5)
         obj.name = reader.read("!32s")[0].rstrip("\x00")
-        obj.metadata_match = reader.read("!Q")[0]
-        obj.metadata_write = reader.read("!Q")[0]
-        obj.config = reader.read("!L")[0]
-        obj.max_entries = reader.read("!L")[0]
+        obj.metadata_match, obj.metadata_write, obj.config, obj.max_entries = reader.read_struct(_struct_QQLL)
         obj.properties = loxi.generic_util.unpack_list(reader, ofp.common.table_feature_prop.unpack)
         return obj
 
@@ -4000,21 +3794,13 @@ class table_stats_entry(loxi.OFObject):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!B", self.table_id))
-        packed.append('\x00' * 3)
-        packed.append(struct.pack("!L", self.active_count))
-        packed.append(struct.pack("!Q", self.lookup_count))
-        packed.append(struct.pack("!Q", self.matched_count))
+        packed.append(_struct_B3xLQQ.pack(self.table_id, self.active_count, self.lookup_count, self.matched_count))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = table_stats_entry()
-        obj.table_id = reader.read("!B")[0]
-        reader.skip(3)
-        obj.active_count = reader.read("!L")[0]
-        obj.lookup_count = reader.read("!Q")[0]
-        obj.matched_count = reader.read("!Q")[0]
+        obj.table_id, obj.active_count, obj.lookup_count, obj.matched_count = reader.read_struct(_struct_B3xLQQ)
         return obj
 
     def __eq__(self, other):
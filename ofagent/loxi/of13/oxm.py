@@ -12,6 +12,18 @@ import util
 import loxi.generic_util
 
 import sys
+
+# Precompiled layouts of the fixed-size fields
+_struct_L16s = struct.Struct("!L16s")
+_struct_L16s16s = struct.Struct("!L16s16s")
+_struct_LB = struct.Struct("!LB")
+_struct_LBB = struct.Struct("!LBB")
+_struct_LH = struct.Struct("!LH")
+_struct_LHH = struct.Struct("!LHH")
+_struct_LL = struct.Struct("!LL")
+_struct_LLL = struct.Struct("!LLL")
+_struct_LQ = struct.Struct("!LQ")
+_struct_LQQ = struct.Struct("!LQQ")
 ofp = sys.modules['loxi.of13']
 
 class oxm(loxi.OFObject):
@@ -67,16 +79,14 @@ class arp_op(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_op()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147494402)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -112,18 +122,14 @@ class arp_op_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_op_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147494660)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -251,16 +257,14 @@ class arp_spa(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_spa()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147494916)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -296,18 +300,14 @@ class arp_spa_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_spa_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147495176)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -435,16 +435,14 @@ class arp_tpa(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_tpa()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147495428)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -480,18 +478,14 @@ class arp_tpa_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = arp_tpa_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147495688)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -527,16 +521,14 @@ class bsn_egr_port_group_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_egr_port_group_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 200196)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -572,18 +564,14 @@ class bsn_egr_port_group_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_egr_port_group_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 200456)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -619,16 +607,14 @@ class bsn_global_vrf_allowed(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_global_vrf_allowed()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 198145)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -664,18 +650,14 @@ class bsn_global_vrf_allowed_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_global_vrf_allowed_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 198402)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -895,16 +877,14 @@ class bsn_ingress_port_group_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_ingress_port_group_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 206852)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -940,18 +920,14 @@ class bsn_ingress_port_group_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_ingress_port_group_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 207112)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1171,16 +1147,14 @@ class bsn_inner_vlan_vid(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_inner_vlan_vid()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 208898)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -1216,18 +1190,14 @@ class bsn_inner_vlan_vid_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_inner_vlan_vid_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 209156)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -1263,16 +1233,14 @@ class bsn_l2_cache_hit(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l2_cache_hit()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 205825)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -1308,18 +1276,14 @@ class bsn_l2_cache_hit_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l2_cache_hit_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 206082)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -1355,16 +1319,14 @@ class bsn_l3_dst_class_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_dst_class_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 199684)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1400,18 +1362,14 @@ class bsn_l3_dst_class_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_dst_class_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 199944)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1447,16 +1405,14 @@ class bsn_l3_interface_class_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_interface_class_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 198660)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1492,18 +1448,14 @@ class bsn_l3_interface_class_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_interface_class_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 198920)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1539,16 +1491,14 @@ class bsn_l3_src_class_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_src_class_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 199172)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1584,18 +1534,14 @@ class bsn_l3_src_class_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_l3_src_class_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 199432)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1631,16 +1577,14 @@ class bsn_lag_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_lag_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 197124)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1676,18 +1620,14 @@ class bsn_lag_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_lag_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 197384)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1723,16 +1663,14 @@ class bsn_tcp_flags(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_tcp_flags()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 204802)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -1768,18 +1706,14 @@ class bsn_tcp_flags_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_tcp_flags_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 205060)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -1815,16 +1749,14 @@ class bsn_udf0(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf0()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 200708)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1860,18 +1792,14 @@ class bsn_udf0_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf0_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 200968)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1907,16 +1835,14 @@ class bsn_udf1(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf1()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 201220)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1952,18 +1878,14 @@ class bsn_udf1_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf1_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 201480)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -1999,16 +1921,14 @@ class bsn_udf2(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf2()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 201732)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2044,18 +1964,14 @@ class bsn_udf2_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf2_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 201992)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2091,16 +2007,14 @@ class bsn_udf3(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf3()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 202244)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2136,18 +2050,14 @@ class bsn_udf3_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf3_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 202504)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2183,16 +2093,14 @@ class bsn_udf4(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf4()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 202756)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2228,18 +2136,14 @@ class bsn_udf4_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf4_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 203016)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2275,16 +2179,14 @@ class bsn_udf5(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf5()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 203268)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2320,18 +2222,14 @@ class bsn_udf5_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf5_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 203528)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2367,16 +2265,14 @@ class bsn_udf6(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf6()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 203780)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2412,18 +2308,14 @@ class bsn_udf6_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf6_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 204040)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2459,16 +2351,14 @@ class bsn_udf7(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf7()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 204292)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2504,18 +2394,14 @@ class bsn_udf7_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_udf7_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 204552)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2551,16 +2437,14 @@ class bsn_vfi(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vfi()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 209410)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -2596,18 +2480,14 @@ class bsn_vfi_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vfi_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 209668)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -2643,16 +2523,14 @@ class bsn_vlan_xlate_port_group_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vlan_xlate_port_group_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 205316)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2688,18 +2566,14 @@ class bsn_vlan_xlate_port_group_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vlan_xlate_port_group_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 205576)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2735,16 +2609,14 @@ class bsn_vrf(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vrf()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 197636)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2780,18 +2652,14 @@ class bsn_vrf_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vrf_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 197896)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2827,16 +2695,14 @@ class bsn_vxlan_network_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vxlan_network_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 207364)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -2872,18 +2738,14 @@ class bsn_vxlan_network_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = bsn_vxlan_network_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 207624)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -3103,16 +2965,14 @@ class eth_type(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = eth_type()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147486210)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -3148,18 +3008,14 @@ class eth_type_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = eth_type_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147486468)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -3195,16 +3051,14 @@ class icmpv4_code(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv4_code()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147493889)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3240,18 +3094,14 @@ class icmpv4_code_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv4_code_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147494146)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3287,16 +3137,14 @@ class icmpv4_type(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv4_type()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147493377)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3332,18 +3180,14 @@ class icmpv4_type_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv4_type_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147493634)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3379,16 +3223,14 @@ class icmpv6_code(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv6_code()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147499009)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3424,18 +3266,14 @@ class icmpv6_code_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv6_code_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147499266)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3471,16 +3309,14 @@ class icmpv6_type(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv6_type()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147498497)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3516,18 +3352,14 @@ class icmpv6_type_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = icmpv6_type_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147498754)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3563,16 +3395,14 @@ class in_phy_port(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(util.pack_port_no(self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = in_phy_port()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147484164)
-        obj.value = util.unpack_port_no(reader)
         return obj
 
     def __eq__(self, other):
@@ -3608,18 +3438,14 @@ class in_phy_port_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(util.pack_port_no(self.value))
-        packed.append(util.pack_port_no(self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = in_phy_port_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147484424)
-        obj.value = util.unpack_port_no(reader)
-        obj.value_mask = util.unpack_port_no(reader)
         return obj
 
     def __eq__(self, other):
@@ -3655,16 +3481,14 @@ class in_port(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(util.pack_port_no(self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = in_port()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147483652)
-        obj.value = util.unpack_port_no(reader)
         return obj
 
     def __eq__(self, other):
@@ -3700,18 +3524,14 @@ class in_port_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(util.pack_port_no(self.value))
-        packed.append(util.pack_port_no(self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = in_port_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147483912)
-        obj.value = util.unpack_port_no(reader)
-        obj.value_mask = util.unpack_port_no(reader)
         return obj
 
     def __eq__(self, other):
@@ -3747,16 +3567,14 @@ class ip_dscp(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_dscp()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147487745)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3792,18 +3610,14 @@ class ip_dscp_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_dscp_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147488002)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3839,16 +3653,14 @@ class ip_ecn(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_ecn()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147488257)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3884,18 +3696,14 @@ class ip_ecn_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_ecn_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147488514)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3931,16 +3739,14 @@ class ip_proto(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_proto()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147488769)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -3976,18 +3782,14 @@ class ip_proto_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ip_proto_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147489026)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -4023,16 +3825,14 @@ class ipv4_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv4_dst()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147489796)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4068,18 +3868,14 @@ class ipv4_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv4_dst_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147490056)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4115,16 +3911,14 @@ class ipv4_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv4_src()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147489284)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4160,18 +3954,14 @@ class ipv4_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv4_src_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147489544)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4207,8 +3997,7 @@ class ipv6_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
+        packed.append(_struct_L16s.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
@@ -4252,9 +4041,7 @@ class ipv6_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
-        packed.append(struct.pack("!16s", self.value_mask))
+        packed.append(_struct_L16s16s.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
@@ -4299,16 +4086,14 @@ class ipv6_exthdr(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv6_exthdr()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147503618)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -4344,18 +4129,14 @@ class ipv6_exthdr_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv6_exthdr_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147503876)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -4391,16 +4172,14 @@ class ipv6_flabel(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv6_flabel()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147497988)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4436,18 +4215,14 @@ class ipv6_flabel_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = ipv6_flabel_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147498248)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -4575,8 +4350,7 @@ class ipv6_nd_target(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
+        packed.append(_struct_L16s.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
@@ -4620,9 +4394,7 @@ class ipv6_nd_target_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
-        packed.append(struct.pack("!16s", self.value_mask))
+        packed.append(_struct_L16s16s.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
@@ -4759,8 +4531,7 @@ class ipv6_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
+        packed.append(_struct_L16s.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
@@ -4804,9 +4575,7 @@ class ipv6_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!16s", self.value))
-        packed.append(struct.pack("!16s", self.value_mask))
+        packed.append(_struct_L16s16s.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
@@ -4851,16 +4620,14 @@ class metadata(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!Q", self.value))
+        packed.append(_struct_LQ.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = metadata()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LQ)
         assert(_type_len == 2147484680)
-        obj.value = reader.read("!Q")[0]
         return obj
 
     def __eq__(self, other):
@@ -4896,18 +4663,14 @@ class metadata_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!Q", self.value))
-        packed.append(struct.pack("!Q", self.value_mask))
+        packed.append(_struct_LQQ.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = metadata_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LQQ)
         assert(_type_len == 2147484944)
-        obj.value = reader.read("!Q")[0]
-        obj.value_mask = reader.read("!Q")[0]
         return obj
 
     def __eq__(self, other):
@@ -4943,16 +4706,14 @@ class mpls_bos(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_bos()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147502081)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -4988,18 +4749,14 @@ class mpls_bos_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_bos_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147502338)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -5035,16 +4792,14 @@ class mpls_label(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_label()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 2147501060)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5080,18 +4835,14 @@ class mpls_label_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_label_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 2147501320)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5127,16 +4878,14 @@ class mpls_tc(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_tc()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147501569)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -5172,18 +4921,14 @@ class mpls_tc_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = mpls_tc_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147501826)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -5219,16 +4964,14 @@ class sctp_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = sctp_dst()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147492866)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5264,18 +5007,14 @@ class sctp_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = sctp_dst_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147493124)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5311,16 +5050,14 @@ class sctp_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = sctp_src()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147492354)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5356,18 +5093,14 @@ class sctp_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = sctp_src_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147492612)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5403,16 +5136,14 @@ class tcp_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tcp_dst()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147490818)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5448,18 +5179,14 @@ class tcp_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tcp_dst_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147491076)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5495,16 +5222,14 @@ class tcp_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tcp_src()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147490306)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5540,18 +5265,14 @@ class tcp_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tcp_src_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147490564)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5587,16 +5308,14 @@ class tunnel_id(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!Q", self.value))
+        packed.append(_struct_LQ.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_id()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LQ)
         assert(_type_len == 2147503112)
-        obj.value = reader.read("!Q")[0]
         return obj
 
     def __eq__(self, other):
@@ -5632,18 +5351,14 @@ class tunnel_id_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!Q", self.value))
-        packed.append(struct.pack("!Q", self.value_mask))
+        packed.append(_struct_LQQ.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_id_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LQQ)
         assert(_type_len == 2147503376)
-        obj.value = reader.read("!Q")[0]
-        obj.value_mask = reader.read("!Q")[0]
         return obj
 
     def __eq__(self, other):
@@ -5679,16 +5394,14 @@ class tunnel_ipv4_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_ipv4_dst()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 81924)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5724,18 +5437,14 @@ class tunnel_ipv4_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_ipv4_dst_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 82184)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5771,16 +5480,14 @@ class tunnel_ipv4_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
+        packed.append(_struct_LL.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_ipv4_src()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LL)
         assert(_type_len == 81412)
-        obj.value = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5816,18 +5523,14 @@ class tunnel_ipv4_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!L", self.value))
-        packed.append(struct.pack("!L", self.value_mask))
+        packed.append(_struct_LLL.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = tunnel_ipv4_src_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LLL)
         assert(_type_len == 81672)
-        obj.value = reader.read("!L")[0]
-        obj.value_mask = reader.read("!L")[0]
         return obj
 
     def __eq__(self, other):
@@ -5863,16 +5566,14 @@ class udp_dst(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = udp_dst()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147491842)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5908,18 +5609,14 @@ class udp_dst_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = udp_dst_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147492100)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -5955,16 +5652,14 @@ class udp_src(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = udp_src()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147491330)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -6000,18 +5695,14 @@ class udp_src_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = udp_src_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147491588)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -6047,16 +5738,14 @@ class vlan_pcp(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
+        packed.append(_struct_LB.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = vlan_pcp()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LB)
         assert(_type_len == 2147487233)
-        obj.value = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -6092,18 +5781,14 @@ class vlan_pcp_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!B", self.value))
-        packed.append(struct.pack("!B", self.value_mask))
+        packed.append(_struct_LBB.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = vlan_pcp_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LBB)
         assert(_type_len == 2147487490)
-        obj.value = reader.read("!B")[0]
-        obj.value_mask = reader.read("!B")[0]
         return obj
 
     def __eq__(self, other):
@@ -6139,16 +5824,14 @@ class vlan_vid(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
+        packed.append(_struct_LH.pack(self.type_len, self.value))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = vlan_vid()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value = reader.read_struct(_struct_LH)
         assert(_type_len == 2147486722)
-        obj.value = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -6184,18 +5867,14 @@ class vlan_vid_masked(oxm):
 
     def pack(self):
         packed = []
-        packed.append(struct.pack("!L", self.type_len))
-        packed.append(struct.pack("!H", self.value))
-        packed.append(struct.pack("!H", self.value_mask))
+        packed.append(_struct_LHH.pack(self.type_len, self.value, self.value_mask))
         return ''.join(packed)
 
     @staticmethod
     def unpack(reader):
         obj = vlan_vid_masked()
-        _type_len = reader.read("!L")[0]
+        _type_len, obj.value, obj.value_mask = reader.read_struct(_struct_LHH)
         assert(_type_len == 2147486980)
-        obj.value = reader.read("!H")[0]
-        obj.value_mask = reader.read("!H")[0]
         return obj
 
     def __eq__(self, other):
@@ -37,6 +37,7 @@ defs = dict(
     instance_id=os.environ.get('INSTANCE_ID', os.environ.get('HOSTNAME', '1')),
     internal_host_address=os.environ.get('INTERNAL_HOST_ADDRESS',
                                          get_my_primary_local_ipv4()),
+    stats_max_age=int(os.environ.get('STATS_MAX_AGE', 5)),
     work_dir=os.environ.get('WORK_DIR', '/tmp/ofagent')
 )
 
@@ -125,6 +126,16 @@ def parse_args():
                         action='count',
                         help=_help)
 
+    _help = ('seconds for which the port, table and meter statistics '
+             'fetched from vcore are served to the controllers '
+             '(default: %s)' % defs['stats_max_age'])
+    parser.add_argument('-s', '--stats-max-age',
+                        dest='stats_max_age',
+                        action='store',
+                        type=int,
+                        default=defs['stats_max_age'],
+                        help=_help)
+
     _help = 'enable verbose logging'
     parser.add_argument('-v', '--verbose',
                         dest='verbose',
@@ -213,7 +224,8 @@ class Main(object):
         self.log.info('starting-internal-components')
         args = self.args
         self.connection_manager = yield ConnectionManager(
-            args.consul, args.grpc_endpoint, args.controller).start()
+            args.consul, args.grpc_endpoint, args.controller,
+            stats_max_age=args.stats_max_age).start()
         self.log.info('started-internal-services')
 
     @inlineCallbacks
@@ -13,15 +13,58 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import logging
+import struct
+from copy import copy
+
 import structlog
 from hexdump import hexdump
 from twisted.internet import protocol
 
+import loxi
 import loxi.of14
 from common.utils.message_queue import MessageQueue
 
 log = structlog.get_logger()
 
+_xid = struct.Struct('!L')
+_length = struct.Struct('!H')
+
+
+def debug_enabled():
+    """
+    Return True if debug log entries are emitted at all, so that costly
+    log arguments (such as hexdumps) are only produced when needed
+    """
+    return logging.getLogger(__name__).isEnabledFor(logging.DEBUG)
+
+
+class EncodedMessage(object):
+    """
+    An OpenFlow message packed once, to be sent on any number of
+    connections, each with an xid of its own
+    """
+
+    __slots__ = ('type', 'reason', 'xid', 'head', 'body')
+
+    def __init__(self, msg, xid=None, tail=''):
+        """
+        :param msg: loxi message
+        :param xid: xid to send the message with, e.g., that of the request
+        it replies to; if None, each connection generates one
+        :param tail: bytes already packed to append to the message, e.g.,
+        the entries of a multipart reply
+        """
+        msg = copy(msg)  # the xid of the caller's message is left as is
+        msg.xid = 0
+        buf = msg.pack()
+        self.type = msg.type
+        self.reason = getattr(msg, 'reason', None)
+        self.xid = xid
+        # the xid follows the version, type and length
+        self.head = buf[:2] + _length.pack(len(buf) + len(tail))
+        self.body = buf[8:] + tail
+
 
 class OpenFlowConnection(protocol.Protocol):
 
@@ -30,8 +73,10 @@ class OpenFlowConnection(protocol.Protocol):
                             # and agent.enter_connected() methods to indicate
                             # when state change is necessary
         self.next_xid = 1
-        self.read_buffer = None
+        self.read_buffer = bytearray()
         self.rx = MessageQueue()
+        self.rx.add_index('xid', lambda msg: (getattr(msg, 'xid', None),))
+        self.rx.add_index('class', lambda msg: type(msg).__mro__)
 
     def connectionLost(self, reason):
         self.agent.enter_disconnected('connection-lost', reason)
@@ -40,46 +85,51 @@ class OpenFlowConnection(protocol.Protocol):
         self.agent.enter_connected()
 
     def dataReceived(self, data):
-        log.debug('data-received', len=len(data),
-                  received=hexdump(data, result='return'))
+        debug = debug_enabled()
+        if debug:
+            log.debug('data-received', len=len(data),
+                      received=hexdump(data, result='return'))
 
         assert len(data)  # connection close shall be handled by the protocol
+
+        # Messages are parsed in place from the read buffer, through
+        # read-only views on it, and the consumed bytes are dropped once
+        # per call, so the cost of framing is linear in the data received.
         buf = self.read_buffer
-        if buf:
-            buf += data
-        else:
-            buf = data
+        buf.extend(data)
+        size = len(buf)
 
         offset = 0
-        while offset < len(buf):
-            if offset + 8 > len(buf):
-                break  # not enough data for the OpenFlow header
+        while size - offset >= 8:  # enough data for the OpenFlow header
 
             # parse the header to get type
             _version, _type, _len, _xid = \
-                loxi.of14.message.parse_header(buf[offset:])
+                loxi.of14.message.parse_header(buffer(buf, offset, 8))
 
-            ofp = loxi.protocol(_version)
+            if _len < 8:
+                raise loxi.ProtocolError('invalid message length')
 
-            if (offset + _len) > len(buf):
+            if (offset + _len) > size:
                 break  # not enough data to cover whole message
 
-            rawmsg = buf[offset : offset + _len]
+            ofp = loxi.protocol(_version)
+
+            rawmsg = buffer(buf, offset, _len)
             offset += _len
 
             msg = ofp.message.parse_message(rawmsg)
             if not msg:
                 log.warn('could-not-parse',
-                         data=hexdump(rawmsg, result='return'))
-            log.debug('received-msg', module=type(msg).__module__,
-                  name=type(msg).__name__, xid=msg.xid, len=len(buf))
+                         data=hexdump(str(rawmsg), result='return'))
+            elif debug:
+                log.debug('received-msg', module=type(msg).__module__,
+                          name=type(msg).__name__, xid=msg.xid, len=size)
             self.rx.put(msg)
 
-        if offset == len(buf):
-            self.read_buffer = None
-        else:
-            self.read_buffer = buf[offset:]
-            log.debug('remaining', len=len(self.read_buffer))
+        if offset:
+            del buf[:offset]
+        if buf and debug:
+            log.debug('remaining', len=len(buf))
 
     def send_raw(self, buf):
         """
@@ -102,10 +152,34 @@ class OpenFlowConnection(protocol.Protocol):
         if msg.xid is None:
             msg.xid = self._gen_xid()
         buf = msg.pack()
-        log.debug('sending', module=type(msg).__module__,
-                  name=type(msg).__name__, xid=msg.xid, len=len(buf))
+        debug = debug_enabled()
+        if debug:
+            log.debug('sending', module=type(msg).__module__,
+                      name=type(msg).__name__, xid=msg.xid, len=len(buf))
+        self.transport.write(buf)
+        if debug:
+            log.debug('data-sent', sent=hexdump(buf, result='return'))
+
+    def send_encoded(self, encoded_msgs):
+        """
+        Send encoded messages, with xids of this connection unless they
+        have one of their own, in a single write on the socket
+        :param encoded_msgs: list of EncodedMessage
+        :return: None
+        """
+        assert self.connected
+
+        pieces = []
+        for encoded in encoded_msgs:
+            pieces.append(encoded.head)
+            pieces.append(_xid.pack(
+                self._gen_xid() if encoded.xid is None else encoded.xid))
+            pieces.append(encoded.body)
+        buf = ''.join(pieces)
+        if debug_enabled():
+            log.debug('sending-encoded', count=len(encoded_msgs),
+                      len=len(buf))
         self.transport.write(buf)
-        log.debug('data-sent', sent=hexdump(buf, result='return'))
 
     def recv(self, predicate):
         assert self.connected
@@ -115,10 +189,12 @@ class OpenFlowConnection(protocol.Protocol):
         return self.recv(lambda _: True)
 
     def recv_xid(self, xid):
-        return self.recv(lambda msg: msg.xid == xid)
+        assert self.connected
+        return self.rx.get_by('xid', xid)
 
     def recv_class(self, klass):
-        return self.recv(lambda msg: isinstance(msg, klass))
+        assert self.connected
+        return self.rx.get_by('class', klass)
 
     def _gen_xid(self):
         xid = self.next_xid
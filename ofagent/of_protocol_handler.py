@@ -13,11 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from collections import deque
+
 import structlog
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.defer import inlineCallbacks, returnValue, \
+    maybeDeferred
 
 import loxi.of13 as ofp
 from converter import to_loxi, pb2dict, to_grpc
+from of_connection import EncodedMessage
 
 log = structlog.get_logger()
 
@@ -29,6 +33,10 @@ class OpenFlowProtocolHandler(object):
 
     ofp_version = [4]  # OFAgent supported versions
 
+    max_batch_size = 1000  # flow and group mods per update RPC
+
+    max_reply_size = 0xffff  # bytes per multipart reply message
+
     def __init__(self, datapath_id, device_id, agent, cxn, rpc):
         """
         The upper half of the OpenFlow protocol, focusing on message
@@ -46,6 +54,23 @@ class OpenFlowProtocolHandler(object):
         self.rpc = rpc
         self.role = None
 
+        # async config: per message type, the bitmaps of the reasons for
+        # which the message is sent in the master or equal role, and in
+        # the slave role (see OFPT_SET_ASYNC)
+        self.async_masks = {
+            ofp.OFPT_PACKET_IN: [0xffffffff, 0],
+            ofp.OFPT_PORT_STATUS: [0xffffffff, 0xffffffff],
+            ofp.OFPT_FLOW_REMOVED: [0xffffffff, 0],
+        }
+
+        # Flow and group mods are sent to the core in ordered batches, one
+        # batch at a time; the mods received while a batch is in flight
+        # make up the next one. Barriers are queued along with them, and
+        # hold back their reply as well as the mods received after them
+        # until all earlier mods are confirmed.
+        self.pipeline = deque()  # (req, is_barrier)
+        self.batch_in_flight = False
+
     @inlineCallbacks
     def start(self):
         """A new call is made after a fresh reconnect"""
@@ -109,27 +134,107 @@ class OpenFlowProtocolHandler(object):
                 'Cannot handle stats request type "{}"'.format(req.stats_type))
 
     def handle_barrier_request(self, req):
-        # not really doing barrier yet, but we respond
-        # see https://jira.opencord.org/browse/CORD-823
-        self.cxn.send(ofp.message.barrier_reply(xid=req.xid))
+        self.pipeline.append((req, True))
+        self.run_pipeline()
+
+    def submit_operation(self, req):
+        """
+        Queue a flow or group mod, to be sent to the core in a batch with
+        the ones following it, once all barriers received before it are
+        released
+        """
+        self.pipeline.append((req, False))
+        self.run_pipeline()
+
+    def run_pipeline(self):
+        while self.pipeline and not self.batch_in_flight:
+            req, barrier = self.pipeline[0]
+            if barrier:
+                self.pipeline.popleft()
+                self.cxn.send(ofp.message.barrier_reply(xid=req.xid))
+                continue
+
+            reqs, mods = [], []
+            while self.pipeline and not self.pipeline[0][1] and \
+                    len(reqs) < self.max_batch_size:
+                req, _ = self.pipeline.popleft()
+                try:
+                    mods.append(to_grpc(req))
+                    reqs.append(req)
+                except Exception, e:
+                    log.exception('failed-to-convert', e=e)
+                    self.send_operation_error(req)
+
+            if reqs:
+                self.batch_in_flight = True
+                d = maybeDeferred(
+                    self.rpc.update_tables_batch, self.device_id, mods)
+                d.addCallbacks(self.batch_applied, self.batch_failed,
+                               callbackArgs=(reqs,), errbackArgs=(reqs,))
+                d.addBoth(self.batch_done)
+
+    def batch_applied(self, statuses, reqs):
+        for req, status in zip(reqs, statuses):
+            if not status.success:
+                self.send_operation_error(
+                    req, status.error_type, status.error_code)
+
+    def batch_failed(self, failure, reqs):
+        log.error('batch-failed', xids=[req.xid for req in reqs],
+                  failure=failure)
+        for req in reqs:
+            self.send_operation_error(req)
+
+    def batch_done(self, _):
+        self.batch_in_flight = False
+        self.run_pipeline()
+
+    def send_operation_error(self, req, error_type=None, code=None):
+        """
+        Report the failure of a flow or group mod against its xid
+        """
+        try:
+            if error_type is None:
+                if req.type == ofp.OFPT_GROUP_MOD:
+                    error_type = ofp.OFPET_GROUP_MOD_FAILED
+                    code = ofp.OFPGMFC_INVALID_GROUP
+                else:
+                    error_type = ofp.OFPET_FLOW_MOD_FAILED
+                    code = ofp.OFPFMFC_UNKNOWN
+            error_cls = self.error_msgs.get(
+                error_type, ofp.message.bad_request_error_msg)
+            self.cxn.send(error_cls(xid=req.xid, code=code,
+                                    data=req.pack()[:64]))
+        except Exception, e:
+            log.exception('failed-to-report-error', e=e)
+
+    error_msgs = {
+        ofp.OFPET_BAD_REQUEST: ofp.message.bad_request_error_msg,
+        ofp.OFPET_FLOW_MOD_FAILED: ofp.message.flow_mod_failed_error_msg,
+        ofp.OFPET_GROUP_MOD_FAILED: ofp.message.group_mod_failed_error_msg,
+    }
 
     def handle_experimenter_request(self, req):
         raise NotImplementedError()
 
     def handle_flow_mod_request(self, req):
         if self.role == ofp.OFPCR_ROLE_MASTER or self.role == ofp.OFPCR_ROLE_EQUAL:
-           try:
-              grpc_req = to_grpc(req)
-           except Exception, e:
-              log.exception('failed-to-convert', e=e)
-           else:
-              return self.rpc.update_flow_table(self.device_id, grpc_req)
+           self.submit_operation(req)
 
         elif self.role == ofp.OFPCR_ROLE_SLAVE:
-           self.cxn.send(ofp.message.bad_request_error_msg(code=ofp.OFPBRC_IS_SLAVE))
+           self.cxn.send(ofp.message.bad_request_error_msg(
+               xid=req.xid, code=ofp.OFPBRC_IS_SLAVE))
 
     def handle_get_async_request(self, req):
-        raise NotImplementedError()
+        masks = self.async_masks
+        self.cxn.send(ofp.message.async_get_reply(
+            xid=req.xid,
+            packet_in_mask_equal_master=masks[ofp.OFPT_PACKET_IN][0],
+            packet_in_mask_slave=masks[ofp.OFPT_PACKET_IN][1],
+            port_status_mask_equal_master=masks[ofp.OFPT_PORT_STATUS][0],
+            port_status_mask_slave=masks[ofp.OFPT_PORT_STATUS][1],
+            flow_removed_mask_equal_master=masks[ofp.OFPT_FLOW_REMOVED][0],
+            flow_removed_mask_slave=masks[ofp.OFPT_FLOW_REMOVED][1]))
 
     def handle_get_config_request(self, req):
         self.cxn.send(ofp.message.get_config_reply(
@@ -137,12 +242,12 @@ class OpenFlowProtocolHandler(object):
             miss_send_len=ofp.OFPCML_NO_BUFFER
         ))
 
-    @inlineCallbacks
     def handle_group_mod_request(self, req):
         if self.role == ofp.OFPCR_ROLE_MASTER or self.role == ofp.OFPCR_ROLE_EQUAL:
-           yield self.rpc.update_group_table(self.device_id, to_grpc(req))
+           self.submit_operation(req)
         elif self.role == ofp.OFPCR_ROLE_SLAVE:
-           self.cxn.send(ofp.message.bad_request_error_msg(code=ofp.OFPBRC_IS_SLAVE))
+           self.cxn.send(ofp.message.bad_request_error_msg(
+               xid=req.xid, code=ofp.OFPBRC_IS_SLAVE))
 
 
     def handle_meter_mod_request(self, req):
@@ -188,7 +293,41 @@ class OpenFlowProtocolHandler(object):
         raise NotImplementedError()
 
     def handle_set_async_request(self, req):
-        raise NotImplementedError()
+        self.async_masks = {
+            ofp.OFPT_PACKET_IN: [req.packet_in_mask_equal_master,
+                                 req.packet_in_mask_slave],
+            ofp.OFPT_PORT_STATUS: [req.port_status_mask_equal_master,
+                                   req.port_status_mask_slave],
+            ofp.OFPT_FLOW_REMOVED: [req.flow_removed_mask_equal_master,
+                                    req.flow_removed_mask_slave],
+        }
+
+    def send_multipart_reply(self, reply_class, req, entries):
+        """
+        Send the entries of a multipart reply in as many messages as needed
+        to keep each of them within max_reply_size, all but the last one
+        flagged with OFPSF_REPLY_MORE
+        :param reply_class: loxi class of the reply messages
+        :param req: the multipart request replied to
+        :param entries: loxi reply body entries
+        """
+        # each entry is packed once, the replies are assembled from the
+        # packed entries
+        header_size = len(reply_class(xid=req.xid).pack())
+        msgs = []
+        batch, size = [], header_size
+        for entry in entries:
+            packed = entry.pack()
+            if batch and size + len(packed) > self.max_reply_size:
+                msgs.append(EncodedMessage(
+                    reply_class(flags=ofp.OFPSF_REPLY_MORE),
+                    xid=req.xid, tail=''.join(batch)))
+                batch, size = [], header_size
+            batch.append(packed)
+            size += len(packed)
+        msgs.append(EncodedMessage(
+            reply_class(), xid=req.xid, tail=''.join(batch)))
+        self.cxn.send_encoded(msgs)
 
     def handle_aggregate_request(self, req):
         raise NotImplementedError
@@ -206,30 +345,39 @@ class OpenFlowProtocolHandler(object):
     def handle_flow_stats_request(self, req):
         try:
             flow_stats = yield self.rpc.list_flows(self.device_id)
-            self.cxn.send(ofp.message.flow_stats_reply(
-                xid=req.xid, entries=[to_loxi(f) for f in flow_stats]))
+            self.send_multipart_reply(
+                ofp.message.flow_stats_reply, req,
+                [to_loxi(f) for f in flow_stats])
         except Exception, e:
             log.exception('failed-flow-stats-request', req=req)
 
     @inlineCallbacks
     def handle_group_stats_request(self, req):
         group_stats = yield self.rpc.list_groups(self.device_id)
-        self.cxn.send(ofp.message.group_stats_reply(
-            xid=req.xid, entries=[to_loxi(g.stats) for g  in group_stats]))
+        self.send_multipart_reply(
+            ofp.message.group_stats_reply, req,
+            [to_loxi(g.stats) for g in group_stats])
 
     @inlineCallbacks
     def handle_group_descriptor_request(self, req):
         group_stats = yield self.rpc.list_groups(self.device_id)
-        self.cxn.send(ofp.message.group_desc_stats_reply(
-            xid=req.xid, entries=[to_loxi(g.desc) for g  in group_stats]))
+        self.send_multipart_reply(
+            ofp.message.group_desc_stats_reply, req,
+            [to_loxi(g.desc) for g in group_stats])
 
     def handle_group_features_request(self, req):
         raise NotImplementedError()
 
+    @inlineCallbacks
     def handle_meter_stats_request(self, req):
-        meter_stats = []  # see https://jira.opencord.org/browse/CORD-825
-        self.cxn.send(ofp.message.meter_stats_reply(
-            xid=req.xid, entries=meter_stats))
+        try:
+            stats = yield self.rpc.get_logical_device_stats(self.device_id)
+            self.send_multipart_reply(
+                ofp.message.meter_stats_reply, req,
+                [to_loxi(m) for m in stats.meter_stats
+                 if req.meter_id in (ofp.OFPM_ALL, m.meter_id)])
+        except Exception, e:
+            log.exception('failed-meter-stats-request', req=req)
 
     def handle_meter_config_request(self, req):
         raise NotImplementedError()
@@ -237,27 +385,36 @@ class OpenFlowProtocolHandler(object):
     def handle_meter_features_request(self, req):
         self.cxn.send(ofp.message.bad_request_error_msg())
 
+    @inlineCallbacks
     def handle_port_stats_request(self, req):
-        port_stats = []  # see https://jira.opencord.org/browse/CORD-825
-        self.cxn.send(ofp.message.port_stats_reply(
-            xid=req.xid,entries=port_stats))
+        try:
+            stats = yield self.rpc.get_logical_device_stats(self.device_id)
+            self.send_multipart_reply(
+                ofp.message.port_stats_reply, req,
+                [to_loxi(p) for p in stats.port_stats
+                 if req.port_no in (ofp.OFPP_ANY, p.port_no)])
+        except Exception, e:
+            log.exception('failed-port-stats-request', req=req)
 
     @inlineCallbacks
     def handle_port_desc_request(self, req):
         port_list = yield self.rpc.get_port_list(self.device_id)
-        self.cxn.send(ofp.message.port_desc_stats_reply(
-            xid=req.xid,
-            #flags=None,
-            entries=[to_loxi(port.ofp_port) for port in port_list]
-        ))
+        self.send_multipart_reply(
+            ofp.message.port_desc_stats_reply, req,
+            [to_loxi(port.ofp_port) for port in port_list])
 
     def handle_queue_stats_request(self, req):
         raise NotImplementedError()
 
+    @inlineCallbacks
     def handle_table_stats_request(self, req):
-        table_stats = []  # see https://jira.opencord.org/browse/CORD-825
-        self.cxn.send(ofp.message.table_stats_reply(
-            xid=req.xid, entries=table_stats))
+        try:
+            stats = yield self.rpc.get_logical_device_stats(self.device_id)
+            self.send_multipart_reply(
+                ofp.message.table_stats_reply, req,
+                [to_loxi(t) for t in stats.table_stats])
+        except Exception, e:
+            log.exception('failed-table-stats-request', req=req)
 
     def handle_table_features_request(self, req):
         raise NotImplementedError()
@@ -300,10 +457,21 @@ class OpenFlowProtocolHandler(object):
         ofp.OFPT_TABLE_MOD: handle_table_mod_request,
     }
 
-    def forward_packet_in(self, ofp_packet_in):
+    def send_async(self, encoded_msgs):
+        """
+        Send those of the asynchronous messages that the controller is to
+        receive, given its role and async config
+        :param encoded_msgs: list of EncodedMessage, shared by all the
+        connections of the logical device
+        :return: None
+        """
+        if not self.cxn.connected:
+            return
         if self.role == ofp.OFPCR_ROLE_MASTER or self.role == ofp.OFPCR_ROLE_EQUAL:
-           log.info('sending-packet-in', ofp_packet_in=ofp_packet_in)
-           self.cxn.send(to_loxi(ofp_packet_in))
-
-    def forward_port_status(self, ofp_port_status):
-        self.cxn.send(to_loxi(ofp_port_status))
+            i = 0
+        else:
+            i = 1  # as packet-ins were only ever sent to master and equal
+        masks = self.async_masks
+        msgs = [m for m in encoded_msgs if masks[m.type][i] & (1 << m.reason)]
+        if msgs:
+            self.cxn.send_encoded(msgs)
@@ -0,0 +1,81 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Cache of the logical device statistics fetched from vcore, shared by all
+controller connections of the agent
+"""
+from structlog import get_logger
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+
+log = get_logger()
+
+
+class StatsCache(object):
+
+    def __init__(self, fetch, max_age=5, clock=reactor):
+        """
+        Statistics younger than max_age are served from the cache, and all
+        requests made while the statistics of a device are being fetched
+        wait for that single fetch, so that controllers polling at any rate
+        cause at most one core RPC per device every max_age seconds.
+        :param fetch: callable returning (a Deferred firing with) the
+        LogicalDeviceStats of a logical device, given its id
+        :param max_age: seconds for which fetched statistics are served
+        :param clock: IReactorTime provider
+        """
+        self.fetch = fetch
+        self.max_age = max_age
+        self.clock = clock
+        self.entries = {}  # device_id -> (fetch time, stats)
+        self.pending = {}  # device_id -> [Deferred] waiting for the fetch
+
+    def get(self, device_id):
+        """
+        :return: Deferred firing with the LogicalDeviceStats of the device
+        """
+        entry = self.entries.get(device_id)
+        if entry is not None and \
+                self.clock.seconds() - entry[0] < self.max_age:
+            return succeed(entry[1])
+
+        d = Deferred()
+        waiters = self.pending.get(device_id)
+        if waiters is not None:
+            waiters.append(d)
+            return d
+
+        self.pending[device_id] = [d]
+        fetched_at = self.clock.seconds()
+        maybeDeferred(self.fetch, device_id).addCallbacks(
+            self._fetched, self._failed,
+            callbackArgs=(device_id, fetched_at), errbackArgs=(device_id,))
+        return d
+
+    def remove(self, device_id):
+        self.entries.pop(device_id, None)
+
+    def _fetched(self, stats, device_id, fetched_at):
+        self.entries[device_id] = (fetched_at, stats)
+        for d in self.pending.pop(device_id):
+            d.callback(stats)
+
+    def _failed(self, failure, device_id):
+        log.error('failed-to-fetch-stats', device_id=device_id,
+                  failure=failure)
+        for d in self.pending.pop(device_id):
+            d.errback(failure)
@@ -13,7 +13,6 @@ As all GitHib gists, it is covered by the MIT license.
 
 from optparse import OptionParser
 
-import simplejson
 import structlog
 from kafka import KafkaConsumer
 import pickle
@@ -26,7 +25,12 @@ from kafka.consumer.fetcher import ConsumerRecord
 from kafka.errors import KafkaError
 
 from common.utils.consulhelpers import get_endpoint_from_consul
+from common.utils.event_codec import decode
+from voltha.protos import third_party
+from voltha.protos import events_pb2
 
+# register the event types decode() may meet
+_ = third_party, events_pb2
 
 log = structlog.get_logger()
 
@@ -205,7 +209,7 @@ if __name__ == "__main__":
         msg = record.value
 
         try:
-            batch = _convert(simplejson.loads(msg))
+            batch = _convert(decode(msg))
         except Exception, e:
             log.warn('unknown-format', msg=msg)
             continue
@@ -467,7 +467,7 @@ class DispatcherTest(RestBase):
             self.pt('deleting device {}.  Error:{}'.format(device_id, e))
 
     def _get_devices_grpc(self, stub):
-        res = stub.ListDevices(Empty())
+        res = stub.ListDevices(voltha_pb2.ListRequest())
         return res.items
 
     def _get_adapters_grpc(self, stub):
@@ -756,7 +756,7 @@ class DispatcherTest(RestBase):
         device, and the vlan associated with the latter.
         """
         ports = stub.ListLogicalDevicePorts(
-            voltha_pb2.ID(id=logical_device_id)).items
+            voltha_pb2.ListRequest(id=logical_device_id)).items
         nni = None
         unis = []
         for port in ports:
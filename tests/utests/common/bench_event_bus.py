@@ -0,0 +1,76 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Microbenchmark of the topic routing of the EventBus.
+
+Subscribes a packet-out topic per logical device and a few regexp based
+subscriptions, as a loaded voltha core does, then reports the per-message
+cost of publishing to those topics, and of publishing right after each
+change of the subscriptions.
+
+    python tests/utests/common/bench_event_bus.py [-s 500] [-n 100000]
+"""
+import re
+from argparse import ArgumentParser
+from time import time
+
+from common.event_bus import EventBus
+
+
+def setup(bus, count):
+    received = [0]
+
+    def callback(topic, msg):
+        received[0] += 1
+
+    for i in xrange(count):
+        bus.subscribe('packet-out:{}'.format(i), callback)
+    for pattern in (r'kpis', r'alarms\..*', r'model-change-events',
+                    r'packet-in:.*'):
+        bus.subscribe(re.compile(pattern), callback)
+    return received
+
+
+def publish(bus, topics, count, churn=False):
+    t0 = time()
+    for i in xrange(count):
+        if churn:
+            bus.unsubscribe(bus.subscribe('churn', None))
+        bus.publish(topics[i % len(topics)], i)
+    return time() - t0
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-s', '--subscriptions', type=int, default=500,
+                        help='number of explicit topic subscriptions')
+    parser.add_argument('-n', '--count', type=int, default=100000,
+                        help='number of messages published')
+    args = parser.parse_args()
+
+    topics = ['packet-out:{}'.format(i) for i in xrange(args.subscriptions)]
+    for kind, churn in (('steady', False), ('churn', True)):
+        bus = EventBus()
+        received = setup(bus, args.subscriptions)
+        elapsed = publish(bus, topics, args.count, churn)
+        print '{:<6}: {} msgs, {} delivered in {:.3f} s, {:.2f} us/msg'.format(
+            kind, args.count, received[0], elapsed,
+            elapsed / args.count * 1e6)
+
+
+if __name__ == '__main__':
+    main()
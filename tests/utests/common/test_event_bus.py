@@ -14,13 +14,36 @@
 # limitations under the License.
 #
 import re
+from threading import Thread
 
 from mock import Mock
 from mock import call
 from twisted.internet.defer import DeferredQueue, inlineCallbacks
+from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
-from common.event_bus import EventBusClient, EventBus
+from common.event_bus import EventBusClient, EventBus, DROP_NEWEST, \
+    DROP_OLDEST, BLOCK
+
+
+class FakeReactor(Clock):
+    """
+    Clock also queueing the calls from threads, run by run()
+    """
+
+    def __init__(self):
+        Clock.__init__(self)
+        self.thread_calls = []
+
+    def callFromThread(self, f, *args):
+        self.thread_calls.append((f, args))
+
+    def run(self):
+        while self.thread_calls or self.getDelayedCalls():
+            calls, self.thread_calls = self.thread_calls, []
+            for f, args in calls:
+                f(*args)
+            self.advance(0)
 
 
 class TestEventBus(TestCase):
@@ -195,3 +218,174 @@ class TestEventBus(TestCase):
             msg = yield queue.get()
             self.assertEqual(msg, i)
         self.assertEqual(len(queue.pending), 0)
+
+    def test_wildcard_and_explicit_topic(self):
+
+        ebc = EventBusClient(EventBus())
+
+        explicit_sub = Mock()
+        ebc.subscribe('news', explicit_sub)
+
+        wildcard_sub = Mock()
+        ebc.subscribe(re.compile(r'n.*'), wildcard_sub)
+
+        for i in xrange(3):
+            ebc.publish('news', i)
+
+        self.assertEqual(explicit_sub.call_count, 3)
+        self.assertEqual(wildcard_sub.call_count, 3)
+        self.assertEqual(len(ebc.list_subscribers('news')), 1)
+
+    def test_routes_follow_subscriptions(self):
+
+        ebc = EventBusClient(EventBus())
+
+        ebc.publish('news', 1)  # routed to no one, and cached so
+
+        news_sub = Mock()
+        sub1 = ebc.subscribe('news', news_sub)
+        ebc.publish('news', 2)
+
+        wildcard_sub = Mock()
+        sub2 = ebc.subscribe(re.compile(r'.*'), wildcard_sub)
+        ebc.publish('news', 3)
+
+        ebc.unsubscribe(sub1)
+        ebc.publish('news', 4)
+
+        ebc.unsubscribe(sub2)
+        ebc.publish('news', 5)
+
+        self.assertEqual(news_sub.call_args_list,
+                         [call('news', 2), call('news', 3)])
+        self.assertEqual(wildcard_sub.call_args_list,
+                         [call('news', 3), call('news', 4)])
+
+    def test_unsubscribe_from_callback(self):
+
+        ebc = EventBusClient(EventBus())
+        subs = []
+
+        def once(topic, msg):
+            ebc.unsubscribe(subs[0])
+
+        subs.append(ebc.subscribe('news', once))
+        other_sub = Mock()
+        ebc.subscribe('news', other_sub)
+
+        ebc.publish('news', 1)
+        ebc.publish('news', 2)
+
+        self.assertEqual(other_sub.call_count, 2)
+        self.assertEqual(len(ebc.list_subscribers('news')), 1)
+
+
+class TestAsynchronousSubscriptions(TestCase):
+
+    def setUp(self):
+        self.reactor = FakeReactor()
+        self.ebc = EventBusClient(EventBus(self.reactor))
+
+    def test_delivered_on_reactor(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, queue_size=10)
+        sync_mock = Mock()
+        self.ebc.subscribe('news', sync_mock)
+
+        self.ebc.publish('news', 1)
+        self.ebc.publish('news', 2)
+        self.assertEqual(sync_mock.call_count, 2)
+        mock.assert_not_called()
+        self.assertEqual(len(self.reactor.thread_calls), 1)
+
+        self.reactor.run()
+        self.assertEqual(mock.call_args_list,
+                         [call('news', 1), call('news', 2)])
+
+    def test_predicate_applies_before_queueing(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, lambda msg: msg % 2,
+                           queue_size=1, overflow=DROP_NEWEST)
+        for i in xrange(4):
+            self.ebc.publish('news', i)
+        self.reactor.run()
+        self.assertEqual(mock.call_args_list, [call('news', 1)])
+
+    def test_drop_newest(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, queue_size=2, overflow=DROP_NEWEST)
+        for i in xrange(5):
+            self.ebc.publish('news', i)
+        self.reactor.run()
+        self.assertEqual(mock.call_args_list,
+                         [call('news', 0), call('news', 1)])
+
+    def test_drop_oldest(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, queue_size=2, overflow=DROP_OLDEST)
+        for i in xrange(5):
+            self.ebc.publish('news', i)
+        self.reactor.run()
+        self.assertEqual(mock.call_args_list,
+                         [call('news', 3), call('news', 4)])
+
+    def test_block(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, queue_size=2, overflow=BLOCK)
+
+        def publish():
+            for i in xrange(5):
+                self.ebc.publish('news', i)
+
+        publisher = Thread(target=publish)
+        publisher.start()
+        while publisher.is_alive():
+            self.reactor.run()
+            publisher.join(0.01)
+        self.reactor.run()
+        self.assertEqual(mock.call_args_list,
+                         [call('news', i) for i in xrange(5)])
+
+    def test_failing_callback(self):
+        mock = Mock(side_effect=ValueError)
+        self.ebc.subscribe('news', mock, queue_size=2)
+        self.ebc.publish('news', 1)
+        self.ebc.publish('news', 2)
+        self.reactor.run()
+        self.assertEqual(mock.call_count, 2)
+
+    def test_unsubscribe_drops_queued(self):
+        mock = Mock()
+        sub = self.ebc.subscribe('news', mock, queue_size=2)
+        self.ebc.publish('news', 1)
+        self.ebc.unsubscribe(sub)
+        self.ebc.publish('news', 2)
+        self.reactor.run()
+        mock.assert_not_called()
+
+    def test_metrics(self):
+        mock = Mock()
+        self.ebc.subscribe('news', mock, queue_size=2, overflow=DROP_NEWEST)
+        self.ebc.subscribe(re.compile('n.*'), mock, queue_size=2,
+                           name='all-n')
+        self.ebc.subscribe('news', mock)
+
+        for i in xrange(3):
+            self.ebc.publish('news', i)
+        self.reactor.advance(1.5)
+        self.assertEqual(self.ebc.get_metrics(), {
+            'event-bus-news-queued': 2,
+            'event-bus-news-lag': 1.5,
+            'event-bus-news-delivered': 0,
+            'event-bus-news-dropped': 1,
+            'event-bus-all-n-queued': 2,
+            'event-bus-all-n-lag': 1.5,
+            'event-bus-all-n-delivered': 0,
+            'event-bus-all-n-dropped': 1,
+        })
+
+        self.reactor.run()
+        metrics = self.ebc.get_metrics()
+        self.assertEqual(metrics['event-bus-news-queued'], 0)
+        self.assertEqual(metrics['event-bus-news-lag'], 0)
+        self.assertEqual(metrics['event-bus-news-delivered'], 2)
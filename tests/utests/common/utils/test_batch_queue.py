@@ -0,0 +1,61 @@
+from Queue import Empty
+from threading import Thread
+from unittest import TestCase, main
+
+from common.utils.batch_queue import BatchQueue
+
+
+class TestBatchQueue(TestCase):
+
+    def test_get_batch(self):
+        queue = BatchQueue()
+        for i in range(5):
+            queue.put(i)
+        self.assertEqual(queue.get_batch(3), [0, 1, 2])
+        self.assertEqual(queue.get_batch(), [3, 4])
+        self.assertEqual(queue.get_batch(timeout=0.01), [])
+        self.assertEqual((queue.enqueued, queue.dequeued), (5, 5))
+
+    def test_get(self):
+        queue = BatchQueue()
+        queue.put('a')
+        self.assertEqual(queue.get(timeout=0.01), 'a')
+        self.assertRaises(Empty, queue.get, timeout=0.01)
+
+    def test_get_batch_waits_for_put(self):
+        queue = BatchQueue()
+        producer = Thread(target=lambda: [queue.put(i) for i in range(3)])
+        producer.start()
+        batch = queue.get_batch(timeout=5)
+        producer.join()
+        batch += queue.get_batch(timeout=0.01)
+        self.assertEqual(batch, [0, 1, 2])
+
+    def test_drop_newest(self):
+        queue = BatchQueue(maxsize=2)
+        self.assertEqual([queue.put(i) for i in range(4)],
+                         [True, True, False, False])
+        self.assertEqual(queue.get_batch(), [0, 1])
+        self.assertEqual(queue.get_metrics('q'), {
+            'q-queued': 0, 'q-enqueued': 2, 'q-dequeued': 2, 'q-dropped': 2})
+
+    def test_drop_oldest(self):
+        queue = BatchQueue(maxsize=2, drop_oldest=True)
+        for i in range(4):
+            queue.put(i)
+        self.assertEqual(queue.get_batch(), [2, 3])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_close(self):
+        queue = BatchQueue()
+        queue.put(1)
+        closer = Thread(target=queue.close)
+        self.assertEqual(queue.get_batch(), [1])
+        closer.start()
+        self.assertEqual(queue.get_batch(), [])
+        closer.join()
+        self.assertFalse(queue.put(2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+from unittest import TestCase, main
+
+from google.protobuf.json_format import MessageToDict
+from simplejson import loads
+
+from common.utils.event_codec import encode_json, encode_protobuf, \
+    decode, decode_message, message_to_dict
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import Device, Port
+from voltha.protos.events_pb2 import KpiEvent, KpiEventType, \
+    MetricValuePairs, AlarmEvent, AlarmEventState
+from voltha.protos.openflow_13_pb2 import ofp_packet_in, ofp_match, \
+    ofp_oxm_field
+
+_ = third_party
+
+
+def kpi_event():
+    return KpiEvent(
+        type=KpiEventType.slice,
+        ts=1500000000.0,
+        prefixes={
+            'voltha.ponsim_olt.abc.pon': MetricValuePairs(
+                metrics={'tx_pkts': 12.5, 'rx_pkts': float('inf')}),
+            'voltha.ponsim_olt.abc.nni': MetricValuePairs(),
+        })
+
+
+class TestEventCodec(TestCase):
+
+    def messages(self):
+        return [
+            kpi_event(),
+            KpiEvent(),
+            AlarmEvent(id='a', state=AlarmEventState.RAISED,
+                       context={'port': '1'}, raised_ts=0.25),
+            Device(id='d', type='ponsim_olt', vlan=12,
+                   ipv4_address='10.0.0.1', custom=None),
+            Device(id='e', mac_address='00:00:00:00:00:01'),
+            Port(port_no=1, label='pon', peers=[Port.PeerPort(
+                device_id='d', port_no=2)]),
+            ofp_packet_in(buffer_id=3, cookie=(1 << 63) + 5, data='\x00\xff',
+                          match=ofp_match(oxm_fields=[ofp_oxm_field()])),
+        ]
+
+    def test_message_to_dict(self):
+        for msg in self.messages():
+            self.assertEqual(message_to_dict(msg),
+                             MessageToDict(msg, True, True))
+
+    def test_json(self):
+        for msg in self.messages():
+            value = encode_json(msg)
+            self.assertEqual(loads(value), MessageToDict(msg, True, True))
+            self.assertEqual(decode(value), MessageToDict(msg, True, True))
+
+    def test_protobuf(self):
+        for msg in self.messages():
+            value = encode_protobuf(msg)
+            self.assertEqual(decode_message(value), msg)
+            self.assertEqual(decode(value), MessageToDict(msg, True, True))
+
+    def test_unknown_enum_value(self):
+        msg = KpiEvent()
+        msg.ParseFromString('\x08\x07')  # type = 7
+        self.assertEqual(message_to_dict(msg)['type'], 7)
+
+
+if __name__ == '__main__':
+    main()
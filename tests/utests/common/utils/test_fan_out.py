@@ -0,0 +1,54 @@
+from unittest import TestCase, main
+
+from common.utils.fan_out import FanOut
+
+
+class TestFanOut(TestCase):
+
+    def test_all_subscribers_get_all_items(self):
+        fan_out = FanOut()
+        queues = [fan_out.subscribe(), fan_out.subscribe()]
+        for i in range(3):
+            fan_out.publish(i)
+        self.assertEqual([q.get_batch() for q in queues],
+                         [[0, 1, 2], [0, 1, 2]])
+
+    def test_backlog_for_first_subscriber(self):
+        fan_out = FanOut(maxsize=2)
+        for i in range(3):
+            fan_out.publish(i)
+        first, second = fan_out.subscribe(), fan_out.subscribe()
+        self.assertEqual(first.get_batch(), [0, 1])
+        self.assertEqual(second.get_batch(timeout=0.01), [])
+
+        fan_out.unsubscribe(first)
+        fan_out.unsubscribe(second)
+        fan_out.publish(3)
+        self.assertEqual(fan_out.subscribe().get_batch(), [3])
+
+    def test_slow_subscriber_overflows_alone(self):
+        fan_out = FanOut(maxsize=2)
+        slow, fast = fan_out.subscribe(), fan_out.subscribe()
+        batches = []
+        for i in range(4):
+            fan_out.publish(i)
+            batches += fast.get_batch()
+        self.assertEqual(batches, [0, 1, 2, 3])
+        self.assertEqual(slow.get_batch(), [0, 1])
+        fan_out.unsubscribe(slow)
+        self.assertEqual(fan_out.get_metrics('q'), {
+            'q-subscribers': 1, 'q-published': 4, 'q-queued': 0,
+            'q-dropped': 2})
+
+    def test_close_subscriptions(self):
+        fan_out = FanOut()
+        queue = fan_out.subscribe()
+        fan_out.publish(1)
+        fan_out.close_subscriptions()
+        fan_out.publish(2)
+        self.assertEqual(queue.get_batch(), [1])
+        self.assertEqual(queue.get_batch(), [])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+from unittest import TestCase, main
+
+from twisted.internet.defer import TimeoutError
+from twisted.internet.task import Clock
+
+from common.utils.message_queue import MessageQueue
+
+
+class Msg(object):
+    def __init__(self, xid):
+        self.xid = xid
+
+
+class Reply(Msg):
+    pass
+
+
+class TestMessageQueue(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.queue = MessageQueue(clock=self.clock)
+        self.queue.add_index('xid', lambda msg: (msg.xid,))
+        self.queue.add_index('class', lambda msg: type(msg).__mro__)
+
+    def result(self, d):
+        results = []
+        d.addBoth(results.append)
+        return results[0] if results else None
+
+    def test_get_by_queued(self):
+        msgs = [Msg(1), Reply(2), Msg(2)]
+        for msg in msgs:
+            self.queue.put(msg)
+        self.assertIs(self.result(self.queue.get_by('xid', 2)), msgs[1])
+        self.assertIs(self.result(self.queue.get_by('class', Msg)), msgs[0])
+        self.assertIs(self.result(self.queue.get()), msgs[2])
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(self.queue.queued_by_key,
+                         {'xid': {}, 'class': {}})
+
+    def test_waiters_served_in_order(self):
+        d1 = self.queue.get(lambda msg: msg.xid > 1)
+        d2 = self.queue.get_by('xid', 3)
+        d3 = self.queue.get_by('class', Reply)
+        msg = Reply(3)
+        self.queue.put(msg)
+        self.assertIs(self.result(d1), msg)
+        self.queue.put(msg)
+        self.assertIs(self.result(d2), msg)
+        self.queue.put(msg)
+        self.assertIs(self.result(d3), msg)
+        self.assertEqual(self.queue.waiting_by_key,
+                         {'xid': {}, 'class': {}})
+
+    def test_unmatched_put_is_queued(self):
+        d = self.queue.get_by('xid', 1)
+        self.queue.put(Msg(2))
+        self.assertIsNone(self.result(d))
+        self.assertEqual(len(self.queue), 1)
+
+    def test_cancel_and_timeout(self):
+        d1 = self.queue.get_by('xid', 1)
+        d1.addErrback(lambda _: None)
+        d1.cancel()
+        d2 = self.queue.get_by('xid', 1, timeout=5)
+        self.clock.advance(5)
+        self.assertTrue(self.result(d2).check(TimeoutError))
+        self.assertEqual(self.queue.waiting_by_key['xid'], {})
+
+        d3 = self.queue.get(timeout=5)
+        msg = Msg(1)
+        self.queue.put(msg)
+        self.assertIs(self.result(d3), msg)
+        self.assertFalse(self.clock.getDelayedCalls())
+
+    def test_maxsize_drops_oldest(self):
+        queue = MessageQueue(maxsize=2)
+        queue.add_index('xid', lambda msg: (msg.xid,))
+        for i in range(3):
+            queue.put(Msg(i))
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.queued_by_key['xid'].keys(), [1, 2])
+        self.assertEqual(self.result(queue.get()).xid, 1)
+
+    def test_reset(self):
+        d = self.queue.get_by('xid', 1)
+        self.queue.put(Msg(2))
+        self.queue.reset()
+        self.assertTrue(self.result(d).check(Exception))
+        self.assertEqual(len(self.queue), 0)
+
+
+if __name__ == '__main__':
+    main()
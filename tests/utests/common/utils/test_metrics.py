@@ -0,0 +1,95 @@
+from threading import Thread
+from unittest import TestCase, main
+
+from twisted.internet.defer import Deferred
+
+from common.utils.metrics import MetricsRegistry, Counter
+
+
+class TestMetricsRegistry(TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        c = self.registry.counter('frames')
+        self.assertIs(self.registry.counter('frames'), c)
+
+        def count():
+            for _ in xrange(1000):
+                c.inc()
+
+        threads = [Thread(target=count) for _ in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        c.inc(5)
+        self.assertEqual(self.registry.collect(), {'frames': 4005})
+
+    def test_gauge(self):
+        g = self.registry.gauge('depth')
+        g.set(3)
+        self.assertEqual(self.registry.collect(), {'depth': 3})
+        items = [1, 2]
+        self.registry.gauge('depth', lambda: len(items))
+        self.assertEqual(self.registry.collect(), {'depth': 2})
+
+    def test_histogram(self):
+        h = self.registry.histogram('latency', buckets=(1, 2, 5, 10))
+        for value in [0.5] * 50 + [1.5] * 40 + [4] * 9 + [7]:
+            h.observe(value)
+        self.assertEqual(self.registry.collect(), {
+            'latency-count': 100,
+            'latency-sum': 25 + 60 + 36 + 7,
+            'latency-max': 7,
+            'latency-p50': 1,
+            'latency-p90': 2,
+            'latency-p99': 5,
+        })
+
+        # percentiles are over the values observed since the last collection
+        h.observe(20)
+        metrics = self.registry.collect()
+        self.assertEqual(metrics['latency-count'], 101)
+        self.assertEqual(metrics['latency-p50'], 20)
+        self.assertEqual(metrics['latency-max'], 20)
+
+        metrics = self.registry.collect()
+        self.assertEqual(metrics['latency-p99'], 0)
+        self.assertEqual(metrics['latency-max'], 0)
+
+    def test_timer(self):
+        h = self.registry.histogram('latency')
+        with h.time():
+            pass
+        self.assertEqual(h.count, 1)
+        self.assertLess(h.sum, 0.5)
+
+    def test_timed(self):
+        h = self.registry.histogram('latency')
+
+        @h.timed
+        def f(result):
+            return result
+
+        self.assertEqual(f(1), 1)
+        self.assertEqual(h.count, 1)
+        d = Deferred()
+        self.assertIs(f(d), d)
+        self.assertEqual(h.count, 1)
+        d.callback(None)
+        self.assertEqual(h.count, 2)
+        self.assertRaises(TypeError, f)
+        self.assertEqual(h.count, 3)
+
+    def test_names_are_unique(self):
+        self.registry.counter('x')
+        self.assertRaises(ValueError, self.registry.histogram, 'x')
+        self.registry.unregister('x')
+        self.registry.histogram('x')
+        self.assertNotIsInstance(self.registry.metrics['x'], Counter)
+
+
+if __name__ == '__main__':
+    main()
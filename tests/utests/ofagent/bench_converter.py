@@ -0,0 +1,122 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Microbenchmark of the protobuf to loxi conversions of ofagent.
+
+Converts a synthesized logical device flow table, port list and packet-in
+burst to loxi objects and reports the per-message cost.
+
+Run with the ofagent directory on the python path:
+
+    python tests/utests/ofagent/bench_converter.py [-n 10000]
+"""
+from argparse import ArgumentParser
+from time import time
+
+from voltha.protos import third_party
+from converter import to_loxi
+from protos import openflow_13_pb2 as ofp
+
+_ = third_party
+
+
+def oxm(**kw):
+    return ofp.ofp_oxm_field(
+        oxm_class=ofp.OFPXMC_OPENFLOW_BASIC,
+        ofb_field=ofp.ofp_oxm_ofb_field(**kw))
+
+
+def synthesize_flows(count):
+    return [
+        ofp.ofp_flow_stats(
+            id=i + 1,
+            cookie=i,
+            priority=1000,
+            packet_count=i * 10,
+            byte_count=i * 640,
+            match=ofp.ofp_match(type=ofp.OFPMT_OXM, oxm_fields=[
+                oxm(type=ofp.OFPXMT_OFB_IN_PORT, port=i % 64 + 1),
+                oxm(type=ofp.OFPXMT_OFB_VLAN_VID,
+                    vlan_vid=0x1000 | (i % 4000)),
+                oxm(type=ofp.OFPXMT_OFB_ETH_TYPE, eth_type=0x800),
+                oxm(type=ofp.OFPXMT_OFB_IP_PROTO, ip_proto=17),
+                oxm(type=ofp.OFPXMT_OFB_UDP_DST, udp_dst=67)]),
+            instructions=[ofp.ofp_instruction(
+                type=ofp.OFPIT_APPLY_ACTIONS,
+                actions=ofp.ofp_instruction_actions(actions=[
+                    ofp.ofp_action(type=ofp.OFPAT_PUSH_VLAN,
+                                   push=ofp.ofp_action_push(
+                                       ethertype=0x8100)),
+                    ofp.ofp_action(type=ofp.OFPAT_SET_FIELD,
+                                   set_field=ofp.ofp_action_set_field(
+                                       field=oxm(
+                                           type=ofp.OFPXMT_OFB_VLAN_VID,
+                                           vlan_vid=0x1000 | 4000))),
+                    ofp.ofp_action(type=ofp.OFPAT_OUTPUT,
+                                   output=ofp.ofp_action_output(
+                                       port=ofp.OFPP_CONTROLLER))]))])
+        for i in xrange(count)]
+
+
+def synthesize_ports(count):
+    return [
+        ofp.ofp_port(
+            port_no=i,
+            hw_addr=[0, 0, 0, 0, i >> 8 & 0xff, i & 0xff],
+            name='uni-{}'.format(i),
+            config=0,
+            state=ofp.OFPPS_LIVE,
+            curr=ofp.OFPPF_1GB_FD | ofp.OFPPF_FIBER,
+            advertised=ofp.OFPPF_1GB_FD | ofp.OFPPF_FIBER,
+            curr_speed=ofp.OFPPF_1GB_FD,
+            max_speed=ofp.OFPPF_1GB_FD)
+        for i in xrange(count)]
+
+
+def synthesize_packets_in(count):
+    return [
+        ofp.ofp_packet_in(
+            reason=ofp.OFPR_ACTION,
+            match=ofp.ofp_match(type=ofp.OFPMT_OXM, oxm_fields=[
+                oxm(type=ofp.OFPXMT_OFB_IN_PORT, port=i % 64 + 1)]),
+            data='\x00\x01' * 64)
+        for i in xrange(count)]
+
+
+def convert(pbs):
+    t0 = time()
+    for pb in pbs:
+        to_loxi(pb)
+    return time() - t0
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--count', type=int, default=10000,
+                        help='number of messages of each kind')
+    args = parser.parse_args()
+
+    for kind, pbs in (('flow stats', synthesize_flows(args.count)),
+                      ('ports', synthesize_ports(args.count)),
+                      ('packets in', synthesize_packets_in(args.count))):
+        elapsed = convert(pbs)
+        print '{:<11}: {} msgs in {:.3f} s, {:.1f} us/msg'.format(
+            kind, len(pbs), elapsed, elapsed / len(pbs) * 1e6)
+
+
+if __name__ == '__main__':
+    main()
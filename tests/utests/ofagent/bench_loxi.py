@@ -0,0 +1,89 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Microbenchmark of the loxi OpenFlow 1.3 encoder and parser.
+
+Packs and parses the messages of the loxi test vectors, as well as a flow
+stats reply of a large flow table, and reports the throughput.
+
+Run with the ofagent directory on the python path:
+
+    python tests/utests/ofagent/bench_loxi.py [-n 20000] [-f 400]
+"""
+from argparse import ArgumentParser
+from time import time
+
+import loxi.of13 as ofp
+from test_loxi_ofp13_util import gen_test_vectors
+
+
+def flow_stats_reply(count):
+    return ofp.message.flow_stats_reply(xid=1, entries=[
+        ofp.flow_stats_entry(
+            cookie=i,
+            priority=1000,
+            packet_count=i * 10,
+            byte_count=i * 640,
+            match=ofp.match([
+                ofp.oxm.in_port(i % 64 + 1),
+                ofp.oxm.vlan_vid(0x1000 | (i % 4000)),
+                ofp.oxm.eth_type(0x800),
+                ofp.oxm.ip_proto(17),
+                ofp.oxm.udp_dst(67)]),
+            instructions=[ofp.instruction.apply_actions([
+                ofp.action.push_vlan(ethertype=0x8100),
+                ofp.action.set_field(ofp.oxm.vlan_vid(0x1000 | 4000)),
+                ofp.action.output(port=ofp.OFPP_CONTROLLER)])])
+        for i in xrange(count)])
+
+
+def run(msg, count):
+    t0 = time()
+    for _ in xrange(count):
+        packed = msg.pack()
+    t1 = time()
+    for _ in xrange(count):
+        ofp.message.parse_message(packed)
+    t2 = time()
+    return t1 - t0, t2 - t1
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='number of times each test vector is run')
+    parser.add_argument('-f', '--flows', type=int, default=400,
+                        help='number of entries in the flow stats reply '
+                             '(a reply is limited to 64KB)')
+    args = parser.parse_args()
+
+    for msg, _ in gen_test_vectors():
+        pack_time, parse_time = run(msg, args.count)
+        print '{:<18}: pack {:.0f} msgs/s, parse {:.0f} msgs/s'.format(
+            type(msg).__name__,
+            args.count / pack_time, args.count / parse_time)
+
+    msg = flow_stats_reply(args.flows)
+    pack_time, parse_time = run(msg, 10)
+    print '{} flow stats entries: pack {:.0f} entries/s, ' \
+          'parse {:.0f} entries/s'.format(
+              args.flows, 10 * args.flows / pack_time,
+              10 * args.flows / parse_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Microbenchmark of the OpenFlowConnection receive path.
+
+Replays a flow-mod stream, as delivered by TCP in chunks of a given size,
+into an OpenFlowConnection and reports the framing and parsing throughput.
+The stream is either read from a file holding a raw capture of the
+controller to agent byte stream (e.g., the TCP payload exported from a
+packet capture), or synthesized.
+
+Run with the ofagent directory on the python path:
+
+    python tests/utests/ofagent/bench_of_connection.py [-n 20000] [capture]
+"""
+from argparse import ArgumentParser
+from time import time
+
+from mock import Mock
+
+from loxi import of13
+from of_connection import OpenFlowConnection
+
+
+def synthesize_stream(count):
+    return ''.join(
+        of13.message.flow_add(
+            xid=i,
+            cookie=i,
+            priority=1000,
+            match=of13.match([
+                of13.oxm.in_port(i % 64 + 1),
+                of13.oxm.vlan_vid(0x1000 | (i % 4000)),
+                of13.oxm.eth_type(0x800),
+                of13.oxm.ip_proto(17),
+                of13.oxm.udp_dst(67)]),
+            instructions=[
+                of13.instruction.apply_actions([
+                    of13.action.push_vlan(ethertype=0x8100),
+                    of13.action.set_field(of13.oxm.vlan_vid(0x1000 | 4000)),
+                    of13.action.output(port=of13.OFPP_CONTROLLER)])
+            ]).pack()
+        for i in xrange(count))
+
+
+def replay(stream, chunk_size):
+    cxn = OpenFlowConnection(Mock())
+    t0 = time()
+    for offset in xrange(0, len(stream), chunk_size):
+        cxn.dataReceived(stream[offset:offset + chunk_size])
+    elapsed = time() - t0
+    assert not cxn.read_buffer
+    return len(cxn.rx.queue), elapsed
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('capture', nargs='?',
+                        help='file with a raw OpenFlow byte stream')
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='number of flow-mods to synthesize')
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, 'rb') as f:
+            stream = f.read()
+    else:
+        stream = synthesize_stream(args.count)
+
+    print '{} bytes'.format(len(stream))
+    for chunk_size in (1460, 16384, 65536, len(stream)):
+        count, elapsed = replay(stream, chunk_size)
+        print 'chunk {:>9} bytes: {} msgs in {:.3f} s, {:.0f} msgs/s'.format(
+            chunk_size, count, elapsed, count / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,11 @@ _ = third_party
 
 class TestConverter(TestCase):
 
+    def assertLoxiEqual(self, a, b):
+        # by show(), as to_loxi returns objects of ofagent.loxi classes
+        self.assertEqual(type(a).__name__, type(b).__name__)
+        self.assertEqual(a.show(), b.show())
+
     def gen_pb_flow_stats(self):
 
         # device level flows
@@ -223,6 +228,44 @@ class TestConverter(TestCase):
         for group_stat in group_stats:
             loxi_group_desc = to_loxi(group_stat.desc)
 
+    def test_flow_stats_pb_to_loxi_fields(self):
+        flow_stat = mk_flow_stat(
+            priority=500,
+            match_fields=[in_port(1), vlan_vid(4096 + 128)],
+            actions=[push_vlan(0x8100), set_field(vlan_vid(4096 + 1000)),
+                     output(2)],
+            next_table_id=1)
+        flow_stat.packet_count = 10
+        self.assertLoxiEqual(to_loxi(flow_stat), of13.flow_stats_entry(
+            priority=500,
+            packet_count=10,
+            match=of13.match_v3(oxm_list=[
+                of13.oxm.in_port(1), of13.oxm.vlan_vid(4096 + 128)]),
+            instructions=[
+                of13.instruction.apply_actions(actions=[
+                    of13.action.push_vlan(ethertype=0x8100),
+                    of13.action.set_field(of13.oxm.vlan_vid(4096 + 1000)),
+                    of13.action.output(
+                        port=2, max_len=ofp.OFPCML_MAX)]),
+                of13.instruction.goto_table(table_id=1)]))
+
+    def test_port_and_packet_in_pb_to_loxi_conversion(self):
+        port = ofp.ofp_port(port_no=1, hw_addr=[0, 0, 0, 0, 0, 1],
+                            name=u'uni-1', state=ofp.OFPPS_LIVE)
+        self.assertLoxiEqual(to_loxi(port), of13.common.port_desc(
+            port_no=1, hw_addr=[0, 0, 0, 0, 0, 1], name='uni-1',
+            state=ofp.OFPPS_LIVE))
+        packet_in = ofp.ofp_packet_in(
+            reason=ofp.OFPR_ACTION,
+            match=ofp.ofp_match(type=ofp.OFPMT_OXM, oxm_fields=[
+                ofp.ofp_oxm_field(oxm_class=ofp.OFPXMC_OPENFLOW_BASIC,
+                                  ofb_field=in_port(1))]),
+            data='\x00\x01')
+        self.assertLoxiEqual(to_loxi(packet_in), of13.message.packet_in(
+            reason=ofp.OFPR_ACTION,
+            match=of13.match_v3(oxm_list=[of13.oxm.in_port(1)]),
+            data='\x00\x01'))
+
 
 if __name__ == '__main__':
     main()
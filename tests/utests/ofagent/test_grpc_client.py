@@ -0,0 +1,126 @@
+from unittest import TestCase, main
+
+from grpc import StatusCode
+from grpc._channel import _Rendezvous
+from mock import Mock, patch
+
+import grpc_client
+from grpc_client import GrpcClient
+
+
+class FakeRendezvous(_Rendezvous):
+
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return str(self._code)
+
+    def __del__(self):
+        pass
+
+
+class FakeReactor(object):
+    """
+    Runs the calls to threads right away, and keeps the delayed calls
+    """
+
+    def __init__(self):
+        self.delayed = []
+
+    def callInThread(self, f, *args):
+        f(*args)
+
+    def callFromThread(self, f, *args):
+        f(*args)
+
+    def callLater(self, delay, f, *args):
+        self.delayed.append((delay, f, args))
+
+    def run_delayed(self):
+        delay, f, args = self.delayed.pop(0)
+        f(*args)
+        return delay
+
+
+class TestStreams(TestCase):
+
+    def setUp(self):
+        self.reactor = FakeReactor()
+        patcher = patch.object(grpc_client, 'reactor', self.reactor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = GrpcClient(Mock(), Mock())
+
+    def test_restart_on_end_with_backoff(self):
+        runs = []
+
+        def stream():
+            runs.append(True)
+            if len(runs) % 2:
+                raise FakeRendezvous(StatusCode.UNAVAILABLE)
+
+        with patch.object(grpc_client.os, 'system') as system:
+            self.client._run_stream('test', stream, restart_on_end=True)
+            delays = [self.reactor.run_delayed() for _ in xrange(8)]
+        system.assert_not_called()
+        self.assertEqual(len(runs), 9)
+        self.assertEqual(delays, [0.5, 1, 2, 4, 8, 16, 30, 30])
+
+        self.client.stopped = True
+        self.reactor.run_delayed()
+        self.assertEqual(self.reactor.delayed, [])
+
+    def test_no_restart(self):
+        stream = Mock(side_effect=FakeRendezvous(StatusCode.UNAVAILABLE))
+        with patch.object(grpc_client.os, 'system') as system:
+            self.client._run_stream('test', stream)
+        self.assertEqual(system.call_count, 1)
+        self.assertEqual(self.reactor.delayed, [])
+
+    def test_refused_streams_are_retried(self):
+        stub = self.client.local_stub = Mock()
+        refused = FakeRendezvous(StatusCode.RESOURCE_EXHAUSTED)
+        stub.ReceivePacketInBatches.side_effect = [refused, iter([])]
+        stub.StreamPacketsOut.side_effect = [refused, None]
+
+        with patch.object(grpc_client.os, 'system') as system:
+            self.client.start_packet_in_stream()
+            self.client.start_packet_out_stream()
+            self.assertEqual([d for d, _, _ in self.reactor.delayed],
+                             [0.5, 0.5])
+            self.reactor.run_delayed()
+            self.reactor.run_delayed()
+        system.assert_not_called()
+        self.assertEqual(stub.ReceivePacketInBatches.call_count, 2)
+
+        # each attempt streams the packets out from a generator of its own
+        (first,), _ = stub.StreamPacketsOut.call_args_list[0]
+        (second,), _ = stub.StreamPacketsOut.call_args_list[1]
+        self.assertIsNot(first, second)
+
+        # the streams are not restarted when they end
+        self.assertEqual(self.reactor.delayed, [])
+
+    def test_logical_device_events_resume_from_position(self):
+        manager = self.client.connection_manager
+        manager.get_logical_device_event_position.side_effect = [
+            ('e1', 0), ('e1', 5)]
+        stub = self.client.local_stub = Mock()
+        stub.ReceiveLogicalDeviceEvents.return_value = iter([])
+
+        with patch.object(grpc_client.threads, 'blockingCallFromThread'):
+            self.client.start_logical_device_event_stream()
+            self.reactor.run_delayed()
+
+        requests = [args[0] for args, _ in
+                    stub.ReceiveLogicalDeviceEvents.call_args_list]
+        self.assertEqual([(r.epoch, r.sequence) for r in requests],
+                         [('e1', 0), ('e1', 5)])
+
+
+if __name__ == '__main__':
+    main()
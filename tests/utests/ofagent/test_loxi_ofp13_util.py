@@ -1,6 +1,53 @@
 from unittest import TestCase, main
 import loxi.of13 as ofp
 
+
+def gen_test_vectors():
+    """
+    Return list of (message, packed message in hex)
+    """
+    return [
+        (ofp.message.flow_add(
+            xid=1,
+            cookie=0x1234,
+            priority=1000,
+            buffer_id=ofp.OFP_NO_BUFFER,
+            out_port=ofp.OFPP_ANY,
+            out_group=ofp.OFPG_ANY,
+            match=ofp.match([
+                ofp.oxm.in_port(1),
+                ofp.oxm.vlan_vid(0x1000 | 100)]),
+            instructions=[ofp.instruction.apply_actions([
+                ofp.action.push_vlan(ethertype=0x8100),
+                ofp.action.set_field(ofp.oxm.vlan_vid(0x1000 | 4000)),
+                ofp.action.output(port=2)])]),
+         '040e0078000000010000000000001234000000000000000000000000000003e8'
+         'ffffffffffffffffffffffff0000000000010012800000040000000180000c02'
+         '1064000000000000000400300000000000110008810000000019001080000c02'
+         '1fa000000000000000000010000000020000000000000000'),
+        (ofp.message.packet_in(
+            xid=2,
+            buffer_id=ofp.OFP_NO_BUFFER,
+            reason=ofp.OFPR_ACTION,
+            match=ofp.match([ofp.oxm.in_port(3)]),
+            data='\x01\x02\x03'),
+         '040a002d00000002ffffffff0000010000000000000000000001000c80000004'
+         '00000003000000000000010203'),
+        (ofp.message.flow_stats_reply(
+            xid=3,
+            entries=[ofp.flow_stats_entry(
+                table_id=0,
+                priority=500,
+                packet_count=7,
+                byte_count=448,
+                match=ofp.match([ofp.oxm.eth_type(0x800)]),
+                instructions=[ofp.instruction.goto_table(table_id=1)])]),
+         '0413005800000003000100000000000000480000000000000000000001f40000'
+         '00000000000000000000000000000000000000000000000700000000000001c0'
+         '0001000a80000a0208000000000000000001000801000000'),
+    ]
+
+
 class TestConection_mgr(TestCase):
 
     def test_bitmap_to_version(self):
@@ -8,5 +55,11 @@ class TestConection_mgr(TestCase):
         versions = ofp.util.bitmap_to_version(bitmaps)
         self.assertEqual(versions,[1,4])
 
+    def test_pack_and_parse_vectors(self):
+        for msg, packed in gen_test_vectors():
+            self.assertEqual(msg.pack().encode('hex'), packed)
+            self.assertEqual(ofp.message.parse_message(packed.decode('hex')),
+                             msg)
+
 if __name__ == '__main__':
     main()
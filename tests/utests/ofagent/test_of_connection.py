@@ -0,0 +1,83 @@
+from unittest import TestCase, main
+
+from mock import Mock
+
+import loxi
+from loxi import of13
+from of_connection import EncodedMessage, OpenFlowConnection
+
+
+class TestOpenFlowConnection(TestCase):
+
+    def setUp(self):
+        self.cxn = OpenFlowConnection(Mock())
+        self.messages = [
+            of13.message.flow_add(
+                xid=i,
+                priority=1000 + i,
+                match=of13.match([of13.oxm.in_port(i)]),
+                instructions=[of13.instruction.apply_actions(
+                    [of13.action.output(port=i + 1)])])
+            for i in range(10)
+        ] + [of13.message.packet_out(xid=10, data='\x00\x01' * 40)]
+        self.stream = ''.join(msg.pack() for msg in self.messages)
+
+    def received(self):
+        received = [msg for msg, _ in self.cxn.rx.queue.itervalues()]
+        self.cxn.rx.reset()
+        return received
+
+    def test_single_chunk(self):
+        self.cxn.dataReceived(self.stream)
+        self.assertEqual(self.received(), self.messages)
+        self.assertEqual(len(self.cxn.read_buffer), 0)
+
+    def test_arbitrary_chunks(self):
+        for chunk_size in (1, 7, 8, 9, 100):
+            for i in range(0, len(self.stream), chunk_size):
+                self.cxn.dataReceived(self.stream[i:i + chunk_size])
+            self.assertEqual(self.received(), self.messages)
+            self.assertEqual(len(self.cxn.read_buffer), 0)
+
+    def test_partial_message_kept(self):
+        first = self.messages[0].pack()
+        self.cxn.dataReceived(first + self.stream[:5])
+        self.assertEqual(self.received(), self.messages[:1])
+        self.assertEqual(len(self.cxn.read_buffer), 5)
+        self.cxn.dataReceived(self.stream[5:])
+        self.assertEqual(self.received(), self.messages)
+
+    def test_invalid_length(self):
+        self.assertRaises(loxi.ProtocolError, self.cxn.dataReceived,
+                          '\x04\x00\x00\x00\x00\x00\x00\x01')
+
+    def test_send_encoded(self):
+        self.cxn.connected = True
+        self.cxn.transport = Mock()
+        msgs = [of13.message.packet_in(data='\x00' * i) for i in range(3)]
+        encoded_msgs = [EncodedMessage(msg) for msg in msgs]
+        for xid, msg in enumerate(msgs, 1):
+            msg.xid = xid
+        self.cxn.send_encoded(encoded_msgs)
+        self.cxn.transport.write.assert_called_once_with(
+            ''.join(msg.pack() for msg in msgs))
+
+    def test_send_encoded_with_xid(self):
+        self.cxn.connected = True
+        self.cxn.transport = Mock()
+        entries = [of13.port_desc(port_no=i) for i in range(3)]
+        msg = of13.message.port_desc_stats_reply(
+            xid=9, flags=of13.OFPSF_REPLY_MORE, entries=entries)
+        self.cxn.send_encoded([EncodedMessage(
+            of13.message.port_desc_stats_reply(flags=of13.OFPSF_REPLY_MORE),
+            xid=9, tail=''.join(entry.pack() for entry in entries))])
+        self.cxn.transport.write.assert_called_once_with(msg.pack())
+
+    def test_encoding_keeps_xid(self):
+        msg = of13.message.packet_in(xid=7, data='\x00')
+        EncodedMessage(msg)
+        self.assertEqual(msg.xid, 7)
+
+
+if __name__ == '__main__':
+    main()
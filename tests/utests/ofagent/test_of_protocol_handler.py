@@ -1,13 +1,17 @@
+import struct
 from unittest import TestCase, main
+
+from mock import Mock
+from twisted.internet.defer import Deferred, succeed
+
+from of_connection import EncodedMessage
 from of_protocol_handler import OpenFlowProtocolHandler
+from protos.openflow_13_pb2 import FlowTableBatchItemStatus, \
+    LogicalDeviceStats, ofp_port_stats, ofp_table_stats
 import loxi.of13 as ofp
 
 class TestOF_Protocol_handler(TestCase):
 
-    def gen_packet_in(self):
-        packet_in = 1
-        return packet_in
-
     def gen_device(self):
         device =lambda: None
         device.id = "1"
@@ -55,23 +59,217 @@ class TestOF_Protocol_handler(TestCase):
         print context.exception
         self.assertTrue('\'function\' object has no attribute \'send\'' in context.exception)
 
-    def test_forward_packet_in_role_none(self):
-        packet_in = self.gen_packet_in()
-        generic_obj = self.gen_generic_obj()
+    def test_send_async_packet_in_role_none(self):
+        packet_in = EncodedMessage(ofp.message.packet_in(
+            reason=ofp.OFPR_ACTION, match=ofp.match([])))
+        cxn = Mock()
         device = self.gen_device()
-        of_proto_handler = OpenFlowProtocolHandler(device.datapath_id, device.id, generic_obj, generic_obj, generic_obj)
-        of_proto_handler.forward_packet_in(packet_in)
+        of_proto_handler = OpenFlowProtocolHandler(device.datapath_id, device.id, Mock(), cxn, Mock())
+        of_proto_handler.send_async([packet_in])
+        cxn.send_encoded.assert_not_called()
 
-    def test_forward_packet_in_role_master(self):
-        packet_in = self.gen_packet_in()
-        generic_obj = self.gen_generic_obj()
+    def test_send_async_packet_in_role_master(self):
+        packet_in = EncodedMessage(ofp.message.packet_in(
+            reason=ofp.OFPR_ACTION, match=ofp.match([])))
+        cxn = Mock()
         device = self.gen_device()
-        of_proto_handler = OpenFlowProtocolHandler(device.datapath_id, device.id, generic_obj, generic_obj, generic_obj)
+        of_proto_handler = OpenFlowProtocolHandler(device.datapath_id, device.id, Mock(), cxn, Mock())
         of_proto_handler.role = ofp.OFPCR_ROLE_MASTER
-        with self.assertRaises(Exception) as context:
-            of_proto_handler.forward_packet_in(packet_in)
-        print context.exception
-        self.assertTrue('\'function\' object has no attribute \'send\'' in context.exception)
+        of_proto_handler.send_async([packet_in])
+        cxn.send_encoded.assert_called_once_with([packet_in])
+
+    def test_send_async_port_status(self):
+        port_status = EncodedMessage(ofp.message.port_status(
+            reason=ofp.OFPPR_ADD))
+        cxn = Mock()
+        device = self.gen_device()
+        of_proto_handler = OpenFlowProtocolHandler(device.datapath_id, device.id, Mock(), cxn, Mock())
+        of_proto_handler.send_async([port_status])
+        cxn.send_encoded.assert_called_once_with([port_status])
+
+
+class TestBarrierSemantics(TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.cxn = Mock()
+        self.cxn.send = self.sent.append
+        self.rpc = Mock()
+        self.pending = []  # (mods, deferred) of outstanding batch RPCs
+        def update_tables_batch(device_id, mods):
+            d = Deferred()
+            self.pending.append((mods, d))
+            return d
+        self.rpc.update_tables_batch = update_tables_batch
+        self.handler = OpenFlowProtocolHandler(1, '1', Mock(), self.cxn,
+                                               self.rpc)
+        self.handler.role = ofp.OFPCR_ROLE_MASTER
+
+    def flow_mod(self, xid):
+        return ofp.message.flow_add(
+            xid=xid, priority=xid,
+            match=ofp.match([ofp.oxm.in_port(xid)]),
+            instructions=[])
+
+    def complete(self, index, *errors):
+        mods, d = self.pending[index]
+        d.callback([FlowTableBatchItemStatus(success=True)
+                    if i not in errors else
+                    FlowTableBatchItemStatus(
+                        error_type=ofp.OFPET_FLOW_MOD_FAILED,
+                        error_code=ofp.OFPFMFC_OVERLAP)
+                    for i in range(len(mods))])
+
+    def test_flow_mods_batched_until_barrier(self):
+        for xid in (1, 2, 3):
+            self.handler.handle_flow_mod_request(self.flow_mod(xid))
+        self.handler.handle_barrier_request(
+            ofp.message.barrier_request(xid=4))
+        self.handler.handle_flow_mod_request(self.flow_mod(5))
+
+        # mods received while the first batch is in flight are held
+        self.assertEqual([[m.priority for m in mods]
+                          for mods, _ in self.pending], [[1]])
+        self.complete(0)
+        self.assertEqual([[m.priority for m in mods]
+                          for mods, _ in self.pending], [[1], [2, 3]])
+        self.assertEqual(self.sent, [])
+
+        # the barrier is released by the last batch before it
+        self.complete(1)
+        self.assertEqual(self.sent, [ofp.message.barrier_reply(xid=4)])
+        self.assertEqual([[m.priority for m in mods]
+                          for mods, _ in self.pending], [[1], [2, 3], [5]])
+
+    def test_errors_reported_before_barrier_reply(self):
+        for xid in (1, 2, 3):
+            self.handler.handle_flow_mod_request(self.flow_mod(xid))
+        self.handler.handle_barrier_request(
+            ofp.message.barrier_request(xid=4))
+        self.pending[0][1].errback(Exception('rejected'))
+        self.complete(1, 1)
+
+        self.assertEqual(len(self.sent), 3)
+        self.assertIsInstance(self.sent[0],
+                              ofp.message.flow_mod_failed_error_msg)
+        self.assertEqual(self.sent[0].xid, 1)
+        self.assertEqual(self.sent[0].code, ofp.OFPFMFC_UNKNOWN)
+        self.assertEqual(self.sent[1].xid, 3)
+        self.assertEqual(self.sent[1].code, ofp.OFPFMFC_OVERLAP)
+        self.assertEqual(self.sent[2], ofp.message.barrier_reply(xid=4))
+
+
+class TestAsyncMessages(TestCase):
+
+    def setUp(self):
+        self.cxn = Mock()
+        self.handler = OpenFlowProtocolHandler(1, '1', Mock(), self.cxn,
+                                               Mock())
+        self.packet_in = EncodedMessage(ofp.message.packet_in(
+            reason=ofp.OFPR_ACTION, match=ofp.match([])))
+        self.port_status = EncodedMessage(ofp.message.port_status(
+            reason=ofp.OFPPR_MODIFY))
+
+    def sent(self):
+        sent = [m for c in self.cxn.send_encoded.call_args_list
+                for m in c[0][0]]
+        self.cxn.send_encoded.reset_mock()
+        return sent
+
+    def test_default_async_config(self):
+        msgs = [self.packet_in, self.port_status]
+        for role in (None, ofp.OFPCR_ROLE_SLAVE):
+            self.handler.role = role
+            self.handler.send_async(msgs)
+            self.assertEqual(self.sent(), [self.port_status])
+        for role in (ofp.OFPCR_ROLE_MASTER, ofp.OFPCR_ROLE_EQUAL):
+            self.handler.role = role
+            self.handler.send_async(msgs)
+            self.assertEqual(self.sent(), msgs)
+
+    def test_set_async(self):
+        self.handler.handle_set_async_request(ofp.message.async_set(
+            packet_in_mask_equal_master=1 << ofp.OFPR_NO_MATCH,
+            packet_in_mask_slave=1 << ofp.OFPR_ACTION,
+            port_status_mask_equal_master=0,
+            port_status_mask_slave=1 << ofp.OFPPR_MODIFY))
+        msgs = [self.packet_in, self.port_status]
+        self.handler.role = ofp.OFPCR_ROLE_MASTER
+        self.handler.send_async(msgs)
+        self.assertEqual(self.sent(), [])
+        self.handler.role = ofp.OFPCR_ROLE_SLAVE
+        self.handler.send_async(msgs)
+        self.assertEqual(self.sent(), msgs)
+
+        self.handler.handle_get_async_request(
+            ofp.message.async_get_request(xid=7))
+        reply = self.cxn.send.call_args[0][0]
+        self.assertEqual(reply.xid, 7)
+        self.assertEqual(reply.packet_in_mask_slave, 1 << ofp.OFPR_ACTION)
+
+    def test_not_connected(self):
+        self.cxn.connected = False
+        self.handler.role = ofp.OFPCR_ROLE_MASTER
+        self.handler.send_async([self.packet_in])
+        self.assertEqual(self.sent(), [])
+
+
+
+class TestStatsRequests(TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.cxn = Mock()
+        self.cxn.send = self.sent.append
+        self.cxn.send_encoded = self.send_encoded
+        self.rpc = Mock()
+        stats = LogicalDeviceStats(
+            id='1',
+            port_stats=[ofp_port_stats(port_no=i, rx_packets=i * 10)
+                        for i in range(1, 1001)],
+            table_stats=[ofp_table_stats(table_id=0, active_count=3)])
+        self.rpc.get_logical_device_stats.side_effect = \
+            lambda _: succeed(stats)
+        self.handler = OpenFlowProtocolHandler(1, '1', Mock(), self.cxn,
+                                               self.rpc)
+
+    def send_encoded(self, encoded_msgs):
+        self.sent.extend(
+            ofp.message.parse_message(
+                m.head + struct.pack('!L', m.xid) + m.body)
+            for m in encoded_msgs)
+
+    def test_port_stats_segmented(self):
+        self.handler.handle_port_stats_request(
+            ofp.message.port_stats_request(xid=5, port_no=ofp.OFPP_ANY))
+        self.rpc.get_logical_device_stats.assert_called_once_with('1')
+        self.assertTrue(len(self.sent) > 1)
+        for i, reply in enumerate(self.sent):
+            self.assertEqual(reply.xid, 5)
+            self.assertEqual(reply.flags, 0 if i == len(self.sent) - 1
+                             else ofp.OFPSF_REPLY_MORE)
+            self.assertTrue(len(reply.pack()) <= 0xffff)
+        self.assertEqual([e.port_no for r in self.sent for e in r.entries],
+                         range(1, 1001))
+
+    def test_single_port_stats(self):
+        self.handler.handle_port_stats_request(
+            ofp.message.port_stats_request(xid=5, port_no=7))
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual([(e.port_no, e.rx_packets)
+                          for e in self.sent[0].entries], [(7, 70)])
+
+    def test_table_and_meter_stats(self):
+        self.handler.handle_table_stats_request(
+            ofp.message.table_stats_request(xid=6))
+        self.handler.handle_meter_stats_request(
+            ofp.message.meter_stats_request(xid=7, meter_id=ofp.OFPM_ALL))
+        self.assertEqual(self.sent, [
+            ofp.message.table_stats_reply(xid=6, entries=[
+                ofp.table_stats_entry(table_id=0, active_count=3,
+                                      lookup_count=0, matched_count=0)]),
+            ofp.message.meter_stats_reply(xid=7, entries=[])])
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,63 @@
+from unittest import TestCase, main
+
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from stats_cache import StatsCache
+
+
+class TestStatsCache(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.fetches = []
+        self.cache = StatsCache(self.fetch, max_age=5, clock=self.clock)
+
+    def fetch(self, device_id):
+        d = Deferred()
+        self.fetches.append((device_id, d))
+        return d
+
+    def result(self, d):
+        results = []
+        d.addBoth(results.append)
+        return results[0] if results else None
+
+    def test_concurrent_requests_share_fetch(self):
+        d1 = self.cache.get('ld1')
+        d2 = self.cache.get('ld1')
+        d3 = self.cache.get('ld2')
+        self.assertEqual([device_id for device_id, _ in self.fetches],
+                         ['ld1', 'ld2'])
+        self.fetches[0][1].callback('stats1')
+        self.assertEqual(self.result(d1), 'stats1')
+        self.assertEqual(self.result(d2), 'stats1')
+        self.assertIsNone(self.result(d3))
+
+    def test_max_age(self):
+        self.cache.get('ld1')
+        self.fetches[0][1].callback('stats1')
+        self.clock.advance(4)
+        self.assertEqual(self.result(self.cache.get('ld1')), 'stats1')
+        self.assertEqual(len(self.fetches), 1)
+
+        self.clock.advance(1)
+        d = self.cache.get('ld1')
+        self.assertEqual(len(self.fetches), 2)
+        self.fetches[1][1].callback('stats2')
+        self.assertEqual(self.result(d), 'stats2')
+
+        self.cache.remove('ld1')
+        self.cache.get('ld1')
+        self.assertEqual(len(self.fetches), 3)
+
+    def test_failed_fetch_is_not_cached(self):
+        d = self.cache.get('ld1')
+        d.addErrback(lambda _: None)
+        self.fetches[0][1].errback(Exception('unavailable'))
+        self.cache.get('ld1')
+        self.assertEqual(len(self.fetches), 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,14 @@ from collections import OrderedDict
 from copy import copy
 import resource
 from random import randint, seed
+from threading import Thread
 from time import time
 from unittest import main, TestCase
 
 import gc
 
 from google.protobuf.json_format import MessageToDict
-from mock import Mock
+from mock import Mock, patch
 from simplejson import dumps
 
 from common.event_bus import EventBusClient
@@ -359,6 +360,66 @@ class TestConfigNodeDeep(DeepTestsBase):
         self.assertEqual(new.adapters[3].version, 'changed')
 
 
+class TestLockFreeReads(DeepTestsBase):
+
+    @patch('voltha.core.config.config_root.reactor')
+    def test_read_releases_root_on_reactor(self, reactor):
+        self.assertEqual(self.node.read('/adapters/3').id, '3')
+        self.assertEqual(self.node.read(depth=-1), self.base_deep)
+        self.assertRaises(KeyError, self.node.read, '/adapters/9')
+        self.assertEqual(reactor.callFromThread.call_count, 3)
+
+        # the pinned root revision is only dropped by the reactor
+        release = reactor.callFromThread.call_args[0][0]
+        self.assertIs(release(), self.node.latest)
+
+    @patch('voltha.core.config.config_root.reactor')
+    def test_reads_see_consistent_revisions(self, _):
+        errors = []
+
+        def reader():
+            try:
+                count = 0
+                while count < 25:
+                    ids = [a.id for a in self.node.read('/adapters')]
+                    # adapters are only ever added in order, one at a time
+                    assert ids == [str(i) for i in xrange(len(ids))], ids
+                    assert len(ids) >= count
+                    count = len(ids)
+            except Exception, e:
+                errors.append(e)
+
+        readers = [Thread(target=reader) for _ in xrange(4)]
+        for thread in readers:
+            thread.start()
+        for i in xrange(5, 25):
+            self.node.add('/adapters', Adapter(id=str(i)))
+        for thread in readers:
+            thread.join(10)
+        self.assertEqual(errors, [])
+
+    def test_read_versioned(self):
+        hash, adapters = self.node.read_versioned('/adapters')
+        self.assertEqual(adapters, self.node.get('/adapters'))
+        self.assertEqual(
+            self.node.read_versioned('/adapters', if_none_match=hash),
+            (hash, None))
+        # served from the cache, which is keyed by hash and depth
+        self.assertIs(self.node.read_versioned('/adapters')[1], adapters)
+        self.assertIsNot(self.node.read_versioned('/adapters', 1)[1],
+                         adapters)
+
+        self.node.update('/adapters/3', Adapter(id='3', version='2'))
+        new_hash, adapters = self.node.read_versioned(
+            '/adapters', if_none_match=hash)
+        self.assertNotEqual(new_hash, hash)
+        self.assertEqual(adapters[3].version, '2')
+
+        hash, adapter = self.node.read_versioned('/adapters/3')
+        self.assertEqual(hash, self.node.latest._children['adapters'][3].hash)
+        self.assertRaises(KeyError, self.node.read_versioned, '/adapters/9')
+
+
 class TestPruningPerformance(DeepTestsBase):
 
     def test_repeated_prunning_keeps_memory_stable(self):
@@ -0,0 +1,109 @@
+from unittest import TestCase, main
+
+from voltha.core.counter_store import CounterStore
+from voltha.core.flow_decomposer import *
+from voltha.protos import openflow_13_pb2 as ofp
+
+
+class TestCounterStore(TestCase):
+
+    def setUp(self):
+        self.store = CounterStore()
+        self.flows = ofp.Flows(items=[
+            mk_flow_stat(match_fields=[in_port(i)], actions=[output(9)])
+            for i in range(3)])
+
+    def test_merge_flow_counters(self):
+        self.store.update_flow_counters('ld1', self.flows.items[1].id,
+                                        10, 1000, 5)
+        flows = self.store.merge_flow_counters('ld1', self.flows)
+        self.assertEqual(flows.items[0].packet_count, 0)
+        self.assertEqual(flows.items[1].packet_count, 10)
+        self.assertEqual(flows.items[1].byte_count, 1000)
+        self.assertEqual(flows.items[1].duration_sec, 5)
+
+        # counters of other devices do not leak in
+        flows = self.store.merge_flow_counters('ld2', ofp.Flows(
+            items=[mk_flow_stat(match_fields=[in_port(1)],
+                                actions=[output(9)])]))
+        self.assertEqual(flows.items[0].packet_count, 0)
+
+    def test_reset_and_retain_flow_counters(self):
+        for flow in self.flows.items:
+            self.store.update_flow_counters('ld1', flow.id, 1, 64)
+        self.store.reset_flow_counters('ld1', self.flows.items[0].id)
+        self.store.retain_flow_counters('ld1', [self.flows.items[0].id,
+                                                self.flows.items[1].id])
+        flows = self.store.merge_flow_counters('ld1', self.flows)
+        self.assertEqual([f.packet_count for f in flows.items], [0, 1, 0])
+
+    def test_port_counters(self):
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=1, rx_packets=5))
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=2, rx_packets=7))
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=1, rx_packets=6))
+        self.assertEqual(
+            sorted(s.rx_packets for s in self.store.get_port_counters('ld1')),
+            [6, 7])
+        self.assertEqual(self.store.get_port_counters('ld1', 2)[0].rx_packets,
+                         7)
+        self.assertEqual(self.store.get_port_counters('ld1', 3), [])
+
+        self.store.remove_device('ld1')
+        self.assertEqual(self.store.get_port_counters('ld1'), [])
+
+    def test_logical_device_stats(self):
+        flows = ofp.Flows(items=[
+            mk_flow_stat(table_id=t, match_fields=[in_port(i)],
+                         actions=[output(9)])
+            for i, t in enumerate((0, 1, 1))])
+        reads = []
+
+        def get_flows():
+            reads.append(1)
+            copy = ofp.Flows()
+            copy.CopyFrom(flows)
+            return copy
+
+        for i, flow in enumerate(flows.items):
+            self.store.update_flow_counters('ld1', flow.id, i + 1, 64)
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=2, rx_packets=7))
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=1, rx_packets=5))
+        self.store.update_meter_counters(
+            'ld1', ofp.ofp_meter_stats(meter_id=1, packet_in_count=3))
+
+        stats = self.store.get_logical_device_stats('ld1', get_flows)
+        self.assertEqual(stats.id, 'ld1')
+        self.assertEqual([p.port_no for p in stats.port_stats], [1, 2])
+        self.assertEqual(
+            [(t.table_id, t.active_count, t.matched_count)
+             for t in stats.table_stats], [(0, 1, 1), (1, 2, 5)])
+        self.assertEqual(stats.meter_stats[0].packet_in_count, 3)
+
+        # served as is until the counters of the device change
+        self.assertIs(self.store.get_logical_device_stats('ld1', get_flows),
+                      stats)
+        self.store.update_port_counters(
+            'ld2', ofp.ofp_port_stats(port_no=1, rx_packets=1))
+        self.assertIs(self.store.get_logical_device_stats('ld1', get_flows),
+                      stats)
+        self.assertEqual(len(reads), 1)
+
+        self.store.update_port_counters(
+            'ld1', ofp.ofp_port_stats(port_no=1, rx_packets=6))
+        stats = self.store.get_logical_device_stats('ld1', get_flows)
+        self.assertEqual(stats.port_stats[0].rx_packets, 6)
+        self.assertEqual(len(reads), 2)
+
+        # as well as when its flow table changes
+        self.store.retain_flow_counters('ld1', [f.id for f in flows.items])
+        self.store.get_logical_device_stats('ld1', get_flows)
+        self.assertEqual(len(reads), 3)
+
+
+if __name__ == '__main__':
+    main()
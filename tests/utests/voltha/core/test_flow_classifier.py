@@ -0,0 +1,80 @@
+from unittest import TestCase, main
+
+from voltha.core.flow_classifier import FlowClassifier
+from voltha.core.flow_decomposer import *
+
+
+class TestFlowClassifier(TestCase):
+
+    def setUp(self):
+        self.classifier = FlowClassifier()
+
+    def mk_flow(self, match_fields, priority=1000, table_id=0):
+        return mk_flow_stat(priority=priority, table_id=table_id,
+                            match_fields=match_fields, actions=[output(1)])
+
+    def masked_ipv4_dst(self, value, mask):
+        field = ipv4_dst(value)
+        field.has_mask = True
+        field.ipv4_dst_mask = mask
+        return field
+
+    def assertOverlapping(self, flow, expected):
+        found = self.classifier.find_overlapping(flow)
+        self.assertEqual(sorted(f.id for f in found),
+                         sorted(f.id for f in expected))
+
+    def test_empty(self):
+        self.assertOverlapping(self.mk_flow([in_port(1)]), [])
+
+    def test_identical_match_overlaps(self):
+        flow = self.mk_flow([in_port(1), vlan_vid(4096 + 10)])
+        self.classifier.add(flow)
+        self.assertOverlapping(flow, [flow])
+
+    def test_wildcarded_fields_overlap(self):
+        flow1 = self.mk_flow([in_port(1)])
+        flow2 = self.mk_flow([vlan_vid(4096 + 10)])
+        flow3 = self.mk_flow([in_port(2), vlan_vid(4096 + 10)])
+        for flow in (flow1, flow2, flow3):
+            self.classifier.add(flow)
+        self.assertOverlapping(
+            self.mk_flow([in_port(1), vlan_vid(4096 + 10)]), [flow1, flow2])
+        self.assertOverlapping(self.mk_flow([]), [flow1, flow2, flow3])
+
+    def test_table_and_priority_separate(self):
+        self.classifier.add(self.mk_flow([in_port(1)], priority=500))
+        self.classifier.add(self.mk_flow([in_port(1)], table_id=1))
+        self.assertOverlapping(self.mk_flow([in_port(1)]), [])
+
+    def test_masked_fields(self):
+        flow1 = self.mk_flow(
+            [eth_type(0x800), self.masked_ipv4_dst(0xe0000000, 0xf0000000)])
+        flow2 = self.mk_flow([eth_type(0x800), ipv4_dst(0x0a000001)])
+        self.classifier.add(flow1)
+        self.classifier.add(flow2)
+        self.assertOverlapping(
+            self.mk_flow([eth_type(0x800), ipv4_dst(0xe4010101)]), [flow1])
+        self.assertOverlapping(
+            self.mk_flow([eth_type(0x800),
+                          self.masked_ipv4_dst(0x0a000000, 0xff000000)]),
+            [flow2])
+
+    def test_remove_and_sync(self):
+        flows = [self.mk_flow([in_port(i)]) for i in range(10)]
+        for flow in flows:
+            self.classifier.add(flow)
+        self.assertOverlapping(self.mk_flow([in_port(3)]), [flows[3]])
+
+        self.classifier.remove(flows[3].id)
+        self.assertOverlapping(self.mk_flow([in_port(3)]), [])
+        self.assertEqual(len(self.classifier), 9)
+
+        self.classifier.sync(flows[:5])
+        self.assertEqual(len(self.classifier), 5)
+        self.assertOverlapping(self.mk_flow([in_port(3)]), [flows[3]])
+        self.assertOverlapping(self.mk_flow([in_port(7)]), [])
+
+
+if __name__ == '__main__':
+    main()
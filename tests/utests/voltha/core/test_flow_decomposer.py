@@ -632,6 +632,127 @@ class TestFlowDecomposer(FlowHelpers, FlowDecomposer):
             ]
         ))
 
+    def test_decomposition_is_memoized(self):
+        flow = mk_flow_stat(
+            match_fields=[in_port(1), vlan_vid(ofp.OFPVID_PRESENT | 0)],
+            actions=[
+                set_field(vlan_vid(ofp.OFPVID_PRESENT | 101)),
+                output(0)
+            ],
+            priority=1000
+        )
+        device_rules = self.decompose_rules([flow], [])
+
+        decompose_flow = self.decompose_flow
+        calls = []
+        def counting_decompose_flow(*args):
+            calls.append(args)
+            return decompose_flow(*args)
+        self.decompose_flow = counting_decompose_flow
+
+        # counters do not take part in the memoization key
+        flow.packet_count = 42
+        self.assertEqual(self.decompose_rules([flow], []), device_rules)
+        self.assertEqual(len(calls), 0)
+
+        # routes via the port changed
+        self.invalidate_decomposition_cache(1)
+        self.assertEqual(self.decompose_rules([flow], []), device_rules)
+        self.assertEqual(len(calls), 1)
+
+        # routes via unrelated ports changed
+        self.invalidate_decomposition_cache(2)
+        self.decompose_rules([flow], [])
+        self.assertEqual(len(calls), 1)
+
+    def test_group_change_invalidates_memoized_decomposition(self):
+        flow = mk_flow_stat(
+            match_fields=[
+                in_port(0),
+                vlan_vid(ofp.OFPVID_PRESENT | 170),
+                vlan_pcp(0),
+                eth_type(0x800),
+                ipv4_dst(0xe00a0a0a)
+            ],
+            actions=[
+                group(10)
+            ],
+            priority=500
+        )
+        def mk_group(*ports):
+            return mk_group_stat(
+                group_id=10,
+                buckets=[
+                    ofp.ofp_bucket(actions=[pop_vlan(), output(port)])
+                    for port in ports
+                ]
+            )
+        device_rules = self.decompose_rules([flow], [mk_group(1)])
+        onu2_flows, _ = device_rules['onu2']
+        self.assertEqual(len(onu2_flows), 1)
+
+        device_rules = self.decompose_rules([flow], [mk_group(1, 2)])
+        onu2_flows, _ = device_rules['onu2']
+        self.assertEqual(len(onu2_flows), 2)
+
+    def test_bucket_port_change_invalidates_memoized_decomposition(self):
+        flow = mk_flow_stat(
+            match_fields=[
+                in_port(0),
+                vlan_vid(ofp.OFPVID_PRESENT | 170),
+                vlan_pcp(0),
+                eth_type(0x800),
+                ipv4_dst(0xe00a0a0a)
+            ],
+            actions=[
+                group(10)
+            ],
+            priority=500
+        )
+        grp = mk_group_stat(
+            group_id=10,
+            buckets=[ofp.ofp_bucket(actions=[pop_vlan(), output(1)])]
+        )
+        self.decompose_rules([flow], [grp])
+
+        decompose_flow = self.decompose_flow
+        calls = []
+        def counting_decompose_flow(*args):
+            calls.append(args)
+            return decompose_flow(*args)
+        self.decompose_flow = counting_decompose_flow
+
+        # routes via unrelated ports changed
+        self.invalidate_decomposition_cache(2)
+        self.decompose_rules([flow], [grp])
+        self.assertEqual(len(calls), 0)
+
+        # the port of the bucket was removed, or added back
+        self.invalidate_decomposition_cache(1)
+        self.decompose_rules([flow], [grp])
+        self.assertEqual(len(calls), 1)
+
+    def test_unrouted_flow_is_not_memoized(self):
+        flow = mk_flow_stat(
+            match_fields=[in_port(1), vlan_vid(ofp.OFPVID_PRESENT | 0)],
+            actions=[
+                set_field(vlan_vid(ofp.OFPVID_PRESENT | 101)),
+                output(0)
+            ],
+            priority=1000
+        )
+        get_route = self.get_route
+        self.get_route = lambda in_port_no, out_port_no: None
+        device_rules = self.decompose_rules([flow], [])
+        self.assertEqual(device_rules, self.get_all_default_rules())
+
+        # the route shows up, without any port being invalidated
+        self.get_route = get_route
+        device_rules = self.decompose_rules([flow], [])
+        olt_flows, _ = device_rules['olt']
+        olt_default_flows, _ = self.get_all_default_rules()['olt']
+        self.assertEqual(len(olt_flows), len(olt_default_flows) + 1)
+
 
 if __name__ == '__main__':
     main()
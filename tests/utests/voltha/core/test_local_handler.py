@@ -0,0 +1,184 @@
+from threading import Thread
+from time import sleep
+from unittest import TestCase, main
+
+from google.protobuf.empty_pb2 import Empty
+from grpc import StatusCode
+from mock import Mock, patch
+
+from common.utils.fan_out import FanOut
+from voltha.core.config.config_root import ConfigRoot
+from voltha.core.local_handler import LocalHandler
+from voltha.protos.openflow_13_pb2 import PacketIn, ofp_packet_in
+from voltha.protos.voltha_pb2 import Device, Devices, ID, LogicalDevice, \
+    LogicalDeviceEvent, LogicalDeviceEventsRequest, ListRequest, \
+    VolthaInstance
+
+
+class TestLogicalDeviceEvents(TestCase):
+
+    def setUp(self):
+        self.handler = LocalHandler(None, 'instance', 'store')
+        self.epoch = self.handler.logical_device_event_epoch
+
+    def receive(self, request, count):
+        stream = self.handler.ReceiveLogicalDeviceEvents(request, Mock())
+        events = [next(stream) for _ in xrange(count)]
+        self.handler.stopped = True
+        return events
+
+    def snapshot(self):
+        return LogicalDeviceEvent(
+            epoch=self.epoch,
+            sequence=self.handler.logical_device_event_sequence,
+            type=LogicalDeviceEvent.SNAPSHOT)
+
+    def test_resume_after_sequence(self):
+        for i in xrange(3):
+            self.handler.send_logical_device_event(
+                LogicalDeviceEvent.ADDED, LogicalDevice(id=str(i)))
+        events = self.receive(
+            LogicalDeviceEventsRequest(epoch=self.epoch, sequence=1), 2)
+        self.assertEqual([e.sequence for e in events], [2, 3])
+        self.assertEqual([e.logical_devices[0].id for e in events],
+                         ['1', '2'])
+
+    @patch('voltha.core.local_handler.threads.blockingCallFromThread',
+           side_effect=lambda _, f: f())
+    def test_snapshot_on_unknown_epoch(self, _):
+        self.handler.send_logical_device_event(
+            LogicalDeviceEvent.ADDED, LogicalDevice(id='1'))
+        with patch.object(self.handler, 'get_logical_device_snapshot',
+                          side_effect=self.snapshot):
+            events = self.receive(
+                LogicalDeviceEventsRequest(epoch='other', sequence=1), 1)
+        self.assertEqual(events[0].type, LogicalDeviceEvent.SNAPSHOT)
+        self.assertEqual(events[0].sequence, 1)
+
+    @patch('voltha.core.local_handler.threads.blockingCallFromThread',
+           side_effect=lambda _, f: f())
+    def test_snapshot_on_gap(self, _):
+        self.handler.logical_device_events = \
+            type(self.handler.logical_device_events)(maxlen=2)
+        for i in xrange(4):
+            self.handler.send_logical_device_event(
+                LogicalDeviceEvent.REMOVED, LogicalDevice(id=str(i)))
+        with patch.object(self.handler, 'get_logical_device_snapshot',
+                          side_effect=self.snapshot):
+            events = self.receive(
+                LogicalDeviceEventsRequest(epoch=self.epoch, sequence=1), 1)
+        self.assertEqual(events[0].type, LogicalDeviceEvent.SNAPSHOT)
+        self.assertEqual(events[0].sequence, 4)
+
+
+class TestReceivePacketIns(TestCase):
+
+    def setUp(self):
+        core = Mock(packet_in_fan_out=FanOut())
+        self.handler = LocalHandler(core, 'instance', 'store')
+
+    def test_batches(self):
+        handler = self.handler
+        handler.packet_in_batch_size = 2
+        for i in xrange(3):
+            handler.send_packet_in('ld1', ofp_packet_in(buffer_id=i))
+        stream = handler.ReceivePacketInBatches(Empty(), Mock())
+        batches = [next(stream), next(stream)]
+        self.assertEqual([[p.packet_in.buffer_id for p in b.items]
+                          for b in batches], [[0, 1], [2]])
+        self.assertEqual(batches[0].items[0],
+                         PacketIn(id='ld1', packet_in=ofp_packet_in()))
+        handler.stopped = True
+        self.assertRaises(StopIteration, next, stream)
+        self.assertEqual(handler.streams, 0)
+
+    def test_ends_when_client_goes_away(self):
+        context = Mock()
+        stream = self.handler.ReceivePacketsIn(Empty(), context)
+        done = []
+        thread = Thread(target=lambda: done.append(list(stream)))
+        thread.start()
+        while not context.add_callback.called:
+            sleep(0.01)
+        # the callback gRPC makes when the RPC terminates
+        context.add_callback.call_args[0][0]()
+        thread.join(5)
+        self.assertEqual(done, [[]])
+        self.assertEqual(self.handler.streams, 0)
+
+    def test_stream_limit(self):
+        self.handler.max_streams = 1
+        self.handler.send_packet_in('ld1', ofp_packet_in())
+        first = self.handler.ReceivePacketsIn(Empty(), Mock())
+        next(first)
+        context = Mock()
+        self.assertEqual(
+            list(self.handler.ReceivePacketsIn(Empty(), context)), [])
+        context.set_code.assert_called_once_with(
+            StatusCode.RESOURCE_EXHAUSTED)
+
+
+class TestListRequests(TestCase):
+
+    def setUp(self):
+        self.handler = LocalHandler(None, 'instance', 'store')
+        self.handler.root = ConfigRoot(VolthaInstance(devices=[
+            Device(id=id, type='ponsim_olt') for id in 'cab']))
+
+    def context(self, **metadata):
+        return Mock(invocation_metadata=Mock(
+            return_value=tuple(metadata.iteritems())))
+
+    def test_page(self):
+        response = self.handler.ListDevices(
+            ListRequest(page_size=2), self.context())
+        self.assertEqual([d.id for d in response.items], ['a', 'b'])
+        self.assertEqual(response.next_page_token, 'b')
+
+    def test_invalid_request(self):
+        context = self.context()
+        response = self.handler.ListDevices(
+            ListRequest(filters=['unknown=x']), context)
+        self.assertEqual(len(response.items), 0)
+        context.set_code.assert_called_once_with(StatusCode.INVALID_ARGUMENT)
+
+    def test_conditional_reads(self):
+        request = ListRequest(page_size=2)
+        context = self.context()
+        self.handler.ListDevices(request, context)
+        (metadata,), _ = context.send_initial_metadata.call_args
+        etag = dict(metadata)['etag']
+
+        context = self.context(**{'if-none-match': etag})
+        response = self.handler.ListDevices(request, context)
+        self.assertEqual(response, Devices())
+        context.send_initial_metadata.assert_called_once_with(
+            (('etag', etag), ('not-modified', 'true')))
+
+        # the etag depends on the request
+        context = self.context(**{'if-none-match': etag})
+        response = self.handler.ListDevices(ListRequest(), context)
+        self.assertEqual(len(response.items), 3)
+
+        self.handler.root.update('/devices/a',
+                                 Device(id='a', type='ponsim_onu'))
+        context = self.context(**{'if-none-match': etag})
+        response = self.handler.ListDevices(request, context)
+        self.assertEqual(response.items[0].type, 'ponsim_onu')
+
+    def test_conditional_get(self):
+        context = self.context(**{'get-depth': '-1'})
+        self.handler.GetDevice(ID(id='a'), context)
+        (metadata,), _ = context.send_initial_metadata.call_args
+        etag = dict(metadata)['etag']
+
+        context = self.context(**{'if-none-match': etag, 'get-depth': '-1'})
+        self.assertEqual(self.handler.GetDevice(ID(id='a'), context),
+                         Device())
+        # an etag only stands for the depth it was read at
+        context = self.context(**{'if-none-match': etag})
+        self.assertEqual(self.handler.GetDevice(ID(id='a'), context),
+                         Device(id='a', type='ponsim_olt'))
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-
+from cPickle import dumps, loads, HIGHEST_PROTOCOL
 from unittest import main
 
 from mock import Mock
@@ -6,6 +6,8 @@ from mock import Mock
 from tests.utests.voltha.core.flow_helpers import FlowHelpers
 from voltha.core import logical_device_agent
 from voltha.core.flow_decomposer import *
+from voltha.core.flow_decomposition_pool import FlowDecompositionPool, \
+    DecompositionSnapshot, decompose_flows
 from voltha.core.logical_device_agent import LogicalDeviceAgent
 from voltha.protos import third_party
 from voltha.protos.device_pb2 import Device, Port
@@ -16,7 +18,11 @@ from voltha.protos.openflow_13_pb2 import Flows, FlowGroups
 class test_logical_device_agent(FlowHelpers):
 
     def setup_mock_registry(self):
-        registry = Mock()
+        components = {
+            'flow_decomposition':
+                FlowDecompositionPool(dict(inline=True)).start()
+        }
+        registry = Mock(side_effect=lambda name: components[name])
         logical_device_agent.registry = registry
 
     def setUp(self):
@@ -247,6 +253,130 @@ class test_logical_device_agent(FlowHelpers):
         ))
         self.assertEqual(len(self.flows.items), 4)
 
+    def test_add_overlapping_flow_is_refused(self):
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            priority=1000,
+            match_fields=[in_port(1), vlan_vid(4096 + 101)],
+            actions=[output(0)]
+        ))
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            priority=1000,
+            flags=ofp.OFPFF_CHECK_OVERLAP,
+            match_fields=[in_port(1), eth_type(0x800)],
+            actions=[output(0)]
+        ))
+        self.assertEqual(len(self.flows.items), 1)
+
+    def test_add_non_overlapping_flows(self):
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            priority=1000,
+            match_fields=[in_port(1), vlan_vid(4096 + 101)],
+            actions=[output(0)]
+        ))
+        # different value on a common field
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            priority=1000,
+            flags=ofp.OFPFF_CHECK_OVERLAP,
+            match_fields=[in_port(2), vlan_vid(4096 + 101)],
+            actions=[output(0)]
+        ))
+        # same match, but different priority
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            priority=900,
+            flags=ofp.OFPFF_CHECK_OVERLAP,
+            match_fields=[in_port(1), vlan_vid(4096 + 101)],
+            actions=[output(0)]
+        ))
+        self.assertEqual(len(self.flows.items), 3)
+
+    def test_find_overlapping_flows_after_delete(self):
+        flow_mod = mk_simple_flow_mod(
+            priority=1000,
+            match_fields=[in_port(1)],
+            actions=[output(0)]
+        )
+        self.lda.update_flow_table(flow_mod)
+        flows = list(self.flows.items)
+        self.assertEqual(
+            len(self.lda.find_overlapping_flows(flows, flow_mod)), 1)
+
+        self.lda.update_flow_table(mk_simple_flow_mod(
+            command=ofp.OFPFC_DELETE_STRICT,
+            priority=1000,
+            match_fields=[in_port(1)],
+            actions=[]
+        ))
+        flows = list(self.flows.items)
+        self.assertEqual(self.lda.find_overlapping_flows(flows, flow_mod), [])
+
+    def test_batch_update(self):
+        flows_updates = []
+        self.flows_proxy.update = lambda _, flows: flows_updates.append(flows)
+        groups_updates = []
+        self.groups_proxy.update = \
+            lambda _, groups: groups_updates.append(groups)
+
+        flow_mods = [
+            mk_simple_flow_mod(priority=1000, match_fields=[in_port(i)],
+                               actions=[output(0)])
+            for i in (1, 2)
+        ]
+        errors = self.lda.update_tables_batch(flow_mods + [
+            mk_multicast_group_mod(group_id=2, buckets=[]),
+            mk_simple_flow_mod(priority=1000, match_fields=[in_port(1)],
+                               flags=ofp.OFPFF_CHECK_OVERLAP, actions=[]),
+            mk_simple_flow_mod(command=ofp.OFPFC_MODIFY, match_fields=[],
+                               actions=[]),
+            mk_simple_flow_mod(command=ofp.OFPFC_DELETE_STRICT,
+                               priority=1000, match_fields=[in_port(2)],
+                               actions=[]),
+        ])
+
+        self.assertEqual(errors, [
+            None, None, None,
+            (ofp.OFPET_FLOW_MOD_FAILED, ofp.OFPFMFC_OVERLAP),
+            (ofp.OFPET_FLOW_MOD_FAILED, ofp.OFPFMFC_UNKNOWN),
+            None
+        ])
+        # one update of each table for the whole batch
+        self.assertEqual(len(flows_updates), 1)
+        self.assertFlowsEqual(flows_updates[0], Flows(items=[
+            flow_stats_entry_from_flow_mod_message(flow_mods[0])]))
+        self.assertEqual(len(groups_updates), 1)
+        self.assertEqual(len(groups_updates[0].items), 1)
+
+    def test_batch_group_mod_and_identical_flow(self):
+        flow_mod = mk_simple_flow_mod(priority=1000, match_fields=[in_port(1)],
+                                      actions=[output(0)])
+        self.lda.update_flow_table(flow_mod)
+
+        # the config tree calls back on changed tables only
+        def update_flows(_, flows):
+            if flows != self.flows:
+                self.flows = flows
+                self.lda._flow_table_updated(flows)
+        self.flows_proxy.update = update_flows
+
+        def update_groups(_, groups):
+            if groups != self.groups:
+                self.groups = groups
+                self.lda._group_table_updated(groups)
+        self.groups_proxy.update = update_groups
+
+        updates = []
+        self.lda._update_device_rules = \
+            lambda flows, groups: updates.append((list(flows), list(groups)))
+
+        group_mod = mk_multicast_group_mod(group_id=2, buckets=[
+            ofp.ofp_bucket(actions=[pop_vlan(), output(1)])])
+        errors = self.lda.update_tables_batch([group_mod, flow_mod])
+
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(len(updates), 1)
+        flows, groups = updates[0]
+        self.assertEqual(len(flows), 1)
+        self.assertEqual(groups, [group_entry_from_group_mod(group_mod)])
+
     # ~~~~~~~~~~~~~~~~~~~ TEST GROUP TABLE MANIPULATION ~~~~~~~~~~~~~~~~~~~~~~~
 
     def test_add_group(self):
@@ -382,6 +512,22 @@ class test_logical_device_agent(FlowHelpers):
         self.assertEqual(len(rules['onu2'][0]), 3)
         self.assertEqual(len(rules['onu2'][1]), 0)
 
+    def test_decomposition_snapshot_survives_pickling(self):
+        self.lda.get_all_default_rules()  # this will prepare the _routes
+        snapshot = DecompositionSnapshot(
+            self.lda.logical_device_id, self.lda._routes,
+            self.lda._default_rules, self.lda._nni_logical_port_no)
+        flows = [
+            mk_flow_stat(
+                priority=1000,
+                match_fields=[in_port(i), vlan_vid(4096 + 0)],
+                actions=[output(0)]
+            ) for i in (1, 2)
+        ]
+        args = loads(dumps((snapshot, flows, {}), HIGHEST_PROTOCOL))
+        self.assertEqual(decompose_flows(*args),
+                         [self.lda.decompose_flow(f, {}) for f in flows])
+
     def test_routes(self):
         self.lda.get_all_default_rules()  # this will prepare the _routes
         routes = self.lda._routes
@@ -426,6 +572,108 @@ class test_logical_device_agent(FlowHelpers):
         self.assertEqual(route[1].ingress_port, self.ports['olt'][1])
         self.assertEqual(route[1].egress_port, self.ports['olt'][0])
 
+    def test_routes_updated_per_port(self):
+        self.lda.get_all_default_rules()  # this will prepare the _routes
+        routes = self.lda._routes
+        onu2_port = self.ld_ports.pop(2)
+
+        self.lda._port_list_updated(onu2_port, removed=True)
+        self.assertEqual(set(routes.keys()), set([(0, 1), (1, 0)]))
+        self.assertIsNone(self.lda.get_route(2, None))
+
+        self.ld_ports.append(onu2_port)
+        self.lda._port_list_updated(onu2_port)
+        self.lda._port_list_updated(onu2_port)  # coalesced with the above
+        self.assertEqual(self.lda.get_route(2, None)[0].device,
+                         self.devices['onu2'])
+        self.assertIs(self.lda._routes, routes)  # not recomputed
+        self.assertEqual(set(routes.keys()),
+                         set([(0, 1), (0, 2), (1, 0), (2, 0)]))
+        self.assertEqual(self.lda.get_route(None, 0)[1].device,
+                         self.devices['olt'])
+
+    def test_root_port_change_rebuilds_routes(self):
+        flows = [mk_flow_stat(
+            priority=1000,
+            match_fields=[in_port(1), vlan_vid(4096 + 0)],
+            actions=[output(0)]
+        )]
+        self.lda.decompose_rules(flows, [])
+        routes = self.lda._routes
+
+        # the NNI port moves to another port of the root device
+        root_port = self.ld_ports[0]
+        root_port.device_port_no = 2
+        self.ports['olt'].append(
+            Port(port_no=2, type=Port.ETHERNET_NNI, device_id='olt'))
+        del self.ports['olt'][0]
+        self.lda._port_list_updated(root_port)
+        self.assertIsNone(self.lda._decomposition_cache)
+
+        device_rules = self.lda.decompose_rules(flows, [])
+        self.assertIsNot(self.lda._routes, routes)
+        self.assertEqual(self.lda.get_route(1, 0)[1].egress_port.port_no, 2)
+        olt_flows, _ = device_rules['olt']
+        self.assertEqual(
+            [get_out_port(f) for f in olt_flows.itervalues()], [1, 2])
+
+    def test_port_routed_once_its_link_is_visible(self):
+        self.lda.get_all_default_rules()  # this will prepare the _routes
+        routes = self.lda._routes
+        onu2_port = self.ld_ports[2]
+        self.lda._port_list_updated(onu2_port, removed=True)
+
+        # the port is added before the root device links to its device
+        del self.ports['olt'][1].peers[1]
+        self.ports['onu2'][1].peers[0].port_no = 2
+        self.lda._port_list_updated(onu2_port)
+        self.assertIsNone(self.lda.get_route(2, None))
+        self.assertIsNone(self.lda.get_route(2, None))
+
+        # a second PON port of the root device shows up
+        self.ports['olt'].append(Port(
+            port_no=2, type=Port.PON_OLT, device_id='olt',
+            peers=[Port.PeerPort(device_id='onu2', port_no=1)]))
+        self.assertEqual(self.lda.get_route(2, None)[0].device,
+                         self.devices['onu2'])
+        self.assertEqual(self.lda.get_route(0, 2)[0].egress_port.port_no, 2)
+        self.assertIs(self.lda._routes, routes)  # not recomputed
+        self.assertEqual(self.lda._pending_ports, {})
+
+    def test_flow_decomposed_again_once_its_port_is_routed(self):
+        self.lda.get_all_default_rules()  # this will prepare the _routes
+        onu2_port = self.ld_ports[2]
+        self.lda._port_list_updated(onu2_port, removed=True)
+
+        # the port is added before the root device links to its device
+        del self.ports['olt'][1].peers[1]
+        self.ports['onu2'][1].peers[0].port_no = 2
+        self.lda._port_list_updated(onu2_port)
+        flows = [mk_flow_stat(
+            priority=1000,
+            match_fields=[in_port(2), vlan_vid(4096 + 0)],
+            actions=[output(0)]
+        )]
+        device_rules = self.lda.decompose_rules(flows, [])
+        self.assertEqual(len(device_rules['olt'][0]), 1)  # default rule
+
+        # a second PON port of the root device shows up
+        self.ports['olt'].append(Port(
+            port_no=2, type=Port.PON_OLT, device_id='olt',
+            peers=[Port.PeerPort(device_id='onu2', port_no=1)]))
+        self.assertIsNotNone(self.lda.get_route(2, 0))
+        device_rules = self.lda.decompose_rules(flows, [])
+        self.assertEqual(len(device_rules['olt'][0]), 2)
+
+    def test_unrouted_port_of_initial_routes_is_retried(self):
+        self.ports['onu2'][1].peers[0].port_no = 2
+        self.lda.get_all_default_rules()  # this will prepare the _routes
+        self.assertIsNone(self.lda.get_route(2, None))
+
+        self.ports['onu2'][1].peers[0].port_no = 1
+        self.assertEqual(self.lda.get_route(2, None)[0].device,
+                         self.devices['onu2'])
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~ FLOW DECOMP TESTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def test_eapol_flow_decomp_case(self):
@@ -0,0 +1,124 @@
+from unittest import TestCase, main
+
+from google.protobuf.field_mask_pb2 import FieldMask
+
+from voltha.core.paging import select, merge_pages
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import Device, Devices, Port
+from voltha.protos.common_pb2 import OperStatus
+from voltha.protos.openflow_13_pb2 import ofp_group_entry, ofp_group_desc
+from voltha.protos.voltha_pb2 import ListRequest
+
+_ = third_party
+
+
+def device(id, type='ponsim_olt', oper_status=OperStatus.ACTIVE):
+    return Device(id=id, type=type, oper_status=oper_status,
+                  serial_number='sn-' + id)
+
+
+class TestSelect(TestCase):
+
+    def setUp(self):
+        self.devices = [device(id) for id in 'dbeac']
+
+    def ids(self, items):
+        return ''.join(item.id for item in items)
+
+    def test_no_options(self):
+        items, token = select(self.devices, ListRequest())
+        self.assertEqual(self.ids(items), 'dbeac')
+        self.assertEqual(token, '')
+
+    def test_pages(self):
+        pages = []
+        token = ''
+        while True:
+            items, token = select(
+                self.devices, ListRequest(page_size=2, page_token=token))
+            pages.append(self.ids(items))
+            if not token:
+                break
+        self.assertEqual(pages, ['ab', 'cd', 'e'])
+
+    def test_page_after_removed_item(self):
+        items, token = select(self.devices, ListRequest(page_size=2))
+        del self.devices[3]  # 'a'
+        del self.devices[1]  # 'b', the last item of the page
+        items, token = select(
+            self.devices, ListRequest(page_size=2, page_token=token))
+        self.assertEqual(self.ids(items), 'cd')
+
+    def test_numeric_key(self):
+        ports = [Port(port_no=n) for n in (10, 9, 100)]
+        items, token = select(ports, ListRequest(page_size=2),
+                              key='port_no')
+        self.assertEqual([p.port_no for p in items], [9, 10])
+        items, token = select(ports, ListRequest(page_token=token),
+                              key='port_no')
+        self.assertEqual([p.port_no for p in items], [100])
+        self.assertRaises(ValueError, select, ports,
+                          ListRequest(page_token='x'), key='port_no')
+
+    def test_nested_key(self):
+        groups = [ofp_group_entry(desc=ofp_group_desc(group_id=n))
+                  for n in (3, 1, 2)]
+        items, token = select(groups, ListRequest(page_size=2),
+                              key='desc.group_id')
+        self.assertEqual([g.desc.group_id for g in items], [1, 2])
+        self.assertEqual(token, '2')
+
+    def test_filters(self):
+        self.devices[0].type = 'ponsim_onu'
+        self.devices[1].oper_status = OperStatus.FAILED
+        request = ListRequest(filters=['type=ponsim_olt',
+                                       'oper_status=ACTIVE'])
+        items, _ = select(self.devices, request)
+        self.assertEqual(self.ids(items), 'eac')
+        request = ListRequest(filters=['oper_status={}'.format(
+            OperStatus.FAILED)])
+        items, _ = select(self.devices, request)
+        self.assertEqual(self.ids(items), 'b')
+
+    def test_invalid_filters(self):
+        for condition in ('type', '=x', 'unknown=x', 'type.x=y',
+                          'proxy_address=x'):
+            self.assertRaises(ValueError, select, self.devices,
+                              ListRequest(filters=[condition]))
+
+    def test_field_mask(self):
+        request = ListRequest(field_mask=FieldMask(paths=['type']))
+        items, _ = select(self.devices[:1], request)
+        self.assertEqual(items, [Device(id='d', type='ponsim_olt')])
+        request = ListRequest(field_mask=FieldMask(paths=['unknown']))
+        self.assertRaises(ValueError, select, self.devices, request)
+
+
+class TestMergePages(TestCase):
+
+    def test_merge(self):
+        request = ListRequest(page_size=2)
+        # pages returned by two instances, as merged by the dispatcher
+        response = Devices(items=[device('a'), device('c'), device('b')],
+                           next_page_token='c')
+        merge_pages(response, request)
+        self.assertEqual([d.id for d in response.items], ['a', 'b'])
+        self.assertEqual(response.next_page_token, 'b')
+
+    def test_last_page(self):
+        request = ListRequest(page_size=3, page_token='a')
+        response = Devices(items=[device('c'), device('b')])
+        merge_pages(response, request)
+        self.assertEqual([d.id for d in response.items], ['b', 'c'])
+        self.assertEqual(response.next_page_token, '')
+
+    def test_more_on_one_instance(self):
+        request = ListRequest(page_size=2)
+        response = Devices(items=[device('a'), device('b')],
+                           next_page_token='b')
+        merge_pages(response, request)
+        self.assertEqual(response.next_page_token, 'b')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+from unittest import TestCase, main
+
+from grpc import ChannelConnectivity
+from mock import Mock, patch
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from voltha.core.peer_channels import PeerChannels
+from voltha.protos.voltha_pb2 import HealthStatus
+
+
+class TestPeerChannels(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.channels = []
+        patcher = patch('voltha.core.peer_channels.grpc.insecure_channel',
+                        side_effect=self.new_channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.peers = PeerChannels(50055, health_check_interval=5,
+                                  failure_threshold=2, backoff_initial=1,
+                                  clock=self.clock).start()
+        self.probes = []
+        self.peers._get_health = self.get_health
+        self.peers.update({'0001': {'host': 'a'}, '0002': {'host': 'b'}})
+        self.addCleanup(self.peers.stop)
+
+    def new_channel(self, target):
+        channel = Mock(target=target)
+        self.channels.append(channel)
+        return channel
+
+    def get_health(self, peer):
+        d = Deferred()
+        self.probes.append((peer.core_id, d))
+        return d
+
+    def answer_probes(self, state=HealthStatus.HEALTHY):
+        probes, self.probes = self.probes, []
+        for _, d in probes:
+            d.callback(HealthStatus(state=state))
+
+    def test_channels_kept_across_membership_changes(self):
+        self.assertEqual([c.target for c in self.channels],
+                         ['a:50055', 'b:50055'])
+        channel = self.peers.get_channel('0001')
+        self.peers.update({'0001': {'host': 'a'}, '0002': None,
+                           '0003': {'host': 'c'}})
+        self.assertIs(self.peers.get_channel('0001'), channel)
+        self.assertIsNone(self.peers.get_channel('0002'))
+        self.assertEqual(self.channels[-1].target, 'c:50055')
+        self.assertEqual(sorted(self.peers.available_peers()),
+                         ['0001', '0003'])
+
+    def test_circuit_opens_on_failures(self):
+        self.peers.record_failure('0001')
+        self.peers.record_success('0001')
+        self.peers.record_failure('0001')
+        self.assertIsNotNone(self.peers.get_channel('0001'))
+        self.peers.record_failure('0001')
+        self.assertIsNone(self.peers.get_channel('0001'))
+        self.assertEqual(self.peers.available_peers(), ['0002'])
+
+        # after the backoff, the peer is reconnected and probed
+        self.clock.advance(1)
+        self.assertEqual(len(self.channels), 3)
+        self.assertEqual([core_id for core_id, _ in self.probes], ['0001'])
+        self.probes[0][1].errback(Exception('unavailable'))
+        self.probes = []
+        self.assertIsNone(self.peers.get_channel('0001'))
+
+        # backoff doubles on every failed probe
+        self.clock.advance(0.9)
+        self.assertEqual(self.probes, [])
+        self.clock.advance(1.1)
+        self.answer_probes()
+        self.assertIs(self.peers.get_channel('0001'), self.channels[-1])
+
+    def test_connectivity_loss_and_recovery(self):
+        peer = self.peers.peers['0001']
+        self.peers._connectivity_changed(
+            peer, peer.channel, ChannelConnectivity.TRANSIENT_FAILURE)
+        self.assertIsNone(self.peers.get_channel('0001'))
+
+        # the peer is probed as soon as the channel is ready again
+        self.peers._connectivity_changed(
+            peer, peer.channel, ChannelConnectivity.READY)
+        self.answer_probes()
+        self.assertIsNotNone(self.peers.get_channel('0001'))
+        self.assertFalse(self.clock.getDelayedCalls()[1:])
+
+    def test_stale_probe_leaves_current_one_pending(self):
+        self.clock.advance(5)
+        stale = [d for core_id, d in self.probes if core_id == '0001']
+        self.probes = []
+        peer = self.peers.peers['0001']
+        self.peers._connectivity_changed(
+            peer, peer.channel, ChannelConnectivity.TRANSIENT_FAILURE)
+        self.clock.advance(1)  # reconnected and probed
+        self.assertEqual([core_id for core_id, _ in self.probes], ['0001'])
+
+        # the probe of the former channel completes, while the one of the
+        # current channel is still on
+        stale[0].callback(HealthStatus(state=HealthStatus.HEALTHY))
+        self.assertIsNone(self.peers.get_channel('0001'))
+        self.peers._connectivity_changed(
+            peer, peer.channel, ChannelConnectivity.READY)
+        self.assertEqual(len(self.probes), 1)
+
+        self.answer_probes()
+        self.assertIs(self.peers.get_channel('0001'), self.channels[-1])
+
+    def test_health_checks(self):
+        self.clock.advance(5)
+        self.assertEqual(sorted(core_id for core_id, _ in self.probes),
+                         ['0001', '0002'])
+        self.probes.pop(0)[1].callback(
+            HealthStatus(state=HealthStatus.OVERLOADED))
+        self.probes.pop(0)[1].callback(
+            HealthStatus(state=HealthStatus.HEALTHY))
+        self.assertEqual(self.peers.available_peers(), ['0002', '0001'])
+
+        self.clock.advance(5)
+        self.answer_probes(HealthStatus.DYING)
+        self.assertEqual(self.peers.available_peers(), [])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import os
+from tempfile import mkdtemp
+from shutil import rmtree
+from unittest import TestCase, main
+
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from voltha.northbound.kafka.batch_producer import BatchProducer, \
+    DROP_NEWEST, DROP_OLDEST, SPOOL
+
+
+class FakeBroker(object):
+    """
+    Records the produce requests, and acknowledges them on demand
+    """
+
+    def __init__(self):
+        self.requests = []  # (topic, msgs, Deferred)
+        self.log = []  # messages acknowledged, in order
+
+    def send_batch(self, topic, msgs):
+        d = Deferred()
+        self.requests.append((topic, msgs, d))
+        return d
+
+    def ack(self, count=None):
+        requests = self.requests[:count]
+        del self.requests[:len(requests)]
+        for topic, msgs, d in requests:
+            self.log.extend(msgs)
+            d.callback(None)
+
+    def fail(self):
+        topic, msgs, d = self.requests.pop(0)
+        d.errback(Exception('broker-down'))
+
+
+class TestBatchProducer(TestCase):
+
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.clock = Clock()
+        self.failures = []
+
+    def producer(self, **kw):
+        kw.setdefault('linger', 1)
+        kw.setdefault('max_batch_bytes', 10)
+        kw.setdefault('max_in_flight', 1)
+        kw.setdefault('max_queued_bytes', 20)
+        return BatchProducer(self.broker.send_batch, clock=self.clock,
+                             on_failure=self.failures.append, **kw)
+
+    def test_linger(self):
+        producer = self.producer()
+        producer.send('a', 'x')
+        producer.send('b', 'y')
+        producer.send('a', 'z')
+        self.assertEqual(self.broker.requests, [])
+        self.clock.advance(1)
+        self.assertEqual([(t, m) for t, m, _ in self.broker.requests[:1]],
+                         [('a', ['x', 'z'])])
+        self.broker.ack()
+        self.broker.ack()
+        self.assertEqual(self.broker.log, ['x', 'z', 'y'])
+        self.assertEqual(producer.get_metrics('p')['p-batches'], 2)
+
+    def test_full_batch_is_sent_right_away(self):
+        producer = self.producer(max_in_flight=2)
+        for msg in ('01234', '56789', 'abc'):
+            producer.send('a', msg)
+        self.assertEqual([m for _, m, _ in self.broker.requests],
+                         [['01234', '56789']])
+        self.clock.advance(1)
+        self.assertEqual(len(self.broker.requests), 2)
+
+    def test_in_flight_window(self):
+        producer = self.producer()
+        for msg in ('0123456789', 'abcdefghij', 'k'):
+            producer.send('a', msg)
+        self.assertEqual(len(self.broker.requests), 1)
+        self.broker.ack()
+        self.assertEqual(len(self.broker.requests), 1)
+        self.broker.ack()
+        self.broker.ack()
+        self.assertEqual(self.broker.log, ['0123456789', 'abcdefghij', 'k'])
+        self.assertEqual(producer.in_flight, 0)
+
+    def test_backpressure(self):
+        producer = self.producer()
+        for msg in ('0123456789', 'abcdefghij', 'klmnopqrst'):
+            producer.send('a', msg)
+        ready = producer.when_ready()
+        self.assertFalse(ready.called)
+        self.broker.ack()
+        self.assertTrue(ready.called)
+
+    def test_flush(self):
+        producer = self.producer()
+        self.assertTrue(producer.flush().called)
+        for msg in ('0123456789', 'a', 'b'):
+            producer.send('a', msg)
+        producer.send('b', 'c')
+        drained = producer.flush()
+        self.assertEqual(len(self.broker.requests), 1)  # window of one
+        self.broker.ack()
+        self.broker.ack()
+        self.assertFalse(drained.called)
+        self.broker.fail()
+        self.assertTrue(drained.called)
+        self.assertEqual(self.broker.log, ['0123456789', 'a', 'b'])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_drop_newest(self):
+        producer = self.producer(overflow=DROP_NEWEST)
+        sent = [producer.send('a', msg)
+                for msg in ('0123456789', 'abcdefghij', 'klmnopqrst',
+                            'uvwxyz0123')]
+        self.assertEqual(sent, [True, True, True, False])
+        self.broker.ack()
+        self.broker.ack()
+        self.broker.ack()
+        self.assertEqual(self.broker.log,
+                         ['0123456789', 'abcdefghij', 'klmnopqrst'])
+        self.assertEqual(producer.get_metrics('p')['p-dropped'], 1)
+
+    def test_drop_oldest(self):
+        producer = self.producer(overflow=DROP_OLDEST)
+        producer.send('a', '0123456789')  # in flight
+        producer.send('a', 'abcdefghij')
+        producer.send('b', 'klmnopqrst')
+        producer.send('a', 'uvwxyz0123')
+        self.broker.ack()
+        self.clock.advance(1)
+        self.broker.ack()
+        self.broker.ack()
+        self.assertEqual(self.broker.log,
+                         ['0123456789', 'klmnopqrst', 'uvwxyz0123'])
+        self.assertEqual(producer.dropped, 1)
+
+    def test_spool(self):
+        spool_dir = mkdtemp()
+        try:
+            producer = self.producer(
+                overflow=SPOOL, spool_path=os.path.join(spool_dir, 'spool'))
+            msgs = ['{:010}'.format(i) for i in xrange(6)]
+            for msg in msgs:
+                self.assertTrue(producer.send('a', msg))
+            self.assertEqual(producer.get_metrics('p')['p-spooled'], 3)
+            while self.broker.requests:
+                self.broker.ack()
+            self.assertEqual(self.broker.log, msgs)
+            self.assertEqual(producer.spool.count, 0)
+            producer.stop()
+        finally:
+            rmtree(spool_dir)
+
+    def test_failure(self):
+        producer = self.producer()
+        producer.send('a', '0123456789')
+        self.broker.fail()
+        self.assertEqual(len(self.failures), 1)
+        self.assertEqual(producer.get_metrics('p')['p-failed'], 1)
+        producer.send('a', 'abcdefghij')
+        self.broker.ack()
+        self.assertEqual(self.broker.log, ['abcdefghij'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from unittest import TestCase, main
+
+from mock import patch
+from twisted.internet.defer import Deferred
+
+from common.event_bus import EventBusClient
+from common.utils.event_codec import decode
+from voltha.northbound.kafka.event_bus_publisher import EventBusPublisher
+from voltha.protos import third_party
+from voltha.protos.events_pb2 import KpiEvent, MetricValuePairs
+
+_ = third_party
+
+
+class FakeKafkaProxy(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, topic, msg):
+        self.sent.append((topic, msg))
+
+
+def kpi_event(ts, metrics=0):
+    return KpiEvent(ts=ts, prefixes={
+        'voltha.ponsim_olt.abc': MetricValuePairs(metrics=dict(
+            ('metric-{}'.format(i), float(i)) for i in xrange(metrics)))})
+
+
+class TestEventBusPublisher(TestCase):
+
+    def setUp(self):
+        self.kafka_proxy = FakeKafkaProxy()
+        self.publisher = EventBusPublisher(self.kafka_proxy, dict(
+            offload_threshold=1000,
+            queue_size=None,  # forward as events are published
+            topic_mappings={
+                'kpis': dict(kafka_topic='voltha.kpis'),
+                'alarms': dict(kafka_topic='voltha.alarms',
+                               format='protobuf'),
+            })).start()
+        self.event_bus = EventBusClient()
+
+    def tearDown(self):
+        self.publisher.stop()
+
+    def sent(self, topic):
+        return [decode(msg)['ts'] for t, msg in self.kafka_proxy.sent
+                if t == topic]
+
+    def test_formats(self):
+        self.event_bus.publish('kpis', kpi_event(1))
+        self.event_bus.publish('alarms', kpi_event(2))
+        (_, json_value), (_, protobuf_value) = self.kafka_proxy.sent
+        self.assertEqual(json_value[0], '{')
+        self.assertEqual(protobuf_value[0], '\x00')
+        self.assertEqual(self.sent('voltha.kpis'), [1])
+        self.assertEqual(self.sent('voltha.alarms'), [2])
+
+    def test_large_events_keep_order(self):
+        encodings = []
+
+        def defer_to_thread(f, *args):
+            d = Deferred()
+            encodings.append((d, f, args))
+            return d
+
+        with patch('voltha.northbound.kafka.event_bus_publisher.threads.'
+                   'deferToThread', defer_to_thread):
+            self.event_bus.publish('kpis', kpi_event(1))
+            self.event_bus.publish('kpis', kpi_event(2, metrics=100))
+            self.event_bus.publish('kpis', kpi_event(3))
+            self.event_bus.publish('kpis', kpi_event(4, metrics=100))
+            self.event_bus.publish('alarms', kpi_event(5))
+            self.assertEqual(self.sent('voltha.kpis'), [1])
+            self.assertEqual(self.sent('voltha.alarms'), [5])
+            self.assertEqual(len(encodings), 2)
+
+            # the second large event is encoded first
+            d, f, args = encodings[1]
+            d.callback(f(*args))
+            self.assertEqual(self.sent('voltha.kpis'), [1])
+
+            d, f, args = encodings[0]
+            d.callback(f(*args))
+            self.assertEqual(self.sent('voltha.kpis'), [1, 2, 3, 4])
+            self.assertEqual(self.publisher.backlogs, {})
+
+            self.event_bus.publish('kpis', kpi_event(6))
+            self.assertEqual(self.sent('voltha.kpis'), [1, 2, 3, 4, 6])
+
+    def test_failed_encoding_is_skipped(self):
+        encodings = []
+
+        def defer_to_thread(f, *args):
+            d = Deferred()
+            encodings.append(d)
+            return d
+
+        with patch('voltha.northbound.kafka.event_bus_publisher.threads.'
+                   'deferToThread', defer_to_thread):
+            self.event_bus.publish('kpis', kpi_event(1, metrics=100))
+            self.event_bus.publish('kpis', kpi_event(2))
+            encodings[0].errback(ValueError('cannot encode'))
+            self.assertEqual(self.sent('voltha.kpis'), [2])
+
+
+if __name__ == '__main__':
+    main()
@@ -549,6 +549,32 @@ class IAdapterAgent(Interface):
         :return: None
         """
 
+    def update_flow_stats(device_id, flow_id, packet_count, byte_count,
+                          duration_sec=0, duration_nsec=0):
+        """
+        Update the counters of a flow. Counters are kept in memory only and
+        updating them does not change the device's flow table.
+        :param device_id: id of the device (or logical device)
+        :param flow_id: id of the flow (ofp_flow_stats entry)
+        :return: None
+        """
+
+    def update_port_stats(device_id, port_stats):
+        """
+        Update the counters of a port. Counters are kept in memory only.
+        :param device_id: id of the device (or logical device)
+        :param port_stats: A protobuf message of ofp_port_stats type.
+        :return: None
+        """
+
+    def update_meter_stats(device_id, meter_stats):
+        """
+        Update the counters of a meter. Counters are kept in memory only.
+        :param device_id: id of the device (or logical device)
+        :param meter_stats: A protobuf message of ofp_meter_stats type.
+        :return: None
+        """
+
     def register_for_onu_detect_state(proxy_address):
         """
 
@@ -45,7 +45,7 @@ from voltha.protos.openflow_13_pb2 import OFPPS_LIVE, OFPPF_FIBER, \
     OFPPF_1GB_FD, \
     OFPC_GROUP_STATS, OFPC_PORT_STATS, OFPC_TABLE_STATS, OFPC_FLOW_STATS, \
     ofp_switch_features, ofp_desc
-from voltha.protos.openflow_13_pb2 import ofp_port
+from voltha.protos.openflow_13_pb2 import ofp_port, ofp_port_stats
 from voltha.protos.ponsim_pb2 import FlowTable
 from voltha.registry import registry
 
@@ -147,6 +147,25 @@ class AdapterPmMetrics:
                         rtrn_pon_metrics[p.name] = p.value
                 return rtrn_pon_metrics
 
+    def make_port_stats(self, port_no, metrics):
+        """
+        Build the OpenFlow statistics of a port out of its collected
+        metrics. Ponsim only counts packets, so the other counters are
+        reported as unsupported.
+        """
+        unsupported = 0xffffffffffffffff
+        return ofp_port_stats(
+            port_no=port_no,
+            rx_packets=sum(v for k, v in metrics.iteritems()
+                           if k.startswith('rx_')),
+            tx_packets=sum(v for k, v in metrics.iteritems()
+                           if k.startswith('tx_')),
+            rx_bytes=unsupported, tx_bytes=unsupported,
+            rx_dropped=unsupported, tx_dropped=unsupported,
+            rx_errors=unsupported, tx_errors=unsupported,
+            rx_frame_err=unsupported, rx_over_err=unsupported,
+            rx_crc_err=unsupported, collisions=unsupported)
+
     def start_collector(self, callback):
         log.info("starting-pm-collection", device_name=self.name,
                  device_id=self.device.id)
@@ -829,6 +848,13 @@ class PonSimOltHandler(object):
                 # Step 3: submit
                 self.adapter_agent.submit_kpis(kpi_event)
 
+                # Step 4: refresh the statistics of the logical NNI port
+                if self.logical_device_id is not None:
+                    self.adapter_agent.update_port_stats(
+                        self.logical_device_id,
+                        self.pm_metrics.make_port_stats(
+                            self.ofp_port_no, port_metrics['nni'] or {}))
+
             except Exception as e:
                 log.exception('failed-to-submit-kpis', e=e)
 
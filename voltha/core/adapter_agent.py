@@ -816,6 +816,20 @@ class AdapterAgent(object):
             self.log.exception('failed-kpi-submission',
                                type=type(kpi_event_msg))
 
+    # ~~~~~~~~~~~~~~~~ Handling flow, port and meter statistics ~~~~~~~~~~~~~~
+
+    def update_flow_stats(self, device_id, flow_id, packet_count, byte_count,
+                          duration_sec=0, duration_nsec=0):
+        self.core.counter_store.update_flow_counters(
+            device_id, flow_id, packet_count, byte_count,
+            duration_sec, duration_nsec)
+
+    def update_port_stats(self, device_id, port_stats):
+        self.core.counter_store.update_port_counters(device_id, port_stats)
+
+    def update_meter_stats(self, device_id, meter_stats):
+        self.core.counter_store.update_meter_counters(device_id, meter_stats)
+
     # ~~~~~~~~~~~~~~~~~~~ Handle alarm submissions ~~~~~~~~~~~~~~~~~~~~~
 
     def create_alarm(self, id=None, resource_id=None, description=None,
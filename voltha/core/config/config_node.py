@@ -210,6 +210,30 @@ class ConfigNode(object):
             child_node = child_rev.node
             return child_node._get(child_rev, path, depth)
 
+    def _get_revs(self, rev, path):
+        """
+        :return: the revision of the node at path, or the list of revisions
+        of the items of the list at path
+        """
+        if not path:
+            return rev
+
+        name, _, path = path.partition('/')
+        field = children_fields(self._type)[name]
+        children = rev._children[name]
+        if not field.is_container:
+            child_rev = children[0]
+            return child_rev.node._get_revs(child_rev, path)
+        if not path:
+            return children
+        if not field.key:
+            raise LookupError(
+                'Cannot index into container with no key defined')
+        key, _, path = path.partition('/')
+        _, child_rev = find_rev_by_key(
+            children, field.key, field.key_from_str(key))
+        return child_rev.node._get_revs(child_rev, path)
+
     def _do_get(self, rev, depth):
         msg = rev.get(depth)
         if self._proxy is not None:
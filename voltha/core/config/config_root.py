@@ -13,11 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from collections import OrderedDict
+from hashlib import md5
+from threading import Lock
 from uuid import uuid4
 
 import structlog
 from simplejson import dumps, loads
+from twisted.internet import reactor
+from twisted.python.threadable import isInIOThread
 
+from common.utils.metrics import counter, histogram
 from voltha.core.config.config_node import ConfigNode
 from voltha.core.config.config_rev import ConfigRevision
 from voltha.core.config.config_rev_persisted import PersistedConfigRevision
@@ -25,6 +31,9 @@ from voltha.core.config.merge_3way import MergeConflictException
 
 log = structlog.get_logger()
 
+_commits = counter('config-commits')
+_write_latency = histogram('config-write-latency')
+
 
 class ConfigRoot(ConfigNode):
 
@@ -34,9 +43,13 @@ class ConfigRoot(ConfigNode):
         '_loading',
         '_rev_cls',
         '_deferred_callback_queue',
-        '_notification_deferred_callback_queue'
+        '_notification_deferred_callback_queue',
+        '_read_cache',
+        '_read_cache_lock'
     )
 
+    read_cache_size = 256  # data of the latest versioned reads
+
     def __init__(self, initial_data, kv_store=None, rev_cls=ConfigRevision):
         self._kv_store = kv_store
         self._dirty_nodes = {}
@@ -47,6 +60,8 @@ class ConfigRoot(ConfigNode):
         self._rev_cls = rev_cls
         self._deferred_callback_queue = []
         self._notification_deferred_callback_queue = []
+        self._read_cache = OrderedDict()  # (hash, depth) -> data
+        self._read_cache_lock = Lock()
         super(ConfigRoot, self).__init__(self, initial_data, False)
 
     @property
@@ -85,8 +100,88 @@ class ConfigRoot(ConfigNode):
         finally:
             self.execute_deferred_callbacks()
 
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Lock-free reads ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def read(self, path=None, depth=0):
+        """
+        Read from the latest committed revision of the tree; unlike get(),
+        this is safe to call from any thread.
+
+        Revisions are never modified once made, and a new root revision is
+        only published, by a single reference assignment, once an update is
+        complete. A read against the root revision latest at its start thus
+        sees a consistent tree without any locking, while the reactor thread
+        goes on committing newer revisions.
+        :param path: path of the node to read
+        :param depth: as for get()
+        :return: the data read
+        """
+        if isInIOThread():
+            return self.get(path, depth=depth)
+
+        path = '' if path is None else path.lstrip('/')
+        # Pin the root revision, and with it the revisions read, until the
+        # read completes, then release it on the reactor thread: that is
+        # where they must be pruned, as pruning may touch the kv store.
+        pinned = [self._branches[None]._latest]
+        try:
+            return self._get(pinned[0], path, depth)
+        except KeyError, e:
+            # drop the traceback, which references the revisions walked
+            raise KeyError(*e.args)
+        finally:
+            reactor.callFromThread(pinned.pop)
+
+    def read_versioned(self, path=None, depth=0, if_none_match=None):
+        """
+        As read(), also returning the hash of the data read, for clients to
+        find out whether it changed since they last read it.
+
+        The hash is the one of the revision read, or, for a list, derived
+        from the ones of its items. As a hash identifies the content of its
+        revisions, the data recently read is cached by hash, and must not be
+        modified.
+        :param path: path of the node or list to read
+        :param depth: as for get()
+        :param if_none_match: hash the caller got from a previous read
+        :return: (hash, data read), with None as data if the hash is still
+        if_none_match
+        """
+        path = '' if path is None else path.lstrip('/')
+        pinned = [self._branches[None]._latest]
+        try:
+            revs = self._get_revs(pinned[0], path)
+            if isinstance(revs, list):
+                hash = md5(''.join(rev._hash for rev in revs)).hexdigest()[:12]
+            else:
+                hash = revs._hash
+            if hash == if_none_match:
+                return hash, None
+
+            key = (hash, depth)
+            with self._read_cache_lock:
+                data = self._read_cache.pop(key, None)
+                if data is not None:
+                    self._read_cache[key] = data
+                    return hash, data
+
+            data = self._get(pinned[0], path, depth)
+            with self._read_cache_lock:
+                self._read_cache[key] = data
+                if len(self._read_cache) > self.read_cache_size:
+                    self._read_cache.popitem(last=False)
+            return hash, data
+        except KeyError, e:
+            raise KeyError(*e.args)
+        finally:
+            if isInIOThread():
+                pinned.pop()
+            else:
+                reactor.callFromThread(pinned.pop)
+
     # ~~~~~~ Overridden, root-level CRUD methods to handle transactions ~~~~~~~
 
+    @_write_latency.timed
     def update(self, path, data, strict=None, txid=None, mk_branch=None):
         assert mk_branch is None
         self.check_callback_queue()
@@ -106,6 +201,7 @@ class ConfigRoot(ConfigNode):
             self.execute_deferred_callbacks()
         return res
 
+    @_write_latency.timed
     def add(self, path, data, txid=None, mk_branch=None):
         assert mk_branch is None
         self.check_callback_queue()
@@ -124,6 +220,7 @@ class ConfigRoot(ConfigNode):
             self.execute_deferred_callbacks()
         return res
 
+    @_write_latency.timed
     def remove(self, path, txid=None, mk_branch=None):
         assert mk_branch is None
         self.check_callback_queue()
@@ -195,6 +292,8 @@ class ConfigRoot(ConfigNode):
 
     def _make_latest(self, branch, *args, **kw):
         super(ConfigRoot, self)._make_latest(branch, *args, **kw)
+        if branch._txid is None:
+            _commits.inc()
         # only persist the committed branch
         if self._kv_store is not None and branch._txid is None:
             root_data = dict(
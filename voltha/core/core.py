@@ -18,21 +18,21 @@
 Voltha's CORE components.
 """
 
-from Queue import Queue
-
 import structlog
 from twisted.internet.defer import inlineCallbacks, returnValue
 from zope.interface import implementer
 
+from common.utils.fan_out import FanOut
 from voltha.core.alarm_filter_agent import AlarmFilterAgent
 from voltha.core.config.config_proxy import CallbackType
+from voltha.core.counter_store import CounterStore
 from voltha.core.device_agent import DeviceAgent
 from voltha.core.dispatcher import Dispatcher
 from voltha.core.global_handler import GlobalHandler
 from voltha.core.local_handler import LocalHandler
 from voltha.core.logical_device_agent import LogicalDeviceAgent
 from voltha.protos.voltha_pb2 import \
-    Device, LogicalDevice, AlarmFilter
+    Device, LogicalDevice, AlarmFilter, LogicalDeviceEvent
 from voltha.registry import IComponent
 from xpon_agent import XponAgent
 from xpon_handler import XponHandler
@@ -78,8 +78,11 @@ class VolthaCore(object):
         self.device_agents = {}
         self.logical_device_agents = {}
         self.alarm_filter_agent = None
-        self.packet_in_queue = Queue()
-        self.change_event_queue = Queue()
+        # delivered to all streams receiving them; packet-ins are dropped
+        # past this backlog per stream, e.g., during storms
+        self.packet_in_fan_out = FanOut(maxsize=10000)
+        self.change_event_fan_out = FanOut(maxsize=10000)
+        self.counter_store = CounterStore()
         self.xpon_agent = XponAgent(self)
 
     @inlineCallbacks
@@ -107,6 +110,12 @@ class VolthaCore(object):
         self.stopped = True
         log.info('stopped')
 
+    def get_metrics(self):
+        metrics = self.packet_in_fan_out.get_metrics('packet-in-queue')
+        metrics.update(
+            self.change_event_fan_out.get_metrics('change-event-queue'))
+        return metrics
+
     def get_local_handler(self):
         return self.local_handler
 
@@ -226,6 +235,7 @@ class VolthaCore(object):
 
             yield self.device_agents[device.id].stop(device)
             del self.device_agents[device.id]
+            self.counter_store.remove_device(device.id)
 
     def get_device_agent(self, device_id):
         return self.device_agents[device_id]
@@ -238,6 +248,8 @@ class VolthaCore(object):
         assert logical_device.id not in self.logical_device_agents
         agent = yield LogicalDeviceAgent(self, logical_device).start()
         self.logical_device_agents[logical_device.id] = agent
+        self.local_handler.send_logical_device_event(
+            LogicalDeviceEvent.ADDED, logical_device)
 
     @inlineCallbacks
     def _handle_reconcile_logical_device(self, logical_device, reconcile):
@@ -254,6 +266,9 @@ class VolthaCore(object):
         if logical_device.id in self.logical_device_agents:
             yield self.logical_device_agents[logical_device.id].stop()
             del self.logical_device_agents[logical_device.id]
+            self.counter_store.remove_device(logical_device.id)
+            self.local_handler.send_logical_device_event(
+                LogicalDeviceEvent.REMOVED, logical_device)
 
     def get_logical_device_agent(self, logical_device_id):
         return self.logical_device_agents[logical_device_id]
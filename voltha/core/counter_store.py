@@ -0,0 +1,199 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+In-memory store of flow, port and meter counters.
+
+Counters change far more often than configuration, so they are kept out of
+the config tree: updating them never creates a config revision, is never
+persisted and never affects config hashes. Readers merge them into the
+flows and ports they read from the config tree.
+
+The statistics of a logical device are aggregated from its counters on
+demand, and the result is kept until the counters or flows of the device
+change, so that however often they are polled, they are only rebuilt once
+per collection of the counters by the adapters.
+"""
+from voltha.protos import third_party
+from voltha.protos import openflow_13_pb2 as ofp
+
+_ = third_party
+
+
+class CounterStore(object):
+
+    def __init__(self):
+        # device_id -> {flow_id -> (packet_count, byte_count,
+        #                           duration_sec, duration_nsec)}
+        self._flow_counters = {}
+        # device_id -> {port_no -> ofp_port_stats}
+        self._port_counters = {}
+        # device_id -> {meter_id -> ofp_meter_stats}
+        self._meter_counters = {}
+        # device_id -> generation, bumped on any change of its counters
+        self._generations = {}
+        # device_id -> (generation, LogicalDeviceStats)
+        self._stats = {}
+
+    def _touch(self, device_id):
+        self._generations[device_id] = self._generations.get(device_id, 0) + 1
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ FLOW COUNTERS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def update_flow_counters(self, device_id, flow_id, packet_count,
+                             byte_count, duration_sec=0, duration_nsec=0):
+        """
+        Record the counters of a flow
+        :param device_id: id of the (logical) device the flow is on
+        :param flow_id: id of the ofp_flow_stats entry
+        :return: None
+        """
+        self._flow_counters.setdefault(device_id, {})[flow_id] = (
+            packet_count, byte_count, duration_sec, duration_nsec)
+        self._touch(device_id)
+
+    def reset_flow_counters(self, device_id, flow_id):
+        self._flow_counters.get(device_id, {}).pop(flow_id, None)
+        self._touch(device_id)
+
+    def retain_flow_counters(self, device_id, flow_ids):
+        """
+        Drop the counters of the device's flows that are not in flow_ids.
+        Called on every update of the device's flow table, which thus also
+        invalidates its aggregated statistics.
+        """
+        self._touch(device_id)
+        counters = self._flow_counters.get(device_id)
+        if counters:
+            flow_ids = set(flow_ids)
+            for flow_id in [i for i in counters if i not in flow_ids]:
+                del counters[flow_id]
+
+    def merge_flow_counters(self, device_id, flows):
+        """
+        Fill in the counters of the given flows, in place
+        :param device_id: id of the (logical) device the flows are on
+        :param flows: Flows, as read from the config tree
+        :return: flows
+        """
+        counters = self._flow_counters.get(device_id)
+        if counters:
+            for flow in flows.items:
+                c = counters.get(flow.id)
+                if c is not None:
+                    flow.packet_count, flow.byte_count, \
+                        flow.duration_sec, flow.duration_nsec = c
+        return flows
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ PORT COUNTERS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def update_port_counters(self, device_id, port_stats):
+        """
+        Record the counters of a port
+        :param device_id: id of the (logical) device the port is on
+        :param port_stats: ofp_port_stats
+        :return: None
+        """
+        assert isinstance(port_stats, ofp.ofp_port_stats)
+        self._port_counters.setdefault(
+            device_id, {})[port_stats.port_no] = port_stats
+        self._touch(device_id)
+
+    def get_port_counters(self, device_id, port_no=None):
+        """
+        :param port_no: if None, the counters of all ports are returned
+        :return: list of ofp_port_stats
+        """
+        counters = self._port_counters.get(device_id, {})
+        if port_no is None:
+            return counters.values()
+        port_stats = counters.get(port_no)
+        return [] if port_stats is None else [port_stats]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ METER COUNTERS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def update_meter_counters(self, device_id, meter_stats):
+        """
+        Record the counters of a meter
+        :param device_id: id of the (logical) device the meter is on
+        :param meter_stats: ofp_meter_stats
+        :return: None
+        """
+        assert isinstance(meter_stats, ofp.ofp_meter_stats)
+        self._meter_counters.setdefault(
+            device_id, {})[meter_stats.meter_id] = meter_stats
+        self._touch(device_id)
+
+    def get_meter_counters(self, device_id):
+        return self._meter_counters.get(device_id, {}).values()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ AGGREGATED STATISTICS ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_logical_device_stats(self, device_id, get_flows):
+        """
+        Return the port, table and meter statistics of a logical device,
+        rebuilding them only if its counters or flows changed since they
+        were last built. The returned message is shared and must not be
+        modified.
+        :param device_id: id of the logical device
+        :param get_flows: callable returning the Flows of the device, as
+        read from the config tree; only called on a rebuild
+        :return: LogicalDeviceStats
+        """
+        generation = self._generations.get(device_id, 0)
+        cached = self._stats.get(device_id)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        flows = self.merge_flow_counters(device_id, get_flows())
+        ports = self._port_counters.get(device_id, {})
+        meters = self._meter_counters.get(device_id, {})
+        stats = ofp.LogicalDeviceStats(
+            id=device_id,
+            port_stats=[ports[n] for n in sorted(ports)],
+            table_stats=self._aggregate_table_stats(flows.items),
+            meter_stats=[meters[n] for n in sorted(meters)])
+        self._stats[device_id] = (generation, stats)
+        return stats
+
+    @staticmethod
+    def _aggregate_table_stats(flows):
+        # table_id -> [active_count, matched_count]; table 0 is always
+        # reported, even without any flow
+        tables = {0: [0, 0]}
+        for flow in flows:
+            counts = tables.get(flow.table_id)
+            if counts is None:
+                counts = tables[flow.table_id] = [0, 0]
+            counts[0] += 1
+            counts[1] += flow.packet_count
+        # packets missing all flows of a table are not counted by the
+        # adapters, so the lookups reported are the matches
+        return [ofp.ofp_table_stats(table_id=table_id,
+                                    active_count=active_count,
+                                    lookup_count=matched_count,
+                                    matched_count=matched_count)
+                for table_id, (active_count, matched_count)
+                in sorted(tables.iteritems())]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def remove_device(self, device_id):
+        self._flow_counters.pop(device_id, None)
+        self._port_counters.pop(device_id, None)
+        self._meter_counters.pop(device_id, None)
+        self._generations.pop(device_id, None)
+        self._stats.pop(device_id, None)
@@ -14,123 +14,256 @@
 # limitations under the License.
 #
 
-import networkx as nx
+import structlog
 
 from voltha.core.flow_decomposer import RouteHop
+from voltha.protos import openflow_13_pb2 as ofp
 
+log = structlog.get_logger()
 
-class DeviceGraph(object):
 
+class RouteTable(dict):
     """
-    Mixin class to compute routes in the device graph within
-    a logical device.
+    Route table of a logical device, mapping (ingress, egress) logical port
+    numbers to [ingress_hop, egress_hop] routes. In addition to the plain
+    dict lookup, routes are indexed per ingress and per egress port, so the
+    "half" route lookups and the removal of all routes of a port do not
+    need to scan the table.
     """
 
-    def compute_routes(self, root_proxy, logical_ports):
-        boundary_ports, graph = self._build_graph(root_proxy, logical_ports)
-        routes = self._build_routes(boundary_ports, graph, logical_ports)
-        return graph, routes
-
-    def _build_graph(self, root_proxy, logical_ports):
-
-        graph = nx.Graph()
-
-        # walk logical device's device and port links to discover full graph
-        devices_added = set()  # set of device.id's
-        ports_added = set()  # set of (device.id, port_no) tuples
-        peer_links = set()
-
-        boundary_ports = dict(
-            ((lp.device_id, lp.device_port_no), lp.ofp_port.port_no)
-            for lp in logical_ports
-        )
-
-        def add_device(device):
-            if device.id in devices_added:
-                return
-
-            graph.add_node(device.id, device=device)
-            devices_added.add(device.id)
-
-            ports = root_proxy.get('/devices/{}/ports'.format(device.id))
-            for port in ports:
-                port_id = (device.id, port.port_no)
-                if port_id not in ports_added:
-                    boundary = port_id in boundary_ports
-                    graph.add_node(port_id, port=port, boundary=boundary)
-                    graph.add_edge(device.id, port_id)
-                for peer in port.peers:
-                    if peer.device_id not in devices_added:
-                        peer_device = root_proxy.get(
-                            '/devices/{}'.format(peer.device_id))
-                        add_device(peer_device)
-                    else:
-                        peer_port_id = (peer.device_id, peer.port_no)
-                        if port_id < peer_port_id:
-                            peer_link = (port_id, peer_port_id)
-                        else:
-                            peer_link = (peer_port_id, port_id)
-                        if peer_link not in peer_links:
-                            graph.add_edge(*peer_link)
-                            peer_links.add(peer_link)
+    def __init__(self):
+        super(RouteTable, self).__init__()
+        self.by_ingress = {}  # ingress port_no -> {egress port_no -> route}
+        self.by_egress = {}  # egress port_no -> {ingress port_no -> route}
+        self.root_port = None
+        self.root_device = None
+        self.root_device_ports = None  # port_no -> Port of the root device
+        self.leaf_ports = {}  # logical port_no -> LogicalPort
 
-        for logical_port in logical_ports:
-            device_id = logical_port.device_id
-            device = root_proxy.get('/devices/{}'.format(device_id))
-            add_device(device)
+    def copy(self):
+        """
+        Return a copy that does not change as this table is updated
+        """
+        routes = RouteTable()
+        routes.update(self)
+        routes.by_ingress = dict(
+            (port_no, dict(r)) for port_no, r in self.by_ingress.iteritems())
+        routes.by_egress = dict(
+            (port_no, dict(r)) for port_no, r in self.by_egress.iteritems())
+        routes.root_port = self.root_port
+        routes.root_device = self.root_device
+        routes.root_device_ports = self.root_device_ports
+        routes.leaf_ports = dict(self.leaf_ports)
+        return routes
 
-        return boundary_ports, graph
+    def add_route(self, ingress_port_no, egress_port_no, route):
+        self[(ingress_port_no, egress_port_no)] = route
+        self.by_ingress.setdefault(
+            ingress_port_no, {})[egress_port_no] = route
+        self.by_egress.setdefault(
+            egress_port_no, {})[ingress_port_no] = route
 
-    def _build_routes(self, boundary_ports, graph, logical_ports):
+    def remove_routes(self, port_no):
+        """
+        Remove all routes from and to the given logical port
+        """
+        for egress_port_no in self.by_ingress.pop(port_no, {}):
+            del self[(port_no, egress_port_no)]
+            self._discard(self.by_egress, egress_port_no, port_no)
+        for ingress_port_no in self.by_egress.pop(port_no, {}):
+            del self[(ingress_port_no, port_no)]
+            self._discard(self.by_ingress, ingress_port_no, port_no)
 
-        root_ports = dict((lp.ofp_port.port_no, lp.root_port)
-                          for lp in logical_ports if lp.root_port == True)
+    @staticmethod
+    def _discard(index, port_no, other_port_no):
+        routes = index[port_no]
+        del routes[other_port_no]
+        if not routes:
+            del index[port_no]
 
-        routes = {}
+    def unrouted_ports(self):
+        """
+        Return the logical ports of leaf devices that have no routes yet
+        """
+        if self.root_port is None:
+            return []
+        return [port for port_no, port in self.leaf_ports.iteritems()
+                if port_no not in self.by_ingress and
+                port.device_id != self.root_device.id]
 
-        for source, source_port_no in boundary_ports.iteritems():
-            for target, target_port_no in boundary_ports.iteritems():
+    def any_route_from(self, ingress_port_no):
+        routes = self.by_ingress.get(ingress_port_no)
+        return next(routes.itervalues()) if routes else None
 
-                if source is target:
-                    continue
+    def any_route_to(self, egress_port_no):
+        routes = self.by_egress.get(egress_port_no)
+        return next(routes.itervalues()) if routes else None
 
-                # Ignore NNI - NNI routes
-                if source_port_no in root_ports \
-                        and target_port_no in root_ports:
-                    continue
 
-                # Ignore UNI - UNI routes
-                if source_port_no not in root_ports \
-                        and target_port_no not in root_ports:
-                    continue
+def lookup_route(routes, nni_logical_port_no, ingress_port_no,
+                 egress_port_no):
+    """
+    Look up the route between two logical ports in a RouteTable built by
+    DeviceGraph.compute_routes. Controller-bound and wildcarded ports are
+    resolved to "half" routes, where the unknown hop is None.
+    """
+    if egress_port_no is not None and \
+                    (egress_port_no & 0x7fffffff) == ofp.OFPP_CONTROLLER:
+        # treat it as if the output port is the NNI of the OLT
+        egress_port_no = nni_logical_port_no
+
+    # If ingress_port is not specified (None), it may be a wildcarded
+    # route if egress_port is OFPP_CONTROLLER or _nni_logical_port,
+    # in which case we need to create a half-route where only the egress
+    # hop is filled, the first hope is None
+    if ingress_port_no is None and \
+                    egress_port_no == nni_logical_port_no:
+        # We can use the 2nd hop of any upstream route
+        route = routes.any_route_to(nni_logical_port_no)
+        if route is None:
+            raise Exception('not a single upstream route')
+        return [None, route[1]]
 
-                path = nx.shortest_path(graph, source, target)
+    # If egress_port is not specified (None), we can also can return a
+    # "half" route
+    if egress_port_no is None:
+        route = routes.any_route_from(ingress_port_no)
+        if route is not None:
+            return [route[0], None]
 
-                # number of nodes in valid paths is always multiple of 3
-                if len(path) % 3:
-                    continue
+        # This can occur is a leaf device is disabled
+        log.exception('no-downstream-route',
+                      ingress_port_no=ingress_port_no,
+                      egress_port_no=egress_port_no
+                      )
+        return None
 
-                # in fact, we currently deal with single fan-out networks,
-                # so the number of hops is always 6
-                assert len(path) == 6
+    return routes.get((ingress_port_no, egress_port_no))
 
-                ingress_input_port, ingress_device, ingress_output_port, \
-                egress_input_port, egress_device, egress_output_port = path
 
-                ingress_hop = RouteHop(
-                    device=graph.node[ingress_device]['device'],
-                    ingress_port=graph.node[ingress_input_port]['port'],
-                    egress_port=graph.node[ingress_output_port]['port']
-                )
-                egress_hop = RouteHop(
-                    device=graph.node[egress_device]['device'],
-                    ingress_port=graph.node[egress_input_port]['port'],
-                    egress_port=graph.node[egress_output_port]['port']
-                )
+class DeviceGraph(object):
 
-                routes[(source_port_no, target_port_no)] = [
-                    ingress_hop, egress_hop
-                ]
+    """
+    Mixin class to compute routes in the device graph within
+    a logical device.
 
+    The device graph of a logical device is a PON tree: the root device
+    (OLT) holds the single root (NNI) port, and every other boundary port
+    is the UNI of a leaf device (ONU) peered with a PON port of the root
+    device. Every route is therefore NNI -> OLT -> ONU -> UNI, or its
+    reverse, and is derived from the parent link of the leaf device alone.
+    This allows the routes of a single port to be added or removed without
+    recomputing those of the other ports.
+    """
+
+    def compute_routes(self, root_proxy, logical_ports):
+        """
+        Build the full route table of the given logical ports
+        :return: RouteTable
+        """
+        routes = RouteTable()
+        for logical_port in logical_ports:
+            if logical_port.root_port:
+                self._set_root_port(root_proxy, routes, logical_port)
+        for logical_port in logical_ports:
+            if not logical_port.root_port:
+                self.add_port_routes(root_proxy, routes, logical_port)
         return routes
 
+    def add_port_routes(self, root_proxy, routes, logical_port):
+        """
+        Add the routes from and to a (new) logical port to the route table
+        """
+        if logical_port.root_port:
+            # all routes pass the root port, start over
+            leaf_ports = routes.leaf_ports.values()
+            routes.clear()
+            routes.by_ingress.clear()
+            routes.by_egress.clear()
+            self._set_root_port(root_proxy, routes, logical_port)
+            for leaf_port in leaf_ports:
+                self.add_port_routes(root_proxy, routes, leaf_port)
+            return
+
+        port_no = logical_port.ofp_port.port_no
+        routes.remove_routes(port_no)
+        routes.leaf_ports[port_no] = logical_port
+        if routes.root_port is None or \
+                logical_port.device_id == routes.root_device.id:
+            return
+
+        device = root_proxy.get('/devices/{}'.format(logical_port.device_id))
+        hops = self._leaf_hops(root_proxy, routes, device, logical_port)
+        if hops is None:
+            # the root device ports are read along with the root port, and
+            # may lack a PON port added since
+            self._read_root_device_ports(root_proxy, routes)
+            hops = self._leaf_hops(root_proxy, routes, device, logical_port)
+        if hops is None:
+            log.warn('no-route-to-root', device_id=device.id,
+                     port_no=port_no)
+            return
+        uni_port, parent_port, root_pon_port = hops
+
+        root_port_no = routes.root_port.ofp_port.port_no
+        routes.add_route(root_port_no, port_no, [
+            RouteHop(device=routes.root_device,
+                     ingress_port=routes.root_device_ports[
+                         routes.root_port.device_port_no],
+                     egress_port=root_pon_port),
+            RouteHop(device=device,
+                     ingress_port=parent_port,
+                     egress_port=uni_port)
+        ])
+        routes.add_route(port_no, root_port_no, [
+            RouteHop(device=device,
+                     ingress_port=uni_port,
+                     egress_port=parent_port),
+            RouteHop(device=routes.root_device,
+                     ingress_port=root_pon_port,
+                     egress_port=routes.root_device_ports[
+                         routes.root_port.device_port_no])
+        ])
+
+    @staticmethod
+    def _leaf_hops(root_proxy, routes, device, logical_port):
+        """
+        :return: (UNI port, parent port) of the leaf device and the root
+        device port it is peered with, or None if not all are known
+        """
+        ports = root_proxy.get('/devices/{}/ports'.format(device.id))
+        uni_port = parent_port = root_pon_port = None
+        for port in ports:
+            if port.port_no == logical_port.device_port_no:
+                uni_port = port
+            for peer in port.peers:
+                if peer.device_id == routes.root_device.id:
+                    parent_port = port
+                    root_pon_port = routes.root_device_ports.get(
+                        peer.port_no)
+        if uni_port is None or parent_port is None or root_pon_port is None:
+            return None
+        return uni_port, parent_port, root_pon_port
+
+    def remove_port_routes(self, routes, logical_port):
+        """
+        Remove the routes from and to a (removed) logical port
+        """
+        port_no = logical_port.ofp_port.port_no
+        routes.remove_routes(port_no)
+        if logical_port.root_port:
+            routes.root_port = None
+        else:
+            routes.leaf_ports.pop(port_no, None)
+
+    def _set_root_port(self, root_proxy, routes, logical_port):
+        routes.root_port = logical_port
+        routes.root_device = root_proxy.get(
+            '/devices/{}'.format(logical_port.device_id))
+        self._read_root_device_ports(root_proxy, routes)
+
+    @staticmethod
+    def _read_root_device_ports(root_proxy, routes):
+        routes.root_device_ports = dict(
+            (p.port_no, p) for p in root_proxy.get(
+                '/devices/{}/ports'.format(routes.root_device.id)))
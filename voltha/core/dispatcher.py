@@ -21,23 +21,54 @@ calls are forwarded to the LocalHandler.
 """
 import structlog
 from twisted.internet.defer import inlineCallbacks, returnValue
+from voltha.core.peer_channels import PeerChannels
 from voltha.protos.voltha_pb2 import VolthaLocalServiceStub
 from voltha.registry import registry
 from twisted.internet import reactor
 import grpc
 from grpc import StatusCode
 from grpc._channel import _Rendezvous
+from common.utils.grpc_utils import deferred_from_future
 from common.utils.id_generation import get_core_id_from_device_id, \
     is_broadcast_core_id
+from common.utils.metrics import counter, histogram
 
 log = structlog.get_logger()
 
+_rpc_latency = histogram('rpc-latency')
+_rpc_broadcast = counter('rpc-broadcast')
+_rpc_local = counter('rpc-local')
+_rpc_peer = counter('rpc-peer')
+_rpc_errors = counter('rpc-errors')
+
 
 class DispatchError(object):
     def __init__(self, error_code):
         self.error_code = error_code
 
 
+class BroadcastContext(object):
+    """
+    Context of the requests made to each instance for a broadcast request.
+    Conditional reads are left to the global handler, which can only tell
+    whether the merged response changed, so the instances do not get the
+    if-none-match request metadata, nor send response metadata.
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def invocation_metadata(self):
+        return tuple(m for m in self.context.invocation_metadata()
+                     if m[0] != 'if-none-match')
+
+    def send_initial_metadata(self, metadata):
+        pass
+
+
 class Dispatcher(object):
     def __init__(self, core, instance_id, core_store_id, grpc_port):
         self.core = core
@@ -46,19 +77,22 @@ class Dispatcher(object):
         self.grpc_port = grpc_port
         self.local_handler = None
         self.peers_map = dict()
-        self.grpc_conn_map = {}
+        self.peer_channels = PeerChannels(grpc_port)
 
     def start(self):
         log.debug('starting')
         self.local_handler = self.core.get_local_handler()
+        self.peer_channels.start()
         reactor.callLater(0, self._start_tracking_peers)
         log.info('started')
         return self
 
     def stop(self):
         log.debug('stopping')
+        self.peer_channels.stop()
         log.info('stopped')
 
+    @_rpc_latency.timed
     @inlineCallbacks
     def dispatch(self,
                  method_name,
@@ -99,12 +133,14 @@ class Dispatcher(object):
                 core_id_from_request_id = get_core_id_from_device_id(id)
             except Exception, e:
                 log.warning('invalid-id', request=request, id=id)
+                _rpc_errors.inc()
                 returnValue(DispatchError(StatusCode.NOT_FOUND))
 
         try:
             # Broadcast request if set
             if broadcast:
                 # broadcast to all instances (including locally)
+                _rpc_broadcast.inc()
                 res = yield self._broadcast_request(method_name,
                                                     request,
                                                     context)
@@ -117,12 +153,14 @@ class Dispatcher(object):
                         (is_broadcast_core_id(id))
                         )
                      ):
+                _rpc_local.inc()
                 returnValue(self._local_dispatch(self.core_store_id,
                                                  method_name,
                                                  request,
                                                  context))
             # Peer Dispatch
             elif core_id_from_request_id:
+                _rpc_peer.inc()
                 res = yield self._dispatch_to_peer(core_id_from_request_id,
                                                    method_name,
                                                    request,
@@ -131,10 +169,12 @@ class Dispatcher(object):
             else:
                 log.warning('invalid-request', request=request, id=id,
                             core_id=core_id, broadcast=broadcast)
+                _rpc_errors.inc()
                 returnValue(DispatchError(StatusCode.INVALID_ARGUMENT))
 
         except Exception as e:
             log.exception('remote-dispatch-exception', e=e)
+            _rpc_errors.inc()
             returnValue(DispatchError(StatusCode.UNKNOWN))
 
     def get_core_id_from_instance_id(self, instance_id):
@@ -167,33 +207,36 @@ class Dispatcher(object):
 
     @inlineCallbacks
     def _broadcast_request(self, method_name, request, context):
+        context = BroadcastContext(context)
         # First get local result
         result = self._local_dispatch(self.core_store_id,
                                       method_name,
                                       request,
                                       context)
-        # Then get peers results
-        log.info('maps', peers=self.peers_map, grpc=self.grpc_conn_map)
+        # Then get the results of the peers, skipping the unavailable ones
+        # rather than waiting for them to time out
+        available_peers = self.peer_channels.available_peers()
+        log.info('maps', peers=self.peers_map, available=available_peers)
         current_responses = [result]
         for core_id in self.peers_map:
+            if core_id != self.core_store_id and \
+                    core_id not in available_peers:
+                log.warn('skipping-unavailable-peer', core=core_id)
+        for core_id in available_peers:
             if core_id == self.core_store_id:
                 continue # already processed
 
-            # As a safeguard, check whether the core_id is in the grpc map
-            if core_id not in self.grpc_conn_map:
-                log.warn('no-grpc-peer-connection', core=core_id)
-            elif self.peers_map[core_id] and self.grpc_conn_map[core_id]:
-                res = yield self._dispatch_to_peer(core_id,
-                                                   method_name,
-                                                   request,
-                                                   context)
-                if isinstance(res, DispatchError):
-                    log.warning('ignoring-peer',
-                                core_id=core_id,
-                                error_code=res.error_code)
-                elif res not in current_responses:
-                    result.MergeFrom(res)
-                    current_responses.append(res)
+            res = yield self._dispatch_to_peer(core_id,
+                                               method_name,
+                                               request,
+                                               context)
+            if isinstance(res, DispatchError):
+                log.warning('ignoring-peer',
+                            core_id=core_id,
+                            error_code=res.error_code)
+            elif res not in current_responses:
+                result.MergeFrom(res)
+                current_responses.append(res)
         returnValue(result)
 
     def _local_dispatch(self, core_id, method_name, request, context):
@@ -209,109 +252,11 @@ class Dispatcher(object):
             while True:
                 peers_map = yield registry('coordinator').recv_peers_map()
                 log.info('peers-map-changed', peers_map=peers_map)
-                yield self.update_grpc_client_map(peers_map)
+                self.peer_channels.update(peers_map)
                 self.peers_map = peers_map
         except Exception, e:
             log.exception('exception', e=e)
 
-    @inlineCallbacks
-    def update_grpc_client_map(self, peers_map):
-        try:
-            # 1. Get the list of connection to open and to close
-            to_open = dict()
-            to_close = set()
-            for id, instance in peers_map.iteritems():
-                # Check for no change
-                if id in self.peers_map and self.peers_map[id] == instance:
-                    continue
-
-                if id not in self.peers_map:
-                    if instance:
-                        to_open[id] = instance['host']
-                elif instance:
-                    to_open[id] = instance['host']
-                    if self.peers_map[id]:
-                        to_close.add(id)
-                else:
-                    if self.peers_map[id]:
-                        to_close.add(id)
-
-            # Close connections that are no longer referenced
-            old_ids = set(self.peers_map.keys()) - set(peers_map.keys())
-            for id in old_ids:
-                if self.peers_map[id]:
-                    to_close.add(id)
-
-            # 2.  Refresh the grpc connections
-            yield self._refresh_grpc_connections(to_open, to_close)
-        except Exception, e:
-            log.exception('exception', e=e)
-
-    @inlineCallbacks
-    def _refresh_grpc_connections(self, to_open, to_close):
-        try:
-            log.info('grpc-channel-refresh', to_open=to_open,
-                     to_close=to_close)
-
-            # Close the unused connection
-            for id in to_close:
-                if self.grpc_conn_map[id]:
-                    # clear connection
-                    self._disconnect_from_peer(id)
-
-            # Open the new connections
-            for id, host in to_open.iteritems():
-                if id in self.grpc_conn_map and self.grpc_conn_map[id]:
-                    # clear connection
-                    self._disconnect_from_peer(id)
-                if host:
-                    self.grpc_conn_map[id] = \
-                        yield self._connect_to_peer(host, self.grpc_port)
-
-        except Exception, e:
-            log.exception('exception', e=e)
-
-    @inlineCallbacks
-    def _connect_to_peer(self, host, port):
-        try:
-            channel = yield grpc.insecure_channel('{}:{}'.format(host, port))
-            log.info('grpc-channel-created-with-peer', peer=host)
-            returnValue(channel)
-        except Exception, e:
-            log.exception('exception', e=e)
-
-    def _disconnect_from_peer(self, peer_id):
-        try:
-            if self.grpc_conn_map[peer_id]:
-                # Let garbage collection clear the connect - no API exist to
-                # close the connection
-                # yield self.grpc_conn_map[peer_id].close()
-                self.grpc_conn_map[peer_id] = None
-                log.info('grpc-channel-closed-with-peer', peer_id=peer_id)
-        except Exception, e:
-            log.exception('exception', e=e)
-        finally:
-            self.grpc_conn_map.pop(peer_id)
-
-    @inlineCallbacks
-    def _reconnect_to_peer(self, peer_id):
-        try:
-            # First disconnect
-            yield self._disconnect_from_peer(peer_id)
-            # Then reconnect
-            peer_instance = self.peers_map.get(peer_id, None)
-            if peer_instance:
-                self.grpc_conn_map[peer_id] = \
-                    yield self._connect_to_peer(peer_instance['host'],
-                                                self.grpc_port)
-                log.info('reconnected-to-peer', peer_id=peer_id)
-                returnValue(True)
-            else:
-                log.info('peer-unavailable', peer_id=peer_id)
-        except Exception, e:
-            log.exception('exception', e=e)
-        returnValue(False)
-
     @inlineCallbacks
     def _dispatch_to_peer(self,
                           core_id,
@@ -338,6 +283,12 @@ class Dispatcher(object):
                           peers_map=self.peers_map)
             return
 
+        channel = self.peer_channels.get_channel(core_id)
+        if channel is None:
+            # the circuit to the peer is open, fail fast
+            log.warning('peer-unavailable', core_id=core_id)
+            returnValue(DispatchError(StatusCode.UNAVAILABLE))
+
         try:
             # Always request from the local service when making request to peer
             # Add a long timeout of 15 seconds to balance between:
@@ -346,22 +297,31 @@ class Dispatcher(object):
             #           request keeps waiting without getting a grpc
             #           rendez-vous exception.
             stub = VolthaLocalServiceStub
-            method = getattr(stub(self.grpc_conn_map[core_id]), method_name)
-            response, rendezvous = yield method.with_call(request,
-                                                          timeout=15,
-                                                          metadata=context.invocation_metadata())
+            method = getattr(stub(channel), method_name)
+            call = method.future(request,
+                                 timeout=15,
+                                 metadata=context.invocation_metadata())
+            response = yield deferred_from_future(call)
+            self.peer_channels.record_success(core_id)
             log.debug('peer-response',
                       core_id=core_id,
                       response=response,
-                      rendezvous_metadata=rendezvous.trailing_metadata())
-            # TODO:  Should we return the metadata as well
+                      rendezvous_metadata=call.trailing_metadata())
+            # pass on the outcome of conditional reads
+            metadata = tuple(m for m in call.initial_metadata()
+                             if m[0] in ('etag', 'not-modified'))
+            if metadata:
+                context.send_initial_metadata(metadata)
             returnValue(response)
         except grpc._channel._Rendezvous, e:
             code = e.code()
-            if code == grpc.StatusCode.UNAVAILABLE:
-                # Try to reconnect
-                status = yield self._reconnect_to_peer(core_id)
-                if status and retry > 0:
+            if code in (grpc.StatusCode.UNAVAILABLE,
+                        grpc.StatusCode.DEADLINE_EXCEEDED):
+                # Count the failure against the peer, which opens its
+                # circuit after a few of them
+                self.peer_channels.record_failure(core_id)
+                if retry > 0 and \
+                        self.peer_channels.get_channel(core_id) is not None:
                     response = yield self._dispatch_to_peer(core_id,
                                                             method_name,
                                                             request,
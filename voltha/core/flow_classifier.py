@@ -0,0 +1,222 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Tuple-space classifier over the OXM match fields of a flow table.
+
+Flows are grouped per (table_id, priority) into "tuple spaces", one space per
+distinct set of exactly matched field types. Overlap queries then only visit
+the spaces of the same table and priority, and within each space resolve the
+candidates by a hash lookup on the field types both matches constrain
+exactly. Masked fields are verified on the (small) candidate set only.
+"""
+from binascii import hexlify
+
+from voltha.protos import third_party
+from voltha.protos import openflow_13_pb2 as ofp
+
+_ = third_party
+
+
+def _as_int(value):
+    if isinstance(value, basestring):
+        return int(hexlify(value), 16) if value else 0
+    return value
+
+
+def match_fields(match):
+    """
+    Flatten an ofp_match into a dict of field key -> (value, mask). The mask
+    is None for exact matches. OXM basic fields are keyed by their field type,
+    any other OXM class is keyed (and compared) by its serialized form.
+    :param match: ofp_match
+    :return: dict
+    """
+    fields = {}
+    for oxm in match.oxm_fields:
+        if oxm.oxm_class != ofp.OFPXMC_OPENFLOW_BASIC:
+            raw = oxm.SerializeToString()
+            fields[raw] = (raw, None)
+            continue
+        field = oxm.ofb_field
+        value_attr = field.WhichOneof('value')
+        value = _as_int(getattr(field, value_attr)) if value_attr else None
+        mask = None
+        if field.has_mask:
+            mask_attr = field.WhichOneof('mask')
+            if mask_attr is not None:
+                mask = _as_int(getattr(field, mask_attr))
+        fields[field.type] = (value, mask)
+    return fields
+
+
+def fields_compatible(a, b):
+    """
+    Return True if a packet may satisfy both (value, mask) constraints
+    """
+    (v1, m1), (v2, m2) = a, b
+    if m1 is None and m2 is None:
+        return v1 == v2
+    if not isinstance(v1, (int, long)) or not isinstance(v2, (int, long)):
+        return v1 == v2
+    if m1 is None:
+        mask = m2
+    elif m2 is None:
+        mask = m1
+    else:
+        mask = m1 & m2
+    return (v1 & mask) == (v2 & mask)
+
+
+class _TupleSpace(object):
+
+    __slots__ = ('exact_keys', 'entries', 'indices')
+
+    def __init__(self, exact_keys):
+        self.exact_keys = exact_keys
+        self.entries = {}  # flow id -> (flow, fields)
+        # sorted tuple of projected field keys -> {projected values -> ids}
+        self.indices = {}
+
+    def add(self, flow_id, flow, fields):
+        self.entries[flow_id] = (flow, fields)
+        for keys, index in self.indices.iteritems():
+            index.setdefault(
+                tuple(fields[k][0] for k in keys), set()).add(flow_id)
+
+    def remove(self, flow_id):
+        flow, fields = self.entries.pop(flow_id)
+        for keys, index in self.indices.iteritems():
+            values = tuple(fields[k][0] for k in keys)
+            ids = index[values]
+            ids.discard(flow_id)
+            if not ids:
+                del index[values]
+
+    def lookup(self, keys, values):
+        index = self.indices.get(keys)
+        if index is None:
+            # first query projecting on these keys, build its index once
+            index = self.indices[keys] = {}
+            for flow_id, (_, fields) in self.entries.iteritems():
+                index.setdefault(
+                    tuple(fields[k][0] for k in keys), set()).add(flow_id)
+        return index.get(values, ())
+
+
+class FlowClassifier(object):
+    """
+    Index of ofp_flow_stats entries answering which flows overlap a given
+    flow, i.e., share its table and priority and may match a same packet.
+    """
+
+    def __init__(self):
+        # (table_id, priority) -> {frozenset of exact keys -> _TupleSpace}
+        self._spaces = {}
+        # flow id -> (table_id, priority) and exact keys
+        self._locations = {}
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, flow_id):
+        return flow_id in self._locations
+
+    def add(self, flow):
+        """
+        Add (or replace, if a flow with the same id is present) a flow
+        :param flow: ofp_flow_stats
+        """
+        assert isinstance(flow, ofp.ofp_flow_stats)
+        if flow.id in self._locations:
+            self.remove(flow.id)
+        fields = match_fields(flow.match)
+        exact_keys = frozenset(
+            k for k, (_, mask) in fields.iteritems() if mask is None)
+        slot = (flow.table_id, flow.priority)
+        spaces = self._spaces.setdefault(slot, {})
+        space = spaces.get(exact_keys)
+        if space is None:
+            space = spaces[exact_keys] = _TupleSpace(exact_keys)
+        space.add(flow.id, flow, fields)
+        self._locations[flow.id] = (slot, exact_keys)
+
+    def remove(self, flow_id):
+        """
+        Remove flow by id; unknown ids are ignored
+        :param flow_id: id of ofp_flow_stats entry
+        """
+        location = self._locations.pop(flow_id, None)
+        if location is None:
+            return
+        slot, exact_keys = location
+        spaces = self._spaces[slot]
+        space = spaces[exact_keys]
+        space.remove(flow_id)
+        if not space.entries:
+            del spaces[exact_keys]
+            if not spaces:
+                del self._spaces[slot]
+
+    def clear(self):
+        self._spaces = {}
+        self._locations = {}
+
+    def sync(self, flows):
+        """
+        Bring the index in line with the given flow table, only touching
+        the entries that were added or removed since the last sync
+        :param flows: iterable of ofp_flow_stats
+        """
+        flows = dict((f.id, f) for f in flows)
+        for flow_id in [i for i in self._locations if i not in flows]:
+            self.remove(flow_id)
+        for flow_id, flow in flows.iteritems():
+            if flow_id not in self._locations:
+                self.add(flow)
+
+    def find_overlapping(self, flow, return_on_first=False):
+        """
+        Return list of indexed flows overlapping with the given flow. Two
+        flows overlap if they are in the same table, have the same priority
+        and a packet may match both.
+        :param flow: ofp_flow_stats (or any object with table_id, priority
+        and match attributes, such as ofp_flow_mod)
+        :param return_on_first: if True, return with the first entry
+        :return: list of ofp_flow_stats
+        """
+        spaces = self._spaces.get((flow.table_id, flow.priority))
+        if not spaces:
+            return []
+
+        fields = match_fields(flow.match)
+        exact_keys = frozenset(
+            k for k, (_, mask) in fields.iteritems() if mask is None)
+
+        overlapping = []
+        for space_keys, space in spaces.iteritems():
+            keys = tuple(sorted(exact_keys & space_keys))
+            values = tuple(fields[k][0] for k in keys)
+            for flow_id in space.lookup(keys, values):
+                other, other_fields = space.entries[flow_id]
+                # remaining common fields are masked on at least one side
+                if all(fields_compatible(value, other_fields[k])
+                       for k, value in fields.iteritems()
+                       if k in other_fields and k not in keys):
+                    overlapping.append(other)
+                    if return_on_first:
+                        return overlapping
+        return overlapping
@@ -450,10 +450,53 @@ class RouteHop(object):
             self._device == other._device and
             self._ingress_port == other._ingress_port and
             self._egress_port == other._egress_port)
+    def __getstate__(self):
+        return self._device, self._ingress_port, self._egress_port
+    def __setstate__(self, state):
+        self._device, self._ingress_port, self._egress_port = state
+
+
+def flow_decomposition_signature(flow, group_map):
+    """
+    Return a key capturing everything the decomposition of a flow depends
+    on, apart from the route between its ingress and egress ports. Flow
+    counters are left out, so a stats refresh does not cause cache misses.
+    """
+    group_id = get_group(flow)
+    group = group_map.get(group_id) if group_id is not None else None
+    return (
+        flow.priority,
+        flow.cookie,
+        flow.match.SerializeToString(),
+        tuple(i.SerializeToString() for i in flow.instructions),
+        group.desc.SerializeToString() if group is not None else None
+    )
+
+
+def flow_routed_ports(flow, group_map):
+    """
+    Return the logical ports the decomposition of a flow routes through:
+    its ingress and egress ports, and the output ports of the buckets of
+    its group, if any
+    """
+    ports = (get_in_port(flow), get_out_port(flow))
+    group_id = get_group(flow)
+    group = group_map.get(group_id) if group_id is not None else None
+    if group is None:
+        return ports
+    return ports + tuple(
+        action.output.port
+        for bucket in group.desc.buckets
+        for action in bucket.actions
+        if action.type == OUTPUT)
 
 
 class FlowDecomposer(object):
 
+    # routed ports, see flow_routed_ports -> {signature -> device rules}
+    _decomposition_cache = None
+    _decomposition_cache_generation = 0
+
     def __init__(self, *args, **kw):
         self.logical_device_id = 'this shall be overwritten in derived class'
         super(FlowDecomposer, self).__init__(*args, **kw)
@@ -463,19 +506,67 @@ class FlowDecomposer(object):
     def decompose_rules(self, flows, groups):
         """
         Generate per-device flows and flow-groups from the flows and groups
-        defined on a logical device
+        defined on a logical device. The decomposition of each flow is
+        memoized per set of ports it is routed through, so only flows that
+        are new or changed since the previous call are decomposed again.
         :param flows: logical device flows
         :param groups: logical device flow groups
         :return: dict(device_id ->
             (OrderedDict-of-device-flows, OrderedDict-of-device-flow-groups))
         """
-
-        device_rules = deepcopy(self.get_all_default_rules())
         group_map = dict((g.desc.group_id, g) for g in groups)
+        lookups, misses = self.lookup_decompositions(flows, group_map)
+        return self.merge_decompositions(
+            lookups, [self.decompose_flow(f, group_map) for f in misses])
 
+    def lookup_decompositions(self, flows, group_map):
+        """
+        Look up the memoized decomposition of each flow
+        :param flows: logical device flows
+        :param group_map: dict(group_id -> logical device flow group)
+        :return: (lookups, misses) where lookups is a list of (ports,
+        signature, device rules or None) tuples in flow order, and misses
+        is the list of flows still to be decomposed, in the same order
+        """
+        cache = self._decomposition_cache or {}
+        lookups = []
+        misses = []
         for flow in flows:
-            for device_id, (_flows, _groups) \
-                    in self.decompose_flow(flow, group_map).iteritems():
+            ports = flow_routed_ports(flow, group_map)
+            signature = flow_decomposition_signature(flow, group_map)
+            decomposed = cache.get(ports, {}).get(signature)
+            if decomposed is None:
+                misses.append(flow)
+            lookups.append((ports, signature, decomposed))
+        return lookups, misses
+
+    def merge_decompositions(self, lookups, decomposed_misses,
+                             generation=None):
+        """
+        Combine memoized and freshly computed flow decompositions with the
+        default rules into the per-device rules, and memoize the latter
+        :param lookups: as returned by lookup_decompositions
+        :param decomposed_misses: device rules of the missed flows, in order
+        :param generation: cache generation at lookup time; if the cache
+        was invalidated since, nothing is memoized
+        :return: dict(device_id ->
+            (OrderedDict-of-device-flows, OrderedDict-of-device-flow-groups))
+        """
+        device_rules = deepcopy(self.get_all_default_rules())
+        decomposed_misses = iter(decomposed_misses)
+
+        # entries not used by this pass are dropped by swapping in the
+        # cache built along the way
+        fresh_cache = {}
+
+        for ports, signature, decomposed in lookups:
+            if decomposed is None:
+                decomposed = next(decomposed_misses)
+                if decomposed is None:
+                    continue  # no route yet, decomposed again next pass
+            fresh_cache.setdefault(ports, {})[signature] = decomposed
+
+            for device_id, (_flows, _groups) in decomposed.iteritems():
                 fl_lst, gr_lst = device_rules.setdefault(
                     device_id, (OrderedDict(), OrderedDict()))
                 for _flow in _flows:
@@ -484,9 +575,32 @@ class FlowDecomposer(object):
                 for _group in _groups:
                     if _group.group_id not in gr_lst:
                         gr_lst[_group.group_id] = _group
+
+        if generation is None or \
+                generation == self._decomposition_cache_generation:
+            self._decomposition_cache = fresh_cache
         return device_rules
 
+    def invalidate_decomposition_cache(self, port_no=None):
+        """
+        Drop memoized decompositions whose route may have changed
+        :param port_no: logical port whose routes changed; if None, the
+        whole cache is dropped
+        :return: None
+        """
+        self._decomposition_cache_generation += 1
+        if port_no is None or not self._decomposition_cache:
+            self._decomposition_cache = None
+            return
+        for ports in self._decomposition_cache.keys():
+            if port_no in ports:
+                del self._decomposition_cache[ports]
+
     def decompose_flow(self, flow, group_map):
+        """
+        :return: dict(device_id -> (list-of-device-flows,
+        list-of-device-flow-groups)), or None if the flow cannot be routed
+        """
         assert isinstance(flow, ofp.ofp_flow_stats)
 
         ####################################################################
@@ -505,7 +619,7 @@ class FlowDecomposer(object):
         if route is None:
             log.error('no-route', in_port_no=in_port_no,
                       out_port_no=out_port_no, comment='ignoring flow')
-            return device_rules
+            return None
 
         assert len(route) == 2
         ingress_hop, egress_hop = route
@@ -678,6 +792,11 @@ class FlowDecomposer(object):
                         # re-run route request to determine egress device and
                         # ports
                         route2 = self.get_route(in_port_no, out_port_no)
+                        if route2 is None:
+                            log.error('no-route', in_port_no=in_port_no,
+                                      out_port_no=out_port_no,
+                                      comment='ignoring flow')
+                            return None
 
                         assert len(route2) == 2
                         ingress_hop2, egress_hop = route2
@@ -0,0 +1,182 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Pool of worker processes running flow decomposition off the reactor thread
+"""
+import copy_reg
+from time import time
+
+import structlog
+from concurrent import futures
+from google.protobuf import symbol_database
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred
+from zope.interface import implementer
+
+from common.utils.metrics import histogram
+from voltha.core.device_graph import lookup_route
+from voltha.core.flow_decomposer import FlowDecomposer
+from voltha.protos import third_party
+from voltha.protos import openflow_13_pb2 as ofp
+from voltha.protos.device_pb2 import Device, Port
+from voltha.protos.logical_device_pb2 import LogicalPort
+from voltha.registry import IComponent
+
+_ = third_party
+log = structlog.get_logger()
+
+_job_latency = histogram('flow-decomposition-latency')
+
+
+# The generated message classes cannot be pickled by reference, as their
+# __module__ is not importable as such; pickle them by full name instead.
+
+def _restore_message(full_name, data):
+    return symbol_database.Default().GetSymbol(full_name).FromString(data)
+
+
+def _reduce_message(msg):
+    return _restore_message, (msg.DESCRIPTOR.full_name,
+                              msg.SerializeToString())
+
+
+for _cls in (Device, Port, LogicalPort, ofp.ofp_flow_stats,
+             ofp.ofp_group_entry):
+    copy_reg.pickle(_cls, _reduce_message)
+
+
+class DecompositionSnapshot(FlowDecomposer):
+    """
+    Immutable copy of the routes and default rules of a logical device,
+    sufficient to decompose its flows without access to the config tree.
+    Snapshots are pickled over to the worker processes.
+    """
+
+    def __init__(self, logical_device_id, routes, default_rules,
+                 nni_logical_port_no):
+        self.logical_device_id = logical_device_id
+        self.routes = routes
+        self.default_rules = default_rules
+        self.nni_logical_port_no = nni_logical_port_no
+
+    def get_all_default_rules(self):
+        return self.default_rules
+
+    def get_default_rules(self, device_id):
+        return self.default_rules[device_id]
+
+    def get_route(self, ingress_port_no, egress_port_no):
+        return lookup_route(self.routes, self.nni_logical_port_no,
+                            ingress_port_no, egress_port_no)
+
+
+def decompose_flows(snapshot, flows, group_map):
+    """
+    Decompose each of the flows against the snapshot. This is a pure
+    function, as it runs in the worker processes.
+    :return: list of device rules, in flow order
+    """
+    return [snapshot.decompose_flow(flow, group_map) for flow in flows]
+
+
+@implementer(IComponent)
+class FlowDecompositionPool(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.workers = config.get('workers', 2)
+        self.inline = config.get('inline', False) or self.workers < 1
+        self.max_pending_jobs = config.get('max_pending_jobs', 64)
+        self.executor = None
+
+        self.pending_jobs = 0
+        self.jobs_completed = 0
+        self.jobs_inlined = 0
+        self.last_job_latency = 0.0
+        self.max_job_latency = 0.0
+
+    def start(self):
+        log.debug('starting')
+        if not self.inline:
+            self.executor = futures.ProcessPoolExecutor(
+                max_workers=self.workers)
+            # the worker processes are forked on first use; do that now,
+            # before gRPC and other threads are started
+            self.executor.submit(int).result()
+        log.info('started', workers=self.workers, inline=self.inline)
+        return self
+
+    def stop(self):
+        log.debug('stopping')
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        log.info('stopped')
+
+    def submit(self, fn, *args):
+        """
+        Run fn(*args) in a worker process. Jobs run inline on the reactor
+        thread if so configured, or while too many jobs are pending.
+        :param fn: module level (picklable) function
+        :return: Deferred firing on the reactor thread with the result
+        """
+        if self.executor is None or \
+                self.pending_jobs >= self.max_pending_jobs:
+            self.jobs_inlined += 1
+            t0 = time()
+            d = maybeDeferred(fn, *args)
+            self._record_latency(time() - t0)
+            return d
+
+        d = Deferred()
+        t0 = time()
+
+        def job_done(future):
+            self.pending_jobs -= 1
+            self._record_latency(time() - t0)
+            e = future.exception()
+            if e is not None:
+                d.errback(e)
+            else:
+                d.callback(future.result())
+
+        self.pending_jobs += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(
+            lambda f: reactor.callFromThread(job_done, f))
+        return d
+
+    def _record_latency(self, latency):
+        self.jobs_completed += 1
+        self.last_job_latency = latency
+        self.max_job_latency = max(self.max_job_latency, latency)
+        _job_latency.observe(latency)
+
+    def get_metrics(self):
+        """
+        Return pool metrics; the max latency is reset on each call
+        """
+        metrics = {
+            'flow-decomposition-pending-jobs': self.pending_jobs,
+            'flow-decomposition-jobs-completed': self.jobs_completed,
+            'flow-decomposition-jobs-inlined': self.jobs_inlined,
+            'flow-decomposition-last-latency-ms':
+                self.last_job_latency * 1000,
+            'flow-decomposition-max-latency-ms': self.max_job_latency * 1000,
+        }
+        self.max_job_latency = 0.0
+        return metrics
@@ -13,6 +13,8 @@
 # limitations under the License.
 #
 import sys
+from hashlib import md5
+
 import structlog
 from grpc import StatusCode
 from twisted.internet.defer import inlineCallbacks
@@ -22,6 +24,7 @@ from common.utils.grpc_utils import twisted_async
 from common.utils.id_generation import \
     create_cluster_id, create_empty_broadcast_id
 from voltha.core.config.config_root import ConfigRoot
+from voltha.core.paging import merge_pages
 from voltha.protos.device_pb2 import PmConfigs, Images, \
     ImageDownload, ImageDownloads
 from voltha.protos.common_pb2 import OperationResp
@@ -30,7 +33,7 @@ from voltha.protos.voltha_pb2 import \
     VolthaGlobalServiceServicer, Voltha, VolthaInstances, VolthaInstance, \
     LogicalDevice, Ports, Flows, FlowGroups, Device, SelfTestResponse, \
     VolthaGlobalServiceStub, Devices, DeviceType, DeviceTypes, DeviceGroup, \
-    AlarmFilter, AlarmFilters
+    AlarmFilter, AlarmFilters, FlowTableBatchStatus, LogicalDeviceStats
 from voltha.registry import registry
 from google.protobuf.empty_pb2 import Empty
 from dispatcher import DispatchError
@@ -115,6 +118,22 @@ class GlobalHandler(VolthaGlobalServiceServicer):
         self.stopped = True
         log.info('stopped')
 
+    @staticmethod
+    def _reply_if_modified(response, context):
+        """
+        Conditional read of the merged response of a broadcast request, as
+        the local handler does for a single instance: the response is
+        replaced by an empty one if it matches the 'if-none-match' request
+        metadata.
+        """
+        etag = md5(response.SerializeToString()).hexdigest()[:12]
+        if dict(context.invocation_metadata()).get('if-none-match') == etag:
+            context.send_initial_metadata(
+                (('etag', etag), ('not-modified', 'true')))
+            return type(response)()
+        context.send_initial_metadata((('etag', etag),))
+        return response
+
     # gRPC service method implementations. BE CAREFUL; THESE ARE CALLED ON
     # the gRPC threadpool threads.
 
@@ -159,11 +178,12 @@ class GlobalHandler(VolthaGlobalServiceServicer):
     def ListLogicalDevices(self, request, context):
         log.info('grpc-request', request=request)
         response = yield self.dispatcher.dispatch('ListLogicalDevices',
-                                                  Empty(),
+                                                  request,
                                                   context,
                                                   broadcast=True)
+        response = merge_pages(response, request)
         log.debug('grpc-response', response=response)
-        returnValue(response)
+        returnValue(self._reply_if_modified(response, context))
 
     @twisted_async
     @inlineCallbacks
@@ -244,6 +264,46 @@ class GlobalHandler(VolthaGlobalServiceServicer):
             log.debug('grpc-success-response', response=response)
             returnValue(response)
 
+    @twisted_async
+    @inlineCallbacks
+    def UpdateLogicalDeviceFlowTableBatch(self, request, context):
+        log.info('grpc-request', id=request.id, items=len(request.items))
+        response = yield self.dispatcher.dispatch(
+            'UpdateLogicalDeviceFlowTableBatch',
+            request,
+            context,
+            id=request.id)
+        log.debug('grpc-response', response=response)
+        if isinstance(response, DispatchError):
+            log.warn('grpc-error-response', error=response.error_code)
+            context.set_details(
+                'Logical device \'{}\' error'.format(request.id))
+            context.set_code(response.error_code)
+            returnValue(FlowTableBatchStatus())
+        else:
+            log.debug('grpc-success-response', response=response)
+            returnValue(response)
+
+    @twisted_async
+    @inlineCallbacks
+    def GetLogicalDeviceStats(self, request, context):
+        log.info('grpc-request', request=request)
+        response = yield self.dispatcher.dispatch(
+            'GetLogicalDeviceStats',
+            request,
+            context,
+            id=request.id)
+        log.debug('grpc-response', response=response)
+        if isinstance(response, DispatchError):
+            log.warn('grpc-error-response', error=response.error_code)
+            context.set_details(
+                'Logical device \'{}\' error'.format(request.id))
+            context.set_code(response.error_code)
+            returnValue(LogicalDeviceStats())
+        else:
+            log.debug('grpc-success-response', response=response)
+            returnValue(response)
+
     @twisted_async
     @inlineCallbacks
     def ListLogicalDeviceFlowGroups(self, request, context):
@@ -289,11 +349,12 @@ class GlobalHandler(VolthaGlobalServiceServicer):
     def ListDevices(self, request, context):
         log.info('grpc-request', request=request)
         response = yield self.dispatcher.dispatch('ListDevices',
-                                                  Empty(),
+                                                  request,
                                                   context,
                                                   broadcast=True)
+        response = merge_pages(response, request)
         log.debug('grpc-response', response=response)
-        returnValue(response)
+        returnValue(self._reply_if_modified(response, context))
 
     @twisted_async
     @inlineCallbacks
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from Queue import Empty as QueueEmpty
+from collections import deque
+from hashlib import md5
+from threading import Condition, Lock
 from uuid import uuid4
 
 import structlog
@@ -21,17 +23,20 @@ from grpc import StatusCode
 from grpc._channel import _Rendezvous
 
 from common.utils.grpc_utils import twisted_async
-from twisted.internet import task
+from twisted.internet import reactor, task, threads
 from common.utils.id_generation import create_cluster_device_id
 from voltha.core.config.config_root import ConfigRoot
-from voltha.protos.openflow_13_pb2 import PacketIn, Flows, FlowGroups, \
-    ofp_port_status
+from voltha.core.paging import select
+from voltha.protos.openflow_13_pb2 import PacketIn, PacketIns, Flows, \
+    FlowGroups, FlowTableBatchStatus, FlowTableBatchItemStatus, \
+    LogicalDeviceStats, ofp_port_status
 from voltha.protos.voltha_pb2 import \
     add_VolthaLocalServiceServicer_to_server, VolthaLocalServiceServicer, \
     VolthaInstance, Adapters, LogicalDevices, LogicalDevice, Ports, \
     LogicalPorts, Devices, Device, DeviceType, \
     DeviceTypes, DeviceGroups, DeviceGroup, AdminState, OperStatus, ChangeEvent, \
-    AlarmFilter, AlarmFilters, SelfTestResponse, OfAgentSubscriber
+    AlarmFilter, AlarmFilters, SelfTestResponse, OfAgentSubscriber, \
+    LogicalDeviceEvent
 from voltha.protos.device_pb2 import PmConfigs, Images, ImageDownload, ImageDownloads
 from voltha.protos.common_pb2 import OperationResp
 from voltha.protos.bbf_fiber_base_pb2 import AllMulticastDistributionSetData, AllMulticastGemportsConfigData
@@ -59,6 +64,19 @@ class LocalHandler(VolthaLocalServiceServicer):
         self.ofagent_heartbeat_delay = 5
         self.ofagent_heartbeat_lc = None
         self.ofagent_is_alive = True
+        self.packet_in_batch_size = 256
+
+        # each stream holds a gRPC thread for as long as it lasts; leave
+        # enough of them to the unary requests
+        self.max_streams = 12
+        self.streams = 0
+        self.streams_lock = Lock()
+
+        # recent logical device events, for streams to resume from
+        self.logical_device_event_epoch = uuid4().hex[:12]
+        self.logical_device_event_sequence = 0
+        self.logical_device_events = deque(maxlen=256)
+        self.logical_device_events_cond = Condition()
 
     def start(self, config_backend=None):
         log.debug('starting')
@@ -103,40 +121,120 @@ class LocalHandler(VolthaLocalServiceServicer):
 
         log.info('stopped')
 
+    def _open_stream(self, context):
+        with self.streams_lock:
+            if self.streams >= self.max_streams:
+                log.warn('too-many-streams', streams=self.streams)
+                context.set_details('Too many concurrent streams')
+                context.set_code(StatusCode.RESOURCE_EXHAUSTED)
+                return False
+            self.streams += 1
+            return True
+
+    def _close_stream(self):
+        with self.streams_lock:
+            self.streams -= 1
+
+    def _receive(self, fan_out, context, max_items=None):
+        """
+        Generate the batches of items published to a fan-out, until the
+        client goes away, the ofagent session ends or the handler stops.
+        In between batches, the gRPC thread serving the stream sleeps.
+        """
+        if not self._open_stream(context):
+            return
+        queue = fan_out.subscribe()
+        # wake the thread up if the client goes away
+        context.add_callback(queue.close)
+        try:
+            while self.ofagent_is_alive and not self.stopped:
+                items = queue.get_batch(max_items)
+                if not items:
+                    break  # closed
+                yield items
+        finally:
+            fan_out.unsubscribe(queue)
+            self._close_stream()
+
     def get_proxy(self, path, exclusive=False):
         return self.root.get_proxy(path, exclusive)
 
     def has_started_with_existing_data(self):
         return self.started_with_existing_data
 
+    @staticmethod
+    def _select(response_class, items, request, context, key='id'):
+        """
+        Build the response of a list RPC, with the items selected by the
+        filters, page and field mask of the ListRequest
+        """
+        try:
+            items, next_page_token = select(items, request, key)
+        except ValueError, e:
+            context.set_details(str(e))
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            return response_class()
+        return response_class(items=items, next_page_token=next_page_token)
+
+    def _read_if_modified(self, path, context, depth=0, request=None):
+        """
+        Read from the config tree, unless the client already has the data.
+        The etag of the data read is sent back as the 'etag' response
+        metadata. A client giving it back as the 'if-none-match' request
+        metadata gets 'not-modified' response metadata and an empty
+        response if the data did not change in between.
+        :param request: ListRequest selecting the items returned, if any
+        :return: the data read, or None if not modified
+        """
+        variant = str(depth)
+        if request is not None and request.ByteSize():
+            variant += '.' + md5(request.SerializeToString()).hexdigest()[:8]
+
+        metadata = dict(context.invocation_metadata())
+        known_hash, _, known_variant = \
+            metadata.get('if-none-match', '').partition('-')
+        hash, data = self.root.read_versioned(
+            path, depth, known_hash if known_variant == variant else None)
+
+        etag = '{}-{}'.format(hash, variant)
+        if data is None:
+            context.send_initial_metadata(
+                (('etag', etag), ('not-modified', 'true')))
+        else:
+            context.send_initial_metadata((('etag', etag),))
+        return data
+
     # gRPC service method implementations. BE CAREFUL; THESE ARE CALLED ON
     # the gRPC threadpool threads.
+    #
+    # The read-only ones are served right there, reading the config tree
+    # with root.read(), so that reads scale with the gRPC thread pool
+    # rather than being serialized through the reactor thread; all others
+    # are run on the reactor thread with twisted_async.
 
-    @twisted_async
     def GetVolthaInstance(self, request, context):
         log.info('grpc-request', request=request)
         depth = int(dict(context.invocation_metadata()).get('get-depth', 0))
-        res = self.root.get('/', depth=depth)
+        res = self.root.read('/', depth=depth)
         return res
 
-    @twisted_async
     def GetHealth(self, request, context):
         log.info('grpc-request', request=request)
-        return self.root.get('/health')
+        return self.root.read('/health')
 
-    @twisted_async
     def ListAdapters(self, request, context):
         log.info('grpc-request', request=request)
-        items = self.root.get('/adapters')
+        items = self.root.read('/adapters')
         return Adapters(items=items)
 
-    @twisted_async
     def ListLogicalDevices(self, request, context):
         log.info('grpc-request', request=request)
-        items = self.root.get('/logical_devices')
-        return LogicalDevices(items=items)
+        items = self._read_if_modified(
+            '/logical_devices', context, request=request)
+        if items is None:
+            return LogicalDevices()
+        return self._select(LogicalDevices, items, request, context)
 
-    @twisted_async
     def GetLogicalDevice(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -149,14 +247,16 @@ class LocalHandler(VolthaLocalServiceServicer):
             return LogicalDevice()
 
         try:
-            return self.root.get('/logical_devices/' + request.id, depth=depth)
+            logical_device = self._read_if_modified(
+                '/logical_devices/' + request.id, context, depth)
+            return LogicalDevice() if logical_device is None \
+                else logical_device
         except KeyError:
             context.set_details(
                 'Logical device \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return LogicalDevice()
 
-    @twisted_async
     def ListLogicalDevicePorts(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -167,16 +267,15 @@ class LocalHandler(VolthaLocalServiceServicer):
             return LogicalPorts()
 
         try:
-            items = self.root.get(
+            items = self.root.read(
                 '/logical_devices/{}/ports'.format(request.id))
-            return LogicalPorts(items=items)
+            return self._select(LogicalPorts, items, request, context)
         except KeyError:
             context.set_details(
                 'Logical device \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return LogicalPorts()
 
-    @twisted_async
     def ListLogicalDeviceFlows(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -187,9 +286,11 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Flows()
 
         try:
-            flows = self.root.get(
+            flows = self.root.read(
                 '/logical_devices/{}/flows'.format(request.id))
-            return flows
+            flows = self.core.counter_store.merge_flow_counters(
+                request.id, flows)
+            return self._select(Flows, flows.items, request, context)
         except KeyError:
             context.set_details(
                 'Logical device \'{}\' not found'.format(request.id))
@@ -217,6 +318,51 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Empty()
 
     @twisted_async
+    def UpdateLogicalDeviceFlowTableBatch(self, request, context):
+        log.info('grpc-request', id=request.id, items=len(request.items))
+
+        if '/' in request.id:
+            context.set_details(
+                'Malformed logical device id \'{}\''.format(request.id))
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            return FlowTableBatchStatus()
+
+        try:
+            agent = self.core.get_logical_device_agent(request.id)
+        except KeyError:
+            context.set_details(
+                'Logical device \'{}\' not found'.format(request.id))
+            context.set_code(StatusCode.NOT_FOUND)
+            return FlowTableBatchStatus()
+
+        errors = agent.update_tables_batch(
+            [getattr(item, item.WhichOneof('mod')) for item in request.items])
+        return FlowTableBatchStatus(items=[
+            FlowTableBatchItemStatus(success=True) if error is None else
+            FlowTableBatchItemStatus(
+                error_type=error[0], error_code=error[1])
+            for error in errors])
+
+    @twisted_async
+    def GetLogicalDeviceStats(self, request, context):
+        log.info('grpc-request', request=request)
+
+        if '/' in request.id:
+            context.set_details(
+                'Malformed logical device id \'{}\''.format(request.id))
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            return LogicalDeviceStats()
+
+        try:
+            return self.core.counter_store.get_logical_device_stats(
+                request.id, lambda: self.root.get(
+                    '/logical_devices/{}/flows'.format(request.id)))
+        except KeyError:
+            context.set_details(
+                'Logical device \'{}\' not found'.format(request.id))
+            context.set_code(StatusCode.NOT_FOUND)
+            return LogicalDeviceStats()
+
     def ListLogicalDeviceFlowGroups(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -227,9 +373,10 @@ class LocalHandler(VolthaLocalServiceServicer):
             return FlowGroups()
 
         try:
-            groups = self.root.get(
+            groups = self.root.read(
                 '/logical_devices/{}/flow_groups'.format(request.id))
-            return groups
+            return self._select(FlowGroups, groups.items, request, context,
+                                key='desc.group_id')
         except KeyError:
             context.set_details(
                 'Logical device \'{}\' not found'.format(request.id))
@@ -256,13 +403,13 @@ class LocalHandler(VolthaLocalServiceServicer):
             context.set_code(StatusCode.NOT_FOUND)
             return Empty()
 
-    @twisted_async
     def ListDevices(self, request, context):
         log.info('grpc-request', request=request)
-        items = self.root.get('/devices')
-        return Devices(items=items)
+        items = self._read_if_modified('/devices', context, request=request)
+        if items is None:
+            return Devices()
+        return self._select(Devices, items, request, context)
 
-    @twisted_async
     def GetDevice(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -275,7 +422,9 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Device()
 
         try:
-            return self.root.get('/devices/' + request.id, depth=depth)
+            device = self._read_if_modified(
+                '/devices/' + request.id, context, depth)
+            return Device() if device is None else device
         except KeyError:
             context.set_details(
                 'Device \'{}\' not found'.format(request.id))
@@ -486,7 +635,6 @@ class LocalHandler(VolthaLocalServiceServicer):
             response = ImageDownload(state=ImageDownload.DOWNLOAD_FAILED)
             return response
 
-    @twisted_async
     def GetImageDownload(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -498,7 +646,7 @@ class LocalHandler(VolthaLocalServiceServicer):
             return response
 
         try:
-            response = self.root.get('/devices/{}/image_downloads/{}'.\
+            response = self.root.read('/devices/{}/image_downloads/{}'.\
                     format(request.id, request.name))
             return response
 
@@ -509,7 +657,6 @@ class LocalHandler(VolthaLocalServiceServicer):
             response = ImageDownload(state=ImageDownload.DOWNLOAD_UNKNOWN)
             return response
 
-    @twisted_async
     def ListImageDownloads(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -521,7 +668,7 @@ class LocalHandler(VolthaLocalServiceServicer):
             return response
 
         try:
-            response = self.root.get('/devices/{}/image_downloads'.\
+            response = self.root.read('/devices/{}/image_downloads'.\
                     format(request.id))
             return ImageDownloads(items=response)
 
@@ -643,7 +790,6 @@ class LocalHandler(VolthaLocalServiceServicer):
 
         return Empty()
 
-    @twisted_async
     def ListDevicePorts(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -654,15 +800,15 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Ports()
 
         try:
-            items = self.root.get('/devices/{}/ports'.format(request.id))
-            return Ports(items=items)
+            items = self.root.read('/devices/{}/ports'.format(request.id))
+            return self._select(Ports, items, request, context,
+                                key='port_no')
         except KeyError:
             context.set_details(
                 'Device \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return Ports()
 
-    @twisted_async
     def ListDevicePmConfigs(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -673,7 +819,7 @@ class LocalHandler(VolthaLocalServiceServicer):
             return PmConfigs()
 
         try:
-            pm_configs = self.root.get(
+            pm_configs = self.root.read(
                 '/devices/{}/pm_configs'.format(request.id))
             pm_configs.id = request.id
             log.debug('device-for-pms', pm_configs=pm_configs)
@@ -705,7 +851,6 @@ class LocalHandler(VolthaLocalServiceServicer):
             context.set_code(StatusCode.NOT_FOUND)
             return Empty()
 
-    @twisted_async
     def ListDeviceFlows(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -716,15 +861,16 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Flows()
 
         try:
-            flows = self.root.get('/devices/{}/flows'.format(request.id))
-            return flows
+            flows = self.root.read('/devices/{}/flows'.format(request.id))
+            flows = self.core.counter_store.merge_flow_counters(
+                request.id, flows)
+            return self._select(Flows, flows.items, request, context)
         except KeyError:
             context.set_details(
                 'Device \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return Flows()
 
-    @twisted_async
     def ListDeviceFlowGroups(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -735,22 +881,21 @@ class LocalHandler(VolthaLocalServiceServicer):
             return FlowGroups()
 
         try:
-            groups = self.root.get(
+            groups = self.root.read(
                 '/devices/{}/flow_groups'.format(request.id))
-            return groups
+            return self._select(FlowGroups, groups.items, request, context,
+                                key='desc.group_id')
         except KeyError:
             context.set_details(
                 'Device \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return FlowGroups()
 
-    @twisted_async
     def ListDeviceTypes(self, request, context):
         log.info('grpc-request', request=request)
-        items = self.root.get('/device_types')
+        items = self.root.read('/device_types')
         return DeviceTypes(items=items)
 
-    @twisted_async
     def GetDeviceType(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -763,21 +908,19 @@ class LocalHandler(VolthaLocalServiceServicer):
             return DeviceType()
 
         try:
-            return self.root.get('/device_types/' + request.id, depth=depth)
+            return self.root.read('/device_types/' + request.id, depth=depth)
         except KeyError:
             context.set_details(
                 'Device type \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return DeviceType()
 
-    @twisted_async
     def ListDeviceGroups(self, request, context):
         log.info('grpc-request', request=request)
         # TODO is this mapped to tree or taken from coordinator?
-        items = self.root.get('/device_groups')
+        items = self.root.read('/device_groups')
         return DeviceGroups(items=items)
 
-    @twisted_async
     def GetDeviceGroup(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -791,7 +934,7 @@ class LocalHandler(VolthaLocalServiceServicer):
 
         # TODO is this mapped to tree or taken from coordinator?
         try:
-            return self.root.get('/device_groups/' + request.id, depth=depth)
+            return self.root.read('/device_groups/' + request.id, depth=depth)
         except KeyError:
             context.set_details(
                 'Device group \'{}\' not found'.format(request.id))
@@ -1017,8 +1160,13 @@ class LocalHandler(VolthaLocalServiceServicer):
             agent = self.core.get_logical_device_agent(packet_out.id)
             agent.packet_out(packet_out.packet_out)
 
-        for request in request_iterator:
-            forward_packet_out(packet_out=request)
+        if not self._open_stream(context):
+            return Empty()
+        try:
+            for request in request_iterator:
+                forward_packet_out(packet_out=request)
+        finally:
+            self._close_stream()
 
         log.debug('stop-stream-packets-out')
 
@@ -1026,48 +1174,111 @@ class LocalHandler(VolthaLocalServiceServicer):
 
     def ReceivePacketsIn(self, request, context):
         log.debug('start-receive-packets-in')
-        while self.ofagent_is_alive:
-            try:
-                packet_in = self.core.packet_in_queue.get(timeout=1)
+        for packet_ins in self._receive(self.core.packet_in_fan_out, context):
+            for packet_in in packet_ins:
                 yield packet_in
-            except QueueEmpty:
-                if self.stopped:
-                    break
         log.debug('stop-receive-packets-in')
 
+    def ReceivePacketInBatches(self, request, context):
+        log.debug('start-receive-packet-in-batches')
+        for packet_ins in self._receive(self.core.packet_in_fan_out, context,
+                                        self.packet_in_batch_size):
+            yield PacketIns(items=packet_ins)
+        log.debug('stop-receive-packet-in-batches')
+
     def send_packet_in(self, device_id, ofp_packet_in):
         """Must be called on the twisted thread"""
         packet_in = PacketIn(id=device_id, packet_in=ofp_packet_in)
-        self.core.packet_in_queue.put(packet_in)
+        self.core.packet_in_fan_out.publish(packet_in)
 
     def ReceiveChangeEvents(self, request, context):
         log.debug('start-receive-change-events')
-        while self.ofagent_is_alive:
-            try:
-                event = self.core.change_event_queue.get(timeout=1)
+        for events in self._receive(self.core.change_event_fan_out, context):
+            for event in events:
                 yield event
-            except QueueEmpty:
-                if self.stopped:
-                    break
         log.debug('stop-receive-change-events')
 
     def send_port_change_event(self, device_id, port_status):
         """Must be called on the twisted thread"""
         assert isinstance(port_status, ofp_port_status)
         event = ChangeEvent(id=device_id, port_status=port_status)
-        self.core.change_event_queue.put(event)
+        self.core.change_event_fan_out.publish(event)
+
+    def ReceiveLogicalDeviceEvents(self, request, context):
+        log.debug('start-receive-logical-device-events', request=request)
+        if request.epoch == self.logical_device_event_epoch:
+            sequence = request.sequence
+        else:
+            sequence = None  # start with a snapshot
+
+        if not self._open_stream(context):
+            return
+
+        cond = self.logical_device_events_cond
+        cancelled = []
+
+        def _cancel():
+            with cond:
+                cancelled.append(True)
+                cond.notify_all()
+
+        context.add_callback(_cancel)
+        try:
+            while self.ofagent_is_alive and not self.stopped and \
+                    not cancelled:
+                with cond:
+                    backlog = self.logical_device_events
+                    resync = sequence is None or \
+                        sequence > self.logical_device_event_sequence or \
+                        (backlog and backlog[0].sequence > sequence + 1)
+                    events = [] if resync else \
+                        [e for e in backlog if e.sequence > sequence]
+                    if not resync and not events:
+                        cond.wait()
+                        continue
+
+                if resync:
+                    # the events since the last one received are gone
+                    snapshot = threads.blockingCallFromThread(
+                        reactor, self.get_logical_device_snapshot)
+                    sequence = snapshot.sequence
+                    yield snapshot
+                else:
+                    for event in events:
+                        sequence = event.sequence
+                        yield event
+        finally:
+            self._close_stream()
+        log.debug('stop-receive-logical-device-events')
+
+    def get_logical_device_snapshot(self):
+        """Must be called on the twisted thread"""
+        return LogicalDeviceEvent(
+            epoch=self.logical_device_event_epoch,
+            sequence=self.logical_device_event_sequence,
+            type=LogicalDeviceEvent.SNAPSHOT,
+            logical_devices=self.root.get('/logical_devices'))
+
+    def send_logical_device_event(self, event_type, logical_device):
+        """Must be called on the twisted thread"""
+        with self.logical_device_events_cond:
+            self.logical_device_event_sequence += 1
+            self.logical_device_events.append(LogicalDeviceEvent(
+                epoch=self.logical_device_event_epoch,
+                sequence=self.logical_device_event_sequence,
+                type=event_type,
+                logical_devices=[logical_device]))
+            self.logical_device_events_cond.notify_all()
 
 
-    @twisted_async
     def ListAlarmFilters(self, request, context):
         try:
-            filters = self.root.get('/alarm_filters')
+            filters = self.root.read('/alarm_filters')
             return AlarmFilters(filters=filters)
         except KeyError:
             context.set_code(StatusCode.NOT_FOUND)
             return AlarmFilters()
 
-    @twisted_async
     def GetAlarmFilter(self, request, context):
         if '/' in request.id:
             context.set_details(
@@ -1076,7 +1287,7 @@ class LocalHandler(VolthaLocalServiceServicer):
             return AlarmFilter()
 
         try:
-            alarm_filter = self.root.get('/alarm_filters/{}'.format(request.id))
+            alarm_filter = self.root.read('/alarm_filters/{}'.format(request.id))
 
             return alarm_filter
         except KeyError:
@@ -1139,7 +1350,6 @@ class LocalHandler(VolthaLocalServiceServicer):
             context.set_code(StatusCode.NOT_FOUND)
             return AlarmFilter()
 
-    @twisted_async
     def GetImages(self, request, context):
         log.info('grpc-request', request=request)
 
@@ -1150,7 +1360,7 @@ class LocalHandler(VolthaLocalServiceServicer):
             return Images()
 
         try:
-            device = self.root.get('/devices/' + request.id)
+            device = self.root.read('/devices/' + request.id)
             return device.images
 
         except KeyError:
@@ -1195,6 +1405,13 @@ class LocalHandler(VolthaLocalServiceServicer):
         self.subscriber = None
         self.ofagent_heartbeat_count = 0
 
+        # End the streams, waking up their threads
+        if self.core is not None:
+            self.core.packet_in_fan_out.close_subscriptions()
+            self.core.change_event_fan_out.close_subscriptions()
+        with self.logical_device_events_cond:
+            self.logical_device_events_cond.notify_all()
+
         # Some local services will stop (packet-in/change-events)
         # need to re-register them
         registry('grpc_server').register(
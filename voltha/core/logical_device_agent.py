@@ -20,11 +20,16 @@ Model that captures the current state of a logical device
 from collections import OrderedDict
 
 import structlog
+from twisted.internet.defer import maybeDeferred, succeed
 
 from common.event_bus import EventBusClient
 from common.frameio.frameio import hexify
+from common.utils.metrics import counter
 from voltha.core.config.config_proxy import CallbackType
-from voltha.core.device_graph import DeviceGraph
+from voltha.core.device_graph import DeviceGraph, lookup_route
+from voltha.core.flow_classifier import FlowClassifier
+from voltha.core.flow_decomposition_pool import DecompositionSnapshot, \
+    decompose_flows
 from voltha.core.flow_decomposer import FlowDecomposer, \
     flow_stats_entry_from_flow_mod_message, group_entry_from_group_mod, \
     mk_flow_stat, in_port, vlan_vid, vlan_pcp, pop_vlan, output, set_field, \
@@ -34,19 +39,36 @@ from voltha.protos import openflow_13_pb2 as ofp
 from voltha.protos.device_pb2 import Port
 from voltha.protos.logical_device_pb2 import LogicalPort
 from voltha.protos.openflow_13_pb2 import Flows, FlowGroups
+from voltha.registry import registry
 
 _ = third_party
 
+_flow_mods = counter('flow-mods')
+_group_mods = counter('group-mods')
+
 def mac_str_to_tuple(mac):
     return tuple(int(d, 16) for d in mac.split(':'))
 
 
+class _TableBatch(object):
+    """
+    Working copies of the flow and group tables while a batch is applied
+    """
+    def __init__(self):
+        self.flows = None
+        self.flows_changed = False
+        self.groups = None
+        self.groups_changed = False
+        self.error = None  # (ofp_error_type, code) of the current item
+
+
 class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
 
     def __init__(self, core, logical_device):
         try:
             self.core = core
             self.local_handler = core.get_local_handler()
+            self.decomposition_pool = registry('flow_decomposition')
             self.logical_device_id = logical_device.id
 
             self.root_proxy = core.get_proxy('/')
@@ -76,6 +98,17 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             self.log = structlog.get_logger(logical_device_id=logical_device.id)
 
             self._routes = None
+            self._default_rules = None
+            self._nni_logical_port_no = None
+            # logical ports added since the route table was last brought up
+            # to date, by port id; bursts of added ports (e.g., during ONU
+            # discovery) are routed in one go on the next route lookup
+            self._pending_ports = OrderedDict()
+            self._default_rules_stale = False
+            self._batch = None
+            self._skip_group_table_update = False
+            self._flow_classifier = FlowClassifier()
+            self._device_rules_written = succeed(None)
         except Exception, e:
             self.log.exception('init-error', e=e)
 
@@ -118,16 +151,23 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             raise NotImplementedError("announce_flow_deleted")
 
     def signal_flow_mod_error(self, code, flow_mod):
-        pass  # TODO
+        if self._batch is not None:
+            self._batch.error = (ofp.OFPET_FLOW_MOD_FAILED, code)
+        else:
+            self.log.warn('flow-mod-failed', code=code, flow_mod=flow_mod)
 
     def signal_flow_removal(self, code, flow):
         pass  # TODO
 
     def signal_group_mod_error(self, code, group_mod):
-        pass  # TODO
+        if self._batch is not None:
+            self._batch.error = (ofp.OFPET_GROUP_MOD_FAILED, code)
+        else:
+            self.log.warn('group-mod-failed', code=code, group_mod=group_mod)
 
     def update_flow_table(self, flow_mod):
 
+        _flow_mods.inc()
         command = flow_mod.command
 
         if command == ofp.OFPFC_ADD:
@@ -151,6 +191,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
 
     def update_group_table(self, group_mod):
 
+        _group_mods.inc()
         command = group_mod.command
 
         if command == ofp.OFPGC_DELETE:
@@ -166,6 +207,79 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             self.log.warn('unhandled-group-mod',
                           command=command, group_mod=group_mod)
 
+    def update_tables_batch(self, mods):
+        """
+        Apply an ordered batch of flow and group mods as one update of the
+        flow and group tables, and thus with one decomposition pass
+        :param mods: list of ofp_flow_mod and ofp_group_mod
+        :return: list with, for each mod, None if it was applied, or the
+        (ofp_error_type, code) tuple of the error it failed with
+        """
+        self._batch = batch = _TableBatch()
+        errors = []
+        try:
+            for mod in mods:
+                batch.error = None
+                try:
+                    if isinstance(mod, ofp.ofp_group_mod):
+                        self.update_group_table(mod)
+                    else:
+                        self.update_flow_table(mod)
+                except Exception, e:
+                    self.log.exception('batch-item-failed', mod=mod, e=e)
+                    if isinstance(mod, ofp.ofp_group_mod):
+                        batch.error = (ofp.OFPET_GROUP_MOD_FAILED,
+                                       ofp.OFPGMFC_INVALID_GROUP)
+                    else:
+                        batch.error = (ofp.OFPET_FLOW_MOD_FAILED,
+                                       ofp.OFPFMFC_UNKNOWN)
+                errors.append(batch.error)
+        finally:
+            self._batch = None
+
+        # the config tree fires no update callback for a table left as it
+        # was, e.g., by the re-add of an existing identical flow
+        flows_changed = batch.flows is not None and batch.flows_changed and \
+            batch.flows != list(self.flows_proxy.get('/').items)
+        if batch.groups is not None and batch.groups_changed:
+            # the flow table update below decomposes against the new groups
+            self._skip_group_table_update = flows_changed
+            try:
+                self.groups_proxy.update('/', FlowGroups(items=batch.groups))
+            finally:
+                self._skip_group_table_update = False
+        if flows_changed:
+            self.flows_proxy.update('/', Flows(items=batch.flows))
+        return errors
+
+    def _get_flows(self):
+        if self._batch is None:
+            return list(self.flows_proxy.get('/').items)
+        if self._batch.flows is None:
+            self._batch.flows = list(self.flows_proxy.get('/').items)
+        return list(self._batch.flows)
+
+    def _update_flows(self, flows):
+        if self._batch is None:
+            self.flows_proxy.update('/', Flows(items=flows))
+        else:
+            self._batch.flows = flows
+            self._batch.flows_changed = True
+
+    def _get_groups(self):
+        if self._batch is None:
+            return self.groups_proxy.get('/').items
+        if self._batch.groups is None:
+            self._batch.groups = list(self.groups_proxy.get('/').items)
+        return self._batch.groups
+
+    def _update_groups(self, groups):
+        if self._batch is None:
+            self.groups_proxy.update('/', FlowGroups(items=groups))
+        else:
+            self._batch.groups = list(groups)
+            self._batch.groups_changed = True
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~ LOW LEVEL FLOW HANDLERS ~~~~~~~~~~~~~~~~~~~~~~~
 
     def flow_add(self, mod):
@@ -173,7 +287,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert mod.cookie_mask == 0
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._get_flows()
 
         changed = False
         check_overlap = mod.flags & ofp.OFPFF_CHECK_OVERLAP
@@ -185,6 +299,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                 # free to add as new flow
                 flow = flow_stats_entry_from_flow_mod_message(mod)
                 flows.append(flow)
+                self._flow_classifier.add(flow)
                 changed = True
                 self.log.debug('flow-added', flow=mod)
 
@@ -192,28 +307,31 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             flow = flow_stats_entry_from_flow_mod_message(mod)
             idx = self.find_flow(flows, flow)
             if idx >= 0:
-                old_flow = flows[idx]
-                if not (mod.flags & ofp.OFPFF_RESET_COUNTS):
-                    flow.byte_count = old_flow.byte_count
-                    flow.packet_count = old_flow.packet_count
+                # counters are kept in the counter store, keyed by flow id,
+                # and thus survive the update unless asked to reset them
+                if mod.flags & ofp.OFPFF_RESET_COUNTS:
+                    self.core.counter_store.reset_flow_counters(
+                        self.logical_device_id, flow.id)
                 flows[idx] = flow
+                self._flow_classifier.add(flow)
                 changed = True
                 self.log.debug('flow-updated', flow=flow)
 
             else:
                 flows.append(flow)
+                self._flow_classifier.add(flow)
                 changed = True
                 self.log.debug('flow-added', flow=mod)
 
         # write back to model
         if changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._update_flows(flows)
 
     def flow_delete(self, mod):
         assert isinstance(mod, ofp.ofp_flow_mod)
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._get_flows()
 
         # build a list of what to keep vs what to delete
         to_keep = []
@@ -221,6 +339,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         for f in flows:
             if self.flow_matches_spec(f, mod):
                 to_delete.append(f)
+                self._flow_classifier.remove(f.id)
             else:
                 to_keep.append(f)
 
@@ -229,7 +348,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
 
         # write back
         if to_delete:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._update_flows(flows)
 
         # send notifications for discarded flow as required by OpenFlow
         self.announce_flows_deleted(to_delete)
@@ -238,20 +357,21 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert isinstance(mod, ofp.ofp_flow_mod)
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._get_flows()
         changed = False
 
         flow = flow_stats_entry_from_flow_mod_message(mod)
         idx = self.find_flow(flows, flow)
         if (idx >= 0):
             del flows[idx]
+            self._flow_classifier.remove(flow.id)
             changed = True
         else:
             # TODO need to check what to do with this case
             self.log.warn('flow-cannot-delete', flow=flow)
 
         if changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._update_flows(flows)
 
     def flow_modify(self, mod):
         raise NotImplementedError()
@@ -264,11 +384,17 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         Return list of overlapping flow(s)
         Two flows overlap if a packet may match both and if they have the
         same priority.
+        The lookup is served by the flow classifier, which is kept in line
+        with the flow table; flows is only used to resync it when the two
+        are found to have drifted apart.
+        :param flows: current flow table (list of ofp_flow_stats)
         :param mod: Flow request
         :param return_on_first: if True, return with the first entry
-        :return:
+        :return: list of ofp_flow_stats
         """
-        return []  # TODO finish implementation
+        if len(self._flow_classifier) != len(flows):
+            self._flow_classifier.sync(flows)
+        return self._flow_classifier.find_overlapping(mod, return_on_first)
 
     @classmethod
     def find_flow(cls, flows, flow):
@@ -382,6 +508,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         for f in flows:
             if self.flow_has_out_group(f, group_id):
                 to_delete.append(f)
+                self._flow_classifier.remove(f.id)
             else:
                 to_keep.append(f)
 
@@ -399,7 +526,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._get_groups())
         changed = False
 
         if group_mod.group_id in groups:
@@ -410,13 +537,13 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             changed = True
 
         if changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._update_groups(groups.values())
 
     def group_delete(self, group_mod):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._get_groups())
         groups_changed = False
         flows_changed = False
 
@@ -434,7 +561,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                 pass
 
             else:
-                flows = list(self.flows_proxy.get('/').items)
+                flows = self._get_flows()
                 flows_changed, flows = self.flows_delete_by_group_id(
                     flows, group_id)
                 del groups[group_id]
@@ -442,15 +569,15 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                 self.log.debug('group-deleted', group_id=group_id)
 
         if groups_changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._update_groups(groups.values())
         if flows_changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._update_flows(flows)
 
     def group_modify(self, group_mod):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._get_groups())
         changed = False
 
         if group_mod.group_id not in groups:
@@ -463,7 +590,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             changed = True
 
         if changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._update_groups(groups.values())
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ PACKET_OUT ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -512,13 +639,12 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         # built-in assumptions, and not yet device vendor specific. The policy-
         # based refinement will be introduced that later.
 
+        self._flow_classifier.sync(flows.items)
+        self.core.counter_store.retain_flow_counters(
+            self.logical_device_id, (f.id for f in flows.items))
+
         groups = self.groups_proxy.get('/').items
-        device_rules_map = self.decompose_rules(flows.items, groups)
-        for device_id, (flows, groups) in device_rules_map.iteritems():
-            self.root_proxy.update('/devices/{}/flows'.format(device_id),
-                                   Flows(items=flows.values()))
-            self.root_proxy.update('/devices/{}/flow_groups'.format(device_id),
-                                   FlowGroups(items=groups.values()))
+        self._update_device_rules(flows.items, groups)
 
     # ~~~~~~~~~~~~~~~~~~~~ GROUP TABLE UPDATE HANDLING ~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -527,9 +653,54 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                   logical_device_id=self.logical_device_id,
                   flow_groups=flow_groups)
 
+        if self._skip_group_table_update:
+            return
+
         flows = self.flows_proxy.get('/').items
-        device_flows_map = self.decompose_rules(flows, flow_groups.items)
-        for device_id, (flows, groups) in device_flows_map.iteritems():
+        self._update_device_rules(flows, flow_groups.items)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~ DEVICE RULES UPDATE ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _update_device_rules(self, flows, groups):
+        """
+        Decompose the logical device rules and write them to the devices.
+        Decompositions may complete out of order on the decomposition pool,
+        but are written back in the order they were requested.
+        """
+        d = maybeDeferred(self._decompose_rules_deferred, flows, groups)
+        self._device_rules_written.addCallback(lambda _: d)
+        self._device_rules_written.addCallback(self._write_device_rules)
+        self._device_rules_written.addErrback(
+            lambda failure: self.log.error('device-rules-update-failed',
+                                           failure=failure))
+
+    def _decompose_rules_deferred(self, flows, groups):
+        """
+        Like decompose_rules, but only the flows missing from the
+        decomposition cache are decomposed, on the decomposition pool,
+        against a snapshot of the current routes and default rules
+        :return: Deferred firing with the device rules map
+        """
+        self._assure_cached_tables_up_to_date()
+        group_map = dict((g.desc.group_id, g) for g in groups)
+        lookups, misses = self.lookup_decompositions(flows, group_map)
+        generation = self._decomposition_cache_generation
+        if misses:
+            # the route table and default rules are updated in place, the
+            # snapshot is pickled over to the workers from another thread
+            snapshot = DecompositionSnapshot(
+                self.logical_device_id, self._routes.copy(),
+                dict(self._default_rules), self._nni_logical_port_no)
+            d = self.decomposition_pool.submit(
+                decompose_flows, snapshot, misses, group_map)
+        else:
+            d = succeed([])
+        d.addCallback(lambda decomposed_misses: self.merge_decompositions(
+            lookups, decomposed_misses, generation))
+        return d
+
+    def _write_device_rules(self, device_rules_map):
+        for device_id, (flows, groups) in device_rules_map.iteritems():
             self.root_proxy.update('/devices/{}/flows'.format(device_id),
                                    Flows(items=flows.values()))
             self.root_proxy.update('/devices/{}/flow_groups'.format(device_id),
@@ -572,7 +743,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
     def _port_removed(self, port):
         self.log.debug('port-removed', port=port)
         assert isinstance(port, LogicalPort)
-        self._port_list_updated(port)
+        self._port_list_updated(port, removed=True)
 
         # Remove the proxy references
         self.port_proxy[port.id].unregister_callback(
@@ -598,154 +769,178 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             )
         )
 
-    def _port_list_updated(self, _):
-        # invalidate the graph and the route table
-        self._invalidate_cached_tables()
+    def _port_list_updated(self, port, removed=False):
+        if port.root_port:
+            # all routes pass the root port, start over
+            self._invalidate_cached_tables()
+            return
+
+        # update the route table for this port only; removing routes is
+        # cheap and done right away, routing added ports is deferred
+        if self._routes is not None:
+            self._pending_ports.pop(port.id, None)
+            if removed:
+                self.remove_port_routes(self._routes, port)
+            else:
+                self._pending_ports[port.id] = port
+            self._default_rules_stale = True
+
+        # only flows routed via this port need to be decomposed again
+        self.invalidate_decomposition_cache(port.ofp_port.port_no)
 
     def _invalidate_cached_tables(self):
         self._routes = None
         self._default_rules = None
         self._nni_logical_port_no = None
+        self._pending_ports.clear()
+        self._default_rules_stale = False
+        # the memoized decompositions follow the routes they were made with
+        self.invalidate_decomposition_cache()
 
     def _assure_cached_tables_up_to_date(self):
         if self._routes is None:
             logical_ports = self.self_proxy.get('/ports')
-            graph, self._routes = self.compute_routes(
-                self.root_proxy, logical_ports)
-            self._default_rules = self._generate_default_rules(graph)
-            root_ports = [p for p in logical_ports if p.root_port]
-            assert len(root_ports) == 1
-            self._nni_logical_port_no = root_ports[0].ofp_port.port_no
-
-
-    def _generate_default_rules(self, graph):
-
-        def root_device_default_rules(device):
-            ports = self.root_proxy.get('/devices/{}/ports'.format(device.id))
-            upstream_ports = [
-                port for port in ports if port.type == Port.ETHERNET_NNI
-            ]
-            assert len(upstream_ports) == 1
-            downstream_ports = [
-                port for port in ports if port.type == Port.PON_OLT
-            ]
-            assert len(downstream_ports) == 1, \
-                'Initially, we only handle one PON port'
-            flows = OrderedDict((f.id, f) for f in [
-                mk_flow_stat(
-                    priority=2000,
-                    match_fields=[
-                        in_port(upstream_ports[0].port_no),
-                        vlan_vid(ofp.OFPVID_PRESENT | 4000),
-                        vlan_pcp(0)
-                    ],
-                    actions=[
-                        pop_vlan(),
-                        output(downstream_ports[0].port_no)
-                    ]
-                )
-            ])
-            groups = OrderedDict()
-            return flows, groups
-
-        def leaf_device_default_rules(device):
-            ports = self.root_proxy.get('/devices/{}/ports'.format(device.id))
-            upstream_ports = [
-                port for port in ports if port.type == Port.PON_ONU
-            ]
-            assert len(upstream_ports) == 1
-            downstream_ports = [
-                port for port in ports if port.type == Port.ETHERNET_UNI
-            ]
-            assert len(downstream_ports) == 1
-            flows = OrderedDict((f.id, f) for f in [
-                mk_flow_stat(
-                    priority=500,
-                    match_fields=[
-                        in_port(downstream_ports[0].port_no),
-                        vlan_vid(ofp.OFPVID_PRESENT | 0)
-                    ],
-                    actions=[
-                        set_field(vlan_vid(ofp.OFPVID_PRESENT | device.vlan)),
-                        output(upstream_ports[0].port_no)
-                    ]
-                ),
-                mk_flow_stat(
-                    priority=500,
-                    match_fields=[
-                        in_port(downstream_ports[0].port_no),
-                        vlan_vid(0)
-                    ],
-                    actions=[
-                        push_vlan(0x8100),
-                        set_field(vlan_vid(ofp.OFPVID_PRESENT | device.vlan)),
-                        output(upstream_ports[0].port_no)
-                    ]
-                ),
-                mk_flow_stat(
-                    priority=500,
-                    match_fields=[
-                        in_port(upstream_ports[0].port_no),
-                        vlan_vid(ofp.OFPVID_PRESENT | device.vlan)
-                    ],
-                    actions=[
-                        set_field(vlan_vid(ofp.OFPVID_PRESENT | 0)),
-                        output(downstream_ports[0].port_no)
-                    ]
-                ),
-            ])
-            groups = OrderedDict()
-            return flows, groups
-
+            self._routes = self.compute_routes(self.root_proxy, logical_ports)
+            self._default_rules = {}
+            self._update_default_rules()
+            self._keep_unrouted_ports_pending()
+
+        elif self._pending_ports or self._default_rules_stale:
+            pending_ports = self._pending_ports.values()
+            self._pending_ports.clear()
+            for port in pending_ports:
+                self.add_port_routes(self.root_proxy, self._routes, port)
+            self._keep_unrouted_ports_pending()
+            routed_ports = [port for port in pending_ports
+                            if port.id not in self._pending_ports]
+            for port in routed_ports:
+                # flows decomposed while the port had no route yet
+                self.invalidate_decomposition_cache(port.ofp_port.port_no)
+            routed_device_ids = set(port.device_id for port in routed_ports)
+            if routed_device_ids or self._default_rules_stale:
+                # the device of an added port may have been (re)activated
+                self._update_default_rules(routed_device_ids)
+
+        self._default_rules_stale = False
+        assert self._routes.root_port is not None
+        self._nni_logical_port_no = self._routes.root_port.ofp_port.port_no
+
+    def _keep_unrouted_ports_pending(self):
+        # ports whose link to the root device is not visible yet, e.g.,
+        # added before the PON port of the root device, are retried on
+        # the next route lookup
+        for port in self._routes.unrouted_ports():
+            self._pending_ports[port.id] = port
+
+    def _update_default_rules(self, refresh_device_ids=()):
+        """
+        Generate the default rules of the devices that joined the device
+        graph, and of the given ones; drop those of the devices that left.
+        :param refresh_device_ids: ids of devices to regenerate rules for
+        """
         root_device_id = self.self_proxy.get('/').root_device_id
-        rules = {}
-        for node_key in graph.nodes():
-            node = graph.node[node_key]
-            device = node.get('device', None)
-            if device is None:
-                continue
-            if device.id == root_device_id:
-                rules[device.id] = root_device_default_rules(device)
-            else:
-                rules[device.id] = leaf_device_default_rules(device)
-        return rules
+        root_ports = self.root_proxy.get(
+            '/devices/{}/ports'.format(root_device_id))
+        device_ids = set([root_device_id])
+        device_ids.update(
+            peer.device_id for port in root_ports for peer in port.peers)
+        device_ids.update(
+            port.device_id for port in self._routes.leaf_ports.itervalues())
+
+        for device_id in self._default_rules.keys():
+            if device_id not in device_ids:
+                del self._default_rules[device_id]
+        for device_id in device_ids:
+            if device_id not in self._default_rules or \
+                    device_id in refresh_device_ids:
+                device = self.root_proxy.get('/devices/{}'.format(device_id))
+                if device_id == root_device_id:
+                    rules = self._root_device_default_rules(device)
+                else:
+                    rules = self._leaf_device_default_rules(device)
+                self._default_rules[device_id] = rules
+
+    def _root_device_default_rules(self, device):
+        ports = self.root_proxy.get('/devices/{}/ports'.format(device.id))
+        upstream_ports = [
+            port for port in ports if port.type == Port.ETHERNET_NNI
+        ]
+        assert len(upstream_ports) == 1
+        downstream_ports = [
+            port for port in ports if port.type == Port.PON_OLT
+        ]
+        assert len(downstream_ports) == 1, \
+            'Initially, we only handle one PON port'
+        flows = OrderedDict((f.id, f) for f in [
+            mk_flow_stat(
+                priority=2000,
+                match_fields=[
+                    in_port(upstream_ports[0].port_no),
+                    vlan_vid(ofp.OFPVID_PRESENT | 4000),
+                    vlan_pcp(0)
+                ],
+                actions=[
+                    pop_vlan(),
+                    output(downstream_ports[0].port_no)
+                ]
+            )
+        ])
+        groups = OrderedDict()
+        return flows, groups
+
+    def _leaf_device_default_rules(self, device):
+        ports = self.root_proxy.get('/devices/{}/ports'.format(device.id))
+        upstream_ports = [
+            port for port in ports if port.type == Port.PON_ONU
+        ]
+        assert len(upstream_ports) == 1
+        downstream_ports = [
+            port for port in ports if port.type == Port.ETHERNET_UNI
+        ]
+        assert len(downstream_ports) == 1
+        flows = OrderedDict((f.id, f) for f in [
+            mk_flow_stat(
+                priority=500,
+                match_fields=[
+                    in_port(downstream_ports[0].port_no),
+                    vlan_vid(ofp.OFPVID_PRESENT | 0)
+                ],
+                actions=[
+                    set_field(vlan_vid(ofp.OFPVID_PRESENT | device.vlan)),
+                    output(upstream_ports[0].port_no)
+                ]
+            ),
+            mk_flow_stat(
+                priority=500,
+                match_fields=[
+                    in_port(downstream_ports[0].port_no),
+                    vlan_vid(0)
+                ],
+                actions=[
+                    push_vlan(0x8100),
+                    set_field(vlan_vid(ofp.OFPVID_PRESENT | device.vlan)),
+                    output(upstream_ports[0].port_no)
+                ]
+            ),
+            mk_flow_stat(
+                priority=500,
+                match_fields=[
+                    in_port(upstream_ports[0].port_no),
+                    vlan_vid(ofp.OFPVID_PRESENT | device.vlan)
+                ],
+                actions=[
+                    set_field(vlan_vid(ofp.OFPVID_PRESENT | 0)),
+                    output(downstream_ports[0].port_no)
+                ]
+            ),
+        ])
+        groups = OrderedDict()
+        return flows, groups
 
     def get_route(self, ingress_port_no, egress_port_no):
         self._assure_cached_tables_up_to_date()
-        if egress_port_no is not None and \
-                        (egress_port_no & 0x7fffffff) == ofp.OFPP_CONTROLLER:
-            # treat it as if the output port is the NNI of the OLT
-            egress_port_no = self._nni_logical_port_no
-
-        # If ingress_port is not specified (None), it may be a wildcarded
-        # route if egress_port is OFPP_CONTROLLER or _nni_logical_port,
-        # in which case we need to create a half-route where only the egress
-        # hop is filled, the first hope is None
-        if ingress_port_no is None and \
-                        egress_port_no == self._nni_logical_port_no:
-            # We can use the 2nd hop of any upstream route, so just find the
-            # first upstream:
-            for (ingress, egress), route in self._routes.iteritems():
-                if egress == self._nni_logical_port_no:
-                    return [None, route[1]]
-            raise Exception('not a single upstream route')
-
-        # If egress_port is not specified (None), we can also can return a
-        # "half" route
-        if egress_port_no is None:
-            for (ingress, egress), route in self._routes.iteritems():
-                if ingress == ingress_port_no:
-                    return [route[0], None]
-
-            # This can occur is a leaf device is disabled
-            self.log.exception('no-downstream-route',
-                               ingress_port_no=ingress_port_no,
-                               egress_port_no= egress_port_no
-                               )
-            return None
-
-
-        return self._routes.get((ingress_port_no, egress_port_no))
+        return lookup_route(self._routes, self._nni_logical_port_no,
+                            ingress_port_no, egress_port_no)
 
     def get_all_default_rules(self):
         self._assure_cached_tables_up_to_date()
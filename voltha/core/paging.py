@@ -0,0 +1,162 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Filtering, paging and projection of the items returned by the list RPCs,
+as requested by a ListRequest.
+
+Paged lists are ordered by the key of their items, and a page token is the
+key of the last item of the page. The next page is thus made of the items
+following that key, whatever was added or removed in between, and the pages
+returned by all Voltha instances for a broadcast request can be merged into
+one by keeping the lowest keys.
+"""
+from bisect import bisect_right
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.field_mask_pb2 import FieldMask
+
+
+def select(items, request, key='id'):
+    """
+    Apply the filters, paging and field mask of a list request to a list
+    :param items: the complete list of items
+    :param request: ListRequest
+    :param key: path of the field identifying the items
+    :return: (items of the requested page, next_page_token)
+    :raises ValueError: if the request is malformed
+    """
+    if request.filters:
+        conditions = [_parse_filter(f) for f in request.filters]
+        items = [item for item in items
+                 if all(_matches(item, path, value)
+                        for path, value in conditions)]
+
+    next_page_token = ''
+    if (request.page_size or request.page_token) and items:
+        items, next_page_token = _page(items, request, key)
+
+    if request.field_mask.paths:
+        items = _project(items, request.field_mask, key)
+
+    return items, next_page_token
+
+
+def merge_pages(response, request, key='id'):
+    """
+    Reduce the pages returned by the Voltha instances for a broadcast list
+    request, merged into a single response, to the requested page
+    :param response: merged list response, updated in place
+    :param request: ListRequest
+    :param key: path of the field identifying the items
+    :return: response
+    """
+    if not (request.page_size or request.page_token):
+        return response
+
+    items = sorted(response.items, key=lambda item: _get(item, key))
+    if request.page_size and len(items) > request.page_size:
+        items = items[:request.page_size]
+        response.next_page_token = str(_get(items[-1], key))
+    elif response.next_page_token:
+        # an instance has more items, all above those of this page
+        response.next_page_token = str(_get(items[-1], key))
+    del response.items[:]
+    response.items.extend(items)
+    return response
+
+
+def _page(items, request, key):
+    items = sorted(items, key=lambda item: _get(item, key))
+    keys = [_get(item, key) for item in items]
+
+    start = 0
+    if request.page_token:
+        try:
+            start = bisect_right(keys, type(keys[0])(request.page_token))
+        except ValueError:
+            raise ValueError(
+                'Malformed page token \'{}\''.format(request.page_token))
+
+    end = len(items)
+    if request.page_size:
+        end = min(end, start + request.page_size)
+
+    next_page_token = str(keys[end - 1]) if end < len(items) else ''
+    return items[start:end], next_page_token
+
+
+def _project(items, field_mask, key):
+    if not items:
+        return items
+    mask = FieldMask(paths=list(field_mask.paths) + [key])
+    if not mask.IsValidForDescriptor(items[0].DESCRIPTOR):
+        raise ValueError('Invalid field mask \'{}\''.format(
+            ','.join(field_mask.paths)))
+    projected = []
+    for item in items:
+        projection = type(item)()
+        mask.MergeMessage(item, projection)
+        projected.append(projection)
+    return projected
+
+
+def _parse_filter(condition):
+    path, sep, value = condition.partition('=')
+    if not sep or not path:
+        raise ValueError('Malformed filter \'{}\''.format(condition))
+    return path, value
+
+
+def _get(item, path):
+    for name in path.split('.'):
+        item = getattr(item, name)
+    return item
+
+
+def _matches(item, path, value):
+    names = path.split('.')
+    for name in names[:-1]:
+        field = item.DESCRIPTOR.fields_by_name.get(name)
+        if field is None or field.message_type is None or \
+                field.label == FieldDescriptor.LABEL_REPEATED:
+            raise ValueError('Invalid filter field \'{}\''.format(path))
+        item = getattr(item, name)
+
+    field = item.DESCRIPTOR.fields_by_name.get(names[-1])
+    if field is None or field.message_type is not None:
+        raise ValueError('Invalid filter field \'{}\''.format(path))
+
+    values = getattr(item, field.name)
+    if field.label != FieldDescriptor.LABEL_REPEATED:
+        values = [values]
+    return any(value in _formats(field, v) for v in values)
+
+
+def _formats(field, value):
+    """
+    :return: the strings a filter may give for a field value
+    """
+    if field.enum_type is not None:
+        enum_value = field.enum_type.values_by_number.get(value)
+        if enum_value is not None:
+            return enum_value.name, str(value)
+        return str(value),
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return ('true', '1') if value else ('false', '0')
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return value,
+    return unicode(value),
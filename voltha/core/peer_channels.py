@@ -0,0 +1,262 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+The gRPC channels to the peer Voltha instances, used by the Dispatcher to
+forward requests to them.
+
+A channel is kept, and kept connected, for as long as the address of its
+peer does not change. Each peer has a circuit breaker, which opens on
+consecutive request failures, on a connectivity failure of the channel or
+when the peer reports itself as dying. While it is open, requests to the
+peer fail fast instead of waiting for a gRPC timeout. The peer is then
+reconnected and probed with its HealthService after a jittered exponential
+backoff, and the circuit closes again on the first successful probe.
+"""
+import random
+
+import grpc
+import structlog
+from google.protobuf.empty_pb2 import Empty
+from grpc import ChannelConnectivity
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+
+from common.utils.grpc_utils import deferred_from_future
+from voltha.protos import third_party
+from voltha.protos.voltha_pb2 import HealthServiceStub, HealthStatus
+
+_ = third_party
+log = structlog.get_logger()
+
+
+class PeerChannel(object):
+
+    def __init__(self, core_id, host, port):
+        self.core_id = core_id
+        self.host = host
+        self.port = port
+        self.channel = None
+        self.on_connectivity = None  # subscribed to channel connectivity
+        self.health = None  # last HealthStatus.state reported by the peer
+        self.failures = 0  # consecutive failures since the circuit closed
+        self.open = False  # state of the circuit breaker
+        self.trips = 0  # consecutive openings of the circuit breaker
+        self.probe = None  # IDelayedCall of the next probe, while open
+        self.probing = False
+
+
+class PeerChannels(object):
+
+    def __init__(self, port, health_check_interval=5, health_check_timeout=2,
+                 failure_threshold=3, backoff_initial=0.5, backoff_max=30,
+                 clock=reactor):
+        """
+        :param port: gRPC port of the peers
+        :param health_check_interval: seconds between health checks of the
+        peers whose circuit is closed
+        :param health_check_timeout: seconds after which a health check
+        counts as failed
+        :param failure_threshold: consecutive failures opening the circuit
+        :param backoff_initial: seconds before the first probe of a peer
+        whose circuit opened, doubled on every failed probe...
+        :param backoff_max: ...up to that many seconds
+        :param clock: IReactorTime provider
+        """
+        self.port = port
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.failure_threshold = failure_threshold
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.clock = clock
+
+        self.peers = {}  # core_id -> PeerChannel
+        self.health_check = None
+
+    def start(self):
+        self.health_check = LoopingCall(self.check_health)
+        self.health_check.clock = self.clock
+        self.health_check.start(self.health_check_interval, now=False)
+        return self
+
+    def stop(self):
+        if self.health_check is not None and self.health_check.running:
+            self.health_check.stop()
+        for core_id in self.peers.keys():
+            self._remove(core_id)
+
+    def update(self, peers_map):
+        """
+        Follow a change of the cluster membership. The channels of the peers
+        whose address did not change are kept as they are.
+        :param peers_map: core_id -> instance dict, or None if the instance
+        is currently unavailable
+        """
+        for core_id in self.peers.keys():
+            if not peers_map.get(core_id):
+                self._remove(core_id)
+
+        for core_id, instance in peers_map.iteritems():
+            if not instance:
+                continue
+            peer = self.peers.get(core_id)
+            if peer is not None and peer.host == instance['host']:
+                continue
+            if peer is not None:
+                self._remove(core_id)
+            peer = self.peers[core_id] = PeerChannel(
+                core_id, instance['host'], self.port)
+            self._connect(peer)
+
+    def get_channel(self, core_id):
+        """
+        :return: the channel to the peer, or None if the peer is unknown or
+        its circuit is open, in which case the request should fail fast
+        """
+        peer = self.peers.get(core_id)
+        if peer is None or peer.open:
+            return None
+        return peer.channel
+
+    def available_peers(self):
+        """
+        :return: the ids of the peers whose circuit is closed, the ones
+        reporting themselves as healthy first
+        """
+        return sorted(
+            (core_id for core_id, peer in self.peers.iteritems()
+             if not peer.open),
+            key=lambda core_id:
+                self.peers[core_id].health == HealthStatus.OVERLOADED)
+
+    def record_success(self, core_id):
+        peer = self.peers.get(core_id)
+        if peer is not None:
+            peer.failures = 0
+
+    def record_failure(self, core_id):
+        peer = self.peers.get(core_id)
+        if peer is not None and not peer.open:
+            peer.failures += 1
+            if peer.failures >= self.failure_threshold:
+                self._trip(peer, 'consecutive-failures')
+
+    def check_health(self):
+        for peer in self.peers.values():
+            if not peer.open and not peer.probing:
+                self._probe(peer)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ INTERNALS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _connect(self, peer):
+        channel = grpc.insecure_channel('{}:{}'.format(peer.host, peer.port))
+
+        def _connectivity_changed(connectivity):
+            # called on a gRPC thread
+            reactor.callFromThread(
+                self._connectivity_changed, peer, channel, connectivity)
+
+        peer.channel = channel
+        peer.on_connectivity = _connectivity_changed
+        channel.subscribe(_connectivity_changed, try_to_connect=True)
+        log.info('grpc-channel-created-with-peer', peer=peer.host)
+
+    def _disconnect(self, peer):
+        if peer.channel is not None:
+            peer.channel.unsubscribe(peer.on_connectivity)
+            close = getattr(peer.channel, 'close', None)
+            if close is not None:
+                close()
+            peer.channel = None
+            log.info('grpc-channel-closed-with-peer', peer_id=peer.core_id)
+
+    def _remove(self, core_id):
+        peer = self.peers.pop(core_id)
+        if peer.probe is not None and peer.probe.active():
+            peer.probe.cancel()
+        self._disconnect(peer)
+
+    def _connectivity_changed(self, peer, channel, connectivity):
+        if self.peers.get(peer.core_id) is not peer or \
+                peer.channel is not channel:
+            return  # stale notification
+        log.debug('peer-connectivity', core_id=peer.core_id,
+                  connectivity=connectivity)
+        if connectivity in (ChannelConnectivity.TRANSIENT_FAILURE,
+                            ChannelConnectivity.SHUTDOWN):
+            if not peer.open:
+                self._trip(peer, 'connectivity-lost')
+        elif connectivity == ChannelConnectivity.READY:
+            if peer.open and not peer.probing:
+                # no need to wait for the backoff to expire
+                if peer.probe is not None and peer.probe.active():
+                    peer.probe.cancel()
+                self._probe(peer)
+
+    def _trip(self, peer, reason):
+        peer.open = True
+        peer.trips += 1
+        delay = min(self.backoff_max,
+                    self.backoff_initial * 2 ** (peer.trips - 1))
+        delay *= random.uniform(0.5, 1.0)
+        log.warn('peer-circuit-open', core_id=peer.core_id, reason=reason,
+                 retry_in=delay)
+        if peer.probe is not None and peer.probe.active():
+            peer.probe.cancel()
+        peer.probe = self.clock.callLater(delay, self._reconnect, peer)
+
+    def _reconnect(self, peer):
+        self._disconnect(peer)
+        self._connect(peer)
+        self._probe(peer)
+
+    def _get_health(self, peer):
+        stub = HealthServiceStub(peer.channel)
+        return deferred_from_future(stub.GetHealthStatus.future(
+            Empty(), timeout=self.health_check_timeout))
+
+    def _probe(self, peer):
+        peer.probing = True
+        channel = peer.channel
+
+        def _healthy(status):
+            if peer.channel is not channel:
+                return
+            peer.probing = False
+            peer.health = status.state
+            if status.state == HealthStatus.DYING:
+                self._trip(peer, 'peer-dying')
+            elif peer.open:
+                peer.open = False
+                peer.trips = 0
+                peer.failures = 0
+                log.info('peer-circuit-closed', core_id=peer.core_id)
+            else:
+                peer.failures = 0
+
+        def _unhealthy(failure):
+            if peer.channel is not channel:
+                return
+            peer.probing = False
+            log.debug('peer-health-check-failed', core_id=peer.core_id,
+                      failure=failure.getErrorMessage())
+            if peer.open:
+                self._trip(peer, 'probe-failed')
+            else:
+                self.record_failure(peer.core_id)
+
+        self._get_health(peer).addCallbacks(_healthy, _unhealthy)
@@ -38,6 +38,7 @@ from voltha.adapters.loader import AdapterLoader
 from voltha.coordinator import Coordinator
 from voltha.core.core import VolthaCore
 from voltha.core.config.config_backend import load_backend
+from voltha.core.flow_decomposition_pool import FlowDecompositionPool
 from voltha.northbound.diagnostics import Diagnostics
 from voltha.northbound.grpc.grpc_server import VolthaGrpcServer
 from voltha.northbound.kafka.kafka_proxy import KafkaProxy, get_kafka_proxy
@@ -347,6 +348,14 @@ class Main(object):
             # Update the logger to output the vcore id.
             self.log = update_logging(instance_id=self.instance_id, vcore_id=self.core_store_id)
 
+            # started ahead of the gRPC server, so that its worker
+            # processes are forked before any gRPC threads exist
+            yield registry.register(
+                'flow_decomposition',
+                FlowDecompositionPool(
+                    config=self.config.get('flow_decomposition', {}))
+            ).start()
+
             yield registry.register(
                 'grpc_server',
                 VolthaGrpcServer(self.args.grpc_port)
@@ -17,6 +17,12 @@
 
 """
 Voltha internal diagnostics
+
+The runtime metrics (see common.utils.metrics) and the metrics of the
+components are published periodically as KPI events. Walking the heap is
+too expensive for that, and only done on demand, e.g. from the manhole:
+
+>>> diag.heap_stats()
 """
 
 import arrow
@@ -25,12 +31,14 @@ import structlog
 import resource
 
 import sys
+from collections import Counter
 from simplejson import dumps
 from twisted.internet.defer import Deferred
 from twisted.internet.task import LoopingCall
 from zope.interface import implementer
 
 from common.event_bus import EventBusClient
+from common.utils.metrics import default_registry
 from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricValuePairs
 from voltha.registry import IComponent, registry
 
@@ -65,26 +73,44 @@ class Diagnostics(object):
 
         ts = arrow.utcnow().timestamp
 
-        def deferreds():
-            return len(gc.get_referrers(Deferred))
-
         def rss_mb():
             rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
             if sys.platform.startswith('darwin'):
                 rss /= 1024
             return rss
 
+        metrics = default_registry.collect()
+        metrics['rss-mb'] = rss_mb()
+        if 'flow_decomposition' in registry.components:
+            metrics.update(registry('flow_decomposition').get_metrics())
+        if 'core' in registry.components:
+            metrics.update(registry('core').get_metrics())
+        if 'kafka_proxy' in registry.components:
+            metrics.update(registry('kafka_proxy').get_metrics())
+        metrics.update(self.event_bus.get_metrics())
+
         kpi_event = KpiEvent(
             type=KpiEventType.slice,
             ts=ts,
             prefixes={
                 'voltha.internal.{}'.format(self.instance_id):
-                    MetricValuePairs(metrics={
-                        'deferreds': deferreds(),
-                        'rss-mb': rss_mb(),
-                    })
+                    MetricValuePairs(metrics=metrics)
             }
         )
 
         self.event_bus.publish('kpis', kpi_event)
         log.debug('periodic-check', ts=ts)
+
+    def heap_stats(self, top=20):
+        """
+        Walk the heap, which stalls the reactor on large processes
+        :param top: number of most common object types to return
+        :return: dict of the number of objects per type, for the top most
+        common types, and the number of Deferreds as 'deferreds'
+        """
+        objects = gc.get_objects()
+        counts = Counter(type(o).__name__ for o in objects)
+        stats = dict(counts.most_common(top))
+        stats['deferreds'] = sum(1 for o in objects if isinstance(o, Deferred))
+        log.info('heap-stats', stats=stats)
+        return stats
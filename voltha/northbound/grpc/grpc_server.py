@@ -98,7 +98,7 @@ class HealthService(voltha_pb2.HealthServiceServicer):
     def GetHealthStatus(self, request, context):
         """Return current health status of a Voltha instance
         """
-        log.info('get-health-status', request=request)
+        log.debug('get-health-status', request=request)
         res = voltha_pb2.HealthStatus(
             state=voltha_pb2.HealthStatus.HEALTHY
         )
@@ -197,7 +197,9 @@ class VolthaGrpcServer(object):
     def __init__(self, port=50055):
         self.port = port
         log.info('init-grpc-server', port=self.port)
-        self.thread_pool = futures.ThreadPoolExecutor(max_workers=10)
+        # the streams held open, e.g., by ofagents, each take a worker, up to
+        # the limit set by the local handler; the rest serve unary requests
+        self.thread_pool = futures.ThreadPoolExecutor(max_workers=20)
         self.server = grpc.server(self.thread_pool)
         self.services = []
 
@@ -0,0 +1,319 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Batching and flow control of the messages the KafkaProxy produces.
+
+Messages are queued per topic, and sent as a single produce request per
+topic once the batch is full, or once its first message has waited for the
+linger time. No more than max_in_flight produce requests are outstanding at
+any time; meanwhile, messages keep being queued, up to max_queued_bytes.
+Past that, the overflow policy decides: drop the newest messages, drop the
+oldest ones, or spool the newest ones to a file, to be queued again once
+the backlog has drained.
+
+Callers wanting backpressure wait for when_ready() before producing more.
+"""
+import struct
+from collections import OrderedDict, deque
+from itertools import count
+
+from structlog import get_logger
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+
+from common.utils.metrics import histogram
+
+log = get_logger()
+
+_batch_latency = histogram('kafka-batch-latency')
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+SPOOL = 'spool'
+
+
+class Spool(object):
+    """
+    FIFO of (topic, message) records kept in a file
+    """
+
+    _header = struct.Struct('!HI')
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.read_offset = 0
+        self.count = 0
+
+    def append(self, topic, msg):
+        if self.file is None:
+            self.file = open(self.path, 'w+b')
+        topic = str(topic)
+        self.file.seek(0, 2)
+        self.file.write(self._header.pack(len(topic), len(msg)))
+        self.file.write(topic)
+        self.file.write(msg)
+        self.count += 1
+
+    def pop(self):
+        self.file.seek(self.read_offset)
+        topic_len, msg_len = self._header.unpack(
+            self.file.read(self._header.size))
+        topic = self.file.read(topic_len)
+        msg = self.file.read(msg_len)
+        self.read_offset = self.file.tell()
+        self.count -= 1
+        if not self.count:
+            self.file.truncate(0)
+            self.read_offset = 0
+        return topic, msg
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class BatchProducer(object):
+
+    def __init__(self,
+                 send_batch,
+                 linger=0.05,
+                 max_batch_bytes=65536,
+                 max_in_flight=4,
+                 max_queued_bytes=4194304,
+                 overflow=DROP_OLDEST,
+                 spool_path=None,
+                 on_failure=None,
+                 clock=reactor):
+        """
+        :param send_batch: callable producing a list of messages to a topic,
+        given the topic and the list, returning a Deferred
+        :param linger: seconds a message may wait for its batch to fill up
+        :param max_batch_bytes: size of the messages of a batch, beyond which
+        it is sent right away
+        :param max_in_flight: maximum number of outstanding batches
+        :param max_queued_bytes: size of the messages queued while waiting
+        for the outstanding batches, beyond which the overflow policy applies
+        :param overflow: DROP_NEWEST, DROP_OLDEST or SPOOL
+        :param spool_path: file the messages are spooled to, for SPOOL
+        :param on_failure: called with the Failure of a batch
+        :param clock: IReactorTime provider
+        """
+        assert overflow in (DROP_NEWEST, DROP_OLDEST, SPOOL)
+        assert overflow != SPOOL or spool_path
+        self.send_batch = send_batch
+        self.linger = linger
+        self.max_batch_bytes = max_batch_bytes
+        self.max_in_flight = max_in_flight
+        self.max_queued_bytes = max_queued_bytes
+        self.overflow = overflow
+        self.spool = Spool(spool_path) if overflow == SPOOL else None
+        self.on_failure = on_failure
+        self.clock = clock
+
+        self.queues = {}  # topic -> deque of (sequence, message)
+        self.queued_bytes = 0
+        self.topic_bytes = {}  # topic -> bytes queued
+        self.sequence = count()
+        self.lingering = {}  # topic -> IDelayedCall of its batch
+        self.ready = OrderedDict()  # topics whose batch is due, in order
+        self.in_flight = 0
+        self.waiters = []  # Deferreds of when_ready()
+        self.drain_waiters = []  # Deferreds of flush()
+
+        self.sent = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def send(self, topic, msg):
+        """
+        Queue a message
+        :return: False if the message was dropped
+        """
+        if self.spool is not None and self.spool.count:
+            # keep the order of the messages already spooled
+            return self._overflow(topic, msg)
+        if self.queued_bytes + len(msg) > self.max_queued_bytes:
+            return self._overflow(topic, msg)
+        self._enqueue(topic, msg)
+        self._flush()
+        return True
+
+    def when_ready(self):
+        """
+        :return: Deferred firing once the queued messages are down to half of
+        max_queued_bytes, and none is spooled
+        """
+        if self._is_ready():
+            return succeed(None)
+        d = Deferred()
+        self.waiters.append(d)
+        return d
+
+    def flush(self):
+        """
+        Send all queued messages without waiting for the linger time
+        :return: Deferred firing once none is queued, spooled or in flight
+        """
+        for topic in self.queues.keys():
+            self._due(topic)
+        self._flush()
+        if self._is_drained():
+            return succeed(None)
+        d = Deferred()
+        self.drain_waiters.append(d)
+        return d
+
+    def stop(self):
+        for call in self.lingering.itervalues():
+            call.cancel()
+        self.lingering.clear()
+        if self.spool is not None:
+            self.spool.close()
+
+    def get_metrics(self, prefix):
+        return {
+            prefix + '-queued': sum(len(q) for q in self.queues.itervalues()),
+            prefix + '-queued-bytes': self.queued_bytes,
+            prefix + '-in-flight': self.in_flight,
+            prefix + '-sent': self.sent,
+            prefix + '-batches': self.batches,
+            prefix + '-dropped': self.dropped,
+            prefix + '-spooled': self.spool.count if self.spool else 0,
+            prefix + '-failed': self.failed,
+        }
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ INTERNALS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _enqueue(self, topic, msg):
+        queue = self.queues.get(topic)
+        if queue is None:
+            queue = self.queues[topic] = deque()
+            self.topic_bytes[topic] = 0
+        queue.append((next(self.sequence), msg))
+        self.queued_bytes += len(msg)
+        self.topic_bytes[topic] += len(msg)
+
+        if self.topic_bytes[topic] >= self.max_batch_bytes:
+            self._due(topic)
+        elif topic not in self.lingering and topic not in self.ready:
+            self.lingering[topic] = self.clock.callLater(
+                self.linger, self._linger_expired, topic)
+
+    def _overflow(self, topic, msg):
+        if self.overflow == SPOOL:
+            self.spool.append(topic, msg)
+            return True
+        if self.overflow == DROP_OLDEST:
+            while self.queues and \
+                    self.queued_bytes + len(msg) > self.max_queued_bytes:
+                self._drop_oldest()
+            if self.queued_bytes + len(msg) <= self.max_queued_bytes:
+                self._enqueue(topic, msg)
+                self._flush()
+                return True
+        self.dropped += 1
+        return False
+
+    def _drop_oldest(self):
+        topic = min(self.queues, key=lambda t: self.queues[t][0][0])
+        _, msg = self.queues[topic].popleft()
+        self._dequeued(topic, len(msg))
+        self.dropped += 1
+
+    def _dequeued(self, topic, size):
+        self.queued_bytes -= size
+        self.topic_bytes[topic] -= size
+        if not self.queues[topic]:
+            del self.queues[topic]
+            del self.topic_bytes[topic]
+            self.ready.pop(topic, None)
+            call = self.lingering.pop(topic, None)
+            if call is not None:
+                call.cancel()
+
+    def _linger_expired(self, topic):
+        del self.lingering[topic]
+        self._due(topic)
+        self._flush()
+
+    def _due(self, topic):
+        call = self.lingering.pop(topic, None)
+        if call is not None:
+            call.cancel()
+        self.ready[topic] = None
+
+    def _flush(self):
+        while self.ready and self.in_flight < self.max_in_flight:
+            topic, _ = self.ready.popitem(last=False)
+            queue = self.queues[topic]
+            msgs = []
+            size = 0
+            while queue and (not msgs or
+                             size + len(queue[0][1]) <= self.max_batch_bytes):
+                _, msg = queue.popleft()
+                msgs.append(msg)
+                size += len(msg)
+            self._dequeued(topic, size)
+            if topic in self.queues:
+                # the rest of the messages have waited long enough already
+                self.ready[topic] = None
+            self._send(topic, msgs)
+
+    def _send(self, topic, msgs):
+        self.in_flight += 1
+        self.batches += 1
+        d = maybeDeferred(_batch_latency.timed(self.send_batch), topic, msgs)
+        d.addCallbacks(self._sent, self._failed,
+                       callbackArgs=(msgs,), errbackArgs=(topic, msgs))
+        d.addBoth(self._done)
+
+    def _sent(self, _, msgs):
+        self.sent += len(msgs)
+
+    def _failed(self, failure, topic, msgs):
+        self.failed += len(msgs)
+        log.error('failed-to-send-kafka-batch', topic=topic,
+                  messages=len(msgs), e=failure.getErrorMessage())
+        if self.on_failure is not None:
+            self.on_failure(failure)
+
+    def _done(self, _):
+        self.in_flight -= 1
+        if self.spool is not None:
+            while self.spool.count and \
+                    self.queued_bytes <= self.max_queued_bytes / 2:
+                self._enqueue(*self.spool.pop())
+        self._flush()
+        if self.waiters and self._is_ready():
+            waiters, self.waiters = self.waiters, []
+            for d in waiters:
+                d.callback(None)
+        if self.drain_waiters and self._is_drained():
+            waiters, self.drain_waiters = self.drain_waiters, []
+            for d in waiters:
+                d.callback(None)
+
+    def _is_ready(self):
+        return self.queued_bytes <= self.max_queued_bytes / 2 and \
+            not (self.spool is not None and self.spool.count)
+
+    def _is_drained(self):
+        return not self.queues and not self.in_flight and \
+            not (self.spool is not None and self.spool.count)
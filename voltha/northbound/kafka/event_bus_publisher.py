@@ -19,13 +19,23 @@
 A gateway between the internal event bus and the Kafka publisher proxy
 to publish select topics and messages posted to the Voltha-internal event
 bus toward the external world.
+
+Each mapping may choose the wire format of its Kafka topic, 'json' (the
+default) or 'protobuf', see common.utils.event_codec. Events larger than
+offload_threshold bytes are encoded in a thread rather than on the reactor,
+still reaching their Kafka topic in the order they were posted.
+
+Events are forwarded through bounded queues drained on the reactor, of
+queue_size events per mapping, so that publishers never wait for Kafka.
 """
+from collections import deque
+
 import structlog
-from google.protobuf.json_format import MessageToDict
 from google.protobuf.message import Message
-from simplejson import dumps
+from twisted.internet import threads
 
-from common.event_bus import EventBusClient
+from common.event_bus import EventBusClient, DROP_OLDEST
+from common.utils import event_codec
 
 log = structlog.get_logger()
 
@@ -36,6 +46,10 @@ class EventBusPublisher(object):
         self.kafka_proxy = kafka_proxy
         self.config = config
         self.topic_mappings = config.get('topic_mappings', {})
+        self.offload_threshold = config.get('offload_threshold', 65536)
+        self.queue_size = config.get('queue_size', 10000)
+        self.overflow = config.get('overflow', DROP_OLDEST)
+        self.backlogs = {}  # kafka topic -> deque of [encoded, value]
         self.event_bus = EventBusClient()
         self.subscriptions = None
 
@@ -69,22 +83,70 @@ class EventBusPublisher(object):
                           mapping=mapping)
                 continue
 
+            wire_format = mapping.get('format', event_codec.JSON)
+            encode = event_codec.encoders.get(wire_format)
+            if encode is None:
+                log.error('unknown-format-in-config',
+                          event_bus_topic=event_bus_topic,
+                          format=wire_format)
+                continue
+
             self.subscriptions.append(self.event_bus.subscribe(
                 event_bus_topic,
                 # to avoid Python late-binding to the last registered
                 # kafka_topic, we force instant binding with the default arg
-                lambda _, m, k=kafka_topic: self.forward(k, m)))
+                lambda _, m, k=kafka_topic, e=encode: self.forward(k, m, e),
+                queue_size=self.queue_size,
+                overflow=self.overflow,
+                name=kafka_topic))
 
             log.info('event-to-kafka', kafka_topic=kafka_topic,
-                     event_bus_topic=event_bus_topic)
+                     event_bus_topic=event_bus_topic, format=wire_format)
 
-    def forward(self, kafka_topic, msg):
+    def forward(self, kafka_topic, msg, encode=event_codec.encode_json):
         try:
-            # convert to JSON string if msg is a protobuf msg
-            if isinstance(msg, Message):
-                msg = dumps(MessageToDict(msg, True, True))
             log.debug('forward-event-bus-publisher')
-            self.kafka_proxy.send_message(kafka_topic, msg)
+            backlog = self.backlogs.get(kafka_topic)
+            if not isinstance(msg, Message):
+                value = msg
+            elif msg.ByteSize() >= self.offload_threshold:
+                self._encode_in_thread(kafka_topic, msg, encode)
+                return
+            else:
+                value = encode(msg)
+            if backlog:
+                # an earlier event is still being encoded
+                backlog.append([True, value])
+            else:
+                self.kafka_proxy.send_message(kafka_topic, value)
         except Exception, e:
             log.exception('failed-forward-event-bus-publisher', e=e)
 
+    def _encode_in_thread(self, kafka_topic, msg, encode):
+        entry = [False, None]
+        self.backlogs.setdefault(kafka_topic, deque()).append(entry)
+
+        def encoded(value):
+            entry[:] = [True, value]
+
+        def failed(failure):
+            log.error('failed-encoding-event', kafka_topic=kafka_topic,
+                      e=failure.getErrorMessage())
+            entry[:] = [True, None]
+
+        d = threads.deferToThread(encode, msg)
+        d.addCallbacks(encoded, failed)
+        d.addBoth(lambda _: self._drain(kafka_topic))
+
+    def _drain(self, kafka_topic):
+        backlog = self.backlogs[kafka_topic]
+        while backlog and backlog[0][0]:
+            _, value = backlog.popleft()
+            if value is not None:
+                try:
+                    self.kafka_proxy.send_message(kafka_topic, value)
+                except Exception, e:
+                    log.exception('failed-forward-event-bus-publisher', e=e)
+        if not backlog:
+            del self.backlogs[kafka_topic]
+
@@ -24,6 +24,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from zope.interface import implementer
 
 from common.utils.consulhelpers import get_endpoint_from_consul
+from voltha.northbound.kafka.batch_producer import BatchProducer
 from voltha.northbound.kafka.event_bus_publisher import EventBusPublisher
 from voltha.registry import IComponent
 
@@ -56,6 +57,9 @@ class KafkaProxy(object):
         self.config = config
         self.kclient = None
         self.kproducer = None
+        self.producer = BatchProducer(self._send_batch,
+                                      on_failure=self._on_send_failure,
+                                      **config.get('producer', {}))
         self.event_bus_publisher = None
         self.stopping = False
         self.faulty = False
@@ -75,6 +79,15 @@ class KafkaProxy(object):
 
     @inlineCallbacks
     def stop(self):
+        # a failing batch must not restart the connection while draining
+        self.stopping = True
+        log.debug('flushing-kafka-proxy')
+        yield self.producer.flush()
+        yield self._close()
+        self.producer.stop()
+
+    @inlineCallbacks
+    def _close(self):
         try:
             log.debug('stopping-kafka-proxy')
             try:
@@ -142,56 +155,62 @@ class KafkaProxy(object):
             log.exception('failed-get-kafka-producer', e=e)
             return
 
-    @inlineCallbacks
     def send_message(self, topic, msg):
+        """
+        Queue a message, to be produced along with the other messages queued
+        for the same topic
+        :return: Deferred firing once the producer is ready for more
+        messages, for callers producing in bulk to wait for
+        """
         assert topic is not None
         assert msg is not None
 
+        if self.faulty is False:
+            log.debug('queueing-kafka-msg', topic=topic, msg=msg)
+            self.producer.send(topic, msg)
+        return self.producer.when_ready()
+
+    def _send_batch(self, topic, msgs):
         # first check whether we have a kafka producer.  If there is none
         # then try to get one - this happens only when we try to lookup the
         # kafka service from consul
-        try:
-            if self.faulty is False:
-
-                if self.kproducer is None:
-                    self._get_kafka_producer()
-                    # Lets the next message request do the retry if still a failure
-                    if self.kproducer is None:
-                        log.error('no-kafka-producer', endpoint=self.kafka_endpoint)
-                        return
-
-                log.debug('sending-kafka-msg', topic=topic, msg=msg)
-                msgs = [msg]
-
-                if self.kproducer and self.kclient and \
-                        self.event_bus_publisher and self.faulty is False:
-                    yield self.kproducer.send_messages(topic, msgs=msgs)
-                    log.debug('sent-kafka-msg', topic=topic, msg=msg)
-                else:
-                    return
+        if self.kproducer is None:
+            self._get_kafka_producer()
+            # Lets the next batch do the retry if still a failure
+            if self.kproducer is None:
+                raise Exception('no-kafka-producer')
 
-        except Exception, e:
-            self.faulty = True
-            log.error('failed-to-send-kafka-msg', topic=topic, msg=msg, e=e)
-
-            # set the kafka producer to None.  This is needed if the
-            # kafka docker went down and comes back up with a different
-            # port number.
-            if self.stopping is False:
-                log.debug('stopping-kafka-proxy')
-                try:
-                    self.stopping = True
-                    self.stop()
-                    self.stopping = False
-                    self.faulty = False
-                    log.debug('stopped-kafka-proxy')
-                except Exception, e:
-                    log.exception('failed-stopping-kafka-proxy', e=e)
-                    pass
-            else:
-                log.info('already-stopping-kafka-proxy')
+        if not (self.kclient and self.event_bus_publisher) or self.faulty:
+            raise Exception('kafka-proxy-unavailable')
 
-            return
+        log.debug('sending-kafka-msgs', topic=topic, count=len(msgs))
+        return self.kproducer.send_messages(topic, msgs=msgs)
+
+    def _on_send_failure(self, failure):
+        if self.kproducer is None:
+            return  # nothing to restart
+
+        self.faulty = True
+
+        # set the kafka producer to None.  This is needed if the
+        # kafka docker went down and comes back up with a different
+        # port number.
+        if self.stopping is False:
+            log.debug('stopping-kafka-proxy')
+            try:
+                self.stopping = True
+                self._close()
+                self.stopping = False
+                self.faulty = False
+                log.debug('stopped-kafka-proxy')
+            except Exception, e:
+                log.exception('failed-stopping-kafka-proxy', e=e)
+                pass
+        else:
+            log.info('already-stopping-kafka-proxy')
+
+    def get_metrics(self):
+        return self.producer.get_metrics('kafka-producer')
 
     def is_faulty(self):
         return self.faulty